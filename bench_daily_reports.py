@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Навантажувальний тест щоденної розсилки звітів
+
+Створює тимчасову базу з N синтетичними користувачами та графом друзів,
+піднімає локальну заглушку Steam Web API (aiohttp) з налаштовною затримкою та
+частотою помилок і замінює Telegram-бота фейком, що записує повідомлення.
+Виміряє повний прогін `send_daily_reports_to_all_users` разом з доставкою.
+
+Приклад:
+    python bench_daily_reports.py --users 5000 --friends 6 --steam-latency 0.15 --steam-error-rate 0.02
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+from aiohttp import web
+
+from src.models.user import UserDatabase, User
+from src.services.steam_api import SteamAPI
+from src.services.daily_reports import DailyReportsService
+from src.services.outbox import OutboxSender
+from src.services.rate_limiter import TelegramRateLimiter
+
+STEAM_ID_BASE = 76561198000000000
+
+
+class FakeSteamServer:
+    """Локальна заглушка Steam Web API з затримкою та випадковими помилками"""
+
+    def __init__(self, latency: float, error_rate: float, seed: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = {'stats': 0, 'summaries': 0, 'errors': 0}
+        self.runner = None
+        self.base_url = None
+
+    async def _respond(self, kind: str, payload):
+        self.calls[kind] += 1
+        if self.latency:
+            # Затримка з розкидом ±50%, як у реального API
+            await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        if self.random.random() < self.error_rate:
+            self.calls['errors'] += 1
+            return web.Response(status=500)
+        return web.json_response(payload())
+
+    @staticmethod
+    def player_stats(steam_id: str):
+        n = zlib.crc32(steam_id.encode('utf-8'))
+        matches = 100 + n % 900
+        stats = {
+            'total_kills': matches * (12 + n % 10),
+            'total_deaths': matches * (13 + n % 7),
+            'total_kills_headshot': matches * (4 + n % 5),
+            'total_wins': matches * (40 + n % 20) // 100,
+            'total_matches_played': matches,
+            'total_mvps': matches * (1 + n % 3),
+            'total_rounds_played': matches * 22,
+            'total_damage_done': matches * 2000,
+            'last_match_kills': 10 + n % 20,
+            'last_match_deaths': 10 + n % 15,
+            'last_match_damage': 1500 + n % 1500,
+            'last_match_rounds': 22,
+        }
+        return {'playerstats': {'steamID': steam_id, 'stats': [{'name': k, 'value': v} for k, v in stats.items()]}}
+
+    async def handle_stats(self, request: web.Request):
+        steam_id = request.query.get('steamid', '')
+        return await self._respond('stats', lambda: self.player_stats(steam_id))
+
+    async def handle_summaries(self, request: web.Request):
+        steam_ids = request.query.get('steamids', '').split(',')
+        return await self._respond('summaries', lambda: {'response': {'players': [
+            {'steamid': steam_id, 'personaname': f"Player {steam_id[-6:]}"} for steam_id in steam_ids
+        ]}})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/ISteamUserStats/GetUserStatsForGame/v0002/', self.handle_stats)
+        app.router.add_get('/ISteamUser/GetPlayerSummaries/v0002/', self.handle_summaries)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+
+class RecordingBot:
+    """Фейковий Telegram-бот, що записує надіслані повідомлення"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.sent = 0
+        self.chats = set()
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+        self.chats.add(chat_id)
+
+
+def seed_users(user_db: UserDatabase, users: int, max_friends: int, outside_players: int, seed: int):
+    """Створити користувачів з випадковим графом друзів (частина друзів - не користувачі бота)"""
+    rng = random.Random(seed)
+    user_ids = [str(STEAM_ID_BASE + n) for n in range(users)]
+    outside_ids = [str(STEAM_ID_BASE + users + n) for n in range(outside_players)]
+    pool = user_ids + outside_ids
+
+    for n, steam_id in enumerate(user_ids):
+        user = User(100000 + n, steam_id=steam_id, username=f"user{n}")
+        friends_count = rng.randint(0, max_friends)
+        user.friends = [friend for friend in rng.sample(pool, min(friends_count, len(pool))) if friend != steam_id]
+        user_db.create_user(user)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss у кілобайтах на Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def run_benchmark(args) -> dict:
+    steam = FakeSteamServer(args.steam_latency, args.steam_error_rate, args.seed)
+    base_url = await steam.start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        user_db = UserDatabase(os.path.join(tmp, "bench.db"))
+        seed_start = time.monotonic()
+        seed_users(user_db, args.users, args.friends, args.outside_players, args.seed)
+        print(f"👥 Створено {args.users} користувачів за {time.monotonic() - seed_start:.1f} с")
+
+        steam_api = SteamAPI("bench")
+        steam_api.base_url = base_url
+        bot = RecordingBot(args.telegram_latency)
+        service = DailyReportsService(user_db, steam_api, bot, fetch_concurrency=args.fetch_concurrency)
+        service.delivery_poll_interval = 0.2
+        sender = OutboxSender(service.outbox, bot, TelegramRateLimiter(global_rate=args.telegram_rate),
+                              concurrency=args.senders, poll_interval=0.05)
+
+        tracemalloc.start()
+        sender.start()
+        run_start = time.monotonic()
+        try:
+            sent, errors = await service.send_daily_reports_to_all_users(delivery_timeout=args.delivery_timeout)
+        finally:
+            duration = time.monotonic() - run_start
+            await sender.stop()
+            _, peak_traced = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            await steam.stop()
+
+        steam_calls = steam.calls['stats'] + steam.calls['summaries']
+        return {
+            'users': args.users,
+            'reports': sent,
+            'errors': errors,
+            'messages': bot.sent,
+            'duration': duration,
+            'reports_per_sec': sent / duration if duration > 0 else 0,
+            'steam_calls': steam_calls,
+            'steam_errors': steam.calls['errors'],
+            'steam_calls_per_report': steam_calls / sent if sent else 0,
+            'peak_traced_mb': peak_traced / 1024 / 1024,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Навантажувальний тест щоденних звітів")
+    parser.add_argument('--users', type=int, default=1000, help="кількість користувачів")
+    parser.add_argument('--friends', type=int, default=5, help="максимум друзів у користувача")
+    parser.add_argument('--outside-players', type=int, default=500, help="гравці-друзі, що не є користувачами")
+    parser.add_argument('--steam-latency', type=float, default=0.1, help="середня затримка Steam API, с")
+    parser.add_argument('--steam-error-rate', type=float, default=0.0, help="частка відповідей 500 від Steam")
+    parser.add_argument('--telegram-latency', type=float, default=0.0, help="затримка send_message, с")
+    parser.add_argument('--telegram-rate', type=float, default=25.0, help="глобальний ліміт повідомлень/с")
+    parser.add_argument('--fetch-concurrency', type=int, default=8)
+    parser.add_argument('--senders', type=int, default=8)
+    parser.add_argument('--delivery-timeout', type=float, default=3600)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help="показувати лог фаз розсилки")
+    return parser.parse_args()
+
+
+def main():
+    """Запустити навантажувальний тест та вивести підсумок"""
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    result = asyncio.run(run_benchmark(args))
+
+    print("\n📊 Результати:")
+    print(f"• Звітів: {result['reports']} (помилок: {result['errors']}), повідомлень доставлено: {result['messages']}")
+    print(f"• Загальний час: {result['duration']:.1f} с")
+    print(f"• Швидкість: {result['reports_per_sec']:.1f} звітів/с")
+    print(f"• Запитів до Steam: {result['steam_calls']} (помилок: {result['steam_errors']}), "
+          f"{result['steam_calls_per_report']:.2f} на звіт")
+    print(f"• Пік пам'яті: {result['peak_traced_mb']:.1f} МБ (tracemalloc), {result['peak_rss_mb']:.1f} МБ RSS")
+
+
+if __name__ == "__main__":
+    main()
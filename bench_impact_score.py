@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Порівняння швидкості скалярного та пакетного (NumPy) розрахунку Impact Score
+
+Приклад:
+    python bench_impact_score.py --players 10000 100000
+"""
+import argparse
+import random
+import time
+
+from src.services.steam_api import SteamAPI
+from src.services.stats_batch import PlayerStatsBatch
+
+
+def random_raw_stats(rng: random.Random):
+    """Випадкова відповідь Steam API зі статистикою гравця"""
+    matches = rng.choice([0, 1, 2, 3, 7, rng.randint(1, 5000)])
+    values = {
+        'total_kills': rng.randint(0, 30) * matches,
+        'total_deaths': rng.randint(0, 30) * matches,
+        'total_kills_headshot': rng.randint(0, 15) * matches,
+        'total_shots_fired': rng.randint(0, 400) * matches,
+        'total_shots_hit': rng.randint(0, 100) * matches,
+        'total_wins': rng.randint(0, matches) if matches else rng.randint(0, 3),
+        'total_matches_played': matches,
+        'total_mvps': rng.randint(0, 5) * matches,
+        'total_kills_assist': rng.randint(0, 8) * matches,
+        'total_damage_done': rng.randint(0, 3000) * matches,
+    }
+    # Частина лічильників відсутня у відповіді Steam
+    return {'stats': [{'name': name, 'value': value} for name, value in values.items() if rng.random() > 0.05]}
+
+
+def bench(players: int, seed: int):
+    api = SteamAPI("bench")
+    rng = random.Random(seed)
+    raw = {str(76561198000000000 + n): random_raw_stats(rng) for n in range(players)}
+
+    start = time.perf_counter()
+    parsed = {steam_id: api.parse_cs2_stats(stats) for steam_id, stats in raw.items()}
+    parse_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scalar = {steam_id: api.calculate_impact_score(stats) for steam_id, stats in parsed.items()}
+    scalar_duration = time.perf_counter() - start
+
+    # Пакетний шлях з розібраної статистики (як у знімку щоденних звітів)
+    start = time.perf_counter()
+    batch = PlayerStatsBatch.from_parsed(parsed)
+    from_parsed_duration = time.perf_counter() - start
+    start = time.perf_counter()
+    vectorized = batch.impact_score_map()
+    vector_duration = time.perf_counter() - start
+
+    # Пакетний шлях одразу із сирих відповідей Steam (показники + Impact Score)
+    start = time.perf_counter()
+    raw_batch = PlayerStatsBatch.from_raw_stats(raw)
+    metrics = raw_batch.metrics()
+    raw_batch.impact_scores(metrics=metrics)
+    raw_duration = time.perf_counter() - start
+
+    assert vectorized == scalar, "Пакетний розрахунок не збігається зі скалярним"
+
+    print(f"\n👥 Гравців: {players:,}")
+    print(f"• parse_cs2_stats + calculate_impact_score: {(parse_duration + scalar_duration) * 1000:.0f} мс")
+    print(f"• calculate_impact_score у циклі: {scalar_duration * 1000:.1f} мс")
+    print(f"• Пакетно з розібраної статистики: {vector_duration * 1000:.1f} мс "
+          f"(+ {from_parsed_duration * 1000:.1f} мс на матрицю), "
+          f"прискорення x{scalar_duration / vector_duration:.1f}")
+    print(f"• Пакетно із сирих відповідей: {raw_duration * 1000:.0f} мс, "
+          f"прискорення x{(parse_duration + scalar_duration) / raw_duration:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк пакетного Impact Score")
+    parser.add_argument('--players', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    for players in args.players:
+        bench(players, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,6 +16,9 @@ LOG_LEVEL = "INFO"
 # Daily reports time (24h format)
 DAILY_REPORT_TIME = "10:00"
 
+# Default time zone for daily reports (users can set their own via /report_settings)
+REPORT_TIMEZONE = "Europe/Kyiv"
+
 # Impact Score weights
 IMPACT_SCORE_WEIGHTS = {
     "kd_ratio": 0.25,
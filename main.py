@@ -3,7 +3,7 @@
 """
 import asyncio
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, filters
 from telegram import Bot
 
 # Імпорти наших модулів
@@ -12,6 +12,12 @@ from src.services.steam_api import SteamAPI
 from src.services.daily_reports import DailyReportsService
 from src.services.scheduler import TaskScheduler
 from src.handlers.bot_handlers import BotHandlers
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.analysis_cache import AnalysisCache
+from src.services.demo_job_queue import DemoJobQueue, DemoAnalysisWorkerPool
+from src.services.outbox import MessageOutbox, OutboxSender
+from src.services.notification_coalescer import NotificationCoalescer
+from src.services.global_leaderboard import GlobalLeaderboard
 
 # Конфігурація
 import os
@@ -22,6 +28,7 @@ STEAM_API_KEY = "6629403219DD2ADCA0D3F552F03F92A8"
 DATABASE_PATH = os.getenv("DATABASE_PATH", "/app/data/bot_database.db")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 DAILY_REPORT_TIME = os.getenv("DAILY_REPORT_TIME", "10:00")
+REPORT_TIMEZONE = os.getenv("REPORT_TIMEZONE", "Europe/Kyiv")
 
 # Автоматично визначаємо Railway домен
 def get_railway_domain():
@@ -92,6 +99,7 @@ def main():
     logger.info(f"   DATABASE_PATH: {DATABASE_PATH}")
     logger.info(f"   LOG_LEVEL: {LOG_LEVEL}")
     logger.info(f"   DAILY_REPORT_TIME: {DAILY_REPORT_TIME}")
+    logger.info(f"   REPORT_TIMEZONE: {REPORT_TIMEZONE}")
     
     # Перевіряємо конфігурацію
     if not TELEGRAM_BOT_TOKEN or TELEGRAM_BOT_TOKEN == "YOUR_BOT_TOKEN":
@@ -108,15 +116,34 @@ def main():
     user_db = UserDatabase(DATABASE_PATH)
     steam_api = SteamAPI(STEAM_API_KEY)
     
+    async def post_init(app):
+        """Запуск фонових воркерів у event loop бота"""
+        outbox_sender.start()
+        coalescer.start()
+        demo_workers.start()
+    
     # Створюємо додаток
-    application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+    application = Application.builder().token(TELEGRAM_BOT_TOKEN).post_init(post_init).build()
+    
+    # Усі фонові повідомлення йдуть через outbox з контролем лімітів Telegram
+    outbox = MessageOutbox(DATABASE_PATH)
+    outbox_sender = OutboxSender(outbox, application.bot)
+    coalescer = NotificationCoalescer(DATABASE_PATH, outbox)
+    
+    # Черга аналізу демо та її воркери
+    demo_job_queue = DemoJobQueue(DATABASE_PATH)
+    demo_analyzer = DemoAnalyzer(STEAM_API_KEY, analysis_cache=AnalysisCache(DATABASE_PATH, DemoAnalyzer.ANALYZER_VERSION))
+    demo_workers = DemoAnalysisWorkerPool(demo_job_queue, demo_analyzer, user_db, outbox,
+                                          coalescer=coalescer)
     
     # Ініціалізуємо сервіс щоденних звітів
-    daily_reports_service = DailyReportsService(user_db, steam_api, application.bot)
-    bot_handlers = BotHandlers(user_db, steam_api, daily_reports_service, APP_DOMAIN, STEAM_API_KEY)
+    daily_reports_service = DailyReportsService(user_db, steam_api, application.bot, outbox)
+    global_leaderboard = GlobalLeaderboard(user_db, daily_reports_service.leaderboards)
+    bot_handlers = BotHandlers(user_db, steam_api, daily_reports_service, APP_DOMAIN, STEAM_API_KEY, demo_job_queue,
+                               global_leaderboard, demo_analyzer)
     
     # Ініціалізуємо планувальник
-    scheduler = TaskScheduler(daily_reports_service)
+    scheduler = TaskScheduler(daily_reports_service, global_leaderboard)
     
     # Реєструємо обробники команд
     application.add_handler(CommandHandler("start", bot_handlers.start_command))
@@ -128,6 +155,8 @@ def main():
     application.add_handler(CommandHandler("remove_friend", bot_handlers.remove_friend_command))
     application.add_handler(CommandHandler("friends_stats", bot_handlers.friends_stats_command))
     application.add_handler(CommandHandler("compare", bot_handlers.compare_command))
+    application.add_handler(CommandHandler("leaderboard", bot_handlers.leaderboard_command))
+    application.add_handler(CallbackQueryHandler(bot_handlers.leaderboard_page_callback, pattern=r'^leaderboard:\d+$'))
     application.add_handler(CommandHandler("daily_report", bot_handlers.daily_report_command))
     application.add_handler(CommandHandler("report_settings", bot_handlers.report_settings_command))
     application.add_handler(CommandHandler("about", bot_handlers.about_command))
@@ -151,6 +180,7 @@ def main():
     application.add_handler(CommandHandler("enable_monitoring", bot_handlers.enable_monitoring_command))
     application.add_handler(CommandHandler("disable_monitoring", bot_handlers.disable_monitoring_command))
     application.add_handler(CommandHandler("monitoring_status", bot_handlers.monitoring_status_command))
+    application.add_handler(CommandHandler("notification_window", bot_handlers.notification_window_command))
     
     # Обробник помилок
     application.add_error_handler(error_handler)
@@ -166,13 +196,14 @@ def main():
     logger.info("   /remove_friend - видалити друга")
     logger.info("   /friends_stats - рейтинг друзів")
     logger.info("   /compare - порівняти з гравцем")
+    logger.info("   /leaderboard - рейтинг усіх гравців")
     logger.info("   /daily_report - щоденний звіт")
     logger.info("   /report_settings - налаштування звітів")
     logger.info("   /about - про бота")
     
     # Запускаємо планувальник
     try:
-        scheduler.start(DAILY_REPORT_TIME)
+        scheduler.start(DAILY_REPORT_TIME, REPORT_TIMEZONE)
     except Exception as e:
         logger.warning(f"⚠️ Не вдалося запустити планувальник: {e}")
     
@@ -206,6 +237,7 @@ def main():
                     loop.run_until_complete(application.initialize())
                     loop.run_until_complete(application.start())
                     loop.run_until_complete(application.updater.start_polling())
+                    loop.run_until_complete(post_init(application))
                     
                     # Запускаємо event loop
                     loop.run_forever()
@@ -3,20 +3,33 @@
 """
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
+import asyncio
 import re
 from typing import Optional
 
 from ..models.user import UserDatabase, User
 from ..services.steam_api import SteamAPI
 from ..services.daily_reports import DailyReportsService
+from ..services.demo_job_queue import DemoJobQueue, PRIORITY_MANUAL
+from ..services.demo_analyzer import DemoAnalyzer
+from ..services.demo_events import summarize_analyses
+from ..services.report_schedule import ReportSchedule
+from ..services.leaderboards import LeaderboardStore
+from ..services.global_leaderboard import GlobalLeaderboard
 
 
 
 class BotHandlers:
-    def __init__(self, user_db: UserDatabase, steam_api: SteamAPI, daily_reports_service: DailyReportsService = None, app_domain: str = None, steam_api_key: str = None):
+    MAX_NOTIFICATION_WINDOW = 180  # Максимальне вікно дайджесту матчів у хвилинах
+
+    def __init__(self, user_db: UserDatabase, steam_api: SteamAPI, daily_reports_service: DailyReportsService = None, app_domain: str = None, steam_api_key: str = None, demo_job_queue: DemoJobQueue = None, global_leaderboard: GlobalLeaderboard = None, demo_analyzer: DemoAnalyzer = None):
         self.user_db = user_db
         self.steam_api = steam_api
         self.daily_reports_service = daily_reports_service
+        self.demo_job_queue = demo_job_queue or DemoJobQueue(user_db.db_path)
+        self.demo_analyzer = demo_analyzer
+        self.leaderboards = daily_reports_service.leaderboards if daily_reports_service else LeaderboardStore(user_db.db_path)
+        self.global_leaderboard = global_leaderboard or GlobalLeaderboard(user_db, self.leaderboards)
         self.app_domain = app_domain or "tgcsstats-production.up.railway.app"
         self.steam_api_key = steam_api_key or "YOUR_STEAM_API_KEY"
 
@@ -120,6 +133,7 @@ class BotHandlers:
 /enable_monitoring - увімкнути автоматичний моніторинг матчів
 /disable_monitoring - вимкнути автоматичний моніторинг
 /monitoring_status - статус моніторингу
+/notification_window `<ХВИЛИНИ>` - об'єднувати матчі поспіль в один дайджест
 
 ℹ️ **Інформація:**
 /about - про бота та Impact Score
@@ -197,7 +211,9 @@ class BotHandlers:
             players = await self.steam_api.get_player_summaries([user.steam_id])
             player_name = players[0].get('personaname', 'Невідомо') if players else 'Невідомо'
             impact_score = self.steam_api.calculate_impact_score(stats)
-            
+            if time_period == "all":
+                self.leaderboards.record_player(user.steam_id, stats, impact_score, player_name)
+
             # Формуємо текст статистики
             period_text = {
                 "all": "за весь час",
@@ -262,7 +278,8 @@ class BotHandlers:
             players = await self.steam_api.get_player_summaries([user.steam_id])
             player_name = players[0].get('personaname', 'Невідомо') if players else 'Невідомо'
             impact_score = self.steam_api.calculate_impact_score(stats)
-            
+            self.leaderboards.record_player(user.steam_id, stats, impact_score, player_name)
+
             # Детальна статистика
             detailed_text = f"""
 🎮 **Детальна статистика для {player_name}**
@@ -435,44 +452,26 @@ class BotHandlers:
             # Включаємо себе в рейтинг
             all_steam_ids = [user.steam_id] + user.friends
             
-            # Отримуємо статистику для всіх
-            friends_stats = []
-            for steam_id in all_steam_ids:
-                raw_stats = await self.steam_api.get_player_stats(steam_id)
-                if raw_stats:
-                    stats = self.steam_api.parse_cs2_stats(raw_stats)
-                    impact_score = self.steam_api.calculate_impact_score(stats)
-                    
-                    # Отримуємо ім'я гравця
-                    players = await self.steam_api.get_player_summaries([steam_id])
-                    name = players[0].get('personaname', 'Невідомо') if players else 'Невідомо'
-                    
-                    friends_stats.append({
-                        'steam_id': steam_id,
-                        'name': name,
-                        'stats': stats,
-                        'impact_score': impact_score,
-                        'is_me': steam_id == user.steam_id
-                    })
-            
+            # Зі Steam завантажуються лише гравці без актуальної статистики в базі,
+            # відсортований рейтинг групи читається з бази
+            await self.leaderboards.refresh(self.steam_api, all_steam_ids)
+            friends_stats = self.leaderboards.get_leaderboard(all_steam_ids)
+
             if not friends_stats:
                 await update.message.reply_text("❌ Не вдалося отримати статистику друзів!")
                 return
-            
-            # Сортуємо за Impact Score
-            friends_stats.sort(key=lambda x: x['impact_score'], reverse=True)
-            
+
             # Формуємо повідомлення
             leaderboard_text = "🏆 **Рейтинг друзів (Impact Score):**\n\n"
             
             for i, friend in enumerate(friends_stats, 1):
                 emoji = "👑" if i == 1 else f"{i}️⃣"
-                me_indicator = " 👤" if friend['is_me'] else ""
-                
+                me_indicator = " 👤" if friend['steam_id'] == user.steam_id else ""
+
                 leaderboard_text += f"{emoji} **{friend['name']}**{me_indicator}\n"
                 leaderboard_text += f"   ⚡ Impact Score: **{friend['impact_score']}/100**\n"
-                leaderboard_text += f"   📊 K/D: {friend['stats']['kd_ratio']} | Win: {friend['stats']['win_rate']}%\n\n"
-            
+                leaderboard_text += f"   📊 K/D: {friend['kd_ratio']} | Win: {friend['win_rate']}%\n\n"
+
             leaderboard_text += "💡 Використай `/compare STEAM_ID` для детального порівняння!"
             
             await update.message.reply_text(leaderboard_text, parse_mode='Markdown')
@@ -480,6 +479,70 @@ class BotHandlers:
         except Exception as e:
             await update.message.reply_text(f"❌ Помилка: {str(e)}")
 
+    async def _render_leaderboard_page(self, page: int, telegram_id: int):
+        """Текст та кнопки сторінки глобального рейтингу"""
+        meta = self.global_leaderboard.get_meta()
+        if meta is None:
+            # Перший запит до завершення фонового перерахунку - рахуємо з кешу одразу (поза event loop)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.global_leaderboard.refresh)
+            meta = self.global_leaderboard.get_meta()
+
+        entries, pages = self.global_leaderboard.get_page(page)
+        if not entries:
+            return "🏆 Рейтинг ще порожній - статистика гравців з'явиться після першого завантаження.", None
+        page = min(max(page, 1), pages)
+
+        user = self.user_db.get_user(telegram_id)
+        my_steam_id = user.steam_id if user else None
+
+        text = f"🏆 **Рейтинг гравців (Impact Score)**\n"
+        text += f"👥 Гравців: {meta['total_players']} | Сторінка {page}/{pages}\n\n"
+        for entry in entries:
+            emoji = "👑" if entry['position'] == 1 else f"#{entry['position']}"
+            me_indicator = " 👤" if entry['steam_id'] == my_steam_id else ""
+            text += f"{emoji} **{entry['name'] or 'Невідомо'}**{me_indicator}\n"
+            text += f"   ⚡ {entry['impact_score']}/100 | K/D: {entry['kd_ratio']} | Win: {entry['win_rate']}%\n"
+
+        if my_steam_id:
+            standing = self.global_leaderboard.get_standing(my_steam_id)
+            if standing and 'position' in standing:
+                text += f"\n📍 **Твоя позиція: #{standing['position']}**"
+            elif standing:
+                text += f"\n📍 **Ти у кращих {standing['top_percent']}% гравців**"
+
+        text += f"\n\n🕐 Оновлено: {meta['refreshed_at'].strftime('%d.%m %H:%M')}"
+
+        buttons = []
+        if page > 1:
+            buttons.append(InlineKeyboardButton("◀️", callback_data=f"leaderboard:{page - 1}"))
+        if page < pages:
+            buttons.append(InlineKeyboardButton("▶️", callback_data=f"leaderboard:{page + 1}"))
+        return text, InlineKeyboardMarkup([buttons]) if buttons else None
+
+    async def leaderboard_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обробник команди /leaderboard [СТОРІНКА]"""
+        page = 1
+        if context.args and context.args[0].isdigit():
+            page = int(context.args[0])
+
+        try:
+            text, reply_markup = await self._render_leaderboard_page(page, update.effective_user.id)
+            await update.message.reply_text(text, parse_mode='Markdown', reply_markup=reply_markup)
+        except Exception as e:
+            await update.message.reply_text(f"❌ Помилка: {str(e)}")
+
+    async def leaderboard_page_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Перемикання сторінок /leaderboard кнопками"""
+        query = update.callback_query
+        await query.answer()
+        try:
+            page = int(query.data.split(':', 1)[1])
+            text, reply_markup = await self._render_leaderboard_page(page, update.effective_user.id)
+            await query.edit_message_text(text, parse_mode='Markdown', reply_markup=reply_markup)
+        except Exception as e:
+            await query.edit_message_text(f"❌ Помилка: {str(e)}")
+
     async def compare_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обробник команди /compare"""
         user_id = update.effective_user.id
@@ -517,31 +580,23 @@ class BotHandlers:
         await update.message.reply_text("📊 Порівнюю статистику...")
         
         try:
-            # Отримуємо статистику обох гравців
-            my_raw_stats = await self.steam_api.get_player_stats(user.steam_id)
-            target_raw_stats = await self.steam_api.get_player_stats(target_steam_id)
-            
-            if not my_raw_stats or not target_raw_stats:
+            # Статистика обох гравців з бази (зі Steam - лише відсутні або застарілі)
+            await self.leaderboards.refresh(self.steam_api, [user.steam_id, target_steam_id])
+            players = self.leaderboards.get_players([user.steam_id, target_steam_id])
+
+            if user.steam_id not in players or target_steam_id not in players:
                 await update.message.reply_text("❌ Не вдалося отримати статистику одного з гравців!")
                 return
-            
-            my_stats = self.steam_api.parse_cs2_stats(my_raw_stats)
-            target_stats = self.steam_api.parse_cs2_stats(target_raw_stats)
-            
-            my_impact = self.steam_api.calculate_impact_score(my_stats)
-            target_impact = self.steam_api.calculate_impact_score(target_stats)
-            
-            # Отримуємо імена
-            players = await self.steam_api.get_player_summaries([user.steam_id, target_steam_id])
-            my_name = "Ти"
-            target_name = "Суперник"
-            
-            for player in players:
-                if player['steamid'] == user.steam_id:
-                    my_name = player.get('personaname', 'Ти')
-                elif player['steamid'] == target_steam_id:
-                    target_name = player.get('personaname', 'Суперник')
-            
+
+            my_stats = players[user.steam_id]['stats']
+            target_stats = players[target_steam_id]['stats']
+
+            my_impact = players[user.steam_id]['impact_score']
+            target_impact = players[target_steam_id]['impact_score']
+
+            my_name = players[user.steam_id]['name'] or "Ти"
+            target_name = players[target_steam_id]['name'] or "Суперник"
+
             # Формуємо порівняння
             def compare_stat(my_val, target_val, higher_better=True):
                 if my_val == target_val:
@@ -647,8 +702,11 @@ class BotHandlers:
         await update.message.reply_text("📊 Генерую щоденний звіт...")
         
         try:
+            # Один знімок статистики для обох звітів
+            snapshot = await self.daily_reports_service.build_snapshot([user])
+            
             # Генеруємо персональний звіт
-            personal_report = await self.daily_reports_service.generate_personal_daily_report(user)
+            personal_report = await self.daily_reports_service.generate_personal_daily_report(user, snapshot)
             if personal_report:
                 await update.message.reply_text(personal_report, parse_mode='Markdown')
             else:
@@ -657,7 +715,7 @@ class BotHandlers:
             
             # Генеруємо звіт по друзях якщо є
             if user.friends:
-                friends_report = await self.daily_reports_service.generate_friends_daily_report(user)
+                friends_report = await self.daily_reports_service.generate_friends_daily_report(user, snapshot)
                 if friends_report:
                     await update.message.reply_text(friends_report, parse_mode='Markdown')
             else:
@@ -671,7 +729,7 @@ class BotHandlers:
             await update.message.reply_text(f"❌ Помилка генерації звіту: {str(e)}")
 
     async def report_settings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обробник команди /report_settings"""
+        """Обробник команди /report_settings (перегляд та зміна часу щоденних звітів)"""
         user_id = update.effective_user.id
         user = self.user_db.get_user(user_id)
         
@@ -679,11 +737,43 @@ class BotHandlers:
             await update.message.reply_text("❌ Спочатку зареєструйся командою `/start`", parse_mode='Markdown')
             return
         
-        # TODO: В майбутньому можна додати налаштування часу звітів, вимкнення/увімкнення тощо
-        settings_text = """
+        schedule = self.daily_reports_service.schedule if self.daily_reports_service else ReportSchedule()
+        
+        if context.args:
+            if context.args[0].lower() == 'reset':
+                user.report_time = None
+                user.timezone = None
+            else:
+                report_time = schedule.parse_time(context.args[0])
+                if not report_time:
+                    await update.message.reply_text(
+                        "❌ Невірний формат часу! Використай `ГГ:ХХ`, наприклад: `/report_settings 09:30 Europe/Kyiv`",
+                        parse_mode='Markdown'
+                    )
+                    return
+                
+                if len(context.args) > 1 and not schedule.get_zone(context.args[1]):
+                    await update.message.reply_text(
+                        "❌ Невідомий часовий пояс! Приклади: `Europe/Kyiv`, `Europe/Warsaw`, `America/New_York`",
+                        parse_mode='Markdown'
+                    )
+                    return
+                
+                user.report_time = report_time.strftime('%H:%M')
+                if len(context.args) > 1:
+                    user.timezone = context.args[1]
+            
+            self.user_db.update_user(user)
+            await update.message.reply_text(
+                f"✅ Щоденні звіти приходитимуть о `{schedule.describe(user)}`",
+                parse_mode='Markdown'
+            )
+            return
+        
+        settings_text = f"""
 📅 **Налаштування щоденних звітів**
 
-🕙 **Час відправки:** 10:00 щоранку
+🕙 **Час відправки:** `{schedule.describe(user)}` щоранку
 📊 **Персональний звіт:** ✅ Увімкнено
 🏆 **Звіт по друзях:** ✅ Увімкнено (якщо є друзі)
 
@@ -698,15 +788,19 @@ class BotHandlers:
 • Статистика групи
 • Лідер дня
 
+⚙️ **Змінити час:**
+• `/report_settings 09:30` - свій час
+• `/report_settings 09:30 Europe/Warsaw` - час і часовий пояс
+• `/report_settings reset` - час за замовчуванням
+
 💡 **Корисно знати:**
-• Звіти відправляються автоматично щоранку
+• Звіт приходить протягом {schedule.stagger_minutes} хвилин після вказаного часу
 • Можеш отримати звіт зараз командою `/daily_report`
+• Щонеділі о 12:00 приходять тижневі підсумки: зміна K/D, win rate та Impact Score, найкращий матч тижня
 • Додавай друзів щоб змагатися в групі!
 
 🔮 **Скоро буде доступно:**
-• Налаштування часу відправки
 • Вимкнення окремих типів звітів
-• Тижневі підсумки
 • Сповіщення про досягнення друзів
 """
         
@@ -1400,55 +1494,47 @@ Linux: ~/.steam/steam/steamapps/common/Counter-Strike Global Offensive/csgo/repl
             await update.message.reply_text(
                 "❌ Вкажи ID матчу для аналізу!\n\n"
                 "📝 **Приклад:**\n"
-                "`/demo_analysis match_12345`\n\n"
+                "`/demo_analysis match_12345`\n"
+                "`/demo_analysis match_12345 https://host/demos/match_12345.dem.bz2`\n\n"
                 "💡 **Як отримати ID матчу:**\n"
                 "• З Steam Client після матчу\n"
-                "• З профілю Steam в розділі матчів",
+                "• З профілю Steam в розділі матчів\n\n"
+                "ℹ️ Власний аналізатор бота розбирає лише демо CS:GO; демо CS2 аналізує CSGO Demo Manager",
                 parse_mode='Markdown'
             )
             return
         
         match_id = context.args[0]
-        
-        await update.message.reply_text(f"🎮 Аналізую демо матчу {match_id}...")
+        # Необов'язкова адреса демо, якщо його немає в папках Steam
+        demo_url = context.args[1] if len(context.args) > 1 else None
+        if demo_url and not demo_url.startswith(('http://', 'https://')):
+            await update.message.reply_text("❌ Адреса демо має починатися з http:// або https://")
+            return
         
         try:
-            # Імпортуємо DemoAnalyzer
-            from src.services.demo_analyzer import DemoAnalyzer
-            demo_analyzer = DemoAnalyzer(self.steam_api.api_key)
-            
-            # Завантажуємо демо
-            demo_path = await demo_analyzer.download_demo(user.steam_id, match_id)
-            if not demo_path:
-                await update.message.reply_text("❌ Не вдалося завантажити демо-файл!")
+            # Готовий аналіз поточної версії аналізатора надсилаємо одразу, без повторного аналізу
+            stored = self.user_db.get_match_analysis(user.steam_id, match_id)
+            if (stored and stored.analyzed and self.demo_analyzer and
+                    stored.analysis_data.get('analyzer_version') == self.demo_analyzer.ANALYZER_VERSION):
+                detailed_report = await self.demo_analyzer.get_analysis_summary(stored.analysis_data)
+                await update.message.reply_text(f"📊 **Детальний аналіз матчу {match_id}:**\n\n{detailed_report}",
+                                                parse_mode='Markdown')
                 return
-            
-            # Аналізуємо демо
-            analysis_result = await demo_analyzer.analyze_demo(demo_path, user.steam_id, match_id)
-            if not analysis_result:
-                await update.message.reply_text("❌ Помилка аналізу демо!")
+
+            # Аналіз виконують воркери черги, результат прийде окремим повідомленням
+            job_id = self.demo_job_queue.enqueue(match_id, user.steam_id, [user_id], priority=PRIORITY_MANUAL,
+                                                 demo_url=demo_url)
+            if not job_id:
+                await update.message.reply_text("❌ Не вдалося додати матч в чергу аналізу!")
                 return
             
-            # Зберігаємо аналіз в базі даних
-            from src.models.user import MatchAnalysis
-            match_analysis = MatchAnalysis(
-                steam_id=user.steam_id,
-                match_id=match_id,
-                match_date=datetime.now(),
-                demo_path=demo_path
+            queue_stats = self.demo_job_queue.get_stats()
+            await update.message.reply_text(
+                f"🎮 Матч {match_id} додано в чергу аналізу\n"
+                f"⏳ Завдань у черзі: {queue_stats.get('pending', 0) + queue_stats.get('running', 0)}\n\n"
+                f"📊 Детальний звіт прийде окремим повідомленням\n"
+                f"ℹ️ Демо CS2 аналізує CSGO Demo Manager (власний аналізатор бота розбирає лише демо CS:GO)"
             )
-            match_analysis.analyzed = True
-            match_analysis.analysis_data = analysis_result
-            
-            self.user_db.save_match_analysis(match_analysis)
-            
-            # Створюємо звіт
-            summary = await demo_analyzer.get_analysis_summary(analysis_result)
-            
-            # Видаляємо демо-файл
-            await demo_analyzer.cleanup_demo(demo_path)
-            
-            await update.message.reply_text(summary, parse_mode='Markdown')
             
         except Exception as e:
             await update.message.reply_text(f"❌ Помилка: {str(e)}")
@@ -1553,46 +1639,17 @@ Linux: ~/.steam/steam/steamapps/common/Counter-Strike Global Offensive/csgo/repl
                 )
                 return
             
-            # Розраховуємо загальну статистику
-            total_kills = 0
-            total_deaths = 0
-            total_mvps = 0
-            total_headshots = 0
-            total_damage = 0
-            total_rounds = 0
-            total_wins = 0
-            weapon_stats = {}
-            map_stats = {}
-            
-            for match in analyzed_matches:
-                analysis = match.analysis_data
-                
-                if 'player_stats' in analysis:
-                    stats = analysis['player_stats']
-                    total_kills += stats.get('kills', 0)
-                    total_deaths += stats.get('deaths', 0)
-                    total_mvps += stats.get('mvps', 0)
-                    total_headshots += stats.get('headshots', 0)
-                    total_damage += stats.get('damage_dealt', 0)
-                
-                if 'match_info' in analysis:
-                    match_info = analysis['match_info']
-                    total_rounds += match_info.get('rounds_played', 0)
-                    total_wins += match_info.get('rounds_won', 0)
-                    
-                    map_name = match_info.get('map', 'Невідомо')
-                    if map_name not in map_stats:
-                        map_stats[map_name] = {'rounds': 0, 'wins': 0}
-                    map_stats[map_name]['rounds'] += match_info.get('rounds_played', 0)
-                    map_stats[map_name]['wins'] += match_info.get('rounds_won', 0)
-                
-                if 'weapon_stats' in analysis:
-                    for weapon, stats in analysis['weapon_stats'].items():
-                        if weapon not in weapon_stats:
-                            weapon_stats[weapon] = {'kills': 0, 'accuracy': 0, 'count': 0}
-                        weapon_stats[weapon]['kills'] += stats.get('kills', 0)
-                        weapon_stats[weapon]['accuracy'] += stats.get('accuracy', 0)
-                        weapon_stats[weapon]['count'] += 1
+            # Розраховуємо загальну статистику (векторно, з групуванням за картами та зброєю)
+            summary = summarize_analyses([match.analysis_data for match in analyzed_matches])
+            total_kills = summary['kills']
+            total_deaths = summary['deaths']
+            total_mvps = summary['mvps']
+            total_headshots = summary['headshots']
+            total_damage = summary['damage']
+            total_rounds = summary['rounds']
+            total_wins = summary['wins']
+            weapon_stats = summary['weapons']
+            map_stats = summary['maps']
             
             # Розраховуємо середні показники
             matches_count = len(analyzed_matches)
@@ -1693,8 +1750,50 @@ Linux: ~/.steam/steam/steamapps/common/Counter-Strike Global Offensive/csgo/repl
             f"🎮 Steam ID: `{user.steam_id}`\n"
             f"⏰ Перевірка кожні 5 хвилин\n"
             f"📱 Повідомлення: {'Так' if getattr(user, 'monitoring_enabled', False) else 'Ні'}\n"
-            f"🎬 Аналіз демо: {'Так' if getattr(user, 'monitoring_enabled', False) else 'Ні'}\n\n"
+            f"🎬 Аналіз демо: {'Так' if getattr(user, 'monitoring_enabled', False) else 'Ні'}\n"
+            f"📦 Дайджест: {f'вікно {user.notification_window} хв' if user.notification_window else 'вимкнено'}\n\n"
             f"💡 Команди:\n"
             f"• `/enable_monitoring` - увімкнути\n"
-            f"• `/disable_monitoring` - вимкнути"
+            f"• `/disable_monitoring` - вимкнути\n"
+            f"• `/notification_window 30` - дайджест матчів за 30 хвилин"
         )
+    
+    async def notification_window_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обробник команди /notification_window для налаштування дайджесту матчів"""
+        user_id = update.effective_user.id
+        user = self.user_db.get_user(user_id)
+        
+        if not user or not user.steam_id:
+            await update.message.reply_text("❌ Спочатку увійдіть через Steam: /steam_login")
+            return
+        
+        if not context.args:
+            await update.message.reply_text(
+                f"📦 **Дайджест матчів:** {f'вікно {user.notification_window} хв' if user.notification_window else 'вимкнено'}\n\n"
+                f"Матчі, зіграні поспіль протягом вікна, приходять одним повідомленням.\n\n"
+                f"💡 Використання: `/notification_window <ХВИЛИНИ>` (0-{self.MAX_NOTIFICATION_WINDOW}, 0 - вимкнути)",
+                parse_mode='Markdown'
+            )
+            return
+        
+        try:
+            minutes = int(context.args[0])
+        except ValueError:
+            await update.message.reply_text("❌ Вкажіть кількість хвилин числом, наприклад: `/notification_window 30`", parse_mode='Markdown')
+            return
+        
+        if not 0 <= minutes <= self.MAX_NOTIFICATION_WINDOW:
+            await update.message.reply_text(f"❌ Вікно має бути від 0 до {self.MAX_NOTIFICATION_WINDOW} хвилин")
+            return
+        
+        user.notification_window = minutes
+        self.user_db.update_user(user)
+        
+        if minutes:
+            await update.message.reply_text(
+                f"✅ **Дайджест увімкнено!**\n\n"
+                f"📦 Матчі, зіграні протягом {minutes} хв після першого, прийдуть одним повідомленням",
+                parse_mode='Markdown'
+            )
+        else:
+            await update.message.reply_text("✅ Дайджест вимкнено, повідомлення приходитимуть після кожного матчу")
@@ -8,11 +8,15 @@ from typing import Optional, Dict, Any, List
 
 
 class User:
-    def __init__(self, telegram_id: int, steam_id: str = None, username: str = None, monitoring_enabled: bool = False):
+    def __init__(self, telegram_id: int, steam_id: str = None, username: str = None, monitoring_enabled: bool = False,
+                 notification_window: int = 0, report_time: str = None, timezone: str = None):
         self.telegram_id = telegram_id
         self.steam_id = steam_id
         self.username = username
         self.monitoring_enabled = monitoring_enabled
+        self.notification_window = notification_window  # Хвилини об'єднання сповіщень (0 - одразу)
+        self.report_time = report_time  # Локальний час щоденного звіту "HH:MM" (None - час за замовчуванням)
+        self.timezone = timezone  # Часовий пояс IANA, наприклад "Europe/Kyiv" (None - за замовчуванням)
         self.created_at = datetime.now()
         self.friends = []
     
@@ -22,6 +26,9 @@ class User:
             'steam_id': self.steam_id,
             'username': self.username,
             'monitoring_enabled': self.monitoring_enabled,
+            'notification_window': self.notification_window,
+            'report_time': self.report_time,
+            'timezone': self.timezone,
             'created_at': self.created_at.isoformat(),
             'friends': self.friends
         }
@@ -32,7 +39,10 @@ class User:
             telegram_id=data['telegram_id'],
             steam_id=data.get('steam_id'),
             username=data.get('username'),
-            monitoring_enabled=data.get('monitoring_enabled', False)
+            monitoring_enabled=data.get('monitoring_enabled', False),
+            notification_window=data.get('notification_window', 0),
+            report_time=data.get('report_time'),
+            timezone=data.get('timezone')
         )
         user.created_at = datetime.fromisoformat(data['created_at'])
         user.friends = data.get('friends', [])
@@ -76,6 +86,9 @@ class MatchAnalysis:
 
 
 class UserDatabase:
+    USER_COLUMNS = ('telegram_id, steam_id, username, monitoring_enabled, created_at, friends, notification_window, '
+                    'report_time, timezone')
+    
     def __init__(self, db_path: str):
         self.db_path = db_path
         self.init_database()
@@ -104,6 +117,12 @@ class UserDatabase:
                 # Колонка вже існує
                 pass
             
+            for column in ('notification_window INTEGER DEFAULT 0', 'report_time TEXT', 'timezone TEXT'):
+                try:
+                    cursor.execute(f'ALTER TABLE users ADD COLUMN {column}')
+                except sqlite3.OperationalError:
+                    pass
+            
             # Таблиця аналізу матчів
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS match_analysis (
@@ -134,23 +153,51 @@ class UserDatabase:
                 )
             ''')
             
+            # Останній відомий матч кожного гравця (спільний для всіх процесів моніторингу)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS monitor_state (
+                    steam_id TEXT PRIMARY KEY,
+                    last_match_id TEXT,
+                    updated_at TEXT
+                )
+            ''')
+            
             conn.commit()
     
+    def _row_to_user(self, row) -> User:
+        """Створити користувача з рядка таблиці users (порядок колонок - USER_COLUMNS)"""
+        user = User(
+            telegram_id=row[0],
+            steam_id=row[1],
+            username=row[2],
+            monitoring_enabled=bool(row[3]),
+            notification_window=row[6] or 0,
+            report_time=row[7],
+            timezone=row[8]
+        )
+        user.created_at = datetime.fromisoformat(row[4])
+        user.friends = json.loads(row[5]) if row[5] else []
+        return user
+    
     def create_user(self, user: User) -> bool:
         """Створити нового користувача"""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    INSERT OR REPLACE INTO users (telegram_id, steam_id, username, monitoring_enabled, created_at, friends)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    INSERT OR REPLACE INTO users (telegram_id, steam_id, username, monitoring_enabled, created_at, friends,
+                                                  notification_window, report_time, timezone)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     user.telegram_id,
                     user.steam_id,
                     user.username,
                     user.monitoring_enabled,
                     user.created_at.isoformat(),
-                    json.dumps(user.friends)
+                    json.dumps(user.friends),
+                    user.notification_window,
+                    user.report_time,
+                    user.timezone
                 ))
                 conn.commit()
                 return True
@@ -163,22 +210,14 @@ class UserDatabase:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT telegram_id, steam_id, username, monitoring_enabled, created_at, friends
+                cursor.execute(f'''
+                    SELECT {self.USER_COLUMNS}
                     FROM users WHERE telegram_id = ?
                 ''', (telegram_id,))
                 
                 row = cursor.fetchone()
                 if row:
-                    user = User(
-                        telegram_id=row[0],
-                        steam_id=row[1],
-                        username=row[2],
-                        monitoring_enabled=bool(row[3])
-                    )
-                    user.created_at = datetime.fromisoformat(row[4])
-                    user.friends = json.loads(row[5]) if row[5] else []
-                    return user
+                    return self._row_to_user(row)
                 return None
         except Exception as e:
             print(f"Помилка отримання користувача: {e}")
@@ -204,13 +243,17 @@ class UserDatabase:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
-                    UPDATE users SET steam_id = ?, username = ?, monitoring_enabled = ?, friends = ?
+                    UPDATE users SET steam_id = ?, username = ?, monitoring_enabled = ?, friends = ?, notification_window = ?,
+                                     report_time = ?, timezone = ?
                     WHERE telegram_id = ?
                 ''', (
                     user.steam_id,
                     user.username,
                     user.monitoring_enabled,
                     json.dumps(user.friends),
+                    user.notification_window,
+                    user.report_time,
+                    user.timezone,
                     user.telegram_id
                 ))
                 conn.commit()
@@ -273,55 +316,93 @@ class UserDatabase:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT telegram_id, steam_id, username, monitoring_enabled, created_at, friends
+                cursor.execute(f'''
+                    SELECT {self.USER_COLUMNS}
                     FROM users
                 ''')
                 
-                users = []
-                for row in cursor.fetchall():
-                    user = User(
-                        telegram_id=row[0],
-                        steam_id=row[1],
-                        username=row[2],
-                        monitoring_enabled=bool(row[3])
-                    )
-                    user.created_at = datetime.fromisoformat(row[4])
-                    user.friends = json.loads(row[5]) if row[5] else []
-                    users.append(user)
-                
-                return users
+                return [self._row_to_user(row) for row in cursor.fetchall()]
         except Exception as e:
             print(f"Помилка отримання всіх користувачів: {e}")
             return []
     
+    def get_all_users_with_steam(self) -> List[User]:
+        """Отримати всіх користувачів з прив'язаним Steam акаунтом"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT {self.USER_COLUMNS}
+                    FROM users WHERE steam_id IS NOT NULL AND steam_id != ''
+                ''')
+                
+                return [self._row_to_user(row) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Помилка отримання користувачів зі Steam: {e}")
+            return []
+    
+    def get_users_by_steam_ids(self, steam_ids: List[str]) -> List[User]:
+        """Отримати користувачів, прив'язаних до будь-якого з Steam ID"""
+        if not steam_ids:
+            return []
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                placeholders = ','.join('?' * len(steam_ids))
+                cursor.execute(f'''
+                    SELECT {self.USER_COLUMNS}
+                    FROM users WHERE steam_id IN ({placeholders})
+                ''', list(steam_ids))
+
+                return [self._row_to_user(row) for row in cursor.fetchall()]
+        except Exception as e:
+            print(f"Помилка отримання користувачів за Steam ID: {e}")
+            return []
+
     def get_users_with_monitoring(self) -> List[User]:
         """Отримати користувачів з увімкненим моніторингом"""
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT telegram_id, steam_id, username, monitoring_enabled, created_at, friends
+                cursor.execute(f'''
+                    SELECT {self.USER_COLUMNS}
                     FROM users WHERE monitoring_enabled = TRUE AND steam_id IS NOT NULL
                 ''')
                 
-                users = []
-                for row in cursor.fetchall():
-                    user = User(
-                        telegram_id=row[0],
-                        steam_id=row[1],
-                        username=row[2],
-                        monitoring_enabled=bool(row[3])
-                    )
-                    user.created_at = datetime.fromisoformat(row[4])
-                    user.friends = json.loads(row[5]) if row[5] else []
-                    users.append(user)
-                
-                return users
+                return [self._row_to_user(row) for row in cursor.fetchall()]
         except Exception as e:
             print(f"Помилка отримання користувачів з моніторингом: {e}")
             return []
     
+    def get_last_seen_match(self, steam_id: str) -> Optional[str]:
+        """Отримати останній відомий матч гравця"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT last_match_id FROM monitor_state WHERE steam_id = ?
+                ''', (steam_id,))
+                row = cursor.fetchone()
+                return row[0] if row else None
+        except Exception as e:
+            print(f"Помилка отримання останнього матчу: {e}")
+            return None
+    
+    def set_last_seen_match(self, steam_id: str, match_id: str) -> bool:
+        """Зберегти останній відомий матч гравця"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO monitor_state (steam_id, last_match_id, updated_at)
+                    VALUES (?, ?, ?)
+                ''', (steam_id, match_id, datetime.now().isoformat()))
+                conn.commit()
+                return True
+        except Exception as e:
+            print(f"Помилка збереження останнього матчу: {e}")
+            return False
+    
     # Методи для роботи з аналізом матчів
     def save_match_analysis(self, match: MatchAnalysis) -> bool:
         """Зберегти аналіз матчу"""
@@ -359,12 +440,16 @@ class UserDatabase:
                 
                 row = cursor.fetchone()
                 if row:
-                    return MatchAnalysis(
+                    match = MatchAnalysis(
                         steam_id=row[0],
                         match_id=row[1],
                         match_date=datetime.fromisoformat(row[2]),
                         demo_path=row[3]
                     )
+                    match.analyzed = bool(row[4])
+                    match.analysis_data = json.loads(row[5]) if row[5] else {}
+                    match.created_at = datetime.fromisoformat(row[6])
+                    return match
                 return None
         except Exception as e:
             print(f"Помилка отримання аналізу матчу: {e}")
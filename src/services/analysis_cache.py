@@ -0,0 +1,191 @@
+"""
+Кеш результатів аналізу демо за вмістом файлу
+"""
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+from src.services.demo_parser import detect_compression, open_decompressor, DemoParseError, DECOMPRESSION_ERRORS
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_stream(stream) -> str:
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 вмісту файлу (читається частинами, без завантаження в пам'ять)"""
+    with open(path, 'rb') as f:
+        return _hash_stream(f)
+
+
+def demo_content_hash(path: str) -> str:
+    """
+    SHA-256 розпакованого вмісту демо - ключ кешу аналізів
+
+    Не залежить від того, як демо збережене: `.dem`, `.dem.gz` (заголовок gzip
+    містить час стиснення) чи `.dem.bz2` того ж матчу дають однаковий хеш.
+
+    Raises:
+        DemoParseError: стиснений файл пошкоджений
+    """
+    compression = detect_compression(path)
+    try:
+        with open(path, 'rb') as f:
+            return _hash_stream(open_decompressor(f, compression) if compression else f)
+    except DECOMPRESSION_ERRORS as e:
+        raise DemoParseError(f"Пошкоджене демо: {e}") from e
+
+
+class AnalysisCache:
+    """
+    Аналізи матчів у SQLite за ключем (SHA-256 демо, версія аналізатора)
+
+    Однакове демо повторно не розбирається, навіть якщо його завантажили знову
+    або запросили під іншим match_id. Записи інвалідуються лише зміною версії
+    аналізатора: при створенні кешу записи інших версій видаляються. Попадання,
+    промахи та інвалідації рахуються в `demo_analysis_cache_stats`.
+    """
+
+    def __init__(self, db_path: str, analyzer_version: str):
+        self.db_path = db_path
+        self.analyzer_version = analyzer_version
+        self.init_database()
+        self.invalidate_other_versions()
+
+    # Скільки чекати на блокування бази при оновленні лічильників (вони не критичні)
+    STATS_TIMEOUT = 0.5
+
+    def _connect(self, timeout: float = 30) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=timeout, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиць кешу"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS demo_analysis_cache (
+                    content_hash TEXT NOT NULL,
+                    analyzer_version TEXT NOT NULL,
+                    match_id TEXT,
+                    result TEXT NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    last_hit_at TEXT,
+                    PRIMARY KEY (content_hash, analyzer_version)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS demo_analysis_cache_stats (
+                    stat TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, stat: str, amount: int = 1):
+        conn.execute('''
+            INSERT INTO demo_analysis_cache_stats (stat, value) VALUES (?, ?)
+            ON CONFLICT(stat) DO UPDATE SET value = value + excluded.value
+        ''', (stat, amount))
+
+    def invalidate_other_versions(self) -> int:
+        """
+        Видалити результати інших версій аналізатора
+
+        Returns:
+            Кількість видалених записів
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            deleted = conn.execute('DELETE FROM demo_analysis_cache WHERE analyzer_version != ?',
+                                   (self.analyzer_version,)).rowcount
+            if deleted:
+                self._count(conn, 'invalidated', deleted)
+            conn.execute('COMMIT')
+            return deleted
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка інвалідації кешу аналізів: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def get(self, demo_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Збережений аналіз демо поточної версії (None - промах)
+
+        Читання не бере блокування запису; лічильники попадань оновлюються
+        окремо і пропускаються, якщо база зайнята. Виклик блокуючий - з event
+        loop його слід запускати через `run_in_executor`.
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT result FROM demo_analysis_cache WHERE content_hash = ? AND analyzer_version = ?
+            ''', (demo_hash, self.analyzer_version)).fetchone()
+        except Exception as e:
+            print(f"❌ Помилка читання кешу аналізів: {e}")
+            return None
+        finally:
+            conn.close()
+        self._record_lookup(demo_hash, row is not None)
+        return json.loads(row['result']) if row else None
+
+    def _record_lookup(self, demo_hash: str, hit: bool):
+        """Врахувати попадання чи промах (без очікування на зайняту базу)"""
+        conn = self._connect(self.STATS_TIMEOUT)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if hit:
+                conn.execute('''
+                    UPDATE demo_analysis_cache SET hits = hits + 1, last_hit_at = ?
+                    WHERE content_hash = ? AND analyzer_version = ?
+                ''', (datetime.now().isoformat(), demo_hash, self.analyzer_version))
+            self._count(conn, 'hits' if hit else 'misses')
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        finally:
+            conn.close()
+
+    def put(self, demo_hash: str, match_id: str, result: Dict[str, Any]) -> bool:
+        """Зберегти аналіз демо"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO demo_analysis_cache (content_hash, analyzer_version, match_id, result, hits, created_at)
+                VALUES (?, ?, ?, ?, 0, ?)
+            ''', (demo_hash, self.analyzer_version, match_id, json.dumps(result, ensure_ascii=False),
+                  datetime.now().isoformat()))
+            return True
+        except Exception as e:
+            print(f"❌ Помилка збереження аналізу в кеш: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Кількість записів, попадань, промахів та інвалідацій"""
+        conn = self._connect()
+        try:
+            stats = {'entries': 0, 'hits': 0, 'misses': 0, 'invalidated': 0}
+            stats['entries'] = conn.execute('SELECT COUNT(*) FROM demo_analysis_cache').fetchone()[0]
+            for row in conn.execute('SELECT stat, value FROM demo_analysis_cache_stats'):
+                stats[row['stat']] = row['value']
+            return stats
+        finally:
+            conn.close()
@@ -2,38 +2,67 @@
 Сервіс для автоматичних щоденних звітів
 """
 import asyncio
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+import time
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 
 from ..models.user import UserDatabase, User
 from ..services.steam_api import SteamAPI
+from ..services.outbox import MessageOutbox
+from ..services.stats_snapshot import PlayerStatsSnapshot
+from ..services.report_runs import ReportRunStore
+from ..services.report_schedule import ReportSchedule
+from ..services.weekly_stats import WeeklyStatsStore
+from ..services.rank_snapshots import RankSnapshotStore
+from ..services.leaderboards import LeaderboardStore
 
 
 class DailyReportsService:
-    def __init__(self, user_db: UserDatabase, steam_api: SteamAPI, bot):
+    def __init__(self, user_db: UserDatabase, steam_api: SteamAPI, bot, outbox: MessageOutbox = None,
+                 fetch_concurrency: int = 8, schedule: ReportSchedule = None):
         self.user_db = user_db
         self.steam_api = steam_api
         self.bot = bot
+        self.outbox = outbox or MessageOutbox(user_db.db_path)
+        self.fetch_concurrency = fetch_concurrency
+        self.delivery_poll_interval = 5.0
+        self.enqueue_batch_size = 500
+        self.report_runs = ReportRunStore(user_db.db_path)
+        self.schedule = schedule or ReportSchedule()
+        self.weekly_stats = WeeklyStatsStore(user_db.db_path)
+        self.rank_snapshots = RankSnapshotStore(user_db.db_path)
+        self.leaderboards = LeaderboardStore(user_db.db_path)
+        self._run_lock = asyncio.Lock()
+        self._delivery_tasks = set()
         self.logger = logging.getLogger(__name__)
 
-    async def generate_personal_daily_report(self, user: User) -> Optional[str]:
+    async def build_snapshot(self, users: List[User]) -> PlayerStatsSnapshot:
+        """Завантажити статистику всіх користувачів та їхніх друзів одним проходом"""
+        steam_ids = PlayerStatsSnapshot.collect_steam_ids(users)
+        snapshot = await PlayerStatsSnapshot.build(self.steam_api, steam_ids, self.fetch_concurrency)
+        # Кожен знімок оновлює тижневі агрегати, тож тижневий підсумок не звертається до Steam
+        self.weekly_stats.record_snapshot(snapshot)
+        # і рейтинги груп друзів, які читають /friends_stats та звіт по друзях
+        self.leaderboards.record_snapshot(snapshot)
+        return snapshot
+
+    async def generate_personal_daily_report(self, user: User, snapshot: PlayerStatsSnapshot = None) -> Optional[str]:
         """Генерувати персональний щоденний звіт для користувача"""
         try:
             if not user.steam_id:
                 return None
 
-            # Отримуємо поточну статистику
-            current_stats = await self.steam_api.get_player_stats(user.steam_id)
-            if not current_stats:
-                return None
+            # Без готового знімка (наприклад, для /daily_report) завантажуємо лише цього гравця
+            if snapshot is None:
+                snapshot = await PlayerStatsSnapshot.build(self.steam_api, [user.steam_id])
 
-            parsed_stats = self.steam_api.parse_cs2_stats(current_stats)
-            impact_score = self.steam_api.calculate_impact_score(parsed_stats)
+            parsed_stats = snapshot.get_stats(user.steam_id)
+            if not parsed_stats:
+                return None
 
-            # Отримуємо ім'я гравця
-            players = await self.steam_api.get_player_summaries([user.steam_id])
-            player_name = players[0].get('personaname', 'Гравець') if players else 'Гравець'
+            impact_score = snapshot.get_impact_score(user.steam_id)
+            player_name = snapshot.get_name(user.steam_id, 'Гравець')
 
             # TODO: В майбутньому можна додати порівняння з вчорашньою статистикою
             # Поки що показуємо поточний стан
@@ -64,43 +93,39 @@ class DailyReportsService:
             self.logger.error(f"Помилка генерації персонального звіту для {user.telegram_id}: {e}")
             return None
 
-    async def generate_friends_daily_report(self, user: User) -> Optional[str]:
-        """Генерувати щоденний звіт по друзях"""
+    async def generate_friends_daily_report(self, user: User, snapshot: PlayerStatsSnapshot = None,
+                                            report_day: date = None) -> Optional[str]:
+        """
+        Генерувати щоденний звіт по друзях
+
+        Args:
+            report_day: Локальний день запланованої розсилки - лише тоді рейтинг
+                зберігається як знімок дня; ручні та тестові звіти його лише читають
+        """
         try:
             if not user.steam_id or not user.friends:
                 return None
 
-            # Отримуємо статистику для всіх друзів + користувача
+            # Рейтинг групи (друзі + користувач) вже відсортований у базі; знімок,
+            # отриманий через build_snapshot, його оновив
             all_steam_ids = [user.steam_id] + user.friends
-            friends_data = []
-
-            for steam_id in all_steam_ids:
-                raw_stats = await self.steam_api.get_player_stats(steam_id)
-                if raw_stats:
-                    stats = self.steam_api.parse_cs2_stats(raw_stats)
-                    impact_score = self.steam_api.calculate_impact_score(stats)
-                    
-                    # Отримуємо ім'я
-                    players = await self.steam_api.get_player_summaries([steam_id])
-                    name = players[0].get('personaname', 'Невідомо') if players else 'Невідомо'
-                    
-                    friends_data.append({
-                        'steam_id': steam_id,
-                        'name': name,
-                        'impact_score': impact_score,
-                        'kd_ratio': stats['kd_ratio'],
-                        'win_rate': stats['win_rate'],
-                        'is_me': steam_id == user.steam_id
-                    })
+            if snapshot is None:
+                await self.leaderboards.refresh(self.steam_api, all_steam_ids)
 
+            friends_data = self.leaderboards.get_leaderboard(all_steam_ids)
             if not friends_data:
                 return None
 
-            # Сортуємо за Impact Score
-            friends_data.sort(key=lambda x: x['impact_score'], reverse=True)
+            for friend in friends_data:
+                friend['is_me'] = friend['steam_id'] == user.steam_id
 
             # Знаходимо позицію користувача
             user_position = next((i+1 for i, friend in enumerate(friends_data) if friend['is_me']), 0)
+
+            # Зміни позицій відносно попереднього знімка рейтингу групи
+            previous_day, changes = self._track_rank_changes(
+                user, [friend['steam_id'] for friend in friends_data], report_day
+            )
             
             report = f"""
 🏆 **Щоденний рейтинг друзів**
@@ -108,19 +133,22 @@ class DailyReportsService:
 
 📊 **Топ-{min(5, len(friends_data))} гравців:**
 """
+            if previous_day:
+                report += f"↕️ Зміни позицій з {previous_day.strftime('%d.%m')}\n"
 
             # Показуємо топ-5 або всіх якщо менше
             for i, friend in enumerate(friends_data[:5], 1):
                 emoji = "👑" if i == 1 else f"{i}️⃣"
                 me_indicator = " 👤" if friend['is_me'] else ""
+                change = self._format_rank_change(changes, friend['steam_id'])
                 
-                report += f"\n{emoji} **{friend['name']}**{me_indicator}"
+                report += f"\n{emoji} **{friend['name']}**{me_indicator}{change}"
                 report += f"\n   ⚡ Impact: {friend['impact_score']}/100 | K/D: {friend['kd_ratio']} | Win: {friend['win_rate']}%"
 
             # Додаємо інформацію про позицію користувача
             if user_position > 5:
                 user_data = next(friend for friend in friends_data if friend['is_me'])
-                report += f"\n\n📍 **Твоя позиція: #{user_position}**"
+                report += f"\n\n📍 **Твоя позиція: #{user_position}**{self._format_rank_change(changes, user.steam_id)}"
                 report += f"\n⚡ Impact: {user_data['impact_score']}/100"
 
             # Додаємо статистику змін
@@ -143,6 +171,42 @@ class DailyReportsService:
             self.logger.error(f"Помилка генерації звіту по друзях для {user.telegram_id}: {e}")
             return None
 
+    def _local_day(self, user: User) -> date:
+        """Поточний день у часовому поясі користувача"""
+        return datetime.now(self.schedule.get_user_zone(user)).date()
+
+    def _track_rank_changes(self, user: User, ranking: List[str],
+                            report_day: date = None) -> Tuple[Optional[date], Dict[str, Optional[int]]]:
+        """
+        Порівняти рейтинг групи користувача з попереднім знімком
+
+        Знімок зберігається лише із запланованої розсилки (`report_day` - локальний
+        день звіту користувача); без нього рейтинг порівнюється зі знімком до
+        поточного локального дня без запису.
+
+        Returns:
+            День попереднього знімка (None, якщо його немає) та зміни позицій
+        """
+        try:
+            group_key = RankSnapshotStore.group_key([user.steam_id] + user.friends)
+            previous = self.rank_snapshots.get_previous(group_key, report_day or self._local_day(user))
+            if report_day:
+                self.rank_snapshots.save(group_key, ranking, report_day)
+            if not previous:
+                return None, {}
+            previous_day, previous_ranking = previous
+            return previous_day, RankSnapshotStore.rank_changes(previous_ranking, ranking)
+        except Exception as e:
+            self.logger.error(f"Помилка знімка рейтингу для {user.telegram_id}: {e}")
+            return None, {}
+
+    @staticmethod
+    def _format_rank_change(changes: Dict[str, Optional[int]], steam_id: str) -> str:
+        if not changes:
+            return ""
+        mark = RankSnapshotStore.format_change(changes.get(steam_id))
+        return f" {mark}" if mark else ""
+
     def _get_daily_tip(self, stats: Dict[str, Any]) -> str:
         """Отримати пораду дня на основі статистики"""
         tips = []
@@ -181,56 +245,352 @@ class DailyReportsService:
             import random
             return random.choice(general_tips)
 
-    async def send_daily_reports_to_all_users(self):
-        """Відправити щоденні звіти всім активним користувачам"""
-        users = self.user_db.get_all_users_with_steam()
-        self.logger.info(f"Відправляю щоденні звіти для {len(users)} користувачів")
+    async def render_user_reports(self, user: User, snapshot: PlayerStatsSnapshot,
+                                  report_day: date = None) -> List[Tuple[int, str, str]]:
+        """Сформувати всі щоденні повідомлення користувача зі знімка (`report_day` - день розсилки)"""
+        messages = []
         
-        reports_sent = 0
-        errors = 0
+        # Генеруємо персональний звіт
+        personal_report = await self.generate_personal_daily_report(user, snapshot)
+        if personal_report:
+            messages.append((user.telegram_id, personal_report, 'Markdown'))
         
+        # Генеруємо звіт по друзях (якщо є друзі)
+        if user.friends:
+            friends_report = await self.generate_friends_daily_report(user, snapshot, report_day)
+            if friends_report:
+                messages.append((user.telegram_id, friends_report, 'Markdown'))
+        
+        return messages
+
+    async def render_reports(self, users: List[User], snapshot: PlayerStatsSnapshot,
+                             report_days: Dict[int, date] = None) -> Dict[int, List[Tuple[int, str, str]]]:
+        """
+        Сформувати звіти всіх користувачів
+        
+        Формування - робота CPU з даними знімка, без мережевих запитів, тому
+        звіти формуються по черзі в одному циклі; після кожного користувача
+        керування віддається event loop, щоб бот відповідав під час розсилки.
+        
+        Args:
+            report_days: telegram_id -> локальний день розсилки (для знімків рейтингу)
+        
+        Returns:
+            Повідомлення кожного користувача (порожній список - звіт не сформовано)
+        """
+        rendered: Dict[int, List[Tuple[int, str, str]]] = {}
         for user in users:
             try:
-                # Генеруємо персональний звіт
-                personal_report = await self.generate_personal_daily_report(user)
-                if personal_report:
-                    await self.bot.send_message(
-                        chat_id=user.telegram_id,
-                        text=personal_report,
-                        parse_mode='Markdown'
-                    )
-                    reports_sent += 1
-                    
-                    # Невелика затримка між повідомленнями
-                    await asyncio.sleep(0.5)
-                
-                # Генеруємо звіт по друзях (якщо є друзі)
-                if user.friends:
-                    friends_report = await self.generate_friends_daily_report(user)
-                    if friends_report:
-                        await self.bot.send_message(
-                            chat_id=user.telegram_id,
-                            text=friends_report,
-                            parse_mode='Markdown'
-                        )
-                        
-                        # Затримка між повідомленнями
-                        await asyncio.sleep(0.5)
-                
+                rendered[user.telegram_id] = await self.render_user_reports(
+                    user, snapshot, (report_days or {}).get(user.telegram_id)
+                )
             except Exception as e:
-                self.logger.error(f"Помилка відправки звіту користувачу {user.telegram_id}: {e}")
-                errors += 1
-                continue
+                self.logger.error(f"Помилка формування звіту користувачу {user.telegram_id}: {e}")
+                rendered[user.telegram_id] = []
+            await asyncio.sleep(0)
+        return rendered
+
+    def enqueue_rendered(self, run_id: str, rendered: Dict[int, List[Tuple[int, str, str]]]) -> List[int]:
+        """
+        Додати звіти в outbox та позначити доставку в журналі запуску
+        
+        Повідомлення користувача та його стан у журналі записуються однією
+        транзакцією, тож після перезапуску звіт не буде продубльовано.
+        
+        Returns:
+            ID доданих повідомлень outbox
+        """
+        message_ids = []
+        items = list(rendered.items())
+        conn = self.report_runs.connect()
+        try:
+            for i in range(0, len(items), self.enqueue_batch_size):
+                batch = items[i:i + self.enqueue_batch_size]
+                conn.execute('BEGIN IMMEDIATE')
+                enqueued, failed = [], []
+                for telegram_id, messages in batch:
+                    for chat_id, text, parse_mode in messages:
+                        message_id = self.outbox.enqueue_in_transaction(conn, chat_id, text, parse_mode)
+                        if message_id:
+                            message_ids.append(message_id)
+                    (enqueued if messages else failed).append(telegram_id)
+                self.report_runs.mark_in_transaction(conn, run_id, enqueued, 'enqueued')
+                self.report_runs.mark_in_transaction(conn, run_id, failed, 'error')
+                conn.execute('COMMIT')
+            return message_ids
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    async def wait_for_delivery(self, message_ids: List[int], timeout: float) -> Dict[str, int]:
+        """Дочекатися, поки відправник outbox обробить повідомлення розсилки"""
+        deadline = time.monotonic() + timeout
+        while True:
+            counts = self.outbox.count_status(message_ids)
+            if not counts.get('pending') and not counts.get('sending'):
+                return counts
+            if time.monotonic() >= deadline:
+                return counts
+            await asyncio.sleep(self.delivery_poll_interval)
+
+    async def log_delivery(self, message_ids: List[int], timeout: float) -> Dict[str, int]:
+        """Дочекатися доставки повідомлень розсилки та записати підсумок у лог"""
+        phase_start = time.monotonic()
+        counts = await self.wait_for_delivery(message_ids, timeout)
+        delivery_duration = time.monotonic() - phase_start
+        self.logger.info(
+            f"Доставка: надіслано {counts.get('sent', 0)}, невдало {counts.get('failed', 0)}, "
+            f"не встигли {counts.get('pending', 0) + counts.get('sending', 0)} за {delivery_duration:.1f} с "
+            f"({self._rate(counts.get('sent', 0), delivery_duration)} повідомлень/с)"
+        )
+        return counts
+
+    @staticmethod
+    def daily_run_id(day: date = None) -> str:
+        """Ідентифікатор щоденної розсилки за день"""
+        return f"daily-{(day or date.today()).isoformat()}"
+
+    async def send_daily_reports_to_all_users(self, run_id: str = None, wait_delivery: bool = True,
+                                              delivery_timeout: float = 3600):
+        """
+        Відправити щоденні звіти всім активним користувачам одразу
         
-        self.logger.info(f"Щоденні звіти відправлено: {reports_sent}, помилок: {errors}")
+        Повторний виклик з тим самим run_id (перезапуск процесу, ручний запуск)
+        обробляє лише тих, хто ще не отримав звіт.
+        """
+        users = self.user_db.get_all_users_with_steam()
+        report_days = {user.telegram_id: self._local_day(user) for user in users}
+        async with self._run_lock:
+            reports_sent, errors, message_ids = await self._run_daily_reports(
+                {run_id or self.daily_run_id(): users}, report_days
+            )
+        
+        if wait_delivery and message_ids:
+            await self.log_delivery(message_ids, delivery_timeout)
         return reports_sent, errors
 
-    async def send_weekly_summary(self):
-        """Відправити тижневий підсумок (майбутня функція)"""
-        # TODO: Реалізувати тижневі звіти з порівнянням статистики
-        pass
+    async def send_due_reports(self, window_start: datetime, window_end: datetime, wait_delivery: bool = True,
+                               delivery_timeout: float = 3600):
+        """
+        Відправити звіти користувачам, чий час звіту припадає на (window_start, window_end]
+        
+        Викликається планувальником невеликими часовими пакетами; користувачі пакета
+        мають спільний знімок статистики. Розсилка кожного локального дня має свій
+        run_id, тож перекриття проміжків не дублює звіти.
+        """
+        users = self.user_db.get_all_users_with_steam()
+        due_users = self.schedule.select_due(users, window_start, window_end)
+        if not due_users:
+            return 0, 0
+        
+        runs = {self.daily_run_id(local_day): day_users for local_day, day_users in due_users.items()}
+        report_days = {user.telegram_id: local_day for local_day, day_users in due_users.items() for user in day_users}
+        async with self._run_lock:
+            reports_sent, errors, message_ids = await self._run_daily_reports(runs, report_days)
+        
+        if wait_delivery and message_ids:
+            # Наступний пакет не чекає на доставку попереднього
+            task = asyncio.create_task(self.log_delivery(message_ids, delivery_timeout))
+            self._delivery_tasks.add(task)
+            task.add_done_callback(self._delivery_tasks.discard)
+        return reports_sent, errors
+
+    async def _run_daily_reports(self, runs: Dict[str, List[User]],
+                                 report_days: Dict[int, date]) -> Tuple[int, int, List[int]]:
+        run_start = time.monotonic()
+        
+        # Лише ті, кому звіт цього дня ще не потрапив в outbox
+        run_users: Dict[str, List[User]] = {}
+        for run_id, candidates in runs.items():
+            run = self.report_runs.start_run(run_id, 'daily', [user.telegram_id for user in candidates])
+            remaining = self.report_runs.get_remaining(run_id)
+            run_users[run_id] = [user for user in candidates if user.telegram_id in remaining]
+            self.logger.info(
+                f"Розсилка {run_id}{' (продовження)' if run['resumed'] else ''}: "
+                f"{len(run_users[run_id])} з {len(candidates)} користувачів пакета"
+            )
+        
+        users = [user for run_users_list in run_users.values() for user in run_users_list]
+        if not users:
+            for run_id in run_users:
+                self.report_runs.finish_run(run_id)
+            return 0, 0, []
+        
+        # Фаза 1-2: кожен гравець (користувач або друг) завантажується рівно один раз
+        snapshot = await self.build_snapshot(users)
+        # Без знімка: 2 запити на звіт користувача + 2 на кожного учасника рейтингу друзів
+        naive_requests = sum(2 + (2 * (1 + len(user.friends)) if user.friends else 0) for user in users)
+        self.logger.info(
+            f"Знімок статистики: {len(snapshot.stats)} гравців за {snapshot.duration:.1f} с "
+            f"({self._rate(len(snapshot.stats), snapshot.duration)} гравців/с), "
+            f"запитів до Steam: {snapshot.total_requests} замість {naive_requests} "
+            f"(заощаджено {naive_requests - snapshot.total_requests}), без статистики: {len(snapshot.failed)}"
+        )
+        
+        # Фаза 3: звіти формуються зі знімка без звернень до Steam
+        phase_start = time.monotonic()
+        rendered = await self.render_reports(users, snapshot, report_days)
+        messages_count = sum(len(messages) for messages in rendered.values())
+        render_duration = time.monotonic() - phase_start
+        self.logger.info(
+            f"Формування: {messages_count} повідомлень за {render_duration:.1f} с "
+            f"({self._rate(messages_count, render_duration)} повідомлень/с)"
+        )
+        
+        # Фаза 4: звіти потрапляють в outbox пакетами разом з відміткою в журналі запуску,
+        # темп надсилання контролює відправник outbox зі спільним лімітером
+        phase_start = time.monotonic()
+        message_ids = []
+        for run_id, run_users_list in run_users.items():
+            message_ids += self.enqueue_rendered(run_id, {user.telegram_id: rendered[user.telegram_id]
+                                                          for user in run_users_list})
+            self.report_runs.finish_run(run_id)
+        self.logger.info(f"Додано в outbox: {len(message_ids)} повідомлень за {time.monotonic() - phase_start:.1f} с")
+        
+        reports_sent = sum(1 for messages in rendered.values() if messages)
+        errors = len(rendered) - reports_sent
+        self.logger.info(
+            f"Щоденні звіти сформовано: {reports_sent}, помилок: {errors}, "
+            f"загальний час: {time.monotonic() - run_start:.1f} с"
+        )
+        return reports_sent, errors, message_ids
+
+    @staticmethod
+    def _rate(count: int, duration: float) -> str:
+        return f"{count / duration:.1f}" if duration > 0 else "-"
+
+    @staticmethod
+    def weekly_run_id(week_start: date) -> str:
+        """Ідентифікатор тижневої розсилки"""
+        year, week, _ = week_start.isocalendar()
+        return f"weekly-{year}-W{week:02d}"
+
+    @staticmethod
+    def _format_change(label: str, start: float, last: float, suffix: str = "", precision: int = 2) -> str:
+        diff = round(last - start, precision)
+        arrow = "📈" if diff > 0 else "📉" if diff < 0 else "➖"
+        return f"• {label}: {start}{suffix} → **{last}{suffix}** ({arrow} {diff:+.{precision}f})"
+
+    @staticmethod
+    def _friend_ranks(steam_ids: List[str], week: Dict[str, Dict[str, Any]], point: str) -> Dict[str, int]:
+        """Місця гравців групи за Impact Score на початок ('start') або кінець ('last') тижня"""
+        ranked = sorted((steam_id for steam_id in steam_ids if steam_id in week),
+                        key=lambda steam_id: week[steam_id][point].get('impact_score', 0), reverse=True)
+        return {steam_id: position for position, steam_id in enumerate(ranked, 1)}
+
+    def generate_weekly_summary(self, user: User, week: Dict[str, Dict[str, Any]], week_start: date) -> Optional[str]:
+        """
+        Генерувати тижневий підсумок з агрегатів тижня
+
+        Args:
+            week: агрегати тижня для користувача та його друзів (WeeklyStatsStore.get_week)
+        """
+        try:
+            aggregate = week.get(user.steam_id)
+            if not aggregate:
+                return None
+
+            start, last = aggregate['start'], aggregate['last']
+            week_end = week_start + timedelta(days=6)
+
+            report = f"""
+📆 **Тижневий підсумок для {last.get('name', 'Гравець')}**
+🗓 {week_start.strftime('%d.%m')} - {week_end.strftime('%d.%m.%Y')}
+
+📊 **Зміни за тиждень:**
+{self._format_change('K/D Ratio', start['kd_ratio'], last['kd_ratio'])}
+{self._format_change('Win Rate', start['win_rate'], last['win_rate'], '%', 1)}
+{self._format_change('Headshot %', start['headshot_percent'], last['headshot_percent'], '%', 1)}
+{self._format_change('Impact Score', start['impact_score'], last['impact_score'], '', 1)}
+"""
+
+            matches = last['matches_played'] - start['matches_played']
+            if matches > 0:
+                kills = last['kills'] - start['kills']
+                deaths = last['deaths'] - start['deaths']
+                wins = last['wins'] - start['wins']
+                report += f"\n🎮 **За тиждень:** {matches} матчів, перемог: {wins}"
+                report += f"\n⚔️ K/D тижня: **{round(kills / max(deaths, 1), 2)}** ({kills}/{deaths})"
+            else:
+                report += "\n🎮 Цього тижня матчів не зафіксовано"
+
+            best_match = aggregate.get('best_match')
+            if best_match:
+                result = f" ({best_match['result']})" if best_match.get('result') else ""
+                report += (f"\n\n🏅 **Найкращий матч:** {best_match['kills']}/{best_match['deaths']}, "
+                           f"урон {best_match.get('damage', 0)}, MVP {best_match.get('mvps', 0)}{result}")
+
+            if user.friends:
+                group = [user.steam_id] + user.friends
+                start_rank = self._friend_ranks(group, week, 'start').get(user.steam_id)
+                last_rank = self._friend_ranks(group, week, 'last').get(user.steam_id)
+                if start_rank and last_rank:
+                    moved = start_rank - last_rank
+                    movement = f"⬆️ +{moved}" if moved > 0 else f"⬇️ {moved}" if moved < 0 else "без змін"
+                    report += f"\n\n🏆 **Рейтинг серед друзів:** #{start_rank} → **#{last_rank}** ({movement})"
+
+            return report.strip()
+
+        except Exception as e:
+            self.logger.error(f"Помилка генерації тижневого підсумку для {user.telegram_id}: {e}")
+            return None
+
+    async def send_weekly_summary(self, week_start: date = None) -> Tuple[int, int]:
+        """
+        Відправити тижневий підсумок усім користувачам
+
+        Підсумок будується з тижневих агрегатів, які оновлює кожен знімок статистики
+        протягом тижня, тому розсилка не робить запитів до Steam. Як і щоденна,
+        розсилка має свій run_id і після перезапуску не дублюється.
+        """
+        week_start = week_start or WeeklyStatsStore.week_start()
+        run_id = self.weekly_run_id(week_start)
+        users = self.user_db.get_all_users_with_steam()
+
+        async with self._run_lock:
+            run = self.report_runs.start_run(run_id, 'weekly', [user.telegram_id for user in users])
+            remaining = self.report_runs.get_remaining(run_id)
+            users = [user for user in users if user.telegram_id in remaining]
+
+            week = self.weekly_stats.get_week(PlayerStatsSnapshot.collect_steam_ids(users), week_start)
+            rendered = {}
+            for user in users:
+                summary = self.generate_weekly_summary(user, week, week_start)
+                rendered[user.telegram_id] = [(user.telegram_id, summary, 'Markdown')] if summary else []
+
+            message_ids = self.enqueue_rendered(run_id, rendered)
+            self.report_runs.finish_run(run_id)
+
+            # Щотижневе прибирання застарілих агрегатів і знімків рейтингу
+            self.weekly_stats.purge(current_week=week_start)
+            self.rank_snapshots.purge()
+            self.leaderboards.purge()
+
+        sent = sum(1 for messages in rendered.values() if messages)
+        self.logger.info(
+            f"Тижневий підсумок {run_id}{' (продовження)' if run['resumed'] else ''}: "
+            f"надіслано {sent}, без даних {len(rendered) - sent}, повідомлень в outbox: {len(message_ids)}"
+        )
+        return sent, len(rendered) - sent
+
+    async def get_leaderboard_changes(self, user: User, snapshot: PlayerStatsSnapshot = None) -> Dict[str, Any]:
+        """
+        Отримати зміни в рейтингу групи друзів користувача відносно попереднього дня
+
+        Returns:
+            'ranking' - поточний порядок steam_id, 'previous_day' - день попереднього знімка,
+            'changes' - steam_id -> зміна позиції (None для нових у рейтингу)
+        """
+        if not user.steam_id:
+            return {'ranking': [], 'previous_day': None, 'changes': {}}
+
+        group = [user.steam_id] + user.friends
+        if snapshot is None:
+            await self.leaderboards.refresh(self.steam_api, group)
 
-    async def get_leaderboard_changes(self) -> Dict[str, Any]:
-        """Отримати зміни в рейтингу (майбутня функція)"""
-        # TODO: Реалізувати відстеження змін позицій в рейтингу
-        pass
+        ranking = [entry['steam_id'] for entry in self.leaderboards.get_leaderboard(group)]
+        previous_day, changes = self._track_rank_changes(user, ranking)
+        return {'ranking': ranking, 'previous_day': previous_day, 'changes': changes}
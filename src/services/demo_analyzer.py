@@ -2,68 +2,441 @@
 Сервіс для аналізу демо-файлів CS2
 """
 import os
+import gzip
 import json
-import subprocess
+import multiprocessing
+import shutil
+import signal
 import requests
-from typing import Optional, Dict, Any, List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 import aiohttp
 import asyncio
 
+from src.services.demo_parser import (parse_demo_file, is_demo_file, detect_demo_format, detect_compression,
+                                      DemoParseError, DEMO_EXTENSIONS)
+from src.services.analysis_cache import AnalysisCache, demo_content_hash
+from src.services.demo_downloader import DemoDownloader
+from src.services.demo_storage import DemoStorage
+
 
 class DemoAnalyzer:
-    def __init__(self, steam_api_key: str):
+    ANALYZE_TIMEOUT = 300  # Максимальний час аналізу одного демо (секунди)
+    KILL_GRACE_PERIOD = 5  # Скільки чекати завершення після SIGTERM перед SIGKILL (секунди)
+    OUTPUT_TAIL_LINES = 200  # Скільки останніх рядків stdout/stderr аналізатора зберігати
+    # Змінюється разом з парсером або форматом аналізу - старі результати в кеші стають недійсними
+    ANALYZER_VERSION = "native-1"
+    DEMO_COMPRESSLEVEL = 1  # Рівень gzip для збережених демо (швидко, демо стискаються в рази)
+    DEMO_STORAGE_QUOTA_MB = 2048  # Квота папки демо
+    ANALYSIS_STORAGE_QUOTA_MB = 256  # Квота папки аналізів
+    ANALYSIS_MAX_AGE_DAYS = 30  # Файли аналізів без звернень довше цього видаляються
+    MAX_DEFAULT_PARSE_WORKERS = 2  # Процесів розбору за замовчуванням (бот та моніторинг ділять ті ж ядра)
+
+    def __init__(self, steam_api_key: str, max_concurrent_analyses: int = 2, parse_workers: int = None,
+                 analysis_cache: AnalysisCache = None, demo_downloader: DemoDownloader = None,
+                 storage: DemoStorage = None):
         self.steam_api_key = steam_api_key
         self.demo_folder = "demos"
         self.analysis_folder = "analysis"
         self.csgo_demo_manager_path = "csgo-demo-manager"  # Шлях до CSGO Demo Manager
-        
+        # Адреса демо для завантаження, наприклад https://host/demos/{match_id}.dem.bz2
+        self.demo_url_template = os.getenv("DEMO_URL_TEMPLATE")
+        self.demo_downloader = demo_downloader or DemoDownloader()
+        self.analyze_timeout = self.ANALYZE_TIMEOUT
+        # Обмеження кількості одночасних процесів аналізатора
+        self._analysis_semaphore = asyncio.Semaphore(max_concurrent_analyses)
+        # Власний розбір демо виконується в пулі процесів (без GIL)
+        self.parse_workers = parse_workers or int(os.getenv("DEMO_PARSE_WORKERS", "0")) or self.default_parse_workers()
+        self._parse_executor: Optional[ProcessPoolExecutor] = None
+        # Аналізи демо, що виконуються зараз, за шляхом файлу (одночасні запити того ж демо чекають на один)
+        self._match_tasks: Dict[str, asyncio.Task] = {}
+
         # Створюємо папки якщо не існують
         os.makedirs(self.demo_folder, exist_ok=True)
         os.makedirs(self.analysis_folder, exist_ok=True)
-    
-    async def download_demo(self, steam_id: str, match_id: str) -> Optional[str]:
+        self.analysis_cache = analysis_cache or AnalysisCache(os.path.join(self.analysis_folder, "analysis_cache.db"),
+                                                              self.ANALYZER_VERSION)
+        # Квоти на папки демо та аналізів (облік доступу - у базі кешу аналізів)
+        self.storage = storage or DemoStorage(
+            self.analysis_cache.db_path,
+            {
+                self.demo_folder: int(os.getenv("DEMO_STORAGE_QUOTA_MB", self.DEMO_STORAGE_QUOTA_MB)) * 1024 * 1024,
+                self.analysis_folder: int(os.getenv("ANALYSIS_STORAGE_QUOTA_MB",
+                                                    self.ANALYSIS_STORAGE_QUOTA_MB)) * 1024 * 1024
+            },
+            max_ages={self.analysis_folder: self.ANALYSIS_MAX_AGE_DAYS * 24 * 3600},
+            compactors={self.demo_folder: self.compress_demo}
+        )
+
+    async def download_demo(self, steam_id: str, match_id: str, demo_url: str = None,
+                            demo_sha256: str = None) -> Optional[str]:
         """
         Завантажити демо-файл з Steam
-        
+
+        Демо зберігається один раз на матч (`demos/<match_id>.dem[.gz|.bz2|.zst]`) і
+        спільне для всіх його гравців: якщо файл уже є, він не копіюється повторно.
+        Демо копіюються як є: нестиснене розбирається напряму через mmap, а стискається
+        лише тоді, коли залишається в папці (див. `compress_demo`).
+        Якщо демо немає в папках Steam, воно завантажується по HTTP з `demo_url`
+        або адреси за шаблоном `DEMO_URL_TEMPLATE`.
+
         Args:
             steam_id: Steam ID гравця
             match_id: ID матчу
-        
+            demo_url: адреса демо (необов'язково)
+            demo_sha256: очікуваний SHA-256 завантаженого файлу (необов'язково)
+
         Returns:
             Шлях до демо-файлу або None
         """
         try:
             # Спробуємо завантажити демо через Steam API або локальну папку
-            demo_filename = f"{steam_id}_{match_id}.dem"
-            demo_path = os.path.join(self.demo_folder, demo_filename)
-            
+            for extension in DEMO_EXTENSIONS:
+                stored_path = os.path.join(self.demo_folder, f"{match_id}{extension}")
+                if os.path.exists(stored_path):
+                    self.storage.touch(stored_path)
+                    return stored_path
+
             # Перевіряємо чи існує демо в локальній папці Steam
             steam_demo_paths = [
-                f"C:/Program Files (x86)/Steam/steamapps/common/Counter-Strike Global Offensive/csgo/replays/{demo_filename}",
-                f"C:/Program Files/Steam/steamapps/common/Counter-Strike Global Offensive/csgo/replays/{demo_filename}",
-                f"{os.path.expanduser('~')}/.steam/steam/steamapps/common/Counter-Strike Global Offensive/csgo/replays/{demo_filename}"
+                f"{replays}/{demo_filename}"
+                for replays in (
+                    "C:/Program Files (x86)/Steam/steamapps/common/Counter-Strike Global Offensive/csgo/replays",
+                    "C:/Program Files/Steam/steamapps/common/Counter-Strike Global Offensive/csgo/replays",
+                    f"{os.path.expanduser('~')}/.steam/steam/steamapps/common/Counter-Strike Global Offensive/csgo/replays"
+                )
+                for name in (match_id, f"{steam_id}_{match_id}")
+                for demo_filename in (f"{name}{extension}" for extension in DEMO_EXTENSIONS)
             ]
-            
+
             # Копіюємо демо з Steam папки якщо існує
             for steam_path in steam_demo_paths:
                 if os.path.exists(steam_path):
-                    import shutil
-                    shutil.copy2(steam_path, demo_path)
+                    loop = asyncio.get_running_loop()
+                    stored_path = await loop.run_in_executor(None, self._store_demo, steam_path, match_id)
                     print(f"Демо скопійовано з: {steam_path}")
-                    return demo_path
-            
-            # Якщо демо не знайдено, створюємо тестовий файл
-            print(f"Демо не знайдено в Steam папках, створюємо тестовий файл")
-            with open(demo_path, 'w') as f:
-                f.write(f"Demo file for {steam_id} match {match_id}")
+                    self._track_file(stored_path)
+                    return stored_path
+
+            # Завантажуємо демо по HTTP (з докачуванням незавершеного файлу)
+            url = demo_url or (self.demo_url_template.format(match_id=match_id, steam_id=steam_id)
+                               if self.demo_url_template else None)
+            if url:
+                downloaded = await self.demo_downloader.download(
+                    url, os.path.join(self.demo_folder, f"{match_id}.download"), sha256=demo_sha256)
+                if not downloaded:
+                    return None
+                loop = asyncio.get_running_loop()
+                stored_path = await loop.run_in_executor(None, self._store_demo, downloaded, match_id, True)
+                self._track_file(stored_path)
+                return stored_path
             
-            return demo_path
+            # Без файлу немає що аналізувати: черга повторить спробу або завершить завдання з помилкою
+            print(f"Демо матчу {match_id} не знайдено в папках Steam, адреса для завантаження невідома")
+            return None
             
         except Exception as e:
             print(f"Помилка завантаження демо: {e}")
             return None
     
+    def _track_file(self, path: str):
+        """Взяти новий файл на облік квот і, за потреби, звільнити місце у фоні"""
+        self.storage.touch(path)
+        self.storage.request_eviction()
+
+    def _store_demo(self, source_path: str, match_id: str, move: bool = False) -> str:
+        """
+        Скопіювати (або перемістити, `move=True`) демо в папку демо без змін
+
+        Розширення визначається за сигнатурою стиснення. Файл з'являється під
+        остаточною назвою лише після повного запису.
+
+        Returns:
+            Шлях до збереженого демо
+        """
+        compression = detect_compression(source_path)
+        extension = {'bz2': '.dem.bz2', 'gzip': '.dem.gz', 'zstd': '.dem.zst'}.get(compression, '.dem')
+        demo_path = os.path.join(self.demo_folder, f"{match_id}{extension}")
+        self._place_demo(source_path, demo_path, move)
+        return demo_path
+
+    def compress_demo(self, demo_path: str) -> Optional[Tuple[str, str]]:
+        """
+        Стиснути gzip нестиснене демо, що залишається в папці демо
+
+        Викликається сховищем для файлів, які давно не змінювались і не
+        закріплені (демо, видалене одразу після аналізу, не стискається).
+        Заголовок gzip без часу та імені файлу, тож те саме демо стискається
+        в ті самі байти. Оригінал не змінюється: стиснену копію на його місце
+        ставить сховище, якщо демо тим часом не закріпили.
+
+        Returns:
+            (тимчасовий файл зі стисненим демо, шлях стисненого демо) або None,
+            якщо стиснене демо не менше за оригінал
+        """
+        if not demo_path.endswith('.dem') or detect_compression(demo_path):
+            return None
+        compressed_path = demo_path + ".gz"
+        temp_path = compressed_path + ".part"
+        stat = os.stat(demo_path)
+        with open(demo_path, 'rb') as src, open(temp_path, 'wb') as raw, \
+                gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=self.DEMO_COMPRESSLEVEL,
+                              mtime=0) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        if os.path.getsize(temp_path) >= stat.st_size:
+            os.remove(temp_path)
+            return None
+        # Стиснення не є зміною демо: час зміни залишається для правил витіснення
+        os.utime(temp_path, (stat.st_atime, stat.st_mtime))
+        return temp_path, compressed_path
+
+    @staticmethod
+    def _place_demo(source_path: str, demo_path: str, move: bool):
+        if move:
+            os.replace(source_path, demo_path)
+        else:
+            shutil.copyfile(source_path, demo_path + ".part")
+            os.replace(demo_path + ".part", demo_path)
+
+    async def run_process(self, cmd: List[str], timeout: float) -> Tuple[int, str, str]:
+        """
+        Запустити зовнішню програму без блокування event loop
+
+        stdout та stderr читаються потоково (зберігаються останні рядки). Процес
+        запускається у власній групі процесів, тож при таймауті або скасуванні
+        завершується разом з усіма дочірніми процесами.
+
+        Returns:
+            Код завершення, stdout та stderr
+
+        Raises:
+            asyncio.TimeoutError: процес не завершився за `timeout` секунд
+        """
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=(os.name == 'posix')
+        )
+        stdout_tail = deque(maxlen=self.OUTPUT_TAIL_LINES)
+        stderr_tail = deque(maxlen=self.OUTPUT_TAIL_LINES)
+
+        async def read_stream(stream: asyncio.StreamReader, tail: deque):
+            async for line in stream:
+                tail.append(line.decode('utf-8', errors='replace').rstrip())
+
+        try:
+            returncode, _, _ = await asyncio.wait_for(asyncio.gather(
+                process.wait(),
+                read_stream(process.stdout, stdout_tail),
+                read_stream(process.stderr, stderr_tail)
+            ), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            await self._kill_process_group(process)
+            raise
+        return returncode, '\n'.join(stdout_tail), '\n'.join(stderr_tail)
+
+    async def _kill_process_group(self, process: asyncio.subprocess.Process):
+        """Завершити процес та його дочірні процеси (SIGTERM, потім SIGKILL)"""
+        # Групу завершуємо навіть якщо сам процес уже вийшов: дочірні могли лишитися
+        def send(sig):
+            try:
+                if os.name == 'posix':
+                    os.killpg(process.pid, sig)
+                else:
+                    process.kill()
+            except ProcessLookupError:
+                pass
+
+        send(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), self.KILL_GRACE_PERIOD)
+        except asyncio.TimeoutError:
+            pass
+        # Те, що проігнорувало SIGTERM (процес або його дочірні), завершуємо примусово
+        send(signal.SIGKILL if os.name == 'posix' else signal.SIGTERM)
+        await process.wait()
+
+    @classmethod
+    def default_parse_workers(cls) -> int:
+        """Доступні процесу ядра (з урахуванням affinity/cgroup cpuset), не більше MAX_DEFAULT_PARSE_WORKERS"""
+        if hasattr(os, 'sched_getaffinity'):
+            cpus = len(os.sched_getaffinity(0))
+        else:
+            cpus = os.cpu_count() or 1
+        return max(1, min(cpus, cls.MAX_DEFAULT_PARSE_WORKERS))
+
+    def _get_parse_executor(self) -> ProcessPoolExecutor:
+        if self._parse_executor is None:
+            # fork з процесу бота скопіював би event loop, потоки та з'єднання; воркери
+            # розбору стартують з чистого forkserver (spawn там, де його немає)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._parse_executor = ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context)
+        return self._parse_executor
+
+    def shutdown(self):
+        """Зупинити пул процесів розбору демо"""
+        if self._parse_executor is not None:
+            self._parse_executor.shutdown(wait=False, cancel_futures=True)
+            self._parse_executor = None
+
+    async def analyze_match(self, demo_path: str, match_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Аналізувати демо матчу один раз для всіх його гравців
+
+        Демо розбирається власним парсером у пулі процесів. Результат зі
+        статистикою кожного гравця зберігається в кеші аналізів за SHA-256 розпакованого
+        вмісту демо, тож повторні запити того ж матчу (від інших гравців або після
+        повторного завантаження демо) його не розбирають.
+
+        Returns:
+            Аналіз матчу ('players' - аналізи гравців за Steam ID) або None,
+            якщо файл не є демо HL2DEMO чи пошкоджений
+        """
+        # Ключ - сам файл: різні демо з однаковим ID матчу (тезки з різних папок) не підміняють одне одного
+        key = os.path.realpath(demo_path)
+        task = self._match_tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._analyze_match(demo_path, match_id))
+            self._match_tasks[key] = task
+            task.add_done_callback(lambda _: self._match_tasks.pop(key, None))
+        # Скасування одного з очікувачів не зупиняє аналіз для інших
+        return await asyncio.shield(task)
+
+    async def _analyze_match(self, demo_path: str, match_id: str) -> Optional[Dict[str, Any]]:
+        # Демо не витісняється, поки його розбирають
+        with self.storage.pin(demo_path):
+            self.storage.touch(demo_path)
+            return await self._parse_match(demo_path, match_id)
+
+    async def _parse_match(self, demo_path: str, match_id: str) -> Optional[Dict[str, Any]]:
+        if not is_demo_file(demo_path):
+            return None
+        loop = asyncio.get_running_loop()
+        try:
+            demo_hash = await loop.run_in_executor(None, demo_content_hash, demo_path)
+        except DemoParseError as e:
+            print(f"Помилка читання демо: {e}")
+            return None
+        cached = await loop.run_in_executor(None, self.analysis_cache.get, demo_hash)
+        if cached:
+            return self._for_match(cached, match_id, demo_path)
+
+        try:
+            parsed = await loop.run_in_executor(self._get_parse_executor(), parse_demo_file, demo_path)
+        except DemoParseError as e:
+            print(f"Помилка розбору демо: {e}")
+            return None
+
+        analysis_date = datetime.now().isoformat()
+        match_analysis = {
+            'match_id': match_id,
+            'demo_path': demo_path,
+            'analysis_date': analysis_date,
+            'analysis_method': 'native_parser',
+            'analyzer_version': self.ANALYZER_VERSION,
+            'map': parsed['header']['map_name'] or 'Невідомо',
+            'rounds_played': parsed['rounds_played'],
+            'score': parsed['score'],
+            'players': {
+                steam_id: self._build_player_analysis(parsed, player, demo_path, steam_id, match_id, analysis_date)
+                for steam_id, player in parsed['players'].items() if player['steam_id']
+            }
+        }
+        await loop.run_in_executor(None, self.analysis_cache.put, demo_hash, match_id, match_analysis)
+        return match_analysis
+
+    @staticmethod
+    def _for_match(match_analysis: Dict[str, Any], match_id: str, demo_path: str) -> Dict[str, Any]:
+        """Збережений аналіз з ідентифікаторами поточного запиту (те саме демо могло прийти під іншим match_id)"""
+        match_analysis['match_id'] = match_id
+        match_analysis['demo_path'] = demo_path
+        for player_analysis in match_analysis['players'].values():
+            player_analysis['match_id'] = match_id
+            player_analysis['demo_path'] = demo_path
+        return match_analysis
+
+    @staticmethod
+    def get_player_analysis(match_analysis: Dict[str, Any], steam_id: str) -> Optional[Dict[str, Any]]:
+        """Аналіз одного гравця з аналізу матчу (None, якщо гравця немає в демо)"""
+        return match_analysis['players'].get(steam_id)
+
+    def _build_player_analysis(self, parsed: Dict[str, Any], player: Dict[str, Any], demo_path: str, steam_id: str,
+                               match_id: str, analysis_date: str) -> Dict[str, Any]:
+        """Перетворити статистику гравця з розбору демо у формат аналізу"""
+        header = parsed['header']
+        kills = player['kills']
+        deaths = player['deaths']
+        assists = player['assists']
+        headshots = player['headshots']
+        rounds_played = parsed['rounds_played']
+        rounds_won = player['rounds_won']
+
+        kd_ratio = round(kills / max(deaths, 1), 2)
+        headshot_percent = round((headshots / max(kills, 1)) * 100, 1)
+        win_rate = round((rounds_won / max(rounds_played, 1)) * 100, 1)
+
+        weapon_stats = {}
+        for weapon_name, weapon_data in player['weapons'].items():
+            weapon_stats[weapon_name] = {
+                'kills': weapon_data['kills'],
+                'shots': weapon_data['shots'],
+                'hits': weapon_data['hits'],
+                'accuracy': round((weapon_data['hits'] / max(weapon_data['shots'], 1)) * 100, 1)
+            }
+
+        detailed_stats = {
+            'clutch_situations': player['clutch_situations'],
+            'clutch_wins': player['clutch_wins'],
+            'entry_kills': player['entry_kills'],
+            'trade_kills': player['trade_kills'],
+            'utility_damage': player['utility_damage'],
+            'flash_assists': player['flash_assists'],
+            'bomb_plants': player['bomb_plants'],
+            'bomb_defuses': player['bomb_defuses']
+        }
+
+        return {
+            'steam_id': steam_id,
+            'match_id': match_id,
+            'demo_path': demo_path,
+            'analysis_date': analysis_date,
+            'analysis_method': 'native_parser',
+            'analyzer_version': self.ANALYZER_VERSION,
+            'match_info': {
+                'map': header['map_name'] or 'Невідомо',
+                'rounds_played': rounds_played,
+                'rounds_won': rounds_won,
+                'rounds_lost': rounds_played - rounds_won,
+                'win_rate': win_rate,
+                'match_duration': f"{round(header['playback_time'] / 60)} minutes"
+            },
+            'player_stats': {
+                'kills': kills,
+                'deaths': deaths,
+                'assists': assists,
+                'mvps': player['mvps'],
+                'headshots': headshots,
+                'kd_ratio': kd_ratio,
+                'headshot_percent': headshot_percent,
+                'damage_dealt': player['damage_dealt'],
+                'damage_taken': player['damage_taken'],
+                'adr': round(player['damage_dealt'] / max(rounds_played, 1), 1)
+            },
+            'weapon_stats': weapon_stats,
+            'detailed_stats': detailed_stats,
+            'round_by_round': player['rounds'],
+            'performance_analysis': {
+                'overall_rating': round((kd_ratio * 0.4 + (headshot_percent / 100) * 0.3 + (win_rate / 100) * 0.3) * 10, 1),
+                'clutch_performance': round((detailed_stats['clutch_wins'] / max(detailed_stats['clutch_situations'], 1)) * 100, 1),
+                'entry_performance': detailed_stats['entry_kills'],
+                'team_contribution': round((assists + detailed_stats['flash_assists']) / max(rounds_played, 1), 2)
+            }
+        }
+
     async def analyze_demo_with_csgo_demo_manager(self, demo_path: str, steam_id: str, match_id: str) -> Optional[Dict[str, Any]]:
         """
         Аналізувати демо-файл з використанням CSGO Demo Manager
@@ -97,15 +470,11 @@ class DemoAnalyzer:
             
             print(f"Виконуємо команду: {' '.join(cmd)}")
             
-            # Запускаємо аналіз
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 хвилин таймаут
-            )
-            
-            if result.returncode == 0:
+            # Запускаємо аналіз (не більше N процесів одночасно)
+            async with self._analysis_semaphore:
+                returncode, stdout, stderr = await self.run_process(cmd, self.analyze_timeout)
+
+            if returncode == 0:
                 # Читаємо результати аналізу
                 with open(output_path, 'r', encoding='utf-8') as f:
                     analysis_data = json.load(f)
@@ -114,21 +483,20 @@ class DemoAnalyzer:
                 processed_data = self._process_csgo_demo_manager_data(analysis_data, steam_id, match_id)
                 return processed_data
             else:
-                print(f"Помилка аналізу демо: {result.stderr}")
-                # Якщо CSGO Demo Manager не працює, використовуємо симуляцію
-                return await self._simulate_demo_analysis(demo_path, steam_id, match_id)
+                print(f"Помилка аналізу демо: {stderr}")
+                return None
                 
-        except subprocess.TimeoutExpired:
-            print("Таймаут аналізу демо")
-            return await self._simulate_demo_analysis(demo_path, steam_id, match_id)
+        except asyncio.TimeoutError:
+            print(f"Таймаут аналізу демо ({self.analyze_timeout} с), процес аналізатора завершено")
+            return None
         except FileNotFoundError:
-            print("CSGO Demo Manager не знайдено, використовуємо симуляцію")
-            return await self._simulate_demo_analysis(demo_path, steam_id, match_id)
+            print("CSGO Demo Manager не знайдено, демо не проаналізовано")
+            return None
         except Exception as e:
             print(f"Помилка аналізу демо: {e}")
-            return await self._simulate_demo_analysis(demo_path, steam_id, match_id)
+            return None
     
-    def _process_csgo_demo_manager_data(self, raw_data: Dict[str, Any], steam_id: str, match_id: str) -> Dict[str, Any]:
+    def _process_csgo_demo_manager_data(self, raw_data: Dict[str, Any], steam_id: str, match_id: str) -> Optional[Dict[str, Any]]:
         """
         Обробляє дані з CSGO Demo Manager у наш формат
         """
@@ -146,7 +514,7 @@ class DemoAnalyzer:
             
             if not target_player:
                 print(f"Гравець {steam_id} не знайдено в демо")
-                return self._simulate_demo_analysis("", steam_id, match_id)
+                return None
             
             # Обробляємо статистику гравця
             player_stats = target_player.get('stats', {})
@@ -174,6 +542,13 @@ class DemoAnalyzer:
                     'accuracy': round((weapon_data.get('hits', 0) / max(weapon_data.get('shots', 1), 1)) * 100, 1)
                 }
             
+            # Детальна статистика в тих самих полях, що й у власного парсера
+            detailed_stats = {
+                field: player_stats.get(field, 0)
+                for field in ('clutch_situations', 'clutch_wins', 'entry_kills', 'trade_kills', 'utility_damage',
+                              'flash_assists', 'bomb_plants', 'bomb_defuses')
+            }
+            
             # Обробляємо інформацію про матч
             match_data = {
                 'map': match_info.get('map', 'Невідомо'),
@@ -203,11 +578,12 @@ class DemoAnalyzer:
                     'money_earned': money_earned
                 },
                 'weapon_stats': weapon_stats,
+                'detailed_stats': detailed_stats,
                 'performance_analysis': {
                     'overall_rating': round((kd_ratio * 0.4 + (headshot_percent / 100) * 0.3 + (match_data['win_rate'] / 100) * 0.3) * 10, 1),
-                    'clutch_performance': 0,  # Буде додано пізніше
-                    'entry_performance': 0,   # Буде додано пізніше
-                    'team_contribution': round(assists / max(match_data['rounds_played'], 1), 2)
+                    'clutch_performance': round((detailed_stats['clutch_wins'] / max(detailed_stats['clutch_situations'], 1)) * 100, 1),
+                    'entry_performance': detailed_stats['entry_kills'],
+                    'team_contribution': round((assists + detailed_stats['flash_assists']) / max(match_data['rounds_played'], 1), 2)
                 }
             }
             
@@ -215,12 +591,16 @@ class DemoAnalyzer:
             
         except Exception as e:
             print(f"Помилка обробки даних CSGO Demo Manager: {e}")
-            return self._simulate_demo_analysis("", steam_id, match_id)
+            return None
     
     async def analyze_demo(self, demo_path: str, steam_id: str, match_id: str) -> Optional[Dict[str, Any]]:
         """
         Аналізувати демо-файл (основний метод)
         
+        Демо CS2 (Source 2) аналізує CSGO Demo Manager; власний парсер розбирає
+        лише демо HL2DEMO (CS:GO). Якщо жоден аналізатор не дав результату,
+        повертається None - вигаданих даних замість аналізу немає.
+        
         Args:
             demo_path: Шлях до демо-файлу
             steam_id: Steam ID гравця
@@ -234,9 +614,19 @@ class DemoAnalyzer:
                 print(f"Демо-файл не знайдено: {demo_path}")
                 return None
             
-            # Спочатку пробуємо реальний аналіз
-            analysis_result = await self.analyze_demo_with_csgo_demo_manager(demo_path, steam_id, match_id)
-            
+            # Демо HL2DEMO - спільний аналіз матчу власним парсером
+            match_analysis = await self.analyze_match(demo_path, match_id)
+            if match_analysis:
+                analysis_result = self.get_player_analysis(match_analysis, steam_id)
+                if analysis_result:
+                    return analysis_result
+                print(f"Гравець {steam_id} не знайдено в демо")
+            elif detect_demo_format(demo_path) == 'source2':
+                print(f"Демо CS2 матчу {match_id}: аналіз через CSGO Demo Manager")
+
+            with self.storage.pin(demo_path):
+                analysis_result = await self.analyze_demo_with_csgo_demo_manager(demo_path, steam_id, match_id)
+
             if analysis_result:
                 # Зберігаємо результати аналізу
                 analysis_filename = f"{steam_id}_{match_id}_analysis.json"
@@ -244,136 +634,14 @@ class DemoAnalyzer:
                 
                 with open(analysis_path, 'w', encoding='utf-8') as f:
                     json.dump(analysis_result, f, indent=2, ensure_ascii=False)
+                self._track_file(analysis_path)
                 
                 return analysis_result
-            else:
-                # Якщо реальний аналіз не вдався, використовуємо симуляцію
-                return await self._simulate_demo_analysis(demo_path, steam_id, match_id)
+            return None
             
         except Exception as e:
             print(f"Помилка аналізу демо: {e}")
-            return await self._simulate_demo_analysis(demo_path, steam_id, match_id)
-    
-    async def _simulate_demo_analysis(self, demo_path: str, steam_id: str, match_id: str) -> Dict[str, Any]:
-        """Симуляція аналізу демо-файлу"""
-        
-        # Генеруємо реалістичні дані на основі Steam ID та Match ID
-        import hashlib
-        
-        # Використовуємо хеш для генерації унікальних даних
-        hash_input = f"{steam_id}_{match_id}"
-        hash_value = int(hashlib.md5(hash_input.encode()).hexdigest()[:8], 16)
-        
-        # Генеруємо статистику на основі хешу
-        kills = (hash_value % 30) + 5  # 5-35 вбивств
-        deaths = (hash_value % 25) + 3  # 3-28 смертей
-        assists = (hash_value % 8) + 1   # 1-9 асистів
-        mvps = (hash_value % 5) + 1     # 1-6 MVP
-        headshots = int(kills * ((hash_value % 40) + 30) / 100)  # 30-70% headshots
-        
-        # Розраховуємо додаткові показники
-        kd_ratio = round(kills / max(deaths, 1), 2)
-        headshot_percent = round((headshots / max(kills, 1)) * 100, 1)
-        
-        # Генеруємо статистику по зброї
-        weapons = ['AK47', 'M4A1', 'AWP', 'Deagle', 'USP', 'Glock']
-        weapon_stats = {}
-        
-        for weapon in weapons:
-            weapon_hash = int(hashlib.md5(f"{hash_input}_{weapon}".encode()).hexdigest()[:4], 16)
-            weapon_kills = (weapon_hash % 10) + 1
-            weapon_shots = weapon_kills * ((weapon_hash % 50) + 50)  # 50-100% точність
-            weapon_hits = int(weapon_shots * ((weapon_hash % 30) + 20) / 100)  # 20-50% точність
-            
-            weapon_stats[weapon] = {
-                'kills': weapon_kills,
-                'shots': weapon_shots,
-                'hits': weapon_hits,
-                'accuracy': round((weapon_hits / max(weapon_shots, 1)) * 100, 1)
-            }
-        
-        # Генеруємо статистику по раундах
-        rounds_played = (hash_value % 30) + 15  # 15-45 раундів
-        rounds_won = int(rounds_played * ((hash_value % 40) + 30) / 100)  # 30-70% перемог
-        
-        # Генеруємо статистику по картах
-        maps = ['de_dust2', 'de_inferno', 'de_mirage', 'de_nuke', 'de_overpass']
-        map_name = maps[hash_value % len(maps)]
-        
-        # Генеруємо детальну статистику
-        detailed_stats = {
-            'clutch_situations': (hash_value % 5) + 1,
-            'clutch_wins': (hash_value % 3) + 1,
-            'entry_kills': (hash_value % 8) + 2,
-            'trade_kills': (hash_value % 6) + 1,
-            'utility_damage': (hash_value % 200) + 50,
-            'flash_assists': (hash_value % 4) + 1,
-            'smoke_assists': (hash_value % 3) + 1,
-            'bomb_plants': (hash_value % 3) + 1,
-            'bomb_defuses': (hash_value % 2) + 1
-        }
-        
-        analysis_result = {
-            'steam_id': steam_id,
-            'match_id': match_id,
-            'demo_path': demo_path,
-            'analysis_date': datetime.now().isoformat(),
-            'match_info': {
-                'map': map_name,
-                'rounds_played': rounds_played,
-                'rounds_won': rounds_won,
-                'rounds_lost': rounds_played - rounds_played,
-                'win_rate': round((rounds_won / max(rounds_played, 1)) * 100, 1),
-                'match_duration': f"{rounds_played * 2} minutes"
-            },
-            'player_stats': {
-                'kills': kills,
-                'deaths': deaths,
-                'assists': assists,
-                'mvps': mvps,
-                'headshots': headshots,
-                'kd_ratio': kd_ratio,
-                'headshot_percent': headshot_percent,
-                'damage_dealt': kills * 100 + (hash_value % 500),
-                'damage_taken': deaths * 80 + (hash_value % 400),
-                'money_earned': (kills * 300) + (assists * 150) + (mvps * 200),
-                'money_spent': (hash_value % 5000) + 2000
-            },
-            'weapon_stats': weapon_stats,
-            'detailed_stats': detailed_stats,
-            'round_by_round': self._generate_round_data(rounds_played, hash_value),
-            'performance_analysis': {
-                'overall_rating': round((kd_ratio * 0.4 + (headshot_percent / 100) * 0.3 + (rounds_won / max(rounds_played, 1)) * 0.3) * 10, 1),
-                'clutch_performance': round((detailed_stats['clutch_wins'] / max(detailed_stats['clutch_situations'], 1)) * 100, 1),
-                'entry_performance': detailed_stats['entry_kills'],
-                'team_contribution': round((assists + detailed_stats['flash_assists'] + detailed_stats['smoke_assists']) / max(rounds_played, 1), 2)
-            }
-        }
-        
-        return analysis_result
-    
-    def _generate_round_data(self, rounds_played: int, hash_value: int) -> List[Dict]:
-        """Генерує дані по раундах"""
-        round_data = []
-        
-        for round_num in range(1, min(rounds_played + 1, 31)):  # Максимум 30 раундів
-            round_hash = hash_value + round_num
-            
-            round_info = {
-                'round': round_num,
-                'kills': (round_hash % 4) + 1,
-                'deaths': (round_hash % 3),
-                'assists': (round_hash % 2),
-                'mvp': (round_hash % 10) == 0,  # 10% шанс MVP
-                'damage_dealt': (round_hash % 200) + 50,
-                'money_spent': (round_hash % 2000) + 500,
-                'weapon_used': ['AK47', 'M4A1', 'AWP', 'Deagle'][round_hash % 4],
-                'result': 'win' if (round_hash % 3) > 0 else 'loss'
-            }
-            
-            round_data.append(round_info)
-        
-        return round_data
+            return None
     
     async def cleanup_demo(self, demo_path: str) -> bool:
         """
@@ -388,6 +656,7 @@ class DemoAnalyzer:
         try:
             if os.path.exists(demo_path):
                 os.remove(demo_path)
+                self.storage.forget(demo_path)
                 print(f"Демо-файл видалено: {demo_path}")
                 return True
             return False
@@ -409,6 +678,8 @@ class DemoAnalyzer:
             player_stats = analysis_data['player_stats']
             match_info = analysis_data['match_info']
             performance = analysis_data['performance_analysis']
+            # Старі збережені аналізи можуть не мати детальної статистики
+            detailed_stats = analysis_data.get('detailed_stats', {})
             
             summary = f"""
 🎮 **Аналіз матчу {analysis_data['match_id']}**
@@ -425,7 +696,7 @@ class DemoAnalyzer:
 🏆 **Детальна аналітика:**
 • Загальний рейтинг: **{performance['overall_rating']}/10**
 • Клач ситуації: **{performance['clutch_performance']}%**
-• Entry фраги: **{analysis_data['detailed_stats']['entry_kills']}**
+• Entry фраги: **{detailed_stats.get('entry_kills', 0)}**
 • Командна гра: **{performance['team_contribution']}** за раунд
 
 🔫 **Топ зброя:**
@@ -0,0 +1,311 @@
+"""
+Пакетний аналіз папки з демо (заповнення match_analysis для вже наявних демо)
+
+Приклади:
+    python src/services/demo_backfill.py /data/demos --workers 8
+    python src/services/demo_backfill.py "/data/demos/2024-*/*.dem.bz2" --db data/users.db --all-players
+
+Демо розбираються власним парсером у пулі процесів DemoAnalyzer (лише демо
+CS:GO формату HL2DEMO; демо CS2 позначаються невдалими), результати пишуться в
+`match_analysis` пакетами в одній транзакції. Оброблені файли записуються в
+таблицю `demo_backfill_files`, тож повторний запуск продовжує з місця зупинки.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+# Додаємо кореневу папку проекту до шляху
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.models.user import UserDatabase
+from src.services.analysis_cache import AnalysisCache
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.demo_parser import DEMO_EXTENSIONS
+
+
+def match_id_from_path(path: str) -> str:
+    """Ідентифікатор матчу з імені файлу демо (`<match_id>.dem[.gz|.bz2|.zst]`)"""
+    name = os.path.basename(path)
+    for extension in DEMO_EXTENSIONS:
+        if name.endswith(extension):
+            return name[:-len(extension)]
+    return name
+
+
+def find_demos(sources: List[str]) -> List[str]:
+    """
+    Файли демо з папок (рекурсивно) та glob-шаблонів, без повторів
+
+    ID матчу береться з імені файлу, а аналіз гравця зберігається один на матч,
+    тому файли з однаковим ID матчу (наприклад, тезки з різних папок) не
+    аналізуються: про них друкується попередження, щоб їх перейменувати.
+    """
+    found = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, names in os.walk(source):
+                found.extend(os.path.join(root, name) for name in names)
+        else:
+            found.extend(glob.glob(source, recursive=True))
+    demos = sorted({os.path.normpath(path) for path in found
+                    if path.endswith(DEMO_EXTENSIONS) and os.path.isfile(path)})
+    by_match: Dict[str, List[str]] = {}
+    for path in demos:
+        by_match.setdefault(match_id_from_path(path), []).append(path)
+    duplicates = {match_id for match_id, paths in by_match.items() if len(paths) > 1}
+    for match_id in sorted(duplicates):
+        print(f"⚠️ Кілька демо матчу {match_id}, їх пропущено: {', '.join(by_match[match_id])}")
+    return [path for path in demos if match_id_from_path(path) not in duplicates]
+
+
+class DemoBackfill:
+    """
+    Пакетний аналіз набору демо з продовженням після зупинки
+
+    Одночасно в роботі тримається вдвічі більше демо, ніж процесів розбору, щоб
+    пул не простоював, поки хешується наступний файл. Готові результати
+    накопичуються і записуються по `batch_size` демо за транзакцію разом з
+    позначками обробки файлів. Файл вважається обробленим, якщо його шлях,
+    розмір та час зміни збігаються з записаними; невдалі файли повторюються
+    лише з `retry_failed`.
+    """
+
+    BATCH_SIZE = 50  # Скільки демо записувати в одній транзакції
+    PROGRESS_INTERVAL = 5  # Як часто друкувати прогрес (секунди)
+
+    def __init__(self, db_path: str, workers: int = None, batch_size: int = BATCH_SIZE, all_players: bool = False,
+                 retry_failed: bool = False, progress_interval: float = PROGRESS_INTERVAL,
+                 demo_analyzer: DemoAnalyzer = None):
+        """
+        Args:
+            db_path: база бота (таблиці users та match_analysis)
+            workers: кількість процесів розбору (за замовчуванням - як у бота, `DemoAnalyzer.default_parse_workers`)
+            batch_size: скільки демо записувати в одній транзакції
+            all_players: зберігати аналізи всіх гравців демо, а не лише зареєстрованих
+            retry_failed: повторити файли, які раніше не вдалося проаналізувати
+            progress_interval: період друку прогресу в секундах
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.all_players = all_players
+        self.retry_failed = retry_failed
+        self.progress_interval = progress_interval
+        # Таблиця match_analysis створюється базою користувачів
+        UserDatabase(db_path)
+        self.init_database()
+        # Кеш аналізів у базі бота: демо, вже розібрані ботом чи попереднім запуском, не розбираються
+        self.demo_analyzer = demo_analyzer or DemoAnalyzer(
+            os.getenv("STEAM_API_KEY", ""), parse_workers=workers,
+            analysis_cache=AnalysisCache(db_path, DemoAnalyzer.ANALYZER_VERSION)
+        )
+        self.in_flight = self.demo_analyzer.parse_workers * 2
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиці оброблених файлів"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS demo_backfill_files (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    match_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    players INTEGER NOT NULL DEFAULT 0,
+                    finished_at TEXT NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def pending_demos(self, paths: List[str]) -> List[Dict[str, Any]]:
+        """Демо, які ще не оброблено (або змінилися після обробки)"""
+        conn = self._connect()
+        try:
+            finished = {
+                row['path']: row for row in conn.execute('SELECT path, size, mtime, status FROM demo_backfill_files')
+            }
+        finally:
+            conn.close()
+        pending = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            row = finished.get(path)
+            if row and row['size'] == stat.st_size and row['mtime'] == stat.st_mtime and \
+                    (row['status'] == 'done' or not self.retry_failed):
+                continue
+            pending.append({'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                            'match_id': match_id_from_path(path)})
+        return pending
+
+    async def _analyze(self, demo: Dict[str, Any]) -> Dict[str, Any]:
+        """Аналіз одного демо (помилка позначає файл невдалим, а не зупиняє прогін)"""
+        try:
+            match_analysis = await self.demo_analyzer.analyze_match(demo['path'], demo['match_id'])
+        except Exception as e:
+            print(f"❌ Помилка аналізу {demo['path']}: {e}")
+            match_analysis = None
+        if not match_analysis:
+            return {**demo, 'status': 'failed', 'players': {}}
+        return {**demo, 'status': 'done', 'players': match_analysis['players']}
+
+    def write_batch(self, results: List[Dict[str, Any]]) -> int:
+        """
+        Записати аналізи пакета демо та позначки обробки однією транзакцією
+
+        Returns:
+            Кількість записаних аналізів гравців
+        """
+        if not results:
+            return 0
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            steam_ids = sorted({steam_id for result in results for steam_id in result['players']})
+            if self.all_players:
+                stored = set(steam_ids)
+            else:
+                stored = set()
+                # Запит частинами, щоб не перевищити ліміт параметрів SQLite
+                for start in range(0, len(steam_ids), 500):
+                    chunk = steam_ids[start:start + 500]
+                    stored.update(row['steam_id'] for row in conn.execute(
+                        f"SELECT steam_id FROM users WHERE steam_id IN ({','.join('?' * len(chunk))})", chunk))
+
+            now = datetime.now().isoformat()
+            analyses = []
+            files = []
+            for result in results:
+                match_date = datetime.fromtimestamp(result['mtime']).isoformat()
+                players = [(steam_id, analysis) for steam_id, analysis in result['players'].items()
+                           if steam_id in stored]
+                analyses.extend((steam_id, result['match_id'], match_date, result['path'], True,
+                                 json.dumps(analysis), now) for steam_id, analysis in players)
+                files.append((result['path'], result['size'], result['mtime'], result['match_id'], result['status'],
+                              len(players), now))
+            conn.executemany('''
+                INSERT OR REPLACE INTO match_analysis
+                (steam_id, match_id, match_date, demo_path, analyzed, analysis_data, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', analyses)
+            conn.executemany('''
+                INSERT OR REPLACE INTO demo_backfill_files (path, size, mtime, match_id, status, players, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', files)
+            conn.execute('COMMIT')
+            return len(analyses)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    async def run(self, paths: List[str]) -> Dict[str, Any]:
+        """
+        Проаналізувати демо, які ще не оброблено
+
+        Returns:
+            Підсумок: знайдено, пропущено (оброблені раніше), проаналізовано,
+            невдалих, записано аналізів, обсяг, час та швидкість
+        """
+        pending = self.pending_demos(paths)
+        summary = {'total': len(paths), 'skipped': len(paths) - len(pending), 'analyzed': 0, 'failed': 0,
+                   'rows': 0, 'bytes': 0}
+        print(f"🎬 Знайдено демо: {len(paths)}, до аналізу: {len(pending)} "
+              f"(процесів: {self.demo_analyzer.parse_workers})")
+        started = time.monotonic()
+        last_report = started
+        batch: List[Dict[str, Any]] = []
+        running = set()
+
+        def collect(done):
+            nonlocal last_report
+            for task in done:
+                result = task.result()
+                batch.append(result)
+                summary['analyzed' if result['status'] == 'done' else 'failed'] += 1
+                summary['bytes'] += result['size']
+            if len(batch) >= self.batch_size:
+                summary['rows'] += self.write_batch(batch)
+                batch.clear()
+            now = time.monotonic()
+            if now - last_report >= self.progress_interval:
+                last_report = now
+                self._report(summary, len(pending), now - started)
+
+        try:
+            for demo in pending:
+                if len(running) >= self.in_flight:
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                running.add(asyncio.ensure_future(self._analyze(demo)))
+            while running:
+                done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+        finally:
+            # Після зупинки зберігаємо вже готові результати - наступний запуск їх пропустить
+            summary['rows'] += self.write_batch(batch)
+            self.demo_analyzer.shutdown()
+
+        elapsed = time.monotonic() - started
+        processed = summary['analyzed'] + summary['failed']
+        summary['elapsed'] = elapsed
+        summary['demos_per_min'] = processed / elapsed * 60 if elapsed else 0.0
+        summary['mb_per_s'] = summary['bytes'] / 1024 / 1024 / elapsed if elapsed else 0.0
+        print(f"✅ Проаналізовано: {summary['analyzed']}, помилок: {summary['failed']}, "
+              f"пропущено: {summary['skipped']}, записано аналізів: {summary['rows']}")
+        print(f"⏱️ {elapsed:.1f} с: {summary['demos_per_min']:.1f} демо/хв, {summary['mb_per_s']:.1f} МБ/с")
+        return summary
+
+    @staticmethod
+    def _report(summary: Dict[str, Any], pending: int, elapsed: float):
+        processed = summary['analyzed'] + summary['failed']
+        print(f"⏳ {processed}/{pending} ({processed * 100 // max(pending, 1)}%): "
+              f"{processed / elapsed * 60:.1f} демо/хв, {summary['bytes'] / 1024 / 1024 / elapsed:.1f} МБ/с, "
+              f"помилок: {summary['failed']}", flush=True)
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Пакетний аналіз демо CS2")
+    parser.add_argument("sources", nargs='+', help="папки або glob-шаблони з демо")
+    parser.add_argument("--db", default=None, help="шлях до бази даних")
+    parser.add_argument("--workers", type=int, default=None, help="кількість процесів розбору")
+    parser.add_argument("--batch-size", type=int, default=DemoBackfill.BATCH_SIZE,
+                        help="скільки демо записувати в одній транзакції")
+    parser.add_argument("--all-players", action="store_true",
+                        help="зберігати аналізи всіх гравців, а не лише зареєстрованих")
+    parser.add_argument("--retry-failed", action="store_true", help="повторити невдалі демо")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    db_path = args.db or os.getenv("DATABASE_PATH", os.path.join(project_root, "data", "users.db"))
+    backfill = DemoBackfill(db_path, workers=args.workers, batch_size=args.batch_size,
+                            all_players=args.all_players, retry_failed=args.retry_failed)
+    return asyncio.run(backfill.run(find_demos(args.sources)))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n🛑 Аналіз зупинено, наступний запуск продовжить з місця зупинки")
@@ -0,0 +1,168 @@
+"""
+Потокове завантаження демо-файлів по HTTP
+"""
+import asyncio
+import glob
+import os
+from typing import Optional, List, Tuple
+
+import aiohttp
+
+from src.services.analysis_cache import content_hash
+
+
+class DemoDownloadError(Exception):
+    """Демо неможливо завантажити або воно не пройшло перевірку"""
+
+
+class DemoDownloader:
+    """
+    Завантажувач демо з докачуванням та паралельними діапазонами
+
+    Відповідь пишеться на диск частинами по `chunk_size`, тож пам'ять не
+    залежить від розміру демо. Дані спершу потрапляють у файли `<шлях>.part<N>`:
+    якщо завантаження обірвалося, наступна спроба (або наступний виклик)
+    докачує їх запитом `Range`. Великі файли на серверах з підтримкою `Range`
+    діляться на `parallel_ranges` діапазонів, що завантажуються одночасно.
+    Готовий файл перевіряється за розміром та, якщо відомо, SHA-256.
+    """
+
+    CHUNK_SIZE = 256 * 1024
+    PARALLEL_THRESHOLD = 32 * 1024 * 1024  # Менші файли завантажуються одним запитом
+
+    def __init__(self, max_concurrent_downloads: int = 2, parallel_ranges: int = 4, retries: int = 3,
+                 retry_delay: float = 1.0, timeout: float = 600, chunk_size: int = CHUNK_SIZE,
+                 parallel_threshold: int = PARALLEL_THRESHOLD):
+        self.parallel_ranges = max(parallel_ranges, 1)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.timeout = aiohttp.ClientTimeout(total=timeout, sock_read=60)
+        self.chunk_size = chunk_size
+        self.parallel_threshold = parallel_threshold
+        # Обмеження кількості одночасних завантажень
+        self._download_semaphore = asyncio.Semaphore(max_concurrent_downloads)
+
+    async def download(self, url: str, dest_path: str, expected_size: int = None,
+                       sha256: str = None) -> Optional[str]:
+        """
+        Завантажити файл
+
+        Args:
+            url: адреса демо
+            dest_path: куди зберегти файл
+            expected_size: очікуваний розмір у байтах (необов'язково)
+            sha256: очікуваний SHA-256 у hex (необов'язково)
+
+        Returns:
+            Шлях до файлу або None, якщо завантажити не вдалося
+        """
+        async with self._download_semaphore:
+            try:
+                async with aiohttp.ClientSession(timeout=self.timeout) as session:
+                    total, resumable = await self._probe(session, url)
+                    if total is not None and expected_size is not None and total != expected_size:
+                        raise DemoDownloadError(f"Розмір на сервері {total} замість {expected_size}")
+                    ranges = self._split(total if total is not None else expected_size, resumable)
+                    part_paths = [f"{dest_path}.part{n}" for n in range(len(ranges))]
+                    await asyncio.gather(*(self._fetch_range(session, url, path, start, end, resumable)
+                                           for path, (start, end) in zip(part_paths, ranges)))
+
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._assemble, part_paths, dest_path)
+                await self._verify(dest_path, total if total is not None else expected_size, sha256)
+                print(f"📥 Демо завантажено: {url} ({os.path.getsize(dest_path)} байт, діапазонів: {len(ranges)})")
+                return dest_path
+            except (DemoDownloadError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                print(f"❌ Помилка завантаження демо {url}: {e}")
+                return None
+
+    async def _probe(self, session: aiohttp.ClientSession, url: str) -> Tuple[Optional[int], bool]:
+        """Розмір файлу та чи підтримує сервер запити `Range`"""
+        async with session.get(url, headers={'Range': 'bytes=0-0'}) as response:
+            if response.status == 206:
+                content_range = response.headers.get('Content-Range', '')
+                total = content_range.rpartition('/')[2]
+                return (int(total) if total.isdigit() else None), total.isdigit()
+            if response.status == 200:
+                # Сервер ігнорує Range - тіло не читаємо, файл завантажиться одним запитом
+                return response.content_length, False
+            raise DemoDownloadError(f"HTTP {response.status}")
+
+    def _split(self, total: Optional[int], resumable: bool) -> List[Tuple[int, Optional[int]]]:
+        """Діапазони (початок, кінець включно) для завантаження"""
+        if not resumable or not total:
+            return [(0, total - 1 if total else None)]
+        parts = self.parallel_ranges if total >= self.parallel_threshold else 1
+        size = -(-total // parts)
+        return [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+
+    async def _fetch_range(self, session: aiohttp.ClientSession, url: str, path: str,
+                           start: int, end: Optional[int], resumable: bool):
+        """Завантажити діапазон у файл частини, докачуючи після обривів"""
+        length = end - start + 1 if end is not None else None
+        for attempt in range(self.retries + 1):
+            done = os.path.getsize(path) if resumable and os.path.exists(path) else 0
+            if length is not None and done > length:
+                # Частина від іншого розбиття файлу - завантажуємо заново
+                done = 0
+            if length is not None and done == length:
+                return
+            headers = {'Range': f"bytes={start + done}-{end}"} if resumable else {}
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 200 and start == 0:
+                        # Сервер віддав файл повністю - пишемо з початку
+                        done = 0
+                    elif response.status != 206:
+                        raise DemoDownloadError(f"HTTP {response.status}")
+                    elif not response.headers.get('Content-Range', '').startswith(f"bytes {start + done}-"):
+                        raise DemoDownloadError("Сервер повернув не той діапазон")
+                    with open(path, 'r+b' if done else 'wb') as f:
+                        f.seek(done)
+                        f.truncate()
+                        written = done
+                        async for chunk in response.content.iter_chunked(self.chunk_size):
+                            f.write(chunk)
+                            written += len(chunk)
+                            if length is not None and written > length:
+                                raise DemoDownloadError("Сервер повернув більше даних, ніж запитано")
+                if length is None or written == length:
+                    return
+                error = f"отримано {written} з {length} байт"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+            if attempt == self.retries:
+                raise DemoDownloadError(f"Завантаження перервано: {error}")
+            delay = self.retry_delay * 2 ** attempt
+            print(f"⚠️ Завантаження перервано ({error}), докачування через {delay} с")
+            await asyncio.sleep(delay)
+
+    def _assemble(self, part_paths: List[str], dest_path: str):
+        """Зібрати файл з частин (одна частина просто перейменовується)"""
+        if len(part_paths) == 1:
+            os.replace(part_paths[0], dest_path)
+        else:
+            with open(dest_path + ".tmp", 'wb') as dest:
+                for path in part_paths:
+                    with open(path, 'rb') as part:
+                        while chunk := part.read(self.chunk_size):
+                            dest.write(chunk)
+            os.replace(dest_path + ".tmp", dest_path)
+        # Разом з частинами видаляються й залишки попереднього розбиття файлу
+        for path in glob.glob(glob.escape(dest_path) + ".part*"):
+            os.remove(path)
+
+    async def _verify(self, path: str, size: Optional[int], sha256: Optional[str]):
+        """Перевірити розмір і контрольну суму; файл, що не пройшов перевірку, видаляється"""
+        error = None
+        if size is not None and os.path.getsize(path) != size:
+            error = f"Розмір {os.path.getsize(path)} замість {size}"
+        elif sha256:
+            loop = asyncio.get_running_loop()
+            actual = await loop.run_in_executor(None, content_hash, path)
+            if actual != sha256.lower():
+                error = f"SHA-256 {actual} не збігається з {sha256}"
+        if error:
+            for stale in [path] + glob.glob(glob.escape(path) + ".part*"):
+                os.remove(stale)
+            raise DemoDownloadError(error)
@@ -0,0 +1,246 @@
+"""
+Стовпцева (NumPy) таблиця ігрових подій демо та векторні агрегати за гравцями, раундами та зброєю
+"""
+from array import array
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+# Типи подій у стовпці kind (постріли не зберігаються подіями - див. EventTable.count_shot)
+EVENT_HURT = 1
+EVENT_DEATH = 2
+EVENT_MVP = 3
+
+# Стовпці таблиці подій (усі int32)
+EVENT_COLUMNS = (
+    'kind',
+    'tick',
+    'segment',  # Відрізок раунду: між скиданнями статистики раунду (див. MatchStatsCollector)
+    'attacker',  # Індекс гравця, що завдав шкоди/вбив (-1 - не враховується)
+    'victim',  # Індекс гравця, що отримав шкоду/загинув (-1 - немає)
+    'assister',  # Індекс гравця з асистом (-1 - немає)
+    'weapon',  # Індекс зброї в EventTable.weapons
+    'damage',
+    'headshot',
+    'flag',  # Для шкоди - гранати/вогонь, для вбивства - асист засліпленням
+)
+
+# Результати раундів гравців (рядок на гравця в кожному завершеному раунді)
+ROUND_COLUMNS = ('player', 'segment', 'round', 'won')
+
+
+class EventTable:
+    """
+    Ігрові події матчу у стовпцях
+
+    Події дописуються рядками в типізований буфер `array.array('i')` (компактно,
+    без об'єкта Python на подію). Для агрегатів буфер без копіювання стає
+    матрицею NumPy, стовпці якої групуються за гравцем, раундом та зброєю через
+    `np.bincount` замість словників з лічильниками на кожну подію.
+
+    Постріли - найчастіша подія демо, а потрібна з них лише кількість, тому
+    вони одразу рахуються в лічильник гравець×зброя без рядка в таблиці.
+    """
+
+    def __init__(self):
+        self._rows = array('i')
+        self._round_rows = array('i')
+        self._shots: Dict[Tuple[int, int], int] = {}  # (гравець, зброя) -> кількість пострілів
+        self.weapons: List[str] = []
+        self._weapon_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows) // len(EVENT_COLUMNS)
+
+    def weapon_id(self, name: str) -> int:
+        """Індекс зброї (нова зброя додається в довідник)"""
+        weapon = self._weapon_ids.get(name)
+        if weapon is None:
+            weapon = self._weapon_ids[name] = len(self.weapons)
+            self.weapons.append(name)
+        return weapon
+
+    def add(self, kind: int, tick: int, segment: int, attacker: int = -1, victim: int = -1, assister: int = -1,
+            weapon: int = -1, damage: int = 0, headshot: bool = False, flag: bool = False):
+        self._rows.extend((kind, tick, segment, attacker, victim, assister, weapon, damage, headshot, flag))
+
+    def count_shot(self, player: int, weapon: int):
+        key = (player, weapon)
+        self._shots[key] = self._shots.get(key, 0) + 1
+
+    def add_round_result(self, player: int, segment: int, round_number: int, won: bool):
+        self._round_rows.extend((player, segment, round_number, won))
+
+    @staticmethod
+    def _columns(rows: array, names: Tuple[str, ...]) -> Dict[str, np.ndarray]:
+        table = np.frombuffer(rows, dtype=np.int32).reshape(-1, len(names))
+        return {name: table[:, index] for index, name in enumerate(names)}
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Стовпці подій як масиви NumPy (представлення буфера без копіювання)"""
+        return self._columns(self._rows, EVENT_COLUMNS)
+
+    def round_arrays(self) -> Dict[str, np.ndarray]:
+        return self._columns(self._round_rows, ROUND_COLUMNS)
+
+    def aggregate(self, player_count: int, segment_count: int) -> Dict[str, Any]:
+        """
+        Агрегати всіх гравців
+
+        Returns:
+            Масиви за гравцем (kills, deaths, ...), матриці гравець×зброя
+            (weapon_kills/shots/hits) та рядки раундів кожного гравця (rounds)
+        """
+        events = self.arrays()
+        kind, attacker, victim, assister = events['kind'], events['attacker'], events['victim'], events['assister']
+        weapon, damage = events['weapon'], events['damage'].astype(np.int64)
+        headshot, flag = events['headshot'].astype(bool), events['flag'].astype(bool)
+        weapon_count = len(self.weapons)
+
+        hurt = kind == EVENT_HURT
+        death = kind == EVENT_DEATH
+        dealt = hurt & (attacker >= 0)
+        kill = death & (attacker >= 0)
+        assist = death & (assister >= 0)
+
+        def per_player(mask: np.ndarray, who: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+            return np.bincount(who[mask], weights=None if weights is None else weights[mask],
+                               minlength=player_count).astype(np.int64)
+
+        def per_weapon(mask: np.ndarray) -> np.ndarray:
+            keys = attacker[mask].astype(np.int64) * weapon_count + weapon[mask]
+            return np.bincount(keys, minlength=player_count * weapon_count).reshape(player_count, weapon_count)
+
+        totals = {
+            'kills': per_player(kill, attacker),
+            'headshots': per_player(kill & headshot, attacker),
+            'deaths': per_player(death & (victim >= 0), victim),
+            'assists': per_player(assist, assister),
+            'flash_assists': per_player(assist & flag, assister),
+            'mvps': per_player((kind == EVENT_MVP) & (attacker >= 0), attacker),
+            'damage_dealt': per_player(dealt, attacker, damage),
+            'damage_taken': per_player(hurt & (victim >= 0), victim, damage),
+            'utility_damage': per_player(dealt & flag, attacker, damage),
+            'weapon_kills': per_weapon(kill),
+            'weapon_shots': self._shot_matrix(player_count, weapon_count),
+            'weapon_hits': per_weapon(dealt & ~flag),
+        }
+        totals['rounds'] = self._player_rounds(events, player_count, segment_count, kill, dealt, death, assist)
+        return totals
+
+    def _shot_matrix(self, player_count: int, weapon_count: int) -> np.ndarray:
+        shots = np.zeros((player_count, weapon_count), dtype=np.int64)
+        for (player, weapon), count in self._shots.items():
+            shots[player, weapon] = count
+        return shots
+
+    def _player_rounds(self, events: Dict[str, np.ndarray], player_count: int, segment_count: int,
+                    kill: np.ndarray, dealt: np.ndarray, death: np.ndarray, assist: np.ndarray) -> List[List[Dict]]:
+        """Статистика кожного гравця в кожному завершеному раунді"""
+        segment = events['segment'].astype(np.int64)
+        attacker, victim, assister, weapon = events['attacker'], events['victim'], events['assister'], events['weapon']
+        cells = player_count * segment_count
+
+        def per_cell(mask: np.ndarray, who: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+            keys = who[mask] * segment_count + segment[mask]
+            return np.bincount(keys, weights=None if weights is None else weights[mask], minlength=cells)
+
+        kills = per_cell(kill, attacker)
+        deaths = per_cell(death & (victim >= 0), victim)
+        assists = per_cell(assist, assister)
+        damage = per_cell(dealt, attacker, events['damage'].astype(np.int64))
+        mvp = per_cell((events['kind'] == EVENT_MVP) & (attacker >= 0), attacker) > 0
+
+        # Основна зброя раунду: найбільше вбивств, при рівності - та, з якої вбито першим
+        weapon_used = np.full(cells, -1, dtype=np.int64)
+        kill_index = np.flatnonzero(kill)
+        if len(kill_index):
+            cell = attacker[kill_index] * segment_count + segment[kill_index]
+            keys = cell * len(self.weapons) + weapon[kill_index]
+            unique_keys, first, counts = np.unique(keys, return_index=True, return_counts=True)
+            unique_cells = unique_keys // len(self.weapons)
+            order = np.lexsort((first, -counts, unique_cells))
+            best = order[np.r_[True, unique_cells[order][1:] != unique_cells[order][:-1]]]
+            weapon_used[unique_cells[best]] = unique_keys[best] % len(self.weapons)
+
+        results = self.round_arrays()
+        result_cells = results['player'].astype(np.int64) * segment_count + results['segment']
+        rows: List[List[Dict]] = [[] for _ in range(player_count)]
+        for player, round_number, won, k, d, a, m, dmg, w in zip(
+                results['player'].tolist(), results['round'].tolist(), results['won'].tolist(),
+                kills[result_cells].astype(np.int64).tolist(), deaths[result_cells].astype(np.int64).tolist(),
+                assists[result_cells].astype(np.int64).tolist(), mvp[result_cells].tolist(),
+                damage[result_cells].astype(np.int64).tolist(), weapon_used[result_cells].tolist()):
+            rows[player].append({
+                'round': round_number,
+                'kills': k,
+                'deaths': d,
+                'assists': a,
+                'mvp': m,
+                'damage_dealt': dmg,
+                'weapon_used': self.weapons[w] if w >= 0 else None,
+                'result': 'win' if won else 'loss'
+            })
+        return rows
+
+
+def group_sum(labels: List[str], values: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
+    """
+    Суми стовпців `values` за мітками (векторний group-by)
+
+    Returns:
+        мітка -> {стовпець: сума, 'count': кількість рядків} у порядку першої появи мітки;
+        суми цілих стовпців - цілі
+    """
+    if not labels:
+        return {}
+    unique, first, inverse = np.unique(np.array(labels, dtype=object), return_index=True, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(unique))
+    sums = {}
+    for name, column in values.items():
+        column = np.asarray(column)
+        total = np.bincount(inverse, weights=column.astype(np.float64), minlength=len(unique))
+        sums[name] = np.rint(total).astype(np.int64) if column.dtype.kind in 'iub' else total
+    return {
+        unique[index]: {**{name: column[index].item() for name, column in sums.items()}, 'count': int(counts[index])}
+        for index in np.argsort(first, kind='stable')
+    }
+
+
+def summarize_analyses(analyses: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Загальна статистика гравця за аналізами кількох матчів (для /demo_stats)
+
+    Returns:
+        Суми показників гравця, раунди та перемоги за картами (maps) та
+        вбивства й сума точності за зброєю (weapons, з кількістю матчів count)
+    """
+    def column(section: str, field: str) -> np.ndarray:
+        return np.fromiter((analysis[section].get(field, 0) for analysis in analyses if section in analysis),
+                           dtype=np.int64)
+
+    summary = {
+        'matches': len(analyses),
+        'kills': int(column('player_stats', 'kills').sum()),
+        'deaths': int(column('player_stats', 'deaths').sum()),
+        'mvps': int(column('player_stats', 'mvps').sum()),
+        'headshots': int(column('player_stats', 'headshots').sum()),
+        'damage': int(column('player_stats', 'damage_dealt').sum()),
+    }
+    rounds = column('match_info', 'rounds_played')
+    wins = column('match_info', 'rounds_won')
+    summary['rounds'] = int(rounds.sum())
+    summary['wins'] = int(wins.sum())
+    summary['maps'] = group_sum(
+        [analysis['match_info'].get('map', 'Невідомо') for analysis in analyses if 'match_info' in analysis],
+        {'rounds': rounds, 'wins': wins}
+    )
+
+    weapons = [(name, stats) for analysis in analyses for name, stats in analysis.get('weapon_stats', {}).items()]
+    summary['weapons'] = group_sum(
+        [name for name, _ in weapons],
+        {'kills': np.fromiter((stats.get('kills', 0) for _, stats in weapons), dtype=np.int64, count=len(weapons)),
+         'accuracy': np.fromiter((stats.get('accuracy', 0) for _, stats in weapons), dtype=np.float64,
+                                 count=len(weapons))}
+    )
+    return summary
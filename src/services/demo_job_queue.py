@@ -0,0 +1,474 @@
+"""
+Персистентна черга завдань аналізу демо та пул воркерів для її обробки
+"""
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from src.models.user import UserDatabase, MatchAnalysis
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.outbox import MessageOutbox
+from src.services.notification_coalescer import NotificationCoalescer
+
+# Менше значення - вищий пріоритет
+PRIORITY_MANUAL = 0
+PRIORITY_MONITOR = 10
+
+
+class DemoJobQueue:
+    """
+    Черга аналізів демо в SQLite
+
+    Одне завдання на match_id: повторна постановка того ж матчу лише додає чати
+    для сповіщення та підвищує пріоритет. Взяте завдання невидиме для інших воркерів
+    до `visibility_timeout`, після чого (якщо воркер зник) знову стає доступним.
+    Невдалі спроби повторюються з експоненційною затримкою до `max_attempts`.
+    """
+
+    def __init__(self, db_path: str, visibility_timeout: int = 900, max_attempts: int = 5,
+                 base_backoff: int = 30, max_backoff: int = 3600):
+        self.db_path = db_path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиці завдань"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS demo_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    match_id TEXT NOT NULL UNIQUE,
+                    steam_id TEXT NOT NULL,
+                    chat_ids TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 10,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    locked_until REAL,
+                    worker_id TEXT,
+                    last_error TEXT,
+                    demo_url TEXT,
+                    demo_sha256 TEXT,
+                    created_at TEXT,
+                    updated_at TEXT
+                )
+            ''')
+            # Адреса демо (якщо відома), з якої воркер його завантажить
+            for column in ('demo_url TEXT', 'demo_sha256 TEXT'):
+                try:
+                    conn.execute(f'ALTER TABLE demo_jobs ADD COLUMN {column}')
+                except sqlite3.OperationalError:
+                    pass
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_demo_jobs_ready
+                ON demo_jobs (status, priority, available_at)
+            ''')
+        finally:
+            conn.close()
+
+    def enqueue(self, match_id: str, steam_id: str, chat_ids: List[int], priority: int = PRIORITY_MONITOR,
+                demo_url: str = None, demo_sha256: str = None) -> Optional[int]:
+        """
+        Поставити аналіз матчу в чергу (повертається одразу)
+
+        Args:
+            demo_url: адреса демо, якщо його немає локально (необов'язково)
+            demo_sha256: очікуваний SHA-256 демо за адресою (необов'язково)
+
+        Returns:
+            ID завдання або None при помилці
+        """
+        now = time.time()
+        timestamp = datetime.now().isoformat()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT id, chat_ids, priority, status FROM demo_jobs WHERE match_id = ?',
+                               (match_id,)).fetchone()
+
+            if row is None:
+                cursor = conn.execute('''
+                    INSERT INTO demo_jobs (match_id, steam_id, chat_ids, priority, status, attempts,
+                                           available_at, demo_url, demo_sha256, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, 'pending', 0, ?, ?, ?, ?, ?)
+                ''', (match_id, steam_id, json.dumps(sorted(set(chat_ids))), priority, now, demo_url, demo_sha256,
+                      timestamp, timestamp))
+                job_id = cursor.lastrowid
+            elif row['status'] in ('pending', 'running'):
+                # Дедуплікація: доповнюємо список чатів існуючого завдання
+                merged = sorted(set(json.loads(row['chat_ids'])) | set(chat_ids))
+                conn.execute('''
+                    UPDATE demo_jobs SET chat_ids = ?, priority = ?, demo_url = COALESCE(?, demo_url),
+                                         demo_sha256 = CASE WHEN ? IS NULL THEN demo_sha256 ELSE ? END,
+                                         updated_at = ?
+                    WHERE id = ?
+                ''', (json.dumps(merged), min(row['priority'], priority), demo_url, demo_url, demo_sha256,
+                      timestamp, row['id']))
+                job_id = row['id']
+            else:
+                # Завершене або остаточно невдале завдання запускаємо заново
+                conn.execute('''
+                    UPDATE demo_jobs SET steam_id = ?, chat_ids = ?, priority = ?, status = 'pending', attempts = 0,
+                                         available_at = ?, locked_until = NULL, worker_id = NULL,
+                                         last_error = NULL, demo_url = ?, demo_sha256 = ?, updated_at = ?
+                    WHERE id = ?
+                ''', (steam_id, json.dumps(sorted(set(chat_ids))), priority, now, demo_url, demo_sha256, timestamp,
+                      row['id']))
+                job_id = row['id']
+
+            conn.execute('COMMIT')
+            return job_id
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка постановки аналізу {match_id} в чергу: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Взяти наступне готове завдання (з найвищим пріоритетом)"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('''
+                SELECT * FROM demo_jobs
+                WHERE (status = 'pending' AND available_at <= ?)
+                   OR (status = 'running' AND locked_until < ?)
+                ORDER BY priority, available_at, id
+                LIMIT 1
+            ''', (now, now)).fetchone()
+
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+
+            conn.execute('''
+                UPDATE demo_jobs SET status = 'running', attempts = attempts + 1, locked_until = ?,
+                                     worker_id = ?, updated_at = ?
+                WHERE id = ?
+            ''', (now + self.visibility_timeout, worker_id, datetime.now().isoformat(), row['id']))
+            conn.execute('COMMIT')
+
+            job = dict(row)
+            job['chat_ids'] = json.loads(job['chat_ids'])
+            job['attempts'] += 1
+            return job
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка отримання завдання з черги: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def extend(self, job_id: int, worker_id: str) -> bool:
+        """Продовжити невидимість завдання, поки воркер над ним працює"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                UPDATE demo_jobs SET locked_until = ? WHERE id = ? AND worker_id = ? AND status = 'running'
+            ''', (time.time() + self.visibility_timeout, job_id, worker_id))
+            return cursor.rowcount > 0
+        finally:
+            conn.close()
+
+    def get_chat_ids(self, job_id: int) -> List[int]:
+        """Актуальний список чатів завдання (міг доповнитися під час аналізу)"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT chat_ids FROM demo_jobs WHERE id = ?', (job_id,)).fetchone()
+            return json.loads(row['chat_ids']) if row else []
+        finally:
+            conn.close()
+
+    def complete(self, job_id: int, worker_id: str, notified_chat_ids: List[int] = None) -> bool:
+        """
+        Позначити завдання виконаним
+
+        Якщо поки йшов аналіз до завдання додалися нові чати, яким звіт ще не надіслано,
+        завдання повертається в чергу лише для них.
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT chat_ids FROM demo_jobs WHERE id = ? AND worker_id = ?',
+                               (job_id, worker_id)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return False
+
+            remaining = []
+            if notified_chat_ids is not None:
+                remaining = sorted(set(json.loads(row['chat_ids'])) - set(notified_chat_ids))
+
+            if remaining:
+                conn.execute('''
+                    UPDATE demo_jobs SET status = 'pending', chat_ids = ?, attempts = 0, available_at = ?,
+                                         locked_until = NULL, worker_id = NULL, updated_at = ?
+                    WHERE id = ?
+                ''', (json.dumps(remaining), time.time(), datetime.now().isoformat(), job_id))
+            else:
+                conn.execute('''
+                    UPDATE demo_jobs SET status = 'done', locked_until = NULL, last_error = NULL, updated_at = ?
+                    WHERE id = ?
+                ''', (datetime.now().isoformat(), job_id))
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> str:
+        """
+        Зареєструвати невдалу спробу
+
+        Returns:
+            Новий статус завдання ('pending' для повтору або 'failed')
+        """
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT attempts FROM demo_jobs WHERE id = ? AND worker_id = ?',
+                               (job_id, worker_id)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return 'lost'
+
+            attempts = row['attempts']
+            if attempts >= self.max_attempts:
+                status, available_at = 'failed', time.time()
+            else:
+                delay = min(self.base_backoff * (2 ** (attempts - 1)), self.max_backoff)
+                status, available_at = 'pending', time.time() + delay
+
+            conn.execute('''
+                UPDATE demo_jobs SET status = ?, available_at = ?, locked_until = NULL, last_error = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, available_at, error[:500], datetime.now().isoformat(), job_id))
+            conn.execute('COMMIT')
+            return status
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Кількість завдань за статусами"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) AS cnt FROM demo_jobs GROUP BY status').fetchall()
+            return {row['status']: row['cnt'] for row in rows}
+        finally:
+            conn.close()
+
+
+class DemoAnalysisWorkerPool:
+    """
+    Пул асинхронних воркерів, що виконують аналізи демо з черги
+
+    Виклики черги - транзакції SQLite, що можуть чекати на блокування до 30 с,
+    тому вони виконуються в пулі потоків, а не в event loop бота.
+    """
+
+    COMPLETE_ATTEMPTS = 3  # Скільки разів пробувати позначити завдання виконаним
+
+    def __init__(self, queue: DemoJobQueue, demo_analyzer: DemoAnalyzer, user_db: UserDatabase, outbox: MessageOutbox,
+                 concurrency: int = None, poll_interval: float = 5.0, coalescer: NotificationCoalescer = None):
+        self.queue = queue
+        self.demo_analyzer = demo_analyzer
+        self.user_db = user_db
+        self.outbox = outbox
+        self.coalescer = coalescer
+        self.concurrency = concurrency or int(os.getenv("DEMO_WORKERS", "2"))
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Запустити воркерів у поточному event loop"""
+        if self._tasks:
+            return
+        for n in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._worker_loop(f"{self.worker_prefix}-{n}")))
+        # Квоти на папки демо та аналізів перевіряються у фоні
+        self.demo_analyzer.storage.start()
+        print(f"🎬 Запущено {self.concurrency} воркерів аналізу демо")
+
+    async def stop(self):
+        """Зупинити воркерів"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.demo_analyzer.storage.stop()
+        self.demo_analyzer.shutdown()
+
+    async def _worker_loop(self, worker_id: str):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                job = await loop.run_in_executor(None, self.queue.claim, worker_id)
+                if not job:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self._run_job(job, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Помилка воркера аналізу демо {worker_id}: {e}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _run_job(self, job: Dict[str, Any], worker_id: str):
+        loop = asyncio.get_running_loop()
+        keepalive = asyncio.create_task(self._keep_job_visible(job['id'], worker_id))
+        try:
+            try:
+                notified = await self.process_job(job)
+            except asyncio.CancelledError:
+                # Завдання повернеться в чергу після спливання visibility timeout
+                raise
+            except Exception as e:
+                status = await loop.run_in_executor(None, self.queue.fail, job['id'], worker_id, str(e))
+                print(f"❌ Аналіз матчу {job['match_id']} (спроба {job['attempts']}) не вдався: {e} -> {status}")
+                if status == 'failed':
+                    await self._notify_failure(job)
+                return
+            # Звіти вже в outbox: помилка позначки не повинна повертати завдання на повторний аналіз
+            await self._complete(job, worker_id, notified)
+        finally:
+            keepalive.cancel()
+
+    async def _complete(self, job: Dict[str, Any], worker_id: str, notified: List[int]):
+        """Позначити завдання виконаним, повторюючи спробу, якщо база зайнята"""
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.COMPLETE_ATTEMPTS + 1):
+            try:
+                await loop.run_in_executor(None, self.queue.complete, job['id'], worker_id, notified)
+                return
+            except Exception as e:
+                print(f"⚠️ Не вдалося позначити аналіз матчу {job['match_id']} виконаним (спроба {attempt}): {e}")
+                if attempt < self.COMPLETE_ATTEMPTS:
+                    await asyncio.sleep(self.poll_interval)
+        print(f"❌ Аналіз матчу {job['match_id']} не позначено виконаним")
+
+    async def _keep_job_visible(self, job_id: int, worker_id: str):
+        loop = asyncio.get_running_loop()
+        interval = max(self.queue.visibility_timeout / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.queue.extend, job_id, worker_id)
+            except Exception as e:
+                # Одна невдача не зупиняє продовження - наступна спроба через interval
+                print(f"⚠️ Не вдалося продовжити завдання аналізу {job_id}: {e}")
+
+    async def _notify_failure(self, job: Dict[str, Any]):
+        """Повідомити чати, що аналіз остаточно не вдався"""
+        for chat_id in self.queue.get_chat_ids(job['id']):
+            self.outbox.enqueue(chat_id, f"❌ Не вдалося проаналізувати демо матчу {job['match_id']}", parse_mode=None)
+
+    async def process_job(self, job: Dict[str, Any]) -> List[int]:
+        """
+        Завантажити, проаналізувати, зберегти та розіслати аналіз матчу
+
+        Returns:
+            Список чатів, яким було надіслано звіт
+        """
+        match_id = job['match_id']
+        steam_id = job['steam_id']
+        print(f"🎬 Початок аналізу демо матчу {match_id}...")
+
+        # Завантажуємо демо (з локальних папок Steam, за адресою із завдання або шаблону)
+        demo_path = await self.demo_analyzer.download_demo(steam_id, match_id, job.get('demo_url'),
+                                                           job.get('demo_sha256'))
+        if not demo_path:
+            raise RuntimeError(f"Не вдалося завантажити демо для матчу {match_id}")
+
+        # Демо не витісняється іншими процесами, поки матч аналізується та розсилається
+        with self.demo_analyzer.storage.pin(demo_path):
+            # Аналізуємо демо один раз для всього матчу: аналіз отримує кожен зареєстрований учасник
+            analyses = {}
+            shared_analysis = await self.demo_analyzer.analyze_match(demo_path, match_id)
+            if shared_analysis:
+                for participant in self.user_db.get_users_by_steam_ids(list(shared_analysis['players'])):
+                    analyses[participant.steam_id] = self.demo_analyzer.get_player_analysis(shared_analysis,
+                                                                                           participant.steam_id)
+            if steam_id not in analyses:
+                analysis_result = await self.demo_analyzer.analyze_demo(demo_path, steam_id, match_id)
+                if not analysis_result:
+                    raise RuntimeError(f"Помилка аналізу демо матчу {match_id}")
+                analyses[steam_id] = analysis_result
+
+            # Зберігаємо аналіз в базу даних
+            for player_steam_id, analysis_result in analyses.items():
+                match_analysis = MatchAnalysis(
+                    steam_id=player_steam_id,
+                    match_id=match_id,
+                    match_date=datetime.now(),
+                    demo_path=demo_path
+                )
+                match_analysis.analyzed = True
+                match_analysis.analysis_data = analysis_result
+                self.user_db.save_match_analysis(match_analysis)
+
+            # Надсилаємо звіт усім чатам, що чекають на цей матч (учаснику - його власний аналіз)
+            reports = {}
+            notified = self.queue.get_chat_ids(job['id'])
+            for chat_id in notified:
+                user = self.user_db.get_user(chat_id)
+                player_steam_id = user.steam_id if user and user.steam_id in analyses else steam_id
+                if player_steam_id not in reports:
+                    detailed_report = await self.demo_analyzer.get_analysis_summary(analyses[player_steam_id])
+                    reports[player_steam_id] = f"📊 **Детальний аналіз матчу {match_id}:**\n\n{detailed_report}"
+                self.send_analysis(chat_id, job, reports[player_steam_id], analyses[player_steam_id], player_steam_id)
+
+        # Видаляємо демо-файл
+        await self.demo_analyzer.cleanup_demo(demo_path)
+
+        print(f"✅ Аналіз демо матчу {match_id} завершено")
+        return notified
+
+    def send_analysis(self, chat_id: int, job: Dict[str, Any], message: str, analysis_result: Dict[str, Any],
+                      steam_id: str = None):
+        """Надіслати звіт одразу або додати в дайджест чату"""
+        # Запит через /demo_analysis користувач чекає одразу, дайджест - лише для автоматичного моніторингу
+        if not self.coalescer or job['priority'] <= PRIORITY_MANUAL:
+            self.outbox.enqueue(chat_id, message)
+            return
+
+        user = self.user_db.get_user(chat_id)
+        summary = {
+            'map': analysis_result.get('match_info', {}).get('map', 'Невідомо'),
+            'kd_ratio': analysis_result.get('player_stats', {}).get('kd_ratio', 0),
+            'overall_rating': analysis_result.get('performance_analysis', {}).get('overall_rating', 0)
+        }
+        self.coalescer.add(
+            chat_id,
+            steam_id or job['steam_id'],
+            'demo_analysis',
+            job['match_id'],
+            {'text': message, 'summary': summary},
+            window=user.notification_window * 60 if user else 0
+        )
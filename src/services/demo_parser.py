@@ -0,0 +1,878 @@
+"""
+Розбір демо-файлів CS:GO (формат HL2DEMO) без зовнішніх програм
+
+Демо CS2 мають формат Source 2 (сигнатура PBDEMS2) і цим парсером не
+розбираються - їх аналізує зовнішній аналізатор (див. `DemoAnalyzer.analyze_demo`).
+
+Демо складається із заголовка та послідовності кадрів. Кадри `signon`/`packet`
+містять мережеві повідомлення сервера (protobuf), з яких нас цікавлять список
+ігрових подій, самі події (вбивства, шкода, раунди, бомба) та таблиця рядків
+`userinfo`, що зв'язує userid подій зі Steam ID гравців.
+
+Файл відображається в пам'ять (mmap) і читається потоково: кадри та події
+видаються генераторами (`DemoParser.frames`/`events`, `iter_demo_events`).
+Стиснені демо (bz2, gzip, zstd за наявності пакета zstandard) розпаковуються
+потоком прямо в парсер, без запису розпакованого файлу.
+Розбір - чисто CPU-робота, тому `parse_demo_file` розрахована на запуск у
+`ProcessPoolExecutor`: приймає шлях і повертає звичайний словник.
+"""
+import bz2
+import gzip
+import mmap
+import struct
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+
+import numpy as np
+
+from src.services.demo_events import EventTable, EVENT_HURT, EVENT_DEATH, EVENT_MVP
+
+try:
+    import zstandard
+except ImportError:  # Демо у zstd підтримуються лише з пакетом zstandard
+    zstandard = None
+
+DEMO_MAGIC = b"HL2DEMO\x00"
+# Демо CS2 (Source 2): інший формат кадрів, цей парсер їх не розбирає
+SOURCE2_DEMO_MAGIC = b"PBDEMS2\x00"
+# Сигнатури стиснених файлів
+COMPRESSION_MAGIC = {
+    'bz2': b"BZh",
+    'gzip': b"\x1f\x8b",
+    'zstd': b"\x28\xb5\x2f\xfd",
+}
+# Розширення демо у порядку пошуку (стиснені - як їх віддає Valve, .dem - розпаковане)
+DEMO_EXTENSIONS = ('.dem.bz2', '.dem.gz', '.dem.zst', '.dem')
+HEADER_FORMAT = '<8sii260s260s260s260sfiii'
+HEADER = struct.Struct(HEADER_FORMAT)
+HEADER_SIZE = HEADER.size
+FRAME_HEADER = struct.Struct('<BiB')  # команда, тік, слот гравця
+INT32 = struct.Struct('<i')
+CMDINFO_SIZE = 152  # Дані про позицію камери в кадрах signon/packet (не потрібні)
+
+# Команди кадрів
+DEM_SIGNON = 1
+DEM_PACKET = 2
+DEM_SYNCTICK = 3
+DEM_CONSOLECMD = 4
+DEM_USERCMD = 5
+DEM_DATATABLES = 6
+DEM_STOP = 7
+DEM_CUSTOMDATA = 8
+DEM_STRINGTABLES = 9
+
+# Мережеві повідомлення сервера
+SVC_CREATE_STRING_TABLE = 12
+SVC_UPDATE_STRING_TABLE = 13
+SVC_GAME_EVENT = 25
+SVC_GAME_EVENT_LIST = 30
+
+TEAM_T = 2
+TEAM_CT = 3
+STEAM_ID64_BASE = 76561197960265728
+TRADE_WINDOW_SECONDS = 5  # Вбивство кривдника тіммейта в цьому вікні вважається розміном
+UTILITY_WEAPONS = {'hegrenade', 'inferno', 'molotov', 'incgrenade'}
+
+# player_info_t з таблиці userinfo (поля у big-endian)
+PLAYER_INFO_FORMAT = '>QQ128si33s3xI128s??'
+PLAYER_INFO = struct.Struct(PLAYER_INFO_FORMAT)
+
+
+class DemoParseError(Exception):
+    """Файл не є коректним демо або пошкоджений"""
+
+
+def read_varint(data, pos: int) -> Tuple[int, int]:
+    """Прочитати protobuf varint, повертає (значення, нова позиція)"""
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise DemoParseError("Обірваний varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def decode_protobuf(data) -> List[Tuple[int, int, Any]]:
+    """
+    Розібрати protobuf-повідомлення без схеми
+
+    Returns:
+        Список (номер поля, тип, значення): varint - int, 64/32 біти - bytes, length-delimited - bytes
+    """
+    fields = []
+    pos = 0
+    end = len(data)
+    while pos < end:
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value = bytes(data[pos:pos + 8])
+            pos += 8
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == 5:
+            value = bytes(data[pos:pos + 4])
+            pos += 4
+        else:
+            raise DemoParseError(f"Непідтримуваний тип поля protobuf: {wire_type}")
+        if pos > end:
+            raise DemoParseError("Обірване protobuf-повідомлення")
+        fields.append((field, wire_type, value))
+    return fields
+
+
+def to_signed(value: int) -> int:
+    """Від'ємні int32 у protobuf кодуються як 64-бітні varint"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def steam_id_from_networkid(networkid: str) -> Optional[str]:
+    """STEAM_1:Y:Z -> 64-бітний Steam ID"""
+    try:
+        _, y, z = networkid.split(':')
+        return str(STEAM_ID64_BASE + int(z) * 2 + int(y))
+    except (ValueError, AttributeError):
+        return None
+
+
+def weapon_name(name: Optional[str]) -> str:
+    """Єдина назва зброї для weapon_fire (weapon_ak47) та інших подій (ak47)"""
+    return (name or 'unknown').replace('weapon_', '').upper()
+
+
+class BitReader:
+    """Читання бітового потоку (молодші біти першими), як у bf_read рушія Source"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+        self.size = len(data) * 8
+
+    def read_bits(self, count: int) -> int:
+        if count == 0:
+            return 0
+        if self.pos + count > self.size:
+            raise DemoParseError("Вихід за межі бітового потоку")
+        start = self.pos >> 3
+        shift = self.pos & 7
+        chunk = int.from_bytes(self.data[start:start + ((shift + count + 7) >> 3)], 'little')
+        self.pos += count
+        return (chunk >> shift) & ((1 << count) - 1)
+
+    def read_bit(self) -> bool:
+        return bool(self.read_bits(1))
+
+    def read_bytes(self, count: int) -> bytes:
+        if self.pos & 7 == 0:
+            start = self.pos >> 3
+            if self.pos + count * 8 > self.size:
+                raise DemoParseError("Вихід за межі бітового потоку")
+            self.pos += count * 8
+            return bytes(self.data[start:start + count])
+        return bytes(self.read_bits(8) for _ in range(count))
+
+    def read_string(self, limit: int = 4096) -> str:
+        chars = bytearray()
+        while len(chars) < limit:
+            byte = self.read_bits(8)
+            if byte == 0:
+                break
+            chars.append(byte)
+        return chars.decode('utf-8', errors='replace')
+
+
+class MatchStatsCollector:
+    """
+    Збір статистики гравців з ігрових подій
+
+    Стрільба, шкода, вбивства та MVP записуються в стовпцеву таблицю подій
+    (`EventTable`), а лічильники гравців, зброї та раундів рахуються з неї
+    векторно в `finish`. Послідовно (подія за подією) ведеться лише те, що
+    залежить від стану раунду: перші вбивства, розміни, клачі, бомба.
+    """
+
+    def __init__(self, tickrate: float):
+        self.trade_window = TRADE_WINDOW_SECONDS * tickrate
+        self.users: Dict[int, Dict[str, Any]] = {}  # userid -> {'key', 'steam_id', 'name'}
+        self.teams: Dict[int, int] = {}  # userid -> команда
+        self.reset()
+
+    def reset(self):
+        """Скинути статистику (початок матчу після розминки)"""
+        self.players: Dict[str, Dict[str, Any]] = {}
+        self.player_ids: Dict[str, int] = {}  # ключ гравця -> індекс у таблиці подій
+        self.events = EventTable()
+        self.rounds_played = 0
+        self.score = {TEAM_T: 0, TEAM_CT: 0}
+        # Відрізок раунду: статистика раунду скидається на його початку та після завершення
+        self.segment = -1
+        self._start_round()
+
+    def _start_round(self):
+        self.alive = {userid for userid, team in self.teams.items() if team in (TEAM_T, TEAM_CT)}
+        self.round_kills = 0
+        self.segment += 1
+        self.clutchers: Dict[int, int] = {}
+        self.recent_deaths: List[Tuple[int, int, int]] = []  # (tick, команда жертви, userid вбивці)
+
+    def set_user(self, userid: int, steam_id: Optional[str], name: str, fake: bool = False):
+        """Зв'язати userid з гравцем"""
+        key = steam_id if steam_id and not fake else f"BOT {name}"
+        self.users[userid] = {'key': key, 'steam_id': None if fake else steam_id, 'name': name}
+
+    def _player(self, userid: int) -> Optional[Dict[str, Any]]:
+        user = self.users.get(userid)
+        if not user:
+            return None
+        player = self.players.get(user['key'])
+        if player is None:
+            self.player_ids[user['key']] = len(self.player_ids)
+            player = self.players[user['key']] = {
+                'steam_id': user['steam_id'], 'name': user['name'], 'team': None,
+                'kills': 0, 'deaths': 0, 'assists': 0, 'headshots': 0, 'mvps': 0,
+                'damage_dealt': 0, 'damage_taken': 0, 'utility_damage': 0,
+                'entry_kills': 0, 'trade_kills': 0, 'flash_assists': 0,
+                'clutch_situations': 0, 'clutch_wins': 0, 'bomb_plants': 0, 'bomb_defuses': 0,
+                'rounds_won': 0, 'weapons': {}, 'rounds': []
+            }
+        player['name'] = user['name']
+        if userid in self.teams:
+            player['team'] = self.teams[userid]
+        return player
+
+    def _player_id(self, userid: int) -> int:
+        """Індекс гравця в таблиці подій (-1 - невідомий userid)"""
+        player = self._player(userid)
+        return self.player_ids[self.users[userid]['key']] if player else -1
+
+    def _weapon_id(self, name: Optional[str]) -> int:
+        return self.events.weapon_id(weapon_name(name))
+
+    def handle(self, name: str, data: Dict[str, Any], tick: int):
+        """Обробити ігрову подію"""
+        handler = getattr(self, f"_on_{name}", None)
+        if handler:
+            handler(data, tick)
+
+    def _on_player_connect(self, data, tick):
+        steam_id = steam_id_from_networkid(data.get('networkid', ''))
+        self.set_user(data.get('userid'), steam_id, data.get('name', ''), fake=steam_id is None)
+
+    def _on_player_info(self, data, tick):
+        steam_id = str(data['steamid']) if data.get('steamid') else None
+        self.set_user(data.get('userid'), steam_id, data.get('name', ''), fake=bool(data.get('bot')))
+
+    def _on_player_team(self, data, tick):
+        if data.get('disconnect'):
+            self.teams.pop(data.get('userid'), None)
+            return
+        self.teams[data.get('userid')] = data.get('team')
+        self._player(data.get('userid'))
+
+    def _on_begin_new_match(self, data, tick):
+        self.reset()
+
+    def _on_round_start(self, data, tick):
+        self._start_round()
+
+    def _on_weapon_fire(self, data, tick):
+        shooter = self._player_id(data.get('userid'))
+        if shooter >= 0:
+            self.events.count_shot(shooter, self._weapon_id(data.get('weapon')))
+
+    def _on_player_hurt(self, data, tick):
+        attacker_id, victim_id = data.get('attacker'), data.get('userid')
+        victim = self._player_id(victim_id)
+        attacker = self._player_id(attacker_id)
+        # Шкода по собі та по своїх не зараховується нападнику
+        if attacker_id == victim_id or self.teams.get(attacker_id) == self.teams.get(victim_id):
+            attacker = -1
+        if victim < 0 and attacker < 0:
+            return
+        weapon = data.get('weapon', '')
+        self.events.add(EVENT_HURT, tick, self.segment, attacker=attacker, victim=victim,
+                        weapon=self._weapon_id(weapon), damage=data.get('dmg_health', 0),
+                        flag=weapon in UTILITY_WEAPONS)
+
+    def _on_player_death(self, data, tick):
+        victim_id, attacker_id, assister_id = data.get('userid'), data.get('attacker'), data.get('assister')
+        victim_team = self.teams.get(victim_id)
+        self.alive.discard(victim_id)
+
+        victim = self._player_id(victim_id)
+        attacker = self._player_id(attacker_id)
+        killed = attacker >= 0 and attacker_id != victim_id and self.teams.get(attacker_id) != victim_team
+        assister = self._player_id(assister_id)
+        if assister_id == attacker_id:
+            assister = -1
+        self.events.add(EVENT_DEATH, tick, self.segment, attacker=attacker if killed else -1, victim=victim,
+                        assister=assister, weapon=self._weapon_id(data.get('weapon')),
+                        headshot=bool(data.get('headshot')), flag=bool(data.get('assistedflash')))
+
+        if killed:
+            attacker = self.players[self.users[attacker_id]['key']]
+            if self.round_kills == 0:
+                attacker['entry_kills'] += 1
+            # Розмін: вбитий нещодавно сам убив тіммейта вбивці
+            attacker_team = self.teams.get(attacker_id)
+            if any(killer == victim_id and team == attacker_team and tick - death_tick <= self.trade_window
+                   for death_tick, team, killer in self.recent_deaths):
+                attacker['trade_kills'] += 1
+            self.round_kills += 1
+        self.recent_deaths.append((tick, victim_team, attacker_id))
+        self._check_clutches()
+
+    def _check_clutches(self):
+        """Гравець лишився сам проти хоча б одного суперника - клач"""
+        alive_by_team = {TEAM_T: [], TEAM_CT: []}
+        for userid in self.alive:
+            team = self.teams.get(userid)
+            if team in alive_by_team:
+                alive_by_team[team].append(userid)
+        for team, enemy in ((TEAM_T, TEAM_CT), (TEAM_CT, TEAM_T)):
+            if team in self.clutchers or len(alive_by_team[team]) != 1 or not alive_by_team[enemy]:
+                continue
+            clutcher = alive_by_team[team][0]
+            player = self._player(clutcher)
+            if player:
+                self.clutchers[team] = clutcher
+                player['clutch_situations'] += 1
+
+    def _on_bomb_planted(self, data, tick):
+        player = self._player(data.get('userid'))
+        if player:
+            player['bomb_plants'] += 1
+
+    def _on_bomb_defused(self, data, tick):
+        player = self._player(data.get('userid'))
+        if player:
+            player['bomb_defuses'] += 1
+
+    def _on_round_mvp(self, data, tick):
+        player = self._player_id(data.get('userid'))
+        if player >= 0:
+            self.events.add(EVENT_MVP, tick, self.segment, attacker=player)
+
+    def _on_round_end(self, data, tick):
+        winner = data.get('winner')
+        if winner not in (TEAM_T, TEAM_CT):
+            return
+        self.rounds_played += 1
+        self.score[winner] += 1
+
+        if winner in self.clutchers:
+            player = self._player(self.clutchers[winner])
+            if player:
+                player['clutch_wins'] += 1
+
+        for userid, team in self.teams.items():
+            if team not in (TEAM_T, TEAM_CT):
+                continue
+            player = self._player(userid)
+            if not player:
+                continue
+            won = team == winner
+            if won:
+                player['rounds_won'] += 1
+            self.events.add_round_result(self.player_ids[self.users[userid]['key']], self.segment,
+                                         self.rounds_played, won)
+        self.segment += 1
+
+    def finish(self) -> Dict[str, Dict[str, Any]]:
+        """Порахувати лічильники гравців з таблиці подій (векторно)"""
+        keys = list(self.player_ids)
+        totals = self.events.aggregate(len(keys), self.segment + 1)
+        weapons = self.events.weapons
+        used = (totals['weapon_kills'] + totals['weapon_shots'] + totals['weapon_hits']) > 0
+        for index, key in enumerate(keys):
+            player = self.players[key]
+            for field in ('kills', 'deaths', 'assists', 'headshots', 'mvps', 'damage_dealt', 'damage_taken',
+                          'utility_damage', 'flash_assists'):
+                player[field] = int(totals[field][index])
+            player['weapons'] = {
+                weapons[weapon]: {'kills': int(totals['weapon_kills'][index, weapon]),
+                                  'shots': int(totals['weapon_shots'][index, weapon]),
+                                  'hits': int(totals['weapon_hits'][index, weapon])}
+                for weapon in np.flatnonzero(used[index]).tolist()
+            }
+            player['rounds'] = totals['rounds'][index]
+        return self.players
+
+
+class BufferSource:
+    """Демо в пам'яті або mmap: read повертає зрізи memoryview без копіювання"""
+
+    def __init__(self, data):
+        self.view = memoryview(data)
+        self.pos = 0
+
+    def read(self, size: int) -> memoryview:
+        chunk = self.view[self.pos:self.pos + size]
+        self.pos += len(chunk)
+        return chunk
+
+    def release(self):
+        self.view.release()
+
+
+class DemoParser:
+    """
+    Потоковий розбір демо HL2DEMO
+
+    Працює поверх буфера (bytes, mmap - корисне навантаження пакетів видається
+    зрізами memoryview без копіювання) або потоку з методом `read`, наприклад
+    розпаковувача bz2/gzip. Дані читаються лише вперед, кадри та події
+    видаються генераторами.
+    """
+
+    def __init__(self, source):
+        # mmap теж має метод read, тому буфер розпізнається за протоколом буфера
+        try:
+            self.source = BufferSource(source)
+        except TypeError:
+            self.source = source
+        self.pos = 0  # Прочитано байтів (для повідомлень про помилки)
+        self.header: Dict[str, Any] = {}
+        self.event_descriptors: Dict[int, Tuple[str, List[str]]] = {}
+        self.string_tables: List[Dict[str, Any]] = []
+
+    def _read_exact(self, size: int, allow_eof: bool = False):
+        chunk = self.source.read(size)
+        # Потоки розпаковки можуть віддавати дані частинами
+        while len(chunk) < size:
+            more = self.source.read(size - len(chunk))
+            if not more:
+                if allow_eof and not len(chunk):
+                    return None
+                raise DemoParseError("Неочікуваний кінець файлу")
+            chunk = bytes(chunk) + more
+        self.pos += size
+        return chunk
+
+    def _read(self, fmt: struct.Struct):
+        return fmt.unpack(self._read_exact(fmt.size))
+
+    def _read_chunk(self):
+        length, = self._read(INT32)
+        if length < 0:
+            raise DemoParseError("Некоректна довжина блоку даних")
+        return self._read_exact(length)
+
+    def parse_header(self) -> Dict[str, Any]:
+        """Прочитати заголовок демо (один раз, на початку потоку)"""
+        if self.header:
+            return self.header
+        try:
+            raw = self._read_exact(HEADER_SIZE)
+        except DemoParseError:
+            raise DemoParseError("Файл не є демо HL2DEMO")
+        if bytes(raw[:len(DEMO_MAGIC)]) != DEMO_MAGIC:
+            raise DemoParseError("Файл не є демо HL2DEMO")
+        (_, demo_protocol, network_protocol, server_name, client_name, map_name, game_directory,
+         playback_time, playback_ticks, playback_frames, signon_length) = HEADER.unpack(raw)
+
+        def text(raw: bytes) -> str:
+            return raw.split(b'\x00', 1)[0].decode('utf-8', errors='replace')
+
+        self.header = {
+            'demo_protocol': demo_protocol,
+            'network_protocol': network_protocol,
+            'server_name': text(server_name),
+            'client_name': text(client_name),
+            'map_name': text(map_name),
+            'game_directory': text(game_directory),
+            'playback_time': playback_time,
+            'playback_ticks': playback_ticks,
+            'playback_frames': playback_frames,
+            'signon_length': signon_length,
+            'tickrate': round(playback_ticks / playback_time) if playback_time > 0 else 64
+        }
+        return self.header
+
+    def frames(self) -> Iterator[Tuple[int, int, Optional[memoryview]]]:
+        """
+        Кадри демо по одному
+
+        Yields:
+            (команда, тік, дані кадру) - для буфера дані є його зрізом і дійсні, поки відкритий файл
+        """
+        self.parse_header()
+        while True:
+            frame = self._read_exact(FRAME_HEADER.size, allow_eof=True)
+            if frame is None:
+                return
+            command, tick, _ = FRAME_HEADER.unpack(frame)
+            if command == DEM_STOP:
+                return
+            if command in (DEM_SIGNON, DEM_PACKET):
+                self._read_exact(CMDINFO_SIZE + 8)  # cmdinfo та номери послідовностей
+                yield command, tick, self._read_chunk()
+            elif command == DEM_SYNCTICK:
+                yield command, tick, None
+            elif command in (DEM_USERCMD, DEM_CUSTOMDATA):
+                self._read_exact(4)
+                yield command, tick, self._read_chunk()
+            elif command in (DEM_CONSOLECMD, DEM_DATATABLES, DEM_STRINGTABLES):
+                yield command, tick, self._read_chunk()
+            else:
+                raise DemoParseError(f"Невідома команда кадру {command} (позиція {self.pos})")
+
+    def events(self) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+        """
+        Ігрові події демо по одній
+
+        Записи таблиці userinfo видаються як події `player_info`
+        (userid, steamid, name, bot), тож споживачу не потрібні таблиці рядків.
+
+        Yields:
+            (назва події, значення ключів, тік)
+        """
+        for command, tick, payload in self.frames():
+            if command in (DEM_SIGNON, DEM_PACKET):
+                for name, data in self._packet_events(payload):
+                    yield name, data, tick
+            elif command == DEM_STRINGTABLES:
+                for data in self._parse_string_tables_frame(payload):
+                    yield 'player_info', data, tick
+
+    def parse(self) -> Dict[str, Any]:
+        """Розібрати демо повністю"""
+        self.parse_header()
+        collector = MatchStatsCollector(self.header['tickrate'])
+        for name, data, tick in self.events():
+            collector.handle(name, data, tick)
+        return {
+            'header': self.header,
+            'rounds_played': collector.rounds_played,
+            'score': {'t': collector.score[TEAM_T], 'ct': collector.score[TEAM_CT]},
+            'players': collector.finish()
+        }
+
+    def _packet_events(self, data: memoryview) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        pos = 0
+        end = len(data)
+        while pos < end:
+            message, pos = read_varint(data, pos)
+            size, pos = read_varint(data, pos)
+            payload = data[pos:pos + size]
+            pos += size
+            if message == SVC_GAME_EVENT:
+                event = self._decode_game_event(payload)
+                if event:
+                    yield event
+            elif message == SVC_GAME_EVENT_LIST:
+                self._handle_game_event_list(payload)
+            elif message == SVC_CREATE_STRING_TABLE:
+                for user_info in self._handle_create_string_table(payload):
+                    yield 'player_info', user_info
+            elif message == SVC_UPDATE_STRING_TABLE:
+                for user_info in self._handle_update_string_table(payload):
+                    yield 'player_info', user_info
+
+    def _handle_game_event_list(self, payload):
+        for field, _, descriptor in decode_protobuf(payload):
+            if field != 1:
+                continue
+            event_id, name, keys = None, '', []
+            for sub_field, _, value in decode_protobuf(descriptor):
+                if sub_field == 1:
+                    event_id = value
+                elif sub_field == 2:
+                    name = bytes(value).decode('utf-8', errors='replace')
+                elif sub_field == 3:
+                    key_name = ''
+                    for key_field, _, key_value in decode_protobuf(value):
+                        if key_field == 2:
+                            key_name = bytes(key_value).decode('utf-8', errors='replace')
+                    keys.append(key_name)
+            self.event_descriptors[event_id] = (name, keys)
+
+    def _decode_game_event(self, payload) -> Optional[Tuple[str, Dict[str, Any]]]:
+        event_id = None
+        values = []
+        for field, _, value in decode_protobuf(payload):
+            if field == 2:
+                event_id = value
+            elif field == 3:
+                values.append(self._decode_event_key(value))
+        descriptor = self.event_descriptors.get(event_id)
+        if not descriptor:
+            return None
+        name, keys = descriptor
+        return name, dict(zip(keys, values))
+
+    @staticmethod
+    def _decode_event_key(data):
+        """Значення ключа події: рядок, float, ціле або bool залежно від поля"""
+        for field, wire_type, value in decode_protobuf(data):
+            if field == 1:
+                continue
+            if wire_type == 2:
+                return bytes(value).decode('utf-8', errors='replace')
+            if wire_type == 5:
+                return struct.unpack('<f', value)[0]
+            if field == 7:
+                return bool(value)
+            if field == 8:
+                return value
+            return to_signed(value)
+        return None
+
+    def _handle_create_string_table(self, payload) -> Iterator[Dict[str, Any]]:
+        table = {'name': '', 'max_entries': 0, 'num_entries': 0, 'fixed_size': False,
+                 'user_data_size': 0, 'user_data_size_bits': 0, 'flags': 0}
+        string_data = b''
+        for field, _, value in decode_protobuf(payload):
+            if field == 1:
+                table['name'] = bytes(value).decode('utf-8', errors='replace')
+            elif field == 2:
+                table['max_entries'] = value
+            elif field == 3:
+                table['num_entries'] = value
+            elif field == 4:
+                table['fixed_size'] = bool(value)
+            elif field == 5:
+                table['user_data_size'] = value
+            elif field == 6:
+                table['user_data_size_bits'] = value
+            elif field == 7:
+                table['flags'] = value
+            elif field == 8:
+                string_data = value
+        table['history'] = []
+        self.string_tables.append(table)
+        return self._parse_string_table_update(table, string_data, table['num_entries'])
+
+    def _handle_update_string_table(self, payload) -> Iterator[Dict[str, Any]]:
+        table_id, changed, string_data = 0, 0, b''
+        for field, _, value in decode_protobuf(payload):
+            if field == 1:
+                table_id = value
+            elif field == 2:
+                changed = value
+            elif field == 3:
+                string_data = value
+        if table_id >= len(self.string_tables):
+            return iter(())
+        return self._parse_string_table_update(self.string_tables[table_id], string_data, changed)
+
+    def _parse_string_table_update(self, table: Dict[str, Any], string_data, entries: int) -> Iterator[Dict[str, Any]]:
+        """Розібрати оновлення таблиці рядків (потрібна лише userinfo)"""
+        # Стиснені таблиці (flags & 1) та кодування словником не підтримуються - userinfo такими не буває
+        if table['name'] != 'userinfo' or table['flags'] & 1 or not entries:
+            return
+        reader = BitReader(string_data)
+        if reader.read_bit():
+            return
+        entry_bits = max(table['max_entries'].bit_length() - 1, 0)
+        history = table['history']
+        last_entry = -1
+        for _ in range(entries):
+            index = last_entry + 1
+            if not reader.read_bit():
+                index = reader.read_bits(entry_bits)
+            last_entry = index
+
+            entry = ''
+            if reader.read_bit():
+                if reader.read_bit():
+                    # Префікс одного з останніх 32 рядків + власний суфікс
+                    history_index = reader.read_bits(5)
+                    prefix_length = reader.read_bits(5)
+                    prefix = history[history_index][:prefix_length] if history_index < len(history) else ''
+                    entry = prefix + reader.read_string()
+                else:
+                    entry = reader.read_string()
+
+            user_data = None
+            if reader.read_bit():
+                if table['fixed_size']:
+                    bits = table['user_data_size_bits']
+                    user_data = reader.read_bits(bits).to_bytes(table['user_data_size'], 'little')
+                else:
+                    user_data = reader.read_bytes(reader.read_bits(14))
+            if user_data:
+                user_info = self._decode_user_info(user_data)
+                if user_info:
+                    yield user_info
+
+            history.append(entry)
+            if len(history) > 32:
+                history.pop(0)
+
+    def _parse_string_tables_frame(self, data) -> Iterator[Dict[str, Any]]:
+        """Кадр dem_stringtables - повний знімок таблиць рядків"""
+        reader = BitReader(data)
+        for _ in range(reader.read_bits(8)):
+            table_name = reader.read_string()
+            for _ in range(reader.read_bits(16)):
+                reader.read_string()
+                if reader.read_bit():
+                    user_data = reader.read_bytes(reader.read_bits(16))
+                    if table_name == 'userinfo':
+                        user_info = self._decode_user_info(user_data)
+                        if user_info:
+                            yield user_info
+            if reader.read_bit():
+                for _ in range(reader.read_bits(16)):
+                    reader.read_string()
+                    if reader.read_bit():
+                        reader.read_bytes(reader.read_bits(16))
+
+    @staticmethod
+    def _decode_user_info(data: bytes) -> Optional[Dict[str, Any]]:
+        """Запис player_info_t: userid, Steam ID (xuid), нік та ознака бота"""
+        if len(data) < PLAYER_INFO.size:
+            return None
+        _, xuid, name, userid, _, _, _, fake, is_hltv = PLAYER_INFO.unpack_from(data)
+        if is_hltv:
+            return None
+        return {
+            'userid': userid,
+            'steamid': xuid,
+            'name': name.split(b'\x00', 1)[0].decode('utf-8', errors='replace'),
+            'bot': fake or not xuid
+        }
+
+
+DECOMPRESSION_ERRORS = (OSError, EOFError) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """Формат стиснення файлу за сигнатурою ('bz2', 'gzip', 'zstd') або None"""
+    with open(path, 'rb') as f:
+        head = f.read(max(len(magic) for magic in COMPRESSION_MAGIC.values()))
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_decompressor(fileobj, compression: str):
+    """Потік розпакованих даних поверх відкритого стисненого файлу"""
+    if compression == 'bz2':
+        return bz2.BZ2File(fileobj)
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj)
+    if compression == 'zstd':
+        if zstandard is None:
+            raise DemoParseError("Для демо у форматі zstd потрібен пакет zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(fileobj)
+    raise DemoParseError(f"Невідомий формат стиснення: {compression}")
+
+
+class DemoFile:
+    """
+    Демо-файл, відображений у пам'ять (mmap), або стиснене демо
+
+    Файл не зчитується цілком: сторінки підвантажує ОС під час читання і може
+    витісняти вже прочитані, тож пам'ять процесу не залежить від розміру демо.
+    Стиснені демо (bz2, gzip, zstd) розпаковуються потоково прямо в парсер,
+    без тимчасового розпакованого файлу.
+
+    Використання:
+        with DemoFile(path) as parser:
+            for name, data, tick in parser.events():
+                ...
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._mmap = None
+        self._stream = None
+        self._parser: Optional[DemoParser] = None
+
+    def __enter__(self) -> DemoParser:
+        compression = detect_compression(self.path)
+        self._file = open(self.path, 'rb')
+        if compression:
+            try:
+                self._stream = open_decompressor(self._file, compression)
+            except DemoParseError:
+                self._file.close()
+                raise
+            self._parser = DemoParser(self._stream)
+            return self._parser
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            # Порожній файл неможливо відобразити
+            self._file.close()
+            raise DemoParseError(f"Порожній файл: {e}") from e
+        self._parser = DemoParser(self._mmap)
+        return self._parser
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._stream is not None:
+            self._stream.close()
+        else:
+            self._parser.source.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Хтось ще тримає зріз буфера - відображення закриється разом з ним
+                pass
+        self._parser = None
+        self._file.close()
+        return False
+
+
+def detect_demo_format(path: str) -> Optional[str]:
+    """Формат демо за сигнатурою, зокрема стисненого: 'hl2demo', 'source2' або None"""
+    try:
+        compression = detect_compression(path)
+        with open(path, 'rb') as f:
+            stream = open_decompressor(f, compression) if compression else f
+            magic = stream.read(len(DEMO_MAGIC))
+    except DECOMPRESSION_ERRORS + (DemoParseError,):
+        return None
+    if magic == DEMO_MAGIC:
+        return 'hl2demo'
+    if magic == SOURCE2_DEMO_MAGIC:
+        return 'source2'
+    return None
+
+
+def is_demo_file(path: str) -> bool:
+    """Чи є файл демо HL2DEMO, яке розбирає цей парсер (перевірка сигнатури)"""
+    return detect_demo_format(path) == 'hl2demo'
+
+
+def iter_demo_events(path: str) -> Iterator[Tuple[str, Dict[str, Any], int]]:
+    """
+    Ігрові події демо-файлу по одній (через mmap або потокову розпаковку)
+
+    Raises:
+        DemoParseError: файл не є коректним демо
+    """
+    with DemoFile(path) as parser:
+        try:
+            yield from parser.events()
+        except (struct.error, IndexError, ValueError) + DECOMPRESSION_ERRORS as e:
+            raise DemoParseError(f"Пошкоджене демо: {e}") from e
+
+
+def parse_demo_file(path: str) -> Dict[str, Any]:
+    """
+    Розібрати демо-файл (виконується у процесі пулу)
+
+    Returns:
+        Заголовок, кількість раундів, рахунок та статистика всіх гравців
+
+    Raises:
+        DemoParseError: файл не є коректним демо
+    """
+    with DemoFile(path) as parser:
+        try:
+            return parser.parse()
+        except (struct.error, IndexError, ValueError) + DECOMPRESSION_ERRORS as e:
+            raise DemoParseError(f"Пошкоджене демо: {e}") from e
@@ -0,0 +1,360 @@
+"""
+Квоти на диск для демо-файлів та результатів аналізу
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Callable, Tuple
+
+
+class DemoStorage:
+    """
+    Папки з квотою в байтах та витісненням найдавніше використаних файлів (LRU)
+
+    Час останнього доступу до файлів зберігається в таблиці `storage_files`.
+    Файли, що потрапили в папку в обхід `touch` (наприклад, після збою), під час
+    синхронізації враховуються з часом зміни файлу. Коли папка перевищує квоту,
+    видаляються файли з найстарішим доступом; файли старші за `max_age` секунд
+    видаляються незалежно від квоти. Не витісняються закріплені файли (`pin`),
+    файли, змінені за останні `BUSY_GRACE` секунд (завантаження, запис), та бази SQLite.
+    Файли, що залишились у папці, перед перевіркою квоти можна ущільнити
+    (`compactors`, наприклад стиснути демо) - з тими ж винятками.
+
+    Закріплення зберігаються в таблиці `storage_pins`, тож їх бачать усі процеси,
+    що ділять базу (бот, воркери моніторингу, пакетний аналіз). Закріплення
+    процесу, що зник, знімається само через `PIN_TTL` секунд.
+    """
+
+    EVICTION_INTERVAL = 600  # Як часто перевіряти квоти у фоні (секунди)
+    # Скільки секунд після зміни файл вважається зайнятим (файл ще пишеться);
+    # файли, що читаються, захищає закріплення
+    BUSY_GRACE = 300
+    PIN_TTL = 6 * 3600  # Найдовше закріплення (розбір великого демо, черга аналізу)
+    SQLITE_SUFFIXES = ('.db', '.db-journal', '.db-wal', '.db-shm')
+
+    def __init__(self, db_path: str, quotas: Dict[str, int], max_ages: Dict[str, float] = None,
+                 eviction_interval: float = EVICTION_INTERVAL,
+                 compactors: Dict[str, Callable[[str], Optional[Tuple[str, str]]]] = None):
+        """
+        Args:
+            db_path: база SQLite для часу доступу до файлів
+            quotas: папка -> максимальний розмір у байтах
+            max_ages: папка -> максимальний час без доступу в секундах (необов'язково)
+            eviction_interval: період фонової перевірки квот
+            compactors: папка -> функція ущільнення файлу: пише ущільнену копію в тимчасовий файл, не
+                змінюючи оригінал, і повертає (тимчасовий шлях, кінцевий шлях) або None
+        """
+        self.db_path = db_path
+        self.quotas = {os.path.normpath(folder): quota for folder, quota in quotas.items()}
+        self.max_ages = {os.path.normpath(folder): age for folder, age in (max_ages or {}).items()}
+        self.compactors = {os.path.normpath(folder): compact for folder, compact in (compactors or {}).items()}
+        self.eviction_interval = eviction_interval
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Optional[asyncio.Task] = None
+        for folder in self.quotas:
+            os.makedirs(folder, exist_ok=True)
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиць обліку файлів"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS storage_files (
+                    path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_storage_files_lru ON storage_files (folder, last_access)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS storage_pins (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    path TEXT NOT NULL,
+                    pinned_until REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_storage_pins_path ON storage_pins (path)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS storage_stats (
+                    stat TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def _folder_of(self, path: str) -> Optional[str]:
+        """Папка з квотою, в якій лежить файл"""
+        directory = os.path.dirname(os.path.abspath(path))
+        for folder in self.quotas:
+            if directory == os.path.abspath(folder):
+                return folder
+        return None
+
+    def _is_managed_file(self, name: str) -> bool:
+        return not name.endswith(self.SQLITE_SUFFIXES)
+
+    def touch(self, path: str) -> bool:
+        """Позначити файл використаним зараз (новий файл береться на облік)"""
+        path = os.path.normpath(path)
+        folder = self._folder_of(path)
+        if not folder or not os.path.isfile(path) or not self._is_managed_file(path):
+            return False
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT INTO storage_files (path, folder, size, last_access) VALUES (?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET size = excluded.size, last_access = excluded.last_access
+            ''', (path, folder, os.path.getsize(path), time.time()))
+            return True
+        except Exception as e:
+            print(f"❌ Помилка обліку файлу {path}: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def forget(self, path: str):
+        """Зняти з обліку видалений файл"""
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM storage_files WHERE path = ?', (os.path.normpath(path),))
+        finally:
+            conn.close()
+
+    @contextmanager
+    def pin(self, path: str, ttl: float = None):
+        """Не витісняти й не ущільнювати файл, поки він використовується (у будь-якому процесі)"""
+        path = os.path.normpath(path)
+        conn = self._connect()
+        try:
+            pin_id = conn.execute('INSERT INTO storage_pins (path, pinned_until) VALUES (?, ?)',
+                                  (path, time.time() + (ttl or self.PIN_TTL))).lastrowid
+        finally:
+            conn.close()
+        try:
+            yield path
+        finally:
+            conn = self._connect()
+            try:
+                conn.execute('DELETE FROM storage_pins WHERE id = ?', (pin_id,))
+            finally:
+                conn.close()
+
+    @staticmethod
+    def _pinned_paths(conn: sqlite3.Connection, now: float) -> set:
+        """Закріплені зараз файли (прострочені закріплення видаляються)"""
+        conn.execute('DELETE FROM storage_pins WHERE pinned_until <= ?', (now,))
+        return {row['path'] for row in conn.execute('SELECT DISTINCT path FROM storage_pins')}
+
+    def sync(self, folder: str):
+        """Узгодити облік з вмістом папки: нові файли додаються, зниклі - видаляються"""
+        folder = os.path.normpath(folder)
+        on_disk = {}
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file() and self._is_managed_file(entry.name):
+                    stat = entry.stat()
+                    on_disk[os.path.normpath(entry.path)] = (stat.st_size, stat.st_mtime)
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            tracked = {row['path'] for row in conn.execute('SELECT path FROM storage_files WHERE folder = ?',
+                                                           (folder,))}
+            conn.executemany('DELETE FROM storage_files WHERE path = ?', [(path,) for path in tracked - set(on_disk)])
+            conn.executemany('''
+                INSERT INTO storage_files (path, folder, size, last_access) VALUES (?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET size = excluded.size
+            ''', [(path, folder, size, mtime) for path, (size, mtime) in on_disk.items()])
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def enforce(self) -> List[str]:
+        """
+        Видалити застарілі файли та файли понад квоту (найдавніше використані першими)
+
+        Returns:
+            Список видалених файлів
+        """
+        evicted = []
+        try:
+            now = time.time()
+            for folder, quota in self.quotas.items():
+                if folder in self.compactors:
+                    self.compact(folder, now)
+                self.sync(folder)
+                max_age = self.max_ages.get(folder)
+                conn = self._connect()
+                try:
+                    # Закріплення читаються в транзакції видалення: новий pin чекає на її завершення
+                    conn.execute('BEGIN IMMEDIATE')
+                    pinned = self._pinned_paths(conn, now)
+                    rows = conn.execute('''
+                        SELECT path, size, last_access FROM storage_files WHERE folder = ? ORDER BY last_access
+                    ''', (folder,)).fetchall()
+                    usage = sum(row['size'] for row in rows)
+                    removed = freed = 0
+                    for row in rows:
+                        stale = max_age is not None and now - row['last_access'] > max_age
+                        if not stale and usage <= quota:
+                            break
+                        if row['path'] in pinned:
+                            continue
+                        try:
+                            if now - os.path.getmtime(row['path']) < self.BUSY_GRACE:
+                                continue
+                            os.remove(row['path'])
+                        except FileNotFoundError:
+                            pass
+                        conn.execute('DELETE FROM storage_files WHERE path = ?', (row['path'],))
+                        usage -= row['size']
+                        removed += 1
+                        freed += row['size']
+                        evicted.append(row['path'])
+                    if removed:
+                        self._count(conn, 'evicted_files', removed)
+                        self._count(conn, 'evicted_bytes', freed)
+                    conn.execute('COMMIT')
+                except Exception:
+                    if conn.in_transaction:
+                        conn.execute('ROLLBACK')
+                    raise
+                finally:
+                    conn.close()
+            if evicted:
+                print(f"🧹 Звільнено місце, видалено файлів: {len(evicted)}")
+            return evicted
+        except Exception as e:
+            print(f"❌ Помилка очищення сховища: {e}")
+            return evicted
+
+    def compact(self, folder: str, now: float) -> List[str]:
+        """
+        Ущільнити файли папки, що не використовуються (не закріплені і давно не змінювались)
+
+        Ущільнена копія пишеться в тимчасовий файл без блокувань, а підміняє
+        оригінал лише в транзакції, де закріплення перевіряється знову: файл,
+        закріплений іншим процесом під час ущільнення, залишається як є.
+        Новий файл успадковує час доступу старого.
+
+        Returns:
+            Шляхи нових файлів
+        """
+        compact = self.compactors[folder]
+        compacted = []
+        with os.scandir(folder) as entries:
+            candidates = [os.path.normpath(entry.path) for entry in entries
+                          if entry.is_file() and self._is_managed_file(entry.name)]
+        conn = self._connect()
+        try:
+            pinned = self._pinned_paths(conn, now)
+            for path in candidates:
+                try:
+                    if path in pinned or now - os.path.getmtime(path) < self.BUSY_GRACE:
+                        continue
+                    result = compact(path)
+                except (OSError, EOFError) as e:
+                    print(f"❌ Помилка ущільнення файлу {path}: {e}")
+                    continue
+                if not result:
+                    continue
+                new_path = os.path.normpath(result[1])
+                if self._replace_compacted(conn, path, os.path.normpath(result[0]), new_path):
+                    compacted.append(new_path)
+            if compacted:
+                self._count(conn, 'compacted_files', len(compacted))
+        finally:
+            conn.close()
+        return compacted
+
+    @staticmethod
+    def _replace_compacted(conn: sqlite3.Connection, path: str, temp_path: str, new_path: str) -> bool:
+        """Підмінити файл ущільненою копією, якщо його не закріпили (інакше копія видаляється)"""
+        try:
+            # Новий pin чекає на завершення транзакції, тож файл не зникає з-під читача
+            conn.execute('BEGIN IMMEDIATE')
+            pinned = conn.execute('SELECT 1 FROM storage_pins WHERE path = ? AND pinned_until > ? LIMIT 1',
+                                  (path, time.time())).fetchone() is not None
+            if not pinned:
+                os.replace(temp_path, new_path)
+                os.remove(path)
+                conn.execute('''
+                    UPDATE OR REPLACE storage_files SET path = ?, size = ? WHERE path = ?
+                ''', (new_path, os.path.getsize(new_path), path))
+            conn.execute('COMMIT')
+            return not pinned
+        except OSError as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка заміни файлу {path} ущільненим: {e}")
+            return False
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, stat: str, amount: int):
+        conn.execute('''
+            INSERT INTO storage_stats (stat, value) VALUES (?, ?)
+            ON CONFLICT(stat) DO UPDATE SET value = value + excluded.value
+        ''', (stat, amount))
+
+    def get_usage(self) -> Dict[str, Any]:
+        """Зайняте місце та квота кожної папки, кількість та обсяг витіснених файлів"""
+        usage: Dict[str, Any] = {'folders': {}, 'evicted_files': 0, 'evicted_bytes': 0}
+        conn = self._connect()
+        try:
+            for folder, quota in self.quotas.items():
+                row = conn.execute('SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS bytes FROM storage_files '
+                                   'WHERE folder = ?', (folder,)).fetchone()
+                usage['folders'][folder] = {'files': row['files'], 'bytes': row['bytes'], 'quota': quota}
+            for row in conn.execute('SELECT stat, value FROM storage_stats'):
+                usage[row['stat']] = row['value']
+            return usage
+        finally:
+            conn.close()
+
+    async def enforce_async(self) -> List[str]:
+        """Перевірити квоти у пулі потоків, не блокуючи event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.enforce)
+
+    def request_eviction(self):
+        """Запланувати перевірку квот у фоні (повторні запити об'єднуються)"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if not self._pending or self._pending.done():
+            self._pending = asyncio.create_task(self.enforce_async())
+
+    def start(self):
+        """Запустити періодичну перевірку квот"""
+        if not self._task:
+            self._task = asyncio.create_task(self._eviction_loop())
+
+    async def stop(self):
+        tasks = [task for task in (self._task, self._pending) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._pending = None
+
+    async def _eviction_loop(self):
+        while True:
+            await self.enforce_async()
+            await asyncio.sleep(self.eviction_interval)
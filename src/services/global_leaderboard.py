@@ -0,0 +1,170 @@
+"""
+Глобальний рейтинг усіх зареєстрованих гравців
+"""
+import heapq
+import math
+import sqlite3
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Tuple
+
+import numpy as np
+
+from src.models.user import UserDatabase
+from src.services.leaderboards import LeaderboardStore
+
+
+class GlobalLeaderboard:
+    """
+    Попередньо обчислений рейтинг усіх користувачів бота за Impact Score
+
+    Фонове завдання періодично перераховує рейтинг з кешу статистики
+    (`player_stats_cache`) без звернень до Steam: топ-k гравців відбирається
+    купою та зберігається з позиціями, для решти зберігаються межі
+    перцентилів. Сторінки /leaderboard читаються прямо з цієї таблиці.
+    """
+
+    PERCENTILES = (50, 75, 90, 95, 99)
+
+    def __init__(self, user_db: UserDatabase, leaderboards: LeaderboardStore, top_k: int = 500, page_size: int = 10):
+        self.user_db = user_db
+        self.leaderboards = leaderboards
+        self.db_path = user_db.db_path
+        self.top_k = top_k
+        self.page_size = page_size
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиць глобального рейтингу"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS global_leaderboard (
+                    position INTEGER PRIMARY KEY,
+                    steam_id TEXT NOT NULL,
+                    name TEXT,
+                    impact_score REAL NOT NULL,
+                    kd_ratio REAL,
+                    win_rate REAL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS global_leaderboard_bands (
+                    percentile INTEGER PRIMARY KEY,
+                    impact_score REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS global_leaderboard_meta (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total_players INTEGER NOT NULL,
+                    refreshed_at TEXT NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def refresh(self) -> int:
+        """
+        Перерахувати рейтинг з кешованої статистики
+
+        Виклик блокуючий (SQLite та NumPy) - з event loop його слід запускати
+        через `run_in_executor`.
+
+        Returns:
+            Кількість гравців у рейтингу
+        """
+        steam_ids = [user.steam_id for user in self.user_db.get_all_users_with_steam()]
+        players = self.leaderboards.get_scores(steam_ids)
+
+        # Топ-k купою за O(N log k); для однакових Impact Score - за Steam ID
+        top = heapq.nsmallest(self.top_k, players, key=lambda player: (-player['impact_score'], player['steam_id']))
+
+        impact_scores = np.fromiter((player['impact_score'] for player in players), dtype=np.float64,
+                                    count=len(players))
+        bands = np.percentile(impact_scores, self.PERCENTILES).tolist() if len(players) else []
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM global_leaderboard')
+            conn.executemany('''
+                INSERT INTO global_leaderboard (position, steam_id, name, impact_score, kd_ratio, win_rate)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [(position, player['steam_id'], player['name'], player['impact_score'],
+                   player['kd_ratio'], player['win_rate']) for position, player in enumerate(top, 1)])
+            conn.execute('DELETE FROM global_leaderboard_bands')
+            conn.executemany('''
+                INSERT INTO global_leaderboard_bands (percentile, impact_score) VALUES (?, ?)
+            ''', list(zip(self.PERCENTILES, bands)))
+            conn.execute('''
+                INSERT OR REPLACE INTO global_leaderboard_meta (id, total_players, refreshed_at) VALUES (1, ?, ?)
+            ''', (len(players), datetime.now().isoformat()))
+            conn.execute('COMMIT')
+            return len(players)
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка оновлення глобального рейтингу: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def get_meta(self) -> Optional[Dict[str, Any]]:
+        """Кількість гравців та час останнього перерахунку (None, якщо рейтинг ще не рахувався)"""
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT total_players, refreshed_at FROM global_leaderboard_meta WHERE id = 1').fetchone()
+            if not row:
+                return None
+            return {'total_players': row['total_players'], 'refreshed_at': datetime.fromisoformat(row['refreshed_at'])}
+        finally:
+            conn.close()
+
+    def get_page(self, page: int) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Сторінка рейтингу
+
+        Returns:
+            Гравці сторінки (з позиціями) та кількість сторінок
+        """
+        conn = self._connect()
+        try:
+            ranked = conn.execute('SELECT COUNT(*) FROM global_leaderboard').fetchone()[0]
+            pages = max(1, math.ceil(ranked / self.page_size))
+            page = min(max(page, 1), pages)
+            rows = conn.execute('''
+                SELECT * FROM global_leaderboard WHERE position > ? AND position <= ? ORDER BY position
+            ''', ((page - 1) * self.page_size, page * self.page_size)).fetchall()
+            return [dict(row) for row in rows], pages
+        finally:
+            conn.close()
+
+    def get_standing(self, steam_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Місце гравця: точна позиція в топ-k або перцентиль для решти
+
+        Returns:
+            {'position': N} або {'top_percent': P} (гравець у кращих P%), None - немає статистики
+        """
+        conn = self._connect()
+        try:
+            row = conn.execute('SELECT position FROM global_leaderboard WHERE steam_id = ?', (steam_id,)).fetchone()
+            if row:
+                return {'position': row['position']}
+            bands = conn.execute('SELECT percentile, impact_score FROM global_leaderboard_bands ORDER BY percentile DESC').fetchall()
+        finally:
+            conn.close()
+
+        player = self.leaderboards.get_scores([steam_id])
+        if not player:
+            return None
+        impact_score = player[0]['impact_score']
+        for band in bands:
+            if impact_score >= band['impact_score']:
+                return {'top_percent': 100 - band['percentile']}
+        return {'top_percent': 100}
@@ -0,0 +1,275 @@
+"""
+Матеріалізовані рейтинги груп друзів та кеш статистики гравців
+"""
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterable
+
+from src.services.steam_api import SteamAPI
+from src.services.stats_snapshot import PlayerStatsSnapshot
+from src.services.rank_snapshots import RankSnapshotStore
+
+
+class LeaderboardStore:
+    """
+    Рейтинги груп друзів у SQLite, спільні для /friends_stats, /compare та щоденних звітів
+
+    Статистика кожного гравця зберігається в `player_stats_cache` після кожного
+    завантаження зі Steam. Рейтинг групи (користувач + друзі) зберігається вже
+    відсортованим у `friend_leaderboards`; коли оновлюється статистика будь-кого
+    з учасників, перераховуються лише групи, до яких він входить. Групи з
+    однаковим складом мають спільний рейтинг (ключ - як у знімків рейтингу).
+    """
+
+    # Статистика, старша за цей вік, завантажується зі Steam повторно при читанні
+    MAX_AGE = timedelta(hours=24)
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиць кешу та рейтингів"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS player_stats_cache (
+                    steam_id TEXT PRIMARY KEY,
+                    name TEXT,
+                    impact_score REAL NOT NULL,
+                    kd_ratio REAL,
+                    win_rate REAL,
+                    stats TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS friend_groups (
+                    group_key TEXT PRIMARY KEY,
+                    members TEXT NOT NULL,
+                    last_read_at TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS friend_group_members (
+                    steam_id TEXT NOT NULL,
+                    group_key TEXT NOT NULL,
+                    PRIMARY KEY (steam_id, group_key)
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS friend_leaderboards (
+                    group_key TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    steam_id TEXT NOT NULL,
+                    name TEXT,
+                    impact_score REAL NOT NULL,
+                    kd_ratio REAL,
+                    win_rate REAL,
+                    PRIMARY KEY (group_key, position)
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def record_snapshot(self, snapshot: PlayerStatsSnapshot):
+        """Зберегти статистику зі знімка та перерахувати рейтинги груп її гравців"""
+        if not snapshot.stats:
+            return
+
+        now = datetime.now().isoformat()
+        steam_ids = list(snapshot.stats)
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Знімок без імені гравця (не завантажено профіль) не затирає збережене ім'я
+            conn.executemany('''
+                INSERT INTO player_stats_cache
+                    (steam_id, name, impact_score, kd_ratio, win_rate, stats, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(steam_id) DO UPDATE SET
+                    name = COALESCE(excluded.name, player_stats_cache.name),
+                    impact_score = excluded.impact_score, kd_ratio = excluded.kd_ratio,
+                    win_rate = excluded.win_rate, stats = excluded.stats, updated_at = excluded.updated_at
+            ''', [(steam_id, snapshot.names.get(steam_id), snapshot.get_impact_score(steam_id),
+                   stats.get('kd_ratio', 0), stats.get('win_rate', 0), json.dumps(stats), now)
+                  for steam_id, stats in snapshot.stats.items()])
+
+            # Лише групи, до яких входить хтось з оновлених гравців
+            group_keys = set()
+            for i in range(0, len(steam_ids), 500):
+                chunk = steam_ids[i:i + 500]
+                rows = conn.execute(f'''
+                    SELECT DISTINCT group_key FROM friend_group_members WHERE steam_id IN ({','.join('?' * len(chunk))})
+                ''', chunk).fetchall()
+                group_keys.update(row['group_key'] for row in rows)
+
+            for group_key in group_keys:
+                row = conn.execute('SELECT members FROM friend_groups WHERE group_key = ?', (group_key,)).fetchone()
+                if row:
+                    self._materialize(conn, group_key, row['members'].split(','))
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка оновлення рейтингів друзів: {e}")
+        finally:
+            conn.close()
+
+    def record_player(self, steam_id: str, stats: Dict[str, Any], impact_score: float, name: str = None):
+        """Зберегти статистику одного гравця, отриману поза знімком (наприклад, через /stats)"""
+        snapshot = PlayerStatsSnapshot()
+        snapshot.stats[steam_id] = stats
+        snapshot.impact_scores[steam_id] = impact_score
+        if name:
+            snapshot.names[steam_id] = name
+        self.record_snapshot(snapshot)
+
+    def _materialize(self, conn: sqlite3.Connection, group_key: str, members: List[str]):
+        """Перерахувати збережений рейтинг групи з кешу статистики"""
+        rows = conn.execute(f'''
+            SELECT steam_id, COALESCE(name, 'Невідомо') AS name, impact_score, kd_ratio, win_rate
+            FROM player_stats_cache WHERE steam_id IN ({','.join('?' * len(members))})
+        ''', members).fetchall()
+        ranked = sorted(rows, key=lambda row: (-row['impact_score'], row['steam_id']))
+
+        conn.execute('DELETE FROM friend_leaderboards WHERE group_key = ?', (group_key,))
+        conn.executemany('''
+            INSERT INTO friend_leaderboards (group_key, position, steam_id, name, impact_score, kd_ratio, win_rate)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(group_key, position, row['steam_id'], row['name'], row['impact_score'], row['kd_ratio'], row['win_rate'])
+              for position, row in enumerate(ranked, 1)])
+
+    def get_leaderboard(self, steam_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """
+        Рейтинг групи гравців з бази (без звернень до Steam)
+
+        Група реєструється при першому читанні, після чого її рейтинг
+        підтримується актуальним при кожному оновленні статистики учасників.
+        """
+        members = sorted(set(steam_id for steam_id in steam_ids if steam_id))
+        if not members:
+            return []
+
+        group_key = RankSnapshotStore.group_key(members)
+        now = datetime.now()
+        conn = self._connect()
+        try:
+            group = conn.execute('SELECT last_read_at FROM friend_groups WHERE group_key = ?', (group_key,)).fetchone()
+            if group is None:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute('''
+                    INSERT OR IGNORE INTO friend_groups (group_key, members, last_read_at) VALUES (?, ?, ?)
+                ''', (group_key, ','.join(members), now.isoformat()))
+                conn.executemany('''
+                    INSERT OR IGNORE INTO friend_group_members (steam_id, group_key) VALUES (?, ?)
+                ''', [(steam_id, group_key) for steam_id in members])
+                self._materialize(conn, group_key, members)
+                conn.execute('COMMIT')
+            elif datetime.fromisoformat(group['last_read_at']) < now - timedelta(days=1):
+                # Час читання потрібен лише для очищення, тож оновлюємо його не частіше разу на добу
+                conn.execute('UPDATE friend_groups SET last_read_at = ? WHERE group_key = ?',
+                             (now.isoformat(), group_key))
+
+            rows = conn.execute('''
+                SELECT position, steam_id, name, impact_score, kd_ratio, win_rate FROM friend_leaderboards
+                WHERE group_key = ? ORDER BY position
+            ''', (group_key,)).fetchall()
+            return [dict(row) for row in rows]
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get_players(self, steam_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Кешована статистика гравців: steam_id -> name, impact_score, stats, updated_at"""
+        steam_ids = list(dict.fromkeys(steam_ids))
+        result = {}
+        conn = self._connect()
+        try:
+            for i in range(0, len(steam_ids), 500):
+                chunk = steam_ids[i:i + 500]
+                rows = conn.execute(f'''
+                    SELECT steam_id, name, impact_score, stats, updated_at FROM player_stats_cache
+                    WHERE steam_id IN ({','.join('?' * len(chunk))})
+                ''', chunk).fetchall()
+                for row in rows:
+                    result[row['steam_id']] = {
+                        'name': row['name'],
+                        'impact_score': row['impact_score'],
+                        'stats': json.loads(row['stats']),
+                        'updated_at': datetime.fromisoformat(row['updated_at'])
+                    }
+            return result
+        finally:
+            conn.close()
+
+    def get_scores(self, steam_ids: Iterable[str]) -> List[Dict[str, Any]]:
+        """Імена та основні показники гравців без розбору повної статистики"""
+        steam_ids = list(dict.fromkeys(steam_ids))
+        result = []
+        conn = self._connect()
+        try:
+            for i in range(0, len(steam_ids), 500):
+                chunk = steam_ids[i:i + 500]
+                rows = conn.execute(f'''
+                    SELECT steam_id, COALESCE(name, 'Невідомо') AS name, impact_score, kd_ratio, win_rate
+                    FROM player_stats_cache WHERE steam_id IN ({','.join('?' * len(chunk))})
+                ''', chunk).fetchall()
+                result.extend(dict(row) for row in rows)
+            return result
+        finally:
+            conn.close()
+
+    def get_stale(self, steam_ids: Iterable[str], max_age: timedelta = None) -> List[str]:
+        """Гравці без кешованої статистики або зі статистикою, старшою за `max_age`"""
+        max_age = self.MAX_AGE if max_age is None else max_age
+        steam_ids = list(dict.fromkeys(steam_id for steam_id in steam_ids if steam_id))
+        cached = self.get_players(steam_ids)
+        deadline = datetime.now() - max_age
+        return [steam_id for steam_id in steam_ids
+                if steam_id not in cached or cached[steam_id]['updated_at'] <= deadline]
+
+    async def refresh(self, steam_api: SteamAPI, steam_ids: Iterable[str], max_age: timedelta = None,
+                      concurrency: int = 8) -> Optional[PlayerStatsSnapshot]:
+        """
+        Завантажити зі Steam лише відсутніх або застарілих гравців
+
+        Returns:
+            Знімок завантажених гравців (None, якщо всі дані актуальні)
+        """
+        stale = self.get_stale(steam_ids, max_age)
+        if not stale:
+            return None
+        snapshot = await PlayerStatsSnapshot.build(steam_api, stale, concurrency)
+        self.record_snapshot(snapshot)
+        return snapshot
+
+    def purge(self, keep_days: int = 30) -> int:
+        """Видалити групи, які давно ніхто не читав (наприклад, після зміни списку друзів)"""
+        cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            keys = [row['group_key'] for row in conn.execute(
+                'SELECT group_key FROM friend_groups WHERE last_read_at < ?', (cutoff,)).fetchall()]
+            for group_key in keys:
+                conn.execute('DELETE FROM friend_leaderboards WHERE group_key = ?', (group_key,))
+                conn.execute('DELETE FROM friend_group_members WHERE group_key = ?', (group_key,))
+                conn.execute('DELETE FROM friend_groups WHERE group_key = ?', (group_key,))
+            conn.execute('COMMIT')
+            return len(keys)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
@@ -10,17 +10,26 @@ from telegram.error import TelegramError
 
 from src.services.steam_api import SteamAPI
 from src.services.demo_analyzer import DemoAnalyzer
-from src.models.user import UserDatabase, MatchAnalysis
+from src.services.analysis_cache import AnalysisCache
+from src.services.demo_job_queue import DemoJobQueue, PRIORITY_MONITOR
+from src.services.outbox import MessageOutbox
+from src.services.notification_coalescer import NotificationCoalescer
+from src.models.user import UserDatabase
 
 
 class MatchMonitor:
     def __init__(self, steam_api_key: str, bot_token: str, user_db: UserDatabase):
         self.steam_api = SteamAPI(steam_api_key)
-        self.demo_analyzer = DemoAnalyzer(steam_api_key)
+        self.demo_analyzer = DemoAnalyzer(
+            steam_api_key, analysis_cache=AnalysisCache(user_db.db_path, DemoAnalyzer.ANALYZER_VERSION))
         self.bot = Bot(token=bot_token)
         self.user_db = user_db
+        self.demo_queue = DemoJobQueue(user_db.db_path)
+        self.outbox = MessageOutbox(user_db.db_path)
+        self.coalescer = NotificationCoalescer(user_db.db_path, self.outbox)
         self.monitoring_interval = 300  # 5 хвилин
         self.last_match_cache = {}  # Кеш останніх матчів для кожного гравця
+        self.shard_filter = None  # Фільтр гравців для режиму воркерів (steam_id -> bool)
     
     async def start_monitoring(self):
         """Запустити моніторинг матчів"""
@@ -37,58 +46,102 @@ class MatchMonitor:
     async def check_all_users_matches(self):
         """Перевірити матчі всіх користувачів з увімкненим моніторингом"""
         users = self.user_db.get_users_with_monitoring()
+        subscribers = self.group_users_by_steam_id(users)
         
+        # У режимі воркерів перевіряємо лише гравців з власних шардів
+        if self.shard_filter:
+            subscribers = {steam_id: player_users for steam_id, player_users in subscribers.items()
+                           if self.shard_filter(steam_id)}
+        
+        if len(subscribers) < len(users):
+            print(f"👥 {len(users)} підписок на {len(subscribers)} унікальних гравців")
+        
+        # Кожного гравця перевіряємо один раз, навіть якщо його моніторять кілька користувачів
+        for steam_id, player_users in subscribers.items():
+            try:
+                await self.check_player_last_match(steam_id, player_users)
+            except Exception as e:
+                print(f"❌ Помилка перевірки матчу для {steam_id}: {e}")
+    
+    def group_users_by_steam_id(self, users: List[Any]) -> Dict[str, List[Any]]:
+        """Згрупувати користувачів за Steam ID гравця, якого вони моніторять"""
+        subscribers = {}
         for user in users:
-            if user.steam_id:
-                try:
-                    await self.check_user_last_match(user)
-                except Exception as e:
-                    print(f"❌ Помилка перевірки матчу для {user.steam_id}: {e}")
+            if not user.steam_id:
+                continue
+            player_users = subscribers.setdefault(user.steam_id, [])
+            # Один чат отримує повідомлення лише один раз
+            if all(u.telegram_id != user.telegram_id for u in player_users):
+                player_users.append(user)
+        return subscribers
     
     async def check_user_last_match(self, user):
         """Перевірити останній матч конкретного гравця"""
+        await self.check_player_last_match(user.steam_id, [user])
+    
+    async def check_player_last_match(self, steam_id: str, users: List[Any]):
+        """Перевірити останній матч гравця та сповістити всіх його підписників"""
         try:
             # Отримуємо інформацію про останню активність
-            recent_activity = await self.steam_api.get_recent_activity(user.steam_id)
+            recent_activity = await self.steam_api.get_recent_activity(steam_id)
             
             if not recent_activity:
                 return
             
             # Перевіряємо чи є новий матч
             current_match_id = recent_activity.get('last_match_id')
-            last_known_match = self.last_match_cache.get(user.steam_id)
+            last_known_match = self.last_match_cache.get(steam_id)
+            if last_known_match is None:
+                # Після перезапуску або передачі шарду беремо стан з бази
+                last_known_match = self.user_db.get_last_seen_match(steam_id)
             
             if current_match_id and current_match_id != last_known_match:
                 # Новий матч знайдено!
-                print(f"🎯 Новий матч для {user.steam_id}: {current_match_id}")
+                print(f"🎯 Новий матч для {steam_id}: {current_match_id} ({len(users)} підписників)")
                 
                 # Оновлюємо кеш
-                self.last_match_cache[user.steam_id] = current_match_id
+                self.last_match_cache[steam_id] = current_match_id
+                self.user_db.set_last_seen_match(steam_id, current_match_id)
                 
                 # Аналізуємо матч
-                await self.analyze_and_notify_match(user, current_match_id, recent_activity)
+                await self.analyze_and_notify_match(users, current_match_id, recent_activity)
             
         except Exception as e:
-            print(f"❌ Помилка перевірки матчу для {user.steam_id}: {e}")
+            print(f"❌ Помилка перевірки матчу для {steam_id}: {e}")
     
-    async def analyze_and_notify_match(self, user, match_id: str, recent_activity: Dict[str, Any]):
-        """Аналізувати матч та надіслати повідомлення"""
+    async def analyze_and_notify_match(self, users: List[Any], match_id: str, recent_activity: Dict[str, Any]):
+        """Аналізувати матч та надіслати повідомлення всім підписникам гравця"""
+        if not users:
+            return
+        
+        # Усі користувачі в групі моніторять одного й того ж гравця
+        player = users[0]
+        
         try:
             # Отримуємо детальну статистику останнього матчу
-            last_match_stats = await self.steam_api.get_player_stats(user.steam_id, "last_match")
+            last_match_stats = await self.steam_api.get_player_stats(player.steam_id, "last_match")
             
             if not last_match_stats:
                 print(f"❌ Не вдалося отримати статистику матчу {match_id}")
                 return
             
             # Створюємо повідомлення про матч
-            match_message = self.create_match_notification(user, match_id, last_match_stats, recent_activity)
+            match_message = self.create_match_notification(player, match_id, last_match_stats, recent_activity)
+            match_summary = self.create_match_summary(last_match_stats, recent_activity)
             
-            # Надсилаємо повідомлення користувачу
-            await self.send_match_notification(user.telegram_id, match_message)
+            # Надсилаємо повідомлення кожному підписнику (з урахуванням його вікна дайджесту)
+            for user in users:
+                self.coalescer.add(
+                    user.telegram_id,
+                    player.steam_id,
+                    'match',
+                    match_id,
+                    {'text': match_message, 'summary': match_summary},
+                    window=user.notification_window * 60
+                )
             
-            # Аналізуємо демо якщо можливо
-            await self.analyze_match_demo(user, match_id)
+            # Аналіз демо виконується у фоні (одне завдання для всіх підписників)
+            self.enqueue_match_demo(users, match_id)
             
         except Exception as e:
             print(f"❌ Помилка аналізу матчу {match_id}: {e}")
@@ -136,65 +189,33 @@ class MatchMonitor:
             print(f"❌ Помилка створення повідомлення: {e}")
             return f"🎮 Матч завершено! Match ID: {match_id}"
     
-    async def send_match_notification(self, telegram_id: int, message: str):
-        """Надіслати повідомлення про матч"""
-        try:
-            await self.bot.send_message(
-                chat_id=telegram_id,
-                text=message,
-                parse_mode='Markdown'
-            )
-            print(f"✅ Повідомлення надіслано користувачу {telegram_id}")
-        except TelegramError as e:
-            print(f"❌ Помилка надсилання повідомлення: {e}")
+    def create_match_summary(self, stats: Dict[str, Any], recent_activity: Dict[str, Any]) -> Dict[str, Any]:
+        """Коротка інформація про матч для рядка дайджесту"""
+        player_name = recent_activity.get('player_name')
+        return {
+            # Ім'я гравця в заголовку дайджесту (None, якщо Steam його не повернув)
+            'player_name': player_name if player_name != 'Невідомо' else None,
+            'map': recent_activity.get('last_match_map', 'Невідомо'),
+            'result': recent_activity.get('last_match_result', 'Невідомо'),
+            'kills': stats.get('kills', 0),
+            'deaths': stats.get('deaths', 0),
+            'damage': stats.get('damage', 0)
+        }
     
-    async def analyze_match_demo(self, user, match_id: str):
-        """Аналізувати демо матчу"""
-        try:
-            print(f"🎬 Початок аналізу демо матчу {match_id}...")
-            
-            # Завантажуємо демо
-            demo_path = await self.demo_analyzer.download_demo(user.steam_id, match_id)
-            
-            if not demo_path:
-                print(f"❌ Не вдалося завантажити демо для матчу {match_id}")
-                return
-            
-            # Аналізуємо демо
-            analysis_result = await self.demo_analyzer.analyze_demo(demo_path, user.steam_id, match_id)
-            
-            if analysis_result:
-                # Зберігаємо аналіз в базу даних
-                match_analysis = MatchAnalysis(
-                    steam_id=user.steam_id,
-                    match_id=match_id,
-                    match_date=datetime.now(),
-                    demo_path=demo_path
-                )
-                match_analysis.analyzed = True
-                match_analysis.analysis_data = analysis_result
-                
-                self.user_db.save_match_analysis(match_analysis)
-                
-                # Створюємо детальний звіт
-                detailed_report = await self.demo_analyzer.get_analysis_summary(analysis_result)
-                
-                # Надсилаємо детальний звіт
-                await self.bot.send_message(
-                    chat_id=user.telegram_id,
-                    text=f"📊 **Детальний аналіз матчу {match_id}:**\n\n{detailed_report}",
-                    parse_mode='Markdown'
-                )
-                
-                # Видаляємо демо-файл
-                await self.demo_analyzer.cleanup_demo(demo_path)
-                
-                print(f"✅ Аналіз демо матчу {match_id} завершено")
-            else:
-                print(f"❌ Помилка аналізу демо матчу {match_id}")
-                
-        except Exception as e:
-            print(f"❌ Помилка аналізу демо: {e}")
+    def enqueue_match_demo(self, users: List[Any], match_id: str) -> Optional[int]:
+        """Поставити аналіз демо матчу в чергу (аналіз виконують воркери черги)"""
+        if not users:
+            return None
+        
+        job_id = self.demo_queue.enqueue(
+            match_id,
+            users[0].steam_id,
+            [user.telegram_id for user in users],
+            priority=PRIORITY_MONITOR
+        )
+        if job_id:
+            print(f"📥 Аналіз демо матчу {match_id} додано в чергу (завдання #{job_id})")
+        return job_id
     
     async def get_user_match_history(self, steam_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Отримати історію матчів гравця"""
@@ -1,6 +1,13 @@
 """
 Сервіс для запуску моніторингу матчів
+
+Звичайний режим:
+    python src/services/match_monitor_service.py
+
+Режим воркерів (кілька процесів ділять гравців через оренди в спільній базі):
+    python src/services/match_monitor_service.py --worker --shards 16
 """
+import argparse
 import asyncio
 import os
 import sys
@@ -12,34 +19,75 @@ sys.path.insert(0, str(project_root))
 
 from src.models.user import UserDatabase
 from src.services.match_monitor import MatchMonitor
+from src.services.monitor_leases import MonitorLeaseManager
+from src.services.demo_job_queue import DemoAnalysisWorkerPool
+from src.services.outbox import OutboxSender
+
 
+async def run_lease_heartbeats(lease_manager: MonitorLeaseManager):
+    """Періодично продовжувати оренди та перебалансовувати шарди"""
+    interval = max(lease_manager.lease_ttl / 3, 1)
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # SQLite може чекати на блокування до 30 секунд - не блокуємо event loop
+            await loop.run_in_executor(None, lease_manager.heartbeat)
+        except Exception as e:
+            # Якщо heartbeat не вдається довше за lease_ttl, воркер сам відпускає шарди
+            print(f"❌ Помилка heartbeat воркера: {e}")
 
-async def start_match_monitoring():
+
+async def start_match_monitoring(worker: bool = False, worker_id: str = None, num_shards: int = 16,
+                                 lease_ttl: int = 90, db_path: str = None, interval: int = None):
     """Запустити моніторинг матчів"""
+    monitor = None
+    lease_manager = None
+    heartbeat_task = None
+    demo_workers = None
+    outbox_sender = None
     try:
         # Ініціалізуємо базу даних
-        db_path = os.path.join(project_root, "data", "users.db")
+        db_path = db_path or os.getenv("DATABASE_PATH", os.path.join(project_root, "data", "users.db"))
         user_db = UserDatabase(db_path)
-        
+
         # Отримуємо токен бота з змінних середовища
         bot_token = os.getenv("BOT_TOKEN")
         if not bot_token:
             print("❌ BOT_TOKEN не знайдено в змінних середовища")
             return
-        
+
         # Отримуємо Steam API ключ
         steam_api_key = os.getenv("STEAM_API_KEY")
         if not steam_api_key:
             print("❌ STEAM_API_KEY не знайдено в змінних середовища")
             return
-        
+
         # Створюємо монітор
         monitor = MatchMonitor(steam_api_key, bot_token, user_db)
-        
+        if interval:
+            monitor.monitoring_interval = interval
+
+        if worker:
+            # Кожен воркер перевіряє лише гравців зі своїх шардів
+            lease_manager = MonitorLeaseManager(db_path, worker_id, num_shards, lease_ttl)
+            lease_manager.heartbeat()
+            monitor.shard_filter = lease_manager.owns
+            heartbeat_task = asyncio.create_task(run_lease_heartbeats(lease_manager))
+            print(f"🧩 Режим воркера: {lease_manager.worker_id}, шардів всього: {num_shards}")
+
+        # Воркери черги аналізу демо та відправник outbox працюють паралельно з перевіркою матчів
+        outbox_sender = OutboxSender(monitor.outbox, monitor.bot)
+        outbox_sender.start()
+        monitor.coalescer.start()
+        demo_workers = DemoAnalysisWorkerPool(monitor.demo_queue, monitor.demo_analyzer, user_db, monitor.outbox,
+                                              coalescer=monitor.coalescer)
+        demo_workers.start()
+
         print("🎮 Запуск моніторингу матчів...")
-        print("📊 Перевірка кожні 5 хвилин")
+        print(f"📊 Перевірка кожні {monitor.monitoring_interval} секунд")
         print("👥 Користувачі з увімкненим моніторингом:")
-        
+
         # Показуємо користувачів з увімкненим моніторингом
         users_with_monitoring = user_db.get_users_with_monitoring()
         if users_with_monitoring:
@@ -47,17 +95,52 @@ async def start_match_monitoring():
                 print(f"   • {user.username or user.telegram_id} (Steam: {user.steam_id})")
         else:
             print("   Немає користувачів з увімкненим моніторингом")
-        
+
         print("\n🔄 Моніторинг запущено. Натисніть Ctrl+C для зупинки.")
-        
+
         # Запускаємо моніторинг
         await monitor.start_monitoring()
-        
+
     except KeyboardInterrupt:
         print("\n🛑 Моніторинг зупинено користувачем")
     except Exception as e:
         print(f"❌ Помилка моніторингу: {e}")
+    finally:
+        if demo_workers:
+            await demo_workers.stop()
+        if monitor:
+            await monitor.coalescer.stop()
+        if outbox_sender:
+            await outbox_sender.stop()
+        if heartbeat_task:
+            heartbeat_task.cancel()
+        if lease_manager:
+            # Звільняємо шарди одразу, щоб інші воркери не чекали спливання оренд
+            lease_manager.release_all()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Моніторинг матчів CS2")
+    parser.add_argument("--worker", action="store_true", help="режим воркера з орендою шардів")
+    parser.add_argument("--worker-id", default=os.getenv("MONITOR_WORKER_ID"), help="ідентифікатор воркера")
+    parser.add_argument("--shards", type=int, default=int(os.getenv("MONITOR_SHARDS", "16")), help="кількість шардів")
+    parser.add_argument("--lease-ttl", type=int, default=int(os.getenv("MONITOR_LEASE_TTL", "90")),
+                        help="час життя оренди в секундах")
+    parser.add_argument("--db", default=None, help="шлях до бази даних")
+    parser.add_argument("--interval", type=int, default=None, help="інтервал перевірки в секундах")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(start_match_monitoring())
+    args = parse_args()
+    try:
+        asyncio.run(start_match_monitoring(
+            worker=args.worker,
+            worker_id=args.worker_id,
+            num_shards=args.shards,
+            lease_ttl=args.lease_ttl,
+            db_path=args.db,
+            interval=args.interval
+        ))
+    except KeyboardInterrupt:
+        print("\n🛑 Моніторинг зупинено користувачем")
@@ -0,0 +1,172 @@
+"""
+Оренда шардів гравців для кількох процесів моніторингу матчів
+"""
+import os
+import socket
+import sqlite3
+import time
+import uuid
+import zlib
+from typing import List, Optional, Set
+
+
+class MonitorLeaseManager:
+    """
+    Розподіляє гравців між воркерами моніторингу через таблицю оренд у спільній SQLite базі.
+
+    Кожен Steam ID належить одному з `num_shards` шардів. Воркер періодично надсилає
+    heartbeat, продовжує свої оренди, забирає вільні шарди до своєї справедливої частки
+    та віддає зайві. Якщо воркер падає, його оренди спливають через `lease_ttl` секунд
+    і розбираються іншими воркерами. Так само воркер, у якого heartbeat не вдається
+    (наприклад, база заблокована), перестає вважати шарди своїми, щойно спливає
+    термін останньої успішно продовженої оренди.
+    """
+
+    def __init__(self, db_path: str, worker_id: str = None, num_shards: int = 16, lease_ttl: int = 90):
+        self.db_path = db_path
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.num_shards = num_shards
+        self.lease_ttl = lease_ttl
+        self.owned_shards: Set[int] = set()
+        # Коли спливають оренди, продовжені останнім успішним heartbeat
+        self.leases_expire_at = 0.0
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None - транзакціями керуємо вручну (BEGIN IMMEDIATE)
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиць воркерів та оренд"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS monitor_workers (
+                    worker_id TEXT PRIMARY KEY,
+                    heartbeat_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS monitor_leases (
+                    shard INTEGER PRIMARY KEY,
+                    worker_id TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def shard_for(self, steam_id: str) -> int:
+        """Номер шарду для Steam ID (стабільний між процесами)"""
+        return zlib.crc32(str(steam_id).encode()) % self.num_shards
+
+    def owns(self, steam_id: str, now: Optional[float] = None) -> bool:
+        """Чи належить гравець шардам цього воркера (лише поки оренди не спливли)"""
+        now = time.time() if now is None else now
+        if now >= self.leases_expire_at:
+            self._drop_expired_leases(now)
+            return False
+        return self.shard_for(steam_id) in self.owned_shards
+
+    def _drop_expired_leases(self, now: float):
+        """Забути шарди, оренди яких могли вже перейти до інших воркерів"""
+        if self.owned_shards and now >= self.leases_expire_at:
+            print(f"⚠️ Воркер {self.worker_id}: оренди спливли без heartbeat, шарди {sorted(self.owned_shards)} звільнено")
+            self.owned_shards = set()
+
+    def heartbeat(self, now: Optional[float] = None) -> Set[int]:
+        """
+        Оновити heartbeat воркера та перебалансувати оренди
+
+        Returns:
+            Множина шардів, якими володіє воркер після балансування
+        """
+        now = time.time() if now is None else now
+        expires_at = now + self.lease_ttl
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+
+            # Реєструємо себе та прибираємо мертвих воркерів і прострочені оренди
+            conn.execute('''
+                INSERT INTO monitor_workers (worker_id, heartbeat_at, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(worker_id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at, expires_at = excluded.expires_at
+            ''', (self.worker_id, now, expires_at))
+            conn.execute('DELETE FROM monitor_workers WHERE expires_at < ?', (now,))
+            conn.execute('DELETE FROM monitor_leases WHERE expires_at < ?', (now,))
+
+            workers = [row[0] for row in conn.execute('SELECT worker_id FROM monitor_workers ORDER BY worker_id')]
+            target = self._fair_share(workers)
+
+            # Продовжуємо власні оренди
+            conn.execute('UPDATE monitor_leases SET expires_at = ? WHERE worker_id = ?', (expires_at, self.worker_id))
+            owned = sorted(row[0] for row in conn.execute(
+                'SELECT shard FROM monitor_leases WHERE worker_id = ?', (self.worker_id,)
+            ))
+
+            if len(owned) > target:
+                # Віддаємо зайві шарди новим воркерам
+                released = owned[target:]
+                conn.executemany('DELETE FROM monitor_leases WHERE shard = ? AND worker_id = ?',
+                                 [(shard, self.worker_id) for shard in released])
+                owned = owned[:target]
+            elif len(owned) < target:
+                # Забираємо вільні шарди до своєї частки
+                taken = {row[0] for row in conn.execute('SELECT shard FROM monitor_leases')}
+                free = [shard for shard in range(self.num_shards) if shard not in taken]
+                claimed = free[:target - len(owned)]
+                conn.executemany('INSERT INTO monitor_leases (shard, worker_id, expires_at) VALUES (?, ?, ?)',
+                                 [(shard, self.worker_id, expires_at) for shard in claimed])
+                owned = sorted(owned + claimed)
+
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self._drop_expired_leases(now)
+            raise
+        finally:
+            conn.close()
+
+        self.leases_expire_at = expires_at
+        if set(owned) != self.owned_shards:
+            print(f"🔀 Воркер {self.worker_id}: шарди {owned} ({len(workers)} активних воркерів)")
+        self.owned_shards = set(owned)
+        return self.owned_shards
+
+    def _fair_share(self, workers: List[str]) -> int:
+        """Кількість шардів, яку має тримати цей воркер"""
+        if self.worker_id not in workers:
+            return 0
+        base, extra = divmod(self.num_shards, len(workers))
+        return base + (1 if workers.index(self.worker_id) < extra else 0)
+
+    def release_all(self):
+        """Звільнити всі оренди воркера (при штатній зупинці)"""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM monitor_leases WHERE worker_id = ?', (self.worker_id,))
+            conn.execute('DELETE FROM monitor_workers WHERE worker_id = ?', (self.worker_id,))
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка звільнення оренд: {e}")
+        finally:
+            conn.close()
+        self.owned_shards = set()
+
+    def get_live_workers(self) -> List[str]:
+        """Отримати список активних воркерів"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT worker_id FROM monitor_workers WHERE expires_at >= ? ORDER BY worker_id',
+                                (time.time(),)).fetchall()
+            return [row[0] for row in rows]
+        finally:
+            conn.close()
@@ -0,0 +1,195 @@
+"""
+Об'єднання сповіщень про матчі, що йдуть один за одним, в один дайджест
+"""
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Optional, Dict, Any, List
+
+from src.services.outbox import MessageOutbox
+
+
+class NotificationCoalescer:
+    """
+    Буфер сповіщень про матчі з вікном об'єднання для кожного чату
+
+    Таблиця буфера має бути в тій самій базі, що й outbox.
+
+    Перше сповіщення про гравця відкриває вікно тривалістю `window` секунд; усі
+    сповіщення про того ж гравця для того ж чату, що прийшли до його закриття,
+    надсилаються одним повідомленням-дайджестом. Вікно 0 - надсилати одразу.
+    """
+
+    def __init__(self, db_path: str, outbox: MessageOutbox, flush_interval: float = 30.0):
+        self.db_path = db_path
+        self.outbox = outbox
+        self.flush_interval = flush_interval
+        self._task: Optional[asyncio.Task] = None
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиці буфера сповіщень"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pending_notifications (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    steam_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    match_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    flush_at REAL NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE INDEX IF NOT EXISTS idx_pending_notifications_group
+                ON pending_notifications (chat_id, steam_id, flush_at)
+            ''')
+        finally:
+            conn.close()
+
+    def add(self, chat_id: int, steam_id: str, kind: str, match_id: str, payload: Dict[str, Any], window: int = 0):
+        """
+        Додати сповіщення
+
+        Args:
+            kind: 'match' (результат матчу) або 'demo_analysis' (аналіз демо)
+            payload: 'text' - готове повідомлення для одиночного надсилання,
+                     'summary' - короткі дані для рядка дайджесту
+            window: Вікно об'єднання в секундах
+        """
+        if window <= 0:
+            self.outbox.enqueue(chat_id, payload['text'], parse_mode='Markdown')
+            return
+
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            # Приєднуємося до відкритого вікна або відкриваємо нове
+            row = conn.execute('''
+                SELECT MIN(flush_at) AS flush_at FROM pending_notifications WHERE chat_id = ? AND steam_id = ?
+            ''', (chat_id, steam_id)).fetchone()
+            flush_at = row['flush_at'] if row and row['flush_at'] else now + window
+
+            conn.execute('''
+                INSERT INTO pending_notifications (chat_id, steam_id, kind, match_id, payload, created_at, flush_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (chat_id, steam_id, kind, match_id, json.dumps(payload, ensure_ascii=False), now, flush_at))
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка буферизації сповіщення, надсилаємо одразу: {e}")
+            self.outbox.enqueue(chat_id, payload['text'], parse_mode='Markdown')
+        finally:
+            conn.close()
+
+    def flush_due(self, now: Optional[float] = None) -> int:
+        """
+        Надіслати всі групи, вікно яких закрилося
+
+        Returns:
+            Кількість надісланих повідомлень (дайджестів або одиночних)
+        """
+        now = time.time() if now is None else now
+        conn = self._connect()
+        try:
+            groups = conn.execute('''
+                SELECT chat_id, steam_id FROM pending_notifications
+                GROUP BY chat_id, steam_id
+                HAVING MIN(flush_at) <= ?
+            ''', (now,)).fetchall()
+
+            flushed = 0
+            for group in groups:
+                conn.execute('BEGIN IMMEDIATE')
+                rows = conn.execute('''
+                    SELECT * FROM pending_notifications WHERE chat_id = ? AND steam_id = ? ORDER BY created_at, id
+                ''', (group['chat_id'], group['steam_id'])).fetchall()
+                items = [dict(row, payload=json.loads(row['payload'])) for row in rows]
+
+                # Інший процес міг уже надіслати цю групу і відкрити нове вікно
+                if items and min(item['flush_at'] for item in items) <= now:
+                    # Дайджест потрапляє в outbox в тій самій транзакції, що й видалення з буфера
+                    self.outbox.enqueue_in_transaction(conn, group['chat_id'], self.render(items), parse_mode='Markdown')
+                    conn.executemany('DELETE FROM pending_notifications WHERE id = ?', [(item['id'],) for item in items])
+                    flushed += 1
+                conn.execute('COMMIT')
+            return flushed
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка надсилання дайджестів: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def render(self, items: List[Dict[str, Any]]) -> str:
+        """Одне сповіщення - як є, кілька - дайджест"""
+        if len(items) == 1:
+            return items[0]['payload']['text']
+
+        matches = [item for item in items if item['kind'] == 'match']
+        analyses = [item for item in items if item['kind'] == 'demo_analysis']
+        player_name = next((item['payload']['summary'].get('player_name') for item in items
+                            if item['payload'].get('summary', {}).get('player_name')), None)
+
+        title = f"🎮 **Дайджест матчів{' ' + player_name if player_name else ''}**"
+        lines = [title, ""]
+
+        if matches:
+            lines.append(f"📊 **Зіграно матчів: {len(matches)}**")
+            total_kills = total_deaths = total_damage = 0
+            for i, item in enumerate(matches, 1):
+                summary = item['payload'].get('summary', {})
+                kills = summary.get('kills', 0)
+                deaths = summary.get('deaths', 0)
+                total_kills += kills
+                total_deaths += deaths
+                total_damage += summary.get('damage', 0)
+                lines.append(
+                    f"{i}. {summary.get('map', 'Невідомо')} - {summary.get('result', 'Невідомо')} | "
+                    f"K/D {kills}/{deaths} ({round(kills / max(deaths, 1), 2)}) | `{item['match_id']}`"
+                )
+            lines.append("")
+            lines.append(f"📈 **Разом:** K/D **{total_kills}/{total_deaths}** "
+                         f"({round(total_kills / max(total_deaths, 1), 2)}), урон **{total_damage:,}**")
+
+        if analyses:
+            lines.append("")
+            lines.append("🎬 **Аналіз демо:**")
+            for item in analyses:
+                summary = item['payload'].get('summary', {})
+                lines.append(
+                    f"• `{item['match_id']}`: {summary.get('map', 'Невідомо')}, "
+                    f"K/D {summary.get('kd_ratio', 0)}, рейтинг {summary.get('overall_rating', 0)}/10"
+                )
+
+        lines.append("")
+        lines.append("💡 Використайте `/demo_history` для деталей кожного матчу")
+        return "\n".join(lines)
+
+    def start(self):
+        """Запустити періодичне надсилання дайджестів"""
+        if not self._task:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush_due()
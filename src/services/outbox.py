@@ -0,0 +1,397 @@
+"""
+Персистентна черга вихідних повідомлень (outbox) та сервіс її відправки в Telegram
+"""
+import asyncio
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
+
+from telegram.error import BadRequest, ChatMigrated, Forbidden, RetryAfter
+
+from src.services.rate_limiter import TelegramRateLimiter
+
+
+class MessageOutbox:
+    """
+    Таблиця вихідних повідомлень у SQLite
+
+    Продюсери лише додають повідомлення сюди, надсилає їх `OutboxSender`.
+    Однакове повідомлення в той самий чат відкидається, лише поки попереднє ще
+    чекає на відправку; вже надіслане можна надіслати знову. Продюсер, якому
+    потрібна ідемпотентність (повторний запуск не має дублювати повідомлення),
+    передає явний `dedupe_key` - такий ключ унікальний, поки запис не видалено `purge`.
+    """
+
+    def __init__(self, db_path: str, send_lease: int = 60):
+        self.db_path = db_path
+        self.send_lease = send_lease
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиці outbox"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    parse_mode TEXT,
+                    content_key TEXT NOT NULL,
+                    dedupe_key TEXT UNIQUE,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    locked_until REAL,
+                    last_error TEXT,
+                    created_at TEXT,
+                    sent_at TEXT
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (status, available_at)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_outbox_chat ON outbox (chat_id, status, id)')
+            # Однаковий вміст відкидається лише серед повідомлень, що ще не надіслані
+            conn.execute('''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_content ON outbox (content_key)
+                WHERE status IN ('pending', 'sending')
+            ''')
+            TelegramRateLimiter.init_tables(conn)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_content_key(chat_id: int, text: str, parse_mode: Optional[str]) -> str:
+        return hashlib.sha256(f"{chat_id}\n{parse_mode}\n{text}".encode('utf-8')).hexdigest()
+
+    def enqueue(self, chat_id: int, text: str, parse_mode: Optional[str] = 'Markdown',
+                dedupe_key: str = None, delay: float = 0) -> Optional[int]:
+        """
+        Додати повідомлення в outbox
+
+        Args:
+            dedupe_key: ключ ідемпотентності продюсера (повідомлення з тим самим ключем не додається)
+
+        Returns:
+            ID запису або None, якщо таке повідомлення вже чекає на відправку, ключ
+            `dedupe_key` уже використано (або сталася помилка)
+        """
+        conn = self._connect()
+        try:
+            return self.enqueue_in_transaction(conn, chat_id, text, parse_mode, dedupe_key, delay)
+        except Exception as e:
+            print(f"❌ Помилка додавання повідомлення в outbox: {e}")
+            return None
+        finally:
+            conn.close()
+
+    def enqueue_in_transaction(self, conn: sqlite3.Connection, chat_id: int, text: str,
+                               parse_mode: Optional[str] = 'Markdown', dedupe_key: str = None,
+                               delay: float = 0) -> Optional[int]:
+        """
+        Додати повідомлення через з'єднання викликача (в межах його транзакції)
+
+        Помилки не перехоплюються, щоб викликач міг відкотити свою транзакцію.
+        """
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO outbox (chat_id, text, parse_mode, content_key, dedupe_key, status, attempts,
+                                          available_at, created_at)
+            VALUES (?, ?, ?, ?, ?, 'pending', 0, ?, ?)
+        ''', (chat_id, text, parse_mode, self.make_content_key(chat_id, text, parse_mode), dedupe_key,
+              time.time() + delay, datetime.now().isoformat()))
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Взяти наступне повідомлення для відправки (без лімітів Telegram)
+
+        Повідомлення одного чату надсилаються строго по черзі: чат, у який вже щось
+        надсилається, пропускається.
+        """
+        return self.claim_limited()[0]
+
+    def claim_limited(self, limiter: TelegramRateLimiter = None) -> Tuple[Optional[Dict[str, Any]], float]:
+        """
+        Взяти наступне повідомлення разом з дозволом лімітера на його надсилання
+
+        Слот лімітера займається в тій самій транзакції, що й повідомлення, тож
+        відправники всіх процесів разом не перевищують ліміти Telegram, а
+        повідомлення надсилається одразу, поки діє його оренда.
+
+        Returns:
+            (повідомлення або None, скільки секунд чекати до глобального слоту)
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            wait = limiter.global_wait(conn, now) if limiter else 0.0
+            if wait > 0:
+                conn.execute('COMMIT')
+                return None, wait
+
+            row = conn.execute('''
+                SELECT * FROM outbox
+                WHERE ((status = 'pending' AND available_at <= ?) OR (status = 'sending' AND locked_until < ?))
+                  AND chat_id NOT IN (SELECT chat_id FROM outbox WHERE status = 'sending' AND locked_until >= ?)
+                  AND chat_id NOT IN (SELECT chat_id FROM telegram_chat_limits WHERE ready_at > ?)
+                  AND NOT EXISTS (SELECT 1 FROM outbox AS earlier
+                                  WHERE earlier.chat_id = outbox.chat_id AND earlier.id < outbox.id
+                                    AND earlier.status = 'pending')
+                ORDER BY available_at, id
+                LIMIT 1
+            ''', (now, now, now, now)).fetchone()
+
+            if row is None:
+                conn.execute('COMMIT')
+                return None, 0.0
+
+            locked_until = now + self.send_lease
+            conn.execute('''
+                UPDATE outbox SET status = 'sending', attempts = attempts + 1, locked_until = ? WHERE id = ?
+            ''', (locked_until, row['id']))
+            if limiter:
+                limiter.reserve(conn, row['chat_id'], now)
+            conn.execute('COMMIT')
+
+            message = dict(row)
+            message['attempts'] += 1
+            message['locked_until'] = locked_until
+            return message, 0.0
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка отримання повідомлення з outbox: {e}")
+            return None, 0.0
+        finally:
+            conn.close()
+
+    def pause(self, seconds: float):
+        """Призупинити відправку в усіх процесах (flood control від Telegram)"""
+        conn = self._connect()
+        try:
+            TelegramRateLimiter.pause(conn, time.time() + seconds)
+        finally:
+            conn.close()
+
+    def _update(self, query: str, params: tuple) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute(query, params).rowcount > 0
+        finally:
+            conn.close()
+
+    # Методи нижче з `lease` (locked_until з claim) змінюють повідомлення, лише поки
+    # оренда належить викликачу: після її спливання повідомлення міг забрати інший відправник.
+    # Повертають False, якщо оренду втрачено.
+
+    def mark_sent(self, message_id: int, lease: float = None) -> bool:
+        return self._update('''
+            UPDATE outbox SET status = 'sent', locked_until = NULL, sent_at = ?
+            WHERE id = ?
+              AND (? IS NULL OR (status = 'sending' AND locked_until = ?))
+        ''', (datetime.now().isoformat(), message_id, lease, lease))
+
+    def mark_failed(self, message_id: int, error: str, lease: float = None) -> bool:
+        return self._update('''
+            UPDATE outbox SET status = 'failed', locked_until = NULL, last_error = ?
+            WHERE id = ?
+              AND (? IS NULL OR (status = 'sending' AND locked_until = ?))
+        ''', (error[:500], message_id, lease, lease))
+
+    def retry(self, message_id: int, delay: float, error: str, count_attempt: bool = True, chat_id: int = None,
+              lease: float = None) -> bool:
+        """Повернути повідомлення в чергу з затримкою"""
+        return self._update('''
+            UPDATE outbox SET status = 'pending', locked_until = NULL, available_at = ?, last_error = ?,
+                              attempts = attempts - ?, chat_id = COALESCE(?, chat_id)
+            WHERE id = ?
+              AND (? IS NULL OR (status = 'sending' AND locked_until = ?))
+        ''', (time.time() + delay, error[:500], 0 if count_attempt else 1, chat_id, message_id, lease, lease))
+
+    def retry_as_plain_text(self, message_id: int, error: str, lease: float = None) -> bool:
+        """Повернути повідомлення в чергу без розмітки"""
+        return self._update('''
+            UPDATE outbox SET status = 'pending', locked_until = NULL, available_at = ?, last_error = ?,
+                              parse_mode = NULL
+            WHERE id = ?
+              AND (? IS NULL OR (status = 'sending' AND locked_until = ?))
+        ''', (time.time(), error[:500], message_id, lease, lease))
+
+    def purge(self, older_than_days: int = 7) -> int:
+        """Видалити старі надіслані та невдалі повідомлення"""
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+                DELETE FROM outbox WHERE status IN ('sent', 'failed') AND created_at < ?
+            ''', (cutoff,))
+            TelegramRateLimiter.purge(conn, time.time())
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def count_status(self, message_ids: List[int]) -> Dict[str, int]:
+        """Кількість повідомлень із заданих за статусами"""
+        counts: Dict[str, int] = {}
+        conn = self._connect()
+        try:
+            # SQLite обмежує кількість параметрів запиту
+            for i in range(0, len(message_ids), 500):
+                chunk = message_ids[i:i + 500]
+                rows = conn.execute(f'''
+                    SELECT status, COUNT(*) AS cnt FROM outbox
+                    WHERE id IN ({','.join('?' * len(chunk))}) GROUP BY status
+                ''', chunk).fetchall()
+                for row in rows:
+                    counts[row['status']] = counts.get(row['status'], 0) + row['cnt']
+            return counts
+        finally:
+            conn.close()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Кількість повідомлень за статусами"""
+        conn = self._connect()
+        try:
+            rows = conn.execute('SELECT status, COUNT(*) AS cnt FROM outbox GROUP BY status').fetchall()
+            return {row['status']: row['cnt'] for row in rows}
+        finally:
+            conn.close()
+
+
+class OutboxSender:
+    """
+    Фоновий сервіс, що надсилає повідомлення з outbox через бота
+
+    Дотримується лімітів Telegram через `TelegramRateLimiter`, спільний для всіх
+    процесів з тією ж базою, виконує `retry_after` від flood control та повторює
+    тимчасові помилки з затримкою.
+
+    Повідомлення з бази бере один збирач у пулі потоків (транзакція може чекати
+    на блокування до 30 с) і лише тоді, коли є вільний відправник; відправники
+    отримують повідомлення з `asyncio.Queue`.
+    """
+
+    def __init__(self, outbox: MessageOutbox, bot, limiter: TelegramRateLimiter = None,
+                 concurrency: int = 8, poll_interval: float = 1.0, max_attempts: int = 5):
+        self.outbox = outbox
+        self.bot = bot
+        self.limiter = limiter or TelegramRateLimiter()
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.worker_prefix = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+        self._messages: Optional[asyncio.Queue] = None
+        self._free_senders: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        """Запустити відправників у поточному event loop"""
+        if self._tasks:
+            return
+        self._messages = asyncio.Queue()
+        self._free_senders = asyncio.Semaphore(self.concurrency)
+        self._tasks.append(asyncio.create_task(self._claim_loop()))
+        for n in range(self.concurrency):
+            self._tasks.append(asyncio.create_task(self._sender_loop()))
+        self._tasks.append(asyncio.create_task(self._purge_loop()))
+        print(f"📤 Запущено {self.concurrency} відправників outbox")
+
+    async def stop(self):
+        """Зупинити відправників"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Повідомлення береться лише для вільного відправника, щоб його оренда не спливала в черзі
+            await self._free_senders.acquire()
+            message = None
+            try:
+                message, wait = await loop.run_in_executor(None, self.outbox.claim_limited, self.limiter)
+                if message:
+                    self._messages.put_nowait(message)
+                else:
+                    await asyncio.sleep(min(wait, self.poll_interval) if wait else self.poll_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Помилка отримання повідомлень outbox: {e}")
+                await asyncio.sleep(self.poll_interval)
+            finally:
+                if not message:
+                    self._free_senders.release()
+
+    async def _sender_loop(self):
+        while True:
+            message = await self._messages.get()
+            try:
+                await self.deliver(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Помилка відправника outbox: {e}")
+                await asyncio.sleep(self.poll_interval)
+            finally:
+                self._free_senders.release()
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(3600)
+            try:
+                self.outbox.purge()
+            except Exception as e:
+                print(f"❌ Помилка очищення outbox: {e}")
+
+    async def deliver(self, message: Dict[str, Any]):
+        """Надіслати одне повідомлення, взяте з outbox разом з дозволом лімітера"""
+        lease = message.get('locked_until')
+        try:
+            await self.bot.send_message(
+                chat_id=message['chat_id'],
+                text=message['text'],
+                parse_mode=message['parse_mode']
+            )
+        except RetryAfter as e:
+            # Flood control: зупиняємо всі відправки та повторюємо без втрати спроби
+            retry_after = float(e.retry_after)
+            self.outbox.pause(retry_after)
+            self.outbox.retry(message['id'], retry_after, str(e), count_attempt=False, lease=lease)
+            print(f"⏳ Flood control, пауза {retry_after} с")
+        except ChatMigrated as e:
+            self.outbox.retry(message['id'], 0, str(e), count_attempt=False, chat_id=e.new_chat_id, lease=lease)
+        except Forbidden as e:
+            # Користувач заблокував бота - повтори не допоможуть
+            self.outbox.mark_failed(message['id'], str(e), lease=lease)
+        except BadRequest as e:
+            if message['parse_mode'] and "parse" in str(e).lower():
+                # Некоректна розмітка - надсилаємо як звичайний текст
+                self.outbox.retry_as_plain_text(message['id'], str(e), lease=lease)
+            else:
+                self.outbox.mark_failed(message['id'], str(e), lease=lease)
+        except Exception as e:
+            # Тимчасові помилки (мережа, таймаути) повторюємо з експоненційною затримкою
+            self._retry_or_fail(message, str(e))
+        else:
+            if not self.outbox.mark_sent(message['id'], lease=lease):
+                print(f"⚠️ Оренда повідомлення #{message['id']} спливла під час надсилання")
+
+    def _retry_or_fail(self, message: Dict[str, Any], error: str):
+        if message['attempts'] >= self.max_attempts:
+            self.outbox.mark_failed(message['id'], error, lease=message.get('locked_until'))
+            print(f"❌ Повідомлення #{message['id']} для {message['chat_id']} не надіслано: {error}")
+        else:
+            self.outbox.retry(message['id'], min(2 ** message['attempts'], 300), error,
+                              lease=message.get('locked_until'))
@@ -0,0 +1,107 @@
+"""
+Щоденні знімки рейтингу груп друзів для відстеження змін позицій
+"""
+import hashlib
+import sqlite3
+from datetime import date, timedelta
+from typing import Optional, Dict, List, Iterable, Tuple
+
+
+class RankSnapshotStore:
+    """
+    Знімки рейтингу груп друзів у SQLite
+
+    Знімок - впорядкований список steam_id групи (від першого місця) за день.
+    Ключ групи - хеш її складу, тож користувачі з однаковим складом групи
+    (наприклад, друзі, що додали один одного) мають спільний знімок.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиці знімків рейтингу"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rank_snapshots (
+                    group_key TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    ranking TEXT NOT NULL,
+                    PRIMARY KEY (group_key, day)
+                )
+            ''')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def group_key(steam_ids: Iterable[str]) -> str:
+        """Ключ групи за її складом (не залежить від порядку)"""
+        members = ','.join(sorted(set(steam_ids)))
+        return hashlib.sha1(members.encode('utf-8')).hexdigest()
+
+    def save(self, group_key: str, ranking: List[str], day: date = None):
+        """Зберегти рейтинг групи за день (пізніший знімок того ж дня замінює попередній)"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO rank_snapshots (group_key, day, ranking) VALUES (?, ?, ?)
+            ''', (group_key, (day or date.today()).isoformat(), ','.join(ranking)))
+        finally:
+            conn.close()
+
+    def get_previous(self, group_key: str, day: date = None) -> Optional[Tuple[date, List[str]]]:
+        """Останній знімок групи до дня `day` (день знімка та рейтинг)"""
+        conn = self._connect()
+        try:
+            row = conn.execute('''
+                SELECT day, ranking FROM rank_snapshots WHERE group_key = ? AND day < ?
+                ORDER BY day DESC LIMIT 1
+            ''', (group_key, (day or date.today()).isoformat())).fetchone()
+            if not row:
+                return None
+            return date.fromisoformat(row['day']), row['ranking'].split(',') if row['ranking'] else []
+        finally:
+            conn.close()
+
+    @staticmethod
+    def rank_changes(previous: List[str], current: List[str]) -> Dict[str, Optional[int]]:
+        """
+        Зміни позицій між двома рейтингами за один прохід
+
+        Returns:
+            steam_id -> на скільки місць піднявся гравець (від'ємне - опустився),
+            None - гравця не було в попередньому рейтингу
+        """
+        previous_positions = {steam_id: position for position, steam_id in enumerate(previous)}
+        changes = {}
+        for position, steam_id in enumerate(current):
+            previous_position = previous_positions.get(steam_id)
+            changes[steam_id] = None if previous_position is None else previous_position - position
+        return changes
+
+    @staticmethod
+    def format_change(change: Optional[int]) -> str:
+        """Позначка зміни позиції для звіту"""
+        if change is None:
+            return "🆕"
+        if change > 0:
+            return f"↑{change}"
+        if change < 0:
+            return f"↓{-change}"
+        return ""
+
+    def purge(self, keep_days: int = 30) -> int:
+        """Видалити застарілі знімки"""
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        conn = self._connect()
+        try:
+            return conn.execute('DELETE FROM rank_snapshots WHERE day < ?', (cutoff,)).rowcount
+        finally:
+            conn.close()
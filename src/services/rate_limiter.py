@@ -0,0 +1,73 @@
+"""
+Обмежувач швидкості надсилання повідомлень у Telegram
+"""
+import sqlite3
+
+
+class TelegramRateLimiter:
+    """
+    Ліміти Telegram, спільні для всіх процесів-відправників
+
+    Дотримується глобального ліміту Telegram (~30 повідомлень/с на бота) та ліміту
+    на один чат (~1 повідомлення/с в особистий чат, ~20 на хвилину в групу).
+    Outbox читає бот і кожен воркер моніторингу, тому стан лімітів зберігається
+    в тій самій SQLite базі: дозвіл на надсилання береться в транзакції, що
+    забирає повідомлення (`MessageOutbox.claim_limited`). Після flood control
+    (`RetryAfter`) на паузу стають відправники всіх процесів.
+    """
+
+    def __init__(self, global_rate: float = 25.0, per_chat_interval: float = 1.0, group_chat_interval: float = 3.0):
+        self.global_interval = 1.0 / global_rate
+        self.per_chat_interval = per_chat_interval
+        self.group_chat_interval = group_chat_interval
+
+    @staticmethod
+    def init_tables(conn: sqlite3.Connection):
+        """Таблиці стану лімітів (у базі outbox)"""
+        # key: 'global' - наступний глобальний слот, 'pause' - кінець паузи flood control
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS telegram_rate_limits (
+                key TEXT PRIMARY KEY,
+                ready_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS telegram_chat_limits (
+                chat_id INTEGER PRIMARY KEY,
+                ready_at REAL NOT NULL
+            )
+        ''')
+
+    def chat_interval(self, chat_id: int) -> float:
+        # Групи та канали в Telegram мають від'ємні ID
+        return self.group_chat_interval if chat_id < 0 else self.per_chat_interval
+
+    @staticmethod
+    def global_wait(conn: sqlite3.Connection, now: float) -> float:
+        """Скільки секунд чекати до наступного глобального слоту (0 - можна надсилати)"""
+        row = conn.execute("SELECT MAX(ready_at) FROM telegram_rate_limits WHERE key IN ('global', 'pause')").fetchone()
+        return max((row[0] or 0.0) - now, 0.0)
+
+    def reserve(self, conn: sqlite3.Connection, chat_id: int, now: float):
+        """Зайняти глобальний слот та слот чату (в транзакції викликача)"""
+        conn.execute('''
+            INSERT INTO telegram_rate_limits (key, ready_at) VALUES ('global', ?)
+            ON CONFLICT(key) DO UPDATE SET ready_at = MAX(ready_at, ?) + ?
+        ''', (now + self.global_interval, now, self.global_interval))
+        conn.execute('''
+            INSERT INTO telegram_chat_limits (chat_id, ready_at) VALUES (?, ?)
+            ON CONFLICT(chat_id) DO UPDATE SET ready_at = excluded.ready_at
+        ''', (chat_id, now + self.chat_interval(chat_id)))
+
+    @staticmethod
+    def pause(conn: sqlite3.Connection, until: float):
+        """Призупинити всі надсилання до `until` (flood control від Telegram)"""
+        conn.execute('''
+            INSERT INTO telegram_rate_limits (key, ready_at) VALUES ('pause', ?)
+            ON CONFLICT(key) DO UPDATE SET ready_at = MAX(ready_at, excluded.ready_at)
+        ''', (until,))
+
+    @staticmethod
+    def purge(conn: sqlite3.Connection, now: float) -> int:
+        """Видалити ліміти чатів, що вже минули"""
+        return conn.execute('DELETE FROM telegram_chat_limits WHERE ready_at < ?', (now,)).rowcount
@@ -0,0 +1,151 @@
+"""
+Журнал запусків розсилки звітів та стану доставки кожному користувачу
+"""
+import sqlite3
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Set
+
+
+class ReportRunStore:
+    """
+    Запуски розсилок у SQLite
+
+    Кожен запуск має run_id (наприклад, "daily-2024-12-15") та рядок на кожного
+    користувача. Перезапущена або повторно викликана розсилка з тим самим run_id
+    обробляє лише тих, кому звіт ще не потрапив в outbox.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_database()
+
+    def connect(self) -> sqlite3.Connection:
+        """З'єднання з базою (outbox у тій самій базі, тож можна писати в одній транзакції)"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиць запусків"""
+        conn = self.connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS report_runs (
+                    run_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'running',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    total_users INTEGER NOT NULL DEFAULT 0,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS report_deliveries (
+                    run_id TEXT NOT NULL,
+                    telegram_id INTEGER NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    updated_at TEXT,
+                    PRIMARY KEY (run_id, telegram_id)
+                )
+            ''')
+        finally:
+            conn.close()
+
+    def start_run(self, run_id: str, kind: str, telegram_ids: Iterable[int]) -> Dict[str, Any]:
+        """
+        Почати або продовжити запуск
+
+        Користувачі, що з'явилися після першого старту, додаються до запуску.
+
+        Returns:
+            Стан запуску (з полем 'resumed', якщо запуск вже існував)
+        """
+        now = datetime.now().isoformat()
+        conn = self.connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            existing = conn.execute('SELECT * FROM report_runs WHERE run_id = ?', (run_id,)).fetchone()
+            if existing is None:
+                conn.execute('''
+                    INSERT INTO report_runs (run_id, kind, status, attempts, started_at) VALUES (?, ?, 'running', 1, ?)
+                ''', (run_id, kind, now))
+            else:
+                conn.execute('''
+                    UPDATE report_runs SET status = 'running', attempts = attempts + 1, finished_at = NULL
+                    WHERE run_id = ?
+                ''', (run_id,))
+
+            conn.executemany('''
+                INSERT OR IGNORE INTO report_deliveries (run_id, telegram_id, status, updated_at)
+                VALUES (?, ?, 'pending', ?)
+            ''', [(run_id, telegram_id, now) for telegram_id in telegram_ids])
+            conn.execute('''
+                UPDATE report_runs SET total_users = (SELECT COUNT(*) FROM report_deliveries WHERE run_id = ?)
+                WHERE run_id = ?
+            ''', (run_id, run_id))
+            conn.execute('COMMIT')
+
+            run = self.get_run(run_id, conn)
+            run['resumed'] = existing is not None
+            return run
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get_run(self, run_id: str, conn: sqlite3.Connection = None) -> Optional[Dict[str, Any]]:
+        """Отримати стан запуску"""
+        own_conn = conn is None
+        conn = conn or self.connect()
+        try:
+            row = conn.execute('SELECT * FROM report_runs WHERE run_id = ?', (run_id,)).fetchone()
+            return dict(row) if row else None
+        finally:
+            if own_conn:
+                conn.close()
+
+    def get_remaining(self, run_id: str) -> Set[int]:
+        """Користувачі, яким звіт ще не потрапив в outbox (включно з попередніми помилками)"""
+        conn = self.connect()
+        try:
+            rows = conn.execute('''
+                SELECT telegram_id FROM report_deliveries WHERE run_id = ? AND status IN ('pending', 'error')
+            ''', (run_id,)).fetchall()
+            return {row['telegram_id'] for row in rows}
+        finally:
+            conn.close()
+
+    def mark_in_transaction(self, conn: sqlite3.Connection, run_id: str, telegram_ids: List[int], status: str):
+        """Оновити стан доставки через з'єднання викликача (в межах його транзакції)"""
+        now = datetime.now().isoformat()
+        conn.executemany('''
+            UPDATE report_deliveries SET status = ?, updated_at = ? WHERE run_id = ? AND telegram_id = ?
+        ''', [(status, now, run_id, telegram_id) for telegram_id in telegram_ids])
+
+    def finish_run(self, run_id: str):
+        """Позначити запуск завершеним"""
+        conn = self.connect()
+        try:
+            conn.execute('''
+                UPDATE report_runs SET status = 'completed', finished_at = ? WHERE run_id = ?
+            ''', (datetime.now().isoformat(), run_id))
+        finally:
+            conn.close()
+
+    def is_completed(self, run_id: str) -> bool:
+        run = self.get_run(run_id)
+        return bool(run and run['status'] == 'completed')
+
+    def get_delivery_stats(self, run_id: str) -> Dict[str, int]:
+        """Кількість користувачів запуску за станом доставки"""
+        conn = self.connect()
+        try:
+            rows = conn.execute('''
+                SELECT status, COUNT(*) AS cnt FROM report_deliveries WHERE run_id = ? GROUP BY status
+            ''', (run_id,)).fetchall()
+            return {row['status']: row['cnt'] for row in rows}
+        finally:
+            conn.close()
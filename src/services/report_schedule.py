@@ -0,0 +1,85 @@
+"""
+Розклад щоденних звітів з урахуванням часу та часового поясу кожного користувача
+"""
+import re
+import zlib
+from datetime import datetime, date, time, timedelta, timezone
+from typing import Optional, Dict, List, Any, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+class ReportSchedule:
+    """
+    Обчислення моменту щоденного звіту для кожного користувача
+
+    Звіт користувача припадає на його локальний час (report_time у timezone) плюс
+    стабільний зсув від хешу telegram_id у межах `stagger_minutes`, тож користувачі
+    з однаковим часом розподіляються по вікну, а не приходять в одну хвилину.
+    """
+
+    TIME_PATTERN = re.compile(r'^([01]?\d|2[0-3]):([0-5]\d)$')
+
+    def __init__(self, default_time: str = "10:00", default_timezone: str = "Europe/Kyiv", stagger_minutes: int = 30):
+        self.default_time = default_time
+        self.default_timezone = default_timezone
+        self.stagger_minutes = stagger_minutes
+
+    @classmethod
+    def parse_time(cls, value: str) -> Optional[time]:
+        """Розібрати час "HH:MM" (None, якщо формат некоректний)"""
+        match = cls.TIME_PATTERN.match(value.strip()) if value else None
+        return time(int(match.group(1)), int(match.group(2))) if match else None
+
+    @staticmethod
+    def get_zone(name: str) -> Optional[ZoneInfo]:
+        """Отримати часовий пояс за назвою IANA (None, якщо такого немає)"""
+        try:
+            return ZoneInfo(name) if name else None
+        except (ZoneInfoNotFoundError, ValueError):
+            return None
+
+    def get_user_time(self, user: Any) -> time:
+        return self.parse_time(user.report_time or '') or self.parse_time(self.default_time)
+
+    def get_user_zone(self, user: Any) -> ZoneInfo:
+        return self.get_zone(user.timezone) or ZoneInfo(self.default_timezone)
+
+    def stagger_offset(self, telegram_id: int) -> timedelta:
+        """Стабільний зсув звіту користувача в межах вікна розподілу"""
+        if self.stagger_minutes <= 0:
+            return timedelta(0)
+        seconds = zlib.crc32(str(telegram_id).encode('utf-8')) % (self.stagger_minutes * 60)
+        return timedelta(seconds=seconds)
+
+    def due_at(self, user: Any, local_day: date) -> datetime:
+        """Момент звіту користувача (UTC) для його локального дня"""
+        local = datetime.combine(local_day, self.get_user_time(user), tzinfo=self.get_user_zone(user))
+        return local.astimezone(timezone.utc) + self.stagger_offset(user.telegram_id)
+
+    def last_due(self, user: Any, now: datetime) -> Tuple[datetime, date]:
+        """Останній момент звіту користувача не пізніше `now` та його локальний день"""
+        local_day = now.astimezone(self.get_user_zone(user)).date()
+        # Зсув може перенести звіт за північ, тому перевіряємо і наступний день
+        for day in (local_day + timedelta(days=1), local_day, local_day - timedelta(days=1)):
+            due = self.due_at(user, day)
+            if due <= now:
+                return due, day
+        return self.due_at(user, local_day - timedelta(days=2)), local_day - timedelta(days=2)
+
+    def select_due(self, users: List[Any], window_start: datetime, window_end: datetime) -> Dict[date, List[Any]]:
+        """
+        Користувачі, чий звіт припадає на проміжок (window_start, window_end]
+
+        Returns:
+            Користувачі, згруповані за локальним днем звіту
+        """
+        due_users: Dict[date, List[Any]] = {}
+        for user in users:
+            due, local_day = self.last_due(user, window_end)
+            if window_start < due:
+                due_users.setdefault(local_day, []).append(user)
+        return due_users
+
+    def describe(self, user: Any) -> str:
+        """Час та часовий пояс звіту користувача для показу"""
+        return f"{self.get_user_time(user).strftime('%H:%M')} ({self.get_user_zone(user).key})"
@@ -2,33 +2,50 @@
 Планувальник для автоматичних завдань
 """
 import asyncio
-from datetime import datetime, time
+from datetime import datetime, time, timedelta, timezone
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 import logging
 
 from .daily_reports import DailyReportsService
+from .global_leaderboard import GlobalLeaderboard
 
 
 class TaskScheduler:
-    def __init__(self, daily_reports_service: DailyReportsService):
+    MISFIRE_GRACE_TIME = 6 * 3600  # Наскільки пізно ще можна надіслати щоденні звіти (секунди)
+    BUCKET_MINUTES = 5  # Інтервал між пакетами щоденних звітів
+    LEADERBOARD_REFRESH_MINUTES = 30  # Інтервал перерахунку глобального рейтингу
+
+    def __init__(self, daily_reports_service: DailyReportsService, global_leaderboard: GlobalLeaderboard = None):
         self.daily_reports_service = daily_reports_service
+        self.global_leaderboard = global_leaderboard
         self.scheduler = AsyncIOScheduler()
         self.logger = logging.getLogger(__name__)
+        self._last_bucket_end = None
 
-    def start(self, daily_report_time: str = "10:00"):
+    def start(self, daily_report_time: str = "10:00", default_timezone: str = None):
         """Запустити планувальник"""
         try:
-            # Парсимо час для щоденних звітів
-            hour, minute = map(int, daily_report_time.split(':'))
+            # Час за замовчуванням для користувачів без власних налаштувань
+            schedule = self.daily_reports_service.schedule
+            if not schedule.parse_time(daily_report_time):
+                raise ValueError(f"Некоректний час звітів: {daily_report_time}")
+            schedule.default_time = daily_report_time
+            if default_timezone:
+                schedule.default_timezone = default_timezone
             
-            # Додаємо завдання для щоденних звітів
+            # Щоденні звіти розсилаються невеликими пакетами кожні BUCKET_MINUTES хвилин:
+            # кожен пакет обробляє користувачів, чий час звіту настав з попереднього пакета
             self.scheduler.add_job(
-                func=self.daily_reports_service.send_daily_reports_to_all_users,
-                trigger=CronTrigger(hour=hour, minute=minute),
+                func=self.run_report_bucket,
+                trigger=CronTrigger(minute=f'*/{self.BUCKET_MINUTES}'),
                 id='daily_reports',
                 name='Щоденні звіти',
-                replace_existing=True
+                replace_existing=True,
+                misfire_grace_time=self.BUCKET_MINUTES * 60,
+                coalesce=True
             )
             
             # Додаємо тижневі звіти (неділя о 12:00)
@@ -40,21 +57,79 @@ class TaskScheduler:
                 replace_existing=True
             )
             
+            # Глобальний рейтинг перераховується з кешу статистики (одразу після старту і далі періодично)
+            if self.global_leaderboard:
+                self.scheduler.add_job(
+                    func=self.refresh_global_leaderboard,
+                    trigger=IntervalTrigger(minutes=self.LEADERBOARD_REFRESH_MINUTES),
+                    id='global_leaderboard',
+                    name='Глобальний рейтинг',
+                    replace_existing=True,
+                    next_run_time=datetime.now(),
+                    coalesce=True
+                )
+
+            # Перший пакет одразу: надолужує звіти, пропущені через простій процесу
+            self.scheduler.add_job(
+                func=self.run_report_bucket,
+                trigger=DateTrigger(),
+                id='daily_reports_catch_up',
+                name='Надолуження щоденних звітів',
+                replace_existing=True
+            )
+            
             # Запускаємо планувальник
             self.scheduler.start()
-            self.logger.info(f"✅ Планувальник запущено. Щоденні звіти о {daily_report_time}")
+            self.logger.info(
+                f"✅ Планувальник запущено. Щоденні звіти за замовчуванням о {daily_report_time} "
+                f"({schedule.default_timezone}), пакети кожні {self.BUCKET_MINUTES} хв"
+            )
             
         except Exception as e:
             self.logger.error(f"❌ Помилка запуску планувальника: {e}")
 
+    async def run_report_bucket(self, now: datetime = None):
+        """
+        Розіслати звіти, час яких настав з попереднього пакета
+        
+        Планувальник зберігає стан лише в пам'яті, тож після перезапуску перший пакет
+        охоплює останні MISFIRE_GRACE_TIME секунд; журнал запусків не дає повторно
+        надіслати вже доставлені звіти.
+        """
+        now = now or datetime.now(timezone.utc)
+        window_start = self._last_bucket_end or now - timedelta(seconds=self.MISFIRE_GRACE_TIME)
+        self._last_bucket_end = now
+        try:
+            return await self.daily_reports_service.send_due_reports(
+                window_start, now, delivery_timeout=self.BUCKET_MINUTES * 60
+            )
+        except Exception as e:
+            self.logger.error(f"❌ Помилка розсилки пакета звітів: {e}")
+            return 0, 0
+
+    async def refresh_global_leaderboard(self):
+        """Перерахувати глобальний рейтинг"""
+        try:
+            loop = asyncio.get_running_loop()
+            players = await loop.run_in_executor(None, self.global_leaderboard.refresh)
+            self.logger.info(f"🏆 Глобальний рейтинг оновлено: {players} гравців")
+        except Exception as e:
+            self.logger.error(f"❌ Помилка оновлення глобального рейтингу: {e}")
+
     def stop(self):
         """Зупинити планувальник"""
         if self.scheduler.running:
             self.scheduler.shutdown()
             self.logger.info("🛑 Планувальник зупинено")
 
-    def get_next_report_time(self) -> str:
-        """Отримати час наступного звіту"""
+    def get_next_report_time(self, user=None) -> str:
+        """Отримати час наступного звіту (для користувача - в його часовому поясі)"""
+        if user is not None:
+            schedule = self.daily_reports_service.schedule
+            _, local_day = schedule.last_due(user, datetime.now(timezone.utc))
+            next_due = schedule.due_at(user, local_day + timedelta(days=1))
+            return next_due.astimezone(schedule.get_user_zone(user)).strftime('%d.%m.%Y о %H:%M')
+        
         job = self.scheduler.get_job('daily_reports')
         if job and job.next_run_time:
             return job.next_run_time.strftime('%d.%m.%Y о %H:%M')
@@ -67,22 +142,25 @@ class TaskScheduler:
             # Це потрібно буде передати через конструктор
             user = self.daily_reports_service.user_db.get_user(telegram_id)
             if user and user.steam_id:
+                # Один знімок статистики для обох звітів
+                snapshot = await self.daily_reports_service.build_snapshot([user])
+                
                 # Відправляємо персональний звіт
-                personal_report = await self.daily_reports_service.generate_personal_daily_report(user)
+                personal_report = await self.daily_reports_service.generate_personal_daily_report(user, snapshot)
                 if personal_report:
-                    await self.daily_reports_service.bot.send_message(
-                        chat_id=telegram_id,
-                        text=f"🧪 **Тестовий звіт:**\n\n{personal_report}",
+                    self.daily_reports_service.outbox.enqueue(
+                        telegram_id,
+                        f"🧪 **Тестовий звіт:**\n\n{personal_report}",
                         parse_mode='Markdown'
                     )
                 
                 # Відправляємо звіт по друзях якщо є
                 if user.friends:
-                    friends_report = await self.daily_reports_service.generate_friends_daily_report(user)
+                    friends_report = await self.daily_reports_service.generate_friends_daily_report(user, snapshot)
                     if friends_report:
-                        await self.daily_reports_service.bot.send_message(
-                            chat_id=telegram_id,
-                            text=f"🧪 **Тестовий звіт по друзях:**\n\n{friends_report}",
+                        self.daily_reports_service.outbox.enqueue(
+                            telegram_id,
+                            f"🧪 **Тестовий звіт по друзях:**\n\n{friends_report}",
                             parse_mode='Markdown'
                         )
                 
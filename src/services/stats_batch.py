@@ -0,0 +1,151 @@
+"""
+Пакетний (векторизований NumPy) розрахунок показників та Impact Score для багатьох гравців
+"""
+from operator import itemgetter
+from typing import Dict, Any, List, Mapping
+
+import numpy as np
+
+# Лічильники Steam, з яких рахуються похідні показники (порядок - стовпці матриці)
+COUNTER_FIELDS = (
+    'total_kills', 'total_deaths', 'total_kills_headshot', 'total_shots_fired', 'total_shots_hit',
+    'total_wins', 'total_matches_played', 'total_mvps', 'total_kills_assist', 'total_damage_done',
+)
+
+# Відповідні ключі у розібраній статистиці (SteamAPI.parse_cs2_stats)
+PARSED_FIELDS = (
+    'kills', 'deaths', 'headshot_kills', 'shots_fired', 'shots_hit',
+    'wins', 'matches_played', 'mvps', 'assists', 'damage_dealt',
+)
+
+DEFAULT_WEIGHTS = {
+    "kd_ratio": 0.25,
+    "win_rate": 0.30,
+    "headshot_percent": 0.20,
+    "assists_per_match": 0.15,
+    "mvp_percent": 0.10
+}
+
+
+def round_half_even(values: np.ndarray, ndigits: int) -> np.ndarray:
+    """
+    Округлення, що збігається з вбудованим `round()` Python
+
+    `np.round` множить на 10**ndigits, тому на значеннях, дуже близьких до
+    половини, може відрізнятися від `round()`, який округлює точне десяткове
+    значення float. Такі значення (їх одиниці) доокруглюються через `round()`.
+    """
+    scaled = values * 10.0 ** ndigits
+    result = np.round(values, ndigits)
+    fraction = np.abs(scaled - np.floor(scaled) - 0.5)
+    for index in np.flatnonzero(fraction < 1e-6):
+        result[index] = round(float(values[index]), ndigits)
+    return result
+
+
+class PlayerStatsBatch:
+    """
+    Лічильники N гравців у матриці N×len(COUNTER_FIELDS)
+
+    Дає ті самі показники та Impact Score, що й `SteamAPI.parse_cs2_stats` та
+    `SteamAPI.calculate_impact_score`, але для всіх гравців одразу векторними
+    операціями замість циклу Python по кожному гравцю.
+    """
+
+    def __init__(self, steam_ids: List[str], counters: np.ndarray, empty: np.ndarray = None):
+        self.steam_ids = steam_ids
+        self.counters = np.asarray(counters, dtype=np.float64).reshape(len(steam_ids), len(COUNTER_FIELDS))
+        # Гравці без статистики (parse_cs2_stats повертає {}, Impact Score 0)
+        self.empty = np.zeros(len(steam_ids), dtype=bool) if empty is None else np.asarray(empty, dtype=bool)
+
+    @classmethod
+    def from_raw_stats(cls, raw_stats: Mapping[str, Dict[str, Any]]) -> 'PlayerStatsBatch':
+        """Зібрати матрицю із сирих відповідей Steam (steam_id -> {'stats': [...]})"""
+        steam_ids = list(raw_stats)
+        counters = np.zeros((len(steam_ids), len(COUNTER_FIELDS)))
+        empty = np.zeros(len(steam_ids), dtype=bool)
+        columns = {name: column for column, name in enumerate(COUNTER_FIELDS)}
+        for row, steam_id in enumerate(steam_ids):
+            raw = raw_stats[steam_id]
+            if not raw or 'stats' not in raw:
+                empty[row] = True
+                continue
+            for stat in raw['stats']:
+                column = columns.get(stat['name'])
+                if column is not None:
+                    counters[row, column] = stat['value']
+        return cls(steam_ids, counters, empty)
+
+    @classmethod
+    def from_parsed(cls, parsed_stats: Mapping[str, Dict[str, Any]]) -> 'PlayerStatsBatch':
+        """Зібрати матрицю з уже розібраної статистики (steam_id -> parse_cs2_stats)"""
+        steam_ids = list(parsed_stats)
+        fields = itemgetter(*PARSED_FIELDS)
+        zeros = (0,) * len(PARSED_FIELDS)
+        rows = [fields(stats) if stats else zeros for stats in parsed_stats.values()]
+        counters = np.array(rows, dtype=np.float64) if rows else np.zeros((0, len(COUNTER_FIELDS)))
+        empty = np.fromiter((not stats for stats in parsed_stats.values()), dtype=bool, count=len(steam_ids))
+        return cls(steam_ids, counters, empty)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.counters[:, COUNTER_FIELDS.index(name)]
+
+    def metrics(self) -> Dict[str, np.ndarray]:
+        """Похідні показники всіх гравців (ті самі правила, що й у parse_cs2_stats)"""
+        kills = self.column('total_kills')
+        deaths = self.column('total_deaths')
+        headshot_kills = self.column('total_kills_headshot')
+        shots_fired = self.column('total_shots_fired')
+        shots_hit = self.column('total_shots_hit')
+        wins = self.column('total_wins')
+        matches = self.column('total_matches_played')
+        mvps = self.column('total_mvps')
+        assists = self.column('total_kills_assist')
+        damage = self.column('total_damage_done')
+
+        # Захист від ділення на нуль
+        deaths = np.where(deaths == 0, 1, deaths)
+        matches = np.where(matches == 0, 1, matches)
+        shots_fired = np.where(shots_fired == 0, 1, shots_fired)
+        kills = np.where(kills == 0, 1, kills)
+
+        return {
+            'kd_ratio': round_half_even(kills / deaths, 2),
+            'win_rate': np.minimum(round_half_even((wins / matches) * 100, 1), 100.0),
+            'headshot_percent': np.minimum(round_half_even((headshot_kills / kills) * 100, 1), 100.0),
+            'accuracy_percent': np.minimum(round_half_even((shots_hit / shots_fired) * 100, 1), 100.0),
+            'assists_per_match': round_half_even(assists / matches, 1),
+            'mvp_percent': np.minimum(round_half_even((mvps / matches) * 100, 1), 100.0),
+            'damage_per_match': round_half_even(damage / matches, 0),
+        }
+
+    def impact_scores(self, weights: Dict[str, float] = None, metrics: Dict[str, np.ndarray] = None) -> np.ndarray:
+        """Impact Score усіх гравців (ті самі нормалізація та ваги, що й calculate_impact_score)"""
+        weights = weights or DEFAULT_WEIGHTS
+        metrics = metrics or self.metrics()
+
+        kd_score = np.minimum(metrics['kd_ratio'] / 2.0, 1.0)
+        win_rate_score = metrics['win_rate'] / 100.0
+        hs_score = np.minimum(metrics['headshot_percent'] / 70.0, 1.0)
+        assists_score = np.minimum(metrics['assists_per_match'] / 5.0, 1.0)
+        mvp_score = np.minimum(metrics['mvp_percent'] / 30.0, 1.0)
+
+        impact_score = (
+            kd_score * weights["kd_ratio"] +
+            win_rate_score * weights["win_rate"] +
+            hs_score * weights["headshot_percent"] +
+            assists_score * weights["assists_per_match"] +
+            mvp_score * weights["mvp_percent"]
+        )
+        scores = np.minimum(round_half_even(impact_score * 100, 1), 100.0)
+        return np.where(self.empty, 0.0, scores)
+
+    def impact_score_map(self, weights: Dict[str, float] = None) -> Dict[str, float]:
+        """Impact Score як steam_id -> float"""
+        return dict(zip(self.steam_ids, self.impact_scores(weights).tolist()))
+
+    def ranked(self, weights: Dict[str, float] = None) -> List[str]:
+        """Steam ID від найвищого Impact Score (стабільно для однакових значень)"""
+        scores = self.impact_scores(weights)
+        order = np.argsort(-scores, kind='stable')
+        return [self.steam_ids[index] for index in order]
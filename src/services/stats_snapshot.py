@@ -0,0 +1,97 @@
+"""
+Знімок статистики гравців для пакетної генерації звітів
+"""
+import asyncio
+import time
+from typing import Dict, Any, Iterable, List, Optional
+
+from src.services.steam_api import SteamAPI
+from src.services.stats_batch import PlayerStatsBatch
+
+# Steam API приймає до 100 steamids в одному запиті GetPlayerSummaries
+SUMMARIES_BATCH_SIZE = 100
+
+
+class PlayerStatsSnapshot:
+    """
+    Статистика та імена гравців, отримані один раз для всіх звітів
+
+    Кожен Steam ID завантажується рівно один раз незалежно від того, у скількох
+    користувачів він є другом; імена отримуються пакетами по 100.
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self.impact_scores: Dict[str, float] = {}
+        self.names: Dict[str, str] = {}
+        self.failed: List[str] = []
+        self.stats_requests = 0
+        self.summary_requests = 0
+        self.duration = 0.0
+
+    @staticmethod
+    def collect_steam_ids(users: Iterable[Any]) -> List[str]:
+        """Об'єднання Steam ID користувачів та їхніх друзів (без повторів, порядок збережено)"""
+        steam_ids = {}
+        for user in users:
+            for steam_id in [user.steam_id] + list(user.friends or []):
+                if steam_id:
+                    steam_ids[steam_id] = True
+        return list(steam_ids)
+
+    @classmethod
+    async def build(cls, steam_api: SteamAPI, steam_ids: Iterable[str], concurrency: int = 8) -> 'PlayerStatsSnapshot':
+        """
+        Завантажити статистику та імена гравців
+
+        Args:
+            steam_ids: Steam ID гравців (повтори ігноруються)
+            concurrency: Максимальна кількість одночасних запитів статистики
+        """
+        snapshot = cls()
+        steam_ids = list(dict.fromkeys(steam_ids))
+        start = time.monotonic()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_stats(steam_id: str):
+            async with semaphore:
+                raw_stats = await steam_api.get_player_stats(steam_id)
+            snapshot.stats_requests += 1
+            if not raw_stats:
+                snapshot.failed.append(steam_id)
+                return
+            snapshot.stats[steam_id] = steam_api.parse_cs2_stats(raw_stats)
+
+        async def fetch_names(batch: List[str]):
+            async with semaphore:
+                players = await steam_api.get_player_summaries(batch)
+            snapshot.summary_requests += 1
+            for player in players or []:
+                snapshot.names[player.get('steamid')] = player.get('personaname')
+
+        batches = [steam_ids[i:i + SUMMARIES_BATCH_SIZE] for i in range(0, len(steam_ids), SUMMARIES_BATCH_SIZE)]
+        await asyncio.gather(
+            *(fetch_stats(steam_id) for steam_id in steam_ids),
+            *(fetch_names(batch) for batch in batches)
+        )
+
+        # Impact Score усіх гравців одним векторним розрахунком
+        snapshot.impact_scores = PlayerStatsBatch.from_parsed(snapshot.stats).impact_score_map()
+        snapshot.duration = time.monotonic() - start
+        return snapshot
+
+    def has_stats(self, steam_id: str) -> bool:
+        return steam_id in self.stats
+
+    def get_stats(self, steam_id: str) -> Optional[Dict[str, Any]]:
+        return self.stats.get(steam_id)
+
+    def get_impact_score(self, steam_id: str) -> float:
+        return self.impact_scores.get(steam_id, 0.0)
+
+    def get_name(self, steam_id: str, default: str = 'Невідомо') -> str:
+        return self.names.get(steam_id) or default
+
+    @property
+    def total_requests(self) -> int:
+        return self.stats_requests + self.summary_requests
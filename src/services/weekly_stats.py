@@ -0,0 +1,167 @@
+"""
+Тижневі агрегати статистики гравців, що оновлюються з кожного знімка статистики
+"""
+import json
+import sqlite3
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict, Any, Iterable, List
+
+# Показники, що зберігаються на початок і кінець тижня
+TRACKED_FIELDS = ('kills', 'deaths', 'headshot_kills', 'wins', 'matches_played', 'mvps',
+                  'kd_ratio', 'win_rate', 'headshot_percent')
+
+
+class WeeklyStatsStore:
+    """
+    Статистика гравців на початок та кінець кожного тижня
+
+    Steam віддає лише накопичені за весь час показники, тож тиждень описується
+    двома їх значеннями: першим спостереженням тижня (або останнім спостереженням
+    попереднього тижня) та останнім. Кожне завантаження статистики (щоденні звіти,
+    /daily_report) оновлює кінцеве значення та найкращий матч тижня, тому
+    тижневий підсумок не потребує запитів до Steam.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_database(self):
+        """Ініціалізація таблиці тижневих агрегатів"""
+        conn = self._connect()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS weekly_player_stats (
+                    steam_id TEXT NOT NULL,
+                    week_start TEXT NOT NULL,
+                    start_stats TEXT NOT NULL,
+                    last_stats TEXT NOT NULL,
+                    best_match TEXT,
+                    updated_at TEXT,
+                    PRIMARY KEY (steam_id, week_start)
+                )
+            ''')
+        finally:
+            conn.close()
+
+    @staticmethod
+    def week_start(day: date = None) -> date:
+        """Понеділок тижня, до якого належить день"""
+        day = day or date.today()
+        return day - timedelta(days=day.weekday())
+
+    @staticmethod
+    def make_entry(stats: Dict[str, Any], impact_score: float, name: str = None) -> Dict[str, Any]:
+        """Стиснутий запис показників гравця для агрегатів"""
+        entry = {field: stats.get(field, 0) for field in TRACKED_FIELDS}
+        entry['impact_score'] = impact_score
+        if name:
+            entry['name'] = name
+        return entry
+
+    @staticmethod
+    def _match_score(match: Dict[str, Any]) -> tuple:
+        # Найкращий матч - з найбільшою різницею вбивств і смертей, далі за уроном
+        return (match.get('kills', 0) - match.get('deaths', 0), match.get('damage', 0))
+
+    def record_snapshot(self, snapshot, day: date = None):
+        """Оновити агрегати всіма гравцями зі знімка статистики"""
+        self.record({
+            steam_id: (stats, snapshot.get_impact_score(steam_id), snapshot.names.get(steam_id))
+            for steam_id, stats in snapshot.stats.items()
+        }, day)
+
+    def record(self, players: Dict[str, tuple], day: date = None):
+        """
+        Оновити агрегати
+
+        Args:
+            players: steam_id -> (розібрана статистика, Impact Score, ім'я)
+        """
+        if not players:
+            return
+
+        week = self.week_start(day).isoformat()
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for steam_id, (stats, impact_score, name) in players.items():
+                current = self.make_entry(stats, impact_score, name)
+                row = conn.execute('''
+                    SELECT last_stats, best_match FROM weekly_player_stats WHERE steam_id = ? AND week_start = ?
+                ''', (steam_id, week)).fetchone()
+
+                if row is None:
+                    # Початок тижня - останнє спостереження попереднього тижня, якщо воно є
+                    previous_row = conn.execute('''
+                        SELECT last_stats FROM weekly_player_stats WHERE steam_id = ? AND week_start < ?
+                        ORDER BY week_start DESC LIMIT 1
+                    ''', (steam_id, week)).fetchone()
+                    previous = json.loads(previous_row['last_stats']) if previous_row else None
+                    best_match = None
+                else:
+                    previous = json.loads(row['last_stats'])
+                    best_match = json.loads(row['best_match']) if row['best_match'] else None
+
+                # Останній матч рахується, лише якщо він зіграний після попереднього спостереження
+                last_match = stats.get('last_match') or {}
+                if (previous and current['matches_played'] > previous.get('matches_played', 0)
+                        and last_match.get('rounds')):
+                    if best_match is None or self._match_score(last_match) > self._match_score(best_match):
+                        best_match = {key: last_match.get(key) for key in ('kills', 'deaths', 'mvps', 'damage', 'result')}
+
+                if row is None:
+                    conn.execute('''
+                        INSERT INTO weekly_player_stats (steam_id, week_start, start_stats, last_stats, best_match, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    ''', (steam_id, week, json.dumps(previous or current), json.dumps(current),
+                          json.dumps(best_match) if best_match else None, now))
+                else:
+                    conn.execute('''
+                        UPDATE weekly_player_stats SET last_stats = ?, best_match = ?, updated_at = ?
+                        WHERE steam_id = ? AND week_start = ?
+                    ''', (json.dumps(current), json.dumps(best_match) if best_match else None, now, steam_id, week))
+            conn.execute('COMMIT')
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(f"❌ Помилка оновлення тижневих агрегатів: {e}")
+        finally:
+            conn.close()
+
+    def get_week(self, steam_ids: Iterable[str], week_start: date) -> Dict[str, Dict[str, Any]]:
+        """Агрегати гравців за тиждень"""
+        steam_ids = list(steam_ids)
+        result = {}
+        conn = self._connect()
+        try:
+            for i in range(0, len(steam_ids), 500):
+                chunk = steam_ids[i:i + 500]
+                rows = conn.execute(f'''
+                    SELECT * FROM weekly_player_stats
+                    WHERE week_start = ? AND steam_id IN ({','.join('?' * len(chunk))})
+                ''', [week_start.isoformat()] + chunk).fetchall()
+                for row in rows:
+                    result[row['steam_id']] = {
+                        'start': json.loads(row['start_stats']),
+                        'last': json.loads(row['last_stats']),
+                        'best_match': json.loads(row['best_match']) if row['best_match'] else None
+                    }
+            return result
+        finally:
+            conn.close()
+
+    def purge(self, keep_weeks: int = 8, current_week: date = None) -> int:
+        """Видалити агрегати тижнів, старших за `keep_weeks` від поточного"""
+        cutoff = ((current_week or self.week_start()) - timedelta(weeks=keep_weeks)).isoformat()
+        conn = self._connect()
+        try:
+            return conn.execute('DELETE FROM weekly_player_stats WHERE week_start < ?', (cutoff,)).rowcount
+        finally:
+            conn.close()
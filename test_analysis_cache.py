@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки кешу аналізів демо
+"""
+import asyncio
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from src.services.analysis_cache import AnalysisCache, content_hash, demo_content_hash
+from src.services.demo_analyzer import DemoAnalyzer
+from test_demo_parser import sample_demo, write_sample_demo, TARGET
+
+
+def compress(analyzer: DemoAnalyzer, demo_path: str) -> str:
+    """Стиснути демо так, як це робить сховище"""
+    temp_path, compressed_path = analyzer.compress_demo(demo_path)
+    os.replace(temp_path, compressed_path)
+    os.remove(demo_path)
+    return compressed_path
+
+
+def test_cache_hits_misses_and_versions():
+    """Попадання за хешем, промахи та інвалідація лише зміною версії"""
+    print("🧪 Тестування кешу аналізів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        cache = AnalysisCache(db_path, "v1")
+        assert cache.get("abc") is None
+        cache.put("abc", "match_1", {'players': {}, 'map': "de_nuke"})
+        assert cache.get("abc")['map'] == "de_nuke"
+
+        # Той самий кеш після перезапуску з тією ж версією
+        cache = AnalysisCache(db_path, "v1")
+        assert cache.get("abc") is not None
+        assert cache.get_stats() == {'entries': 1, 'hits': 2, 'misses': 1, 'invalidated': 0}
+
+        # Поки базу тримає інший записувач, читання не чекає на нього, лічильник пропускається
+        writer = sqlite3.connect(db_path, isolation_level=None)
+        writer.execute('BEGIN IMMEDIATE')
+        started = time.monotonic()
+        assert cache.get("abc")['map'] == "de_nuke"
+        assert time.monotonic() - started < 5
+        writer.execute('ROLLBACK')
+        writer.close()
+        assert cache.get_stats()['hits'] == 2
+
+        cache = AnalysisCache(db_path, "v2")
+        assert cache.get("abc") is None
+        assert cache.get_stats() == {'entries': 0, 'hits': 2, 'misses': 2, 'invalidated': 1}
+        print("✅ Кеш інвалідується лише зміною версії аналізатора")
+
+
+def test_analyzer_reuses_cached_analysis():
+    """Те саме демо (навіть під іншим match_id або після повторного завантаження) не розбирається вдруге"""
+    print("\n🧪 Тестування повторного використання аналізу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            db_path = os.path.join(tmp, "bot.db")
+            analyzer = DemoAnalyzer("test", parse_workers=1,
+                                    analysis_cache=AnalysisCache(db_path, DemoAnalyzer.ANALYZER_VERSION))
+            first_path = write_sample_demo(os.path.join("demos", "match_1.dem"))
+            second_path = os.path.join("demos", "match_1_copy.dem")
+            shutil.copy(first_path, second_path)
+            assert content_hash(first_path) == content_hash(second_path)
+
+            async def run():
+                first = await analyzer.analyze_demo(first_path, TARGET, "match_1")
+                # Після розбору пул більше не потрібен: повторний аналіз має прийти з кешу
+                analyzer.shutdown()
+                analyzer._get_parse_executor = None
+                second = await analyzer.analyze_demo(second_path, TARGET, "match_1_copy")
+                return first, second
+
+            first, second = asyncio.run(run())
+        finally:
+            os.chdir(cwd)
+
+        assert first['analyzer_version'] == DemoAnalyzer.ANALYZER_VERSION
+        assert second['match_id'] == "match_1_copy" and second['demo_path'] == second_path
+        assert second['player_stats'] == first['player_stats']
+        assert analyzer.analysis_cache.get_stats() == {'entries': 1, 'hits': 1, 'misses': 1, 'invalidated': 0}
+        print("✅ Повторний аналіз повертається з кешу без розбору демо")
+
+
+def test_hash_ignores_demo_compression():
+    """Те саме демо в будь-якому стисненні та після повторного збереження має один ключ кешу"""
+    print("\n🧪 Тестування ключа кешу для стиснених демо...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+            source = write_sample_demo(os.path.join(tmp, "source.dem"))
+            # Чужий gzip з часом та іменем файлу в заголовку
+            foreign = os.path.join(tmp, "foreign.dem.gz")
+            with open(foreign, 'wb') as f:
+                f.write(gzip.compress(sample_demo(), mtime=1234567))
+            stored = compress(analyzer, analyzer._store_demo(source, "m1"))
+            with open(stored, 'rb') as f:
+                first_bytes = f.read()
+            os.remove(stored)
+            os.utime(source, (1, 1))
+            stored_again = compress(analyzer, analyzer._store_demo(source, "m1"))
+            with open(stored_again, 'rb') as f:
+                second_bytes = f.read()
+        finally:
+            os.chdir(cwd)
+        assert stored.endswith(".dem.gz") and first_bytes == second_bytes
+        assert demo_content_hash(source) == demo_content_hash(foreign) == demo_content_hash(os.path.join(tmp, stored))
+        assert content_hash(source) != content_hash(foreign)
+        print("✅ Ключ кешу не залежить від стиснення та часу збереження")
+
+
+def main():
+    """Головна функція тестування"""
+    test_cache_hits_misses_and_versions()
+    test_analyzer_reuses_cached_analysis()
+    test_hash_ignores_demo_compression()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки пакетного аналізу папки з демо
+"""
+import asyncio
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+
+from src.models.user import UserDatabase, User
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.demo_backfill import DemoBackfill, find_demos, match_id_from_path, main as backfill_main
+from test_demo_parser import sample_demo, write_sample_demo, TARGET, TEAMMATE
+
+
+def make_demos(folder: str) -> list:
+    """Папка з нестисненими, стисненими, пошкодженим та сторонніми файлами"""
+    os.makedirs(os.path.join(folder, "2024", "may"))
+    paths = [write_sample_demo(os.path.join(folder, f"m{n}.dem")) for n in range(3)]
+    paths.append(os.path.join(folder, "2024", "may", "m3.dem.gz"))
+    with gzip.open(paths[-1], 'wb') as f:
+        f.write(sample_demo(use_stringtables_frame=True))
+    with open(os.path.join(folder, "broken.dem"), 'wb') as f:
+        f.write(b"not a demo")
+    with open(os.path.join(folder, "notes.txt"), 'w') as f:
+        f.write("не демо")
+    return paths
+
+
+def stored_rows(db_path: str) -> list:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute('SELECT steam_id, match_id, demo_path, analyzed, analysis_data FROM match_analysis '
+                            'ORDER BY match_id, steam_id').fetchall()
+
+
+def test_find_demos():
+    """Пошук демо в папках та за шаблонами"""
+    print("🧪 Тестування пошуку демо...")
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = make_demos(tmp)
+        found = find_demos([tmp])
+        assert len(found) == 5 and os.path.normpath(paths[3]) in found
+        assert find_demos([os.path.join(tmp, "**", "*.dem.gz"), os.path.join(tmp, "m1.dem")]) == \
+            sorted([os.path.normpath(paths[1]), os.path.normpath(paths[3])])
+        assert match_id_from_path(paths[3]) == "m3" and match_id_from_path("x/123.dem.bz2") == "123"
+        print(f"✅ Знайдено {len(found)} демо")
+
+
+def test_same_match_id_in_different_folders():
+    """Тезки з різних папок не аналізуються як один матч"""
+    print("\n🧪 Тестування демо з однаковим ID матчу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, "a"))
+        os.makedirs(os.path.join(tmp, "b"))
+        valid = write_sample_demo(os.path.join(tmp, "a", "m1.dem"))
+        broken = os.path.join(tmp, "b", "m1.dem")
+        with open(broken, 'wb') as f:
+            f.write(b"not a demo")
+        unique = write_sample_demo(os.path.join(tmp, "b", "m2.dem"))
+        assert find_demos([tmp]) == [os.path.normpath(unique)]
+
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+
+            async def run():
+                return await asyncio.gather(analyzer.analyze_match(valid, "m1"), analyzer.analyze_match(broken, "m1"))
+
+            first, second = asyncio.run(run())
+            analyzer.shutdown()
+        finally:
+            os.chdir(cwd)
+        # Одночасні аналізи різних файлів не об'єднуються за ID матчу
+        assert first and TARGET in first['players'] and second is None
+        print("✅ Однакові ID матчів пропущено, одночасні аналізи не змішуються")
+
+
+def test_backfill_and_resume():
+    """Аналізи зареєстрованих гравців пишуться пакетами, повторний запуск продовжує з місця зупинки"""
+    print("\n🧪 Тестування пакетного аналізу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        demos = os.path.join(tmp, "demos")
+        paths = make_demos(demos)
+        db_path = os.path.join(tmp, "bot.db")
+        UserDatabase(db_path).create_user(User(1, steam_id=TARGET))
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            # Перший запуск обробив лише частину файлів (наприклад, його зупинили)
+            first = DemoBackfill(db_path, workers=2, batch_size=2, progress_interval=0)
+            partial = asyncio.run(first.run(find_demos([paths[0], paths[1]])))
+            summary = backfill_main([demos, "--db", db_path, "--workers", "2", "--batch-size", "2"])
+            rows = stored_rows(db_path)
+            again = backfill_main([demos, "--db", db_path, "--workers", "2"])
+            retried = backfill_main([demos, "--db", db_path, "--workers", "2", "--retry-failed"])
+        finally:
+            os.chdir(cwd)
+
+        assert partial['analyzed'] == 2 and partial['rows'] == 2
+        assert (summary['total'], summary['skipped'], summary['analyzed'], summary['failed']) == (5, 2, 2, 1)
+        assert summary['rows'] == 2 and summary['demos_per_min'] > 0 and summary['mb_per_s'] > 0
+        # Лише зареєстрований гравець, по рядку на матч
+        assert [(row[0], row[1]) for row in rows] == [(TARGET, f"m{n}") for n in range(4)]
+        assert all(row[3] for row in rows) and rows[3][2] == os.path.normpath(paths[3])
+        assert json.loads(rows[0][4])['player_stats']['kills'] == 2
+        assert (again['skipped'], again['analyzed'], again['failed']) == (5, 0, 0)
+        assert (retried['skipped'], retried['failed']) == (4, 1)
+        print(f"✅ Записано {len(rows)} аналізів, повторний запуск нічого не розібрав")
+
+
+def test_all_players():
+    """З --all-players зберігаються аналізи всіх гравців демо"""
+    print("\n🧪 Тестування аналізу всіх гравців...")
+    with tempfile.TemporaryDirectory() as tmp:
+        demos = os.path.join(tmp, "demos")
+        os.makedirs(demos)
+        write_sample_demo(os.path.join(demos, "m1.dem"))
+        db_path = os.path.join(tmp, "bot.db")
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            summary = backfill_main([demos, "--db", db_path, "--workers", "1", "--all-players"])
+        finally:
+            os.chdir(cwd)
+        steam_ids = {row[0] for row in stored_rows(db_path)}
+        assert summary['analyzed'] == 1 and summary['rows'] == len(steam_ids)
+        assert {TARGET, TEAMMATE} <= steam_ids
+        print(f"✅ Збережено аналізи {len(steam_ids)} гравців")
+
+
+def main():
+    """Головна функція тестування"""
+    test_find_demos()
+    test_same_match_id_in_different_folders()
+    test_backfill_and_resume()
+    test_all_players()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
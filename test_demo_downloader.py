@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки завантаження демо по HTTP
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import tracemalloc
+
+from aiohttp import web
+
+from src.models.user import UserDatabase, User
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.demo_downloader import DemoDownloader
+from src.services.demo_job_queue import DemoJobQueue, DemoAnalysisWorkerPool, PRIORITY_MANUAL
+from src.services.outbox import MessageOutbox
+from src.services.demo_parser import parse_demo_file
+from test_demo_parser import sample_demo, TARGET
+
+
+class DemoServer:
+    """Локальний файловий сервер aiohttp з журналом запитів"""
+
+    def __init__(self, folder: str, ranges: bool = True, drop_first_after: int = None, delay: float = 0):
+        self.folder = folder
+        self.ranges = ranges
+        self.drop_first_after = drop_first_after
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.peak_active = 0
+        self.runner = None
+        self.url = None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests.append(request.headers.get('Range'))
+        path = os.path.join(self.folder, request.match_info['name'])
+        if not os.path.exists(path):
+            raise web.HTTPNotFound()
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.drop_first_after is not None and request.headers.get('Range') != 'bytes=0-0':
+                # Обрив з'єднання посеред першої відповіді
+                size = os.path.getsize(path)
+                response = web.StreamResponse(status=206, headers={'Content-Length': str(size),
+                                                                   'Content-Range': f"bytes 0-{size - 1}/{size}"})
+                await response.prepare(request)
+                with open(path, 'rb') as f:
+                    await response.write(f.read(self.drop_first_after))
+                self.drop_first_after = None
+                request.transport.close()
+                return response
+            if self.ranges:
+                return web.FileResponse(path)
+            with open(path, 'rb') as f:
+                return web.Response(body=f.read())
+        finally:
+            self.active -= 1
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get('/demos/{name}', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/demos"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.runner.cleanup()
+
+
+def write_file(folder: str, name: str, size: int) -> bytes:
+    data = os.urandom(size)
+    with open(os.path.join(folder, name), 'wb') as f:
+        f.write(data)
+    return data
+
+
+def test_download_and_verify():
+    """Файл завантажується частинами, перевіряється розмір та SHA-256"""
+    print("🧪 Тестування завантаження...")
+    with tempfile.TemporaryDirectory() as tmp:
+        data = write_file(tmp, "match.dem", 24 * 1024 * 1024)
+        dest = os.path.join(tmp, "out", "match.dem")
+        os.makedirs(os.path.dirname(dest))
+        downloader = DemoDownloader(chunk_size=64 * 1024)
+
+        async def run():
+            async with DemoServer(tmp) as server:
+                tracemalloc.start()
+                path = await downloader.download(f"{server.url}/match.dem", dest, expected_size=len(data),
+                                                 sha256=hashlib.sha256(data).hexdigest())
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                bad = await downloader.download(f"{server.url}/match.dem", dest + ".bad", sha256="0" * 64)
+                missing = await downloader.download(f"{server.url}/missing.dem", dest + ".missing")
+                return path, peak, bad, missing
+
+        path, peak, bad, missing = asyncio.run(run())
+        assert path == dest and open(dest, 'rb').read() == data
+        # Пам'ять обмежена буферами з'єднання, а не розміром файлу
+        assert peak < len(data) // 4
+        assert bad is None and missing is None
+        assert sorted(os.listdir(os.path.dirname(dest))) == ["match.dem"]
+        print(f"✅ 24 МБ завантажено з піком {peak // 1024} КБ, невірна контрольна сума відхилена")
+
+
+def test_resume_partial_download():
+    """Незавершене завантаження докачується запитом Range"""
+    print("\n🧪 Тестування докачування...")
+    with tempfile.TemporaryDirectory() as tmp:
+        data = write_file(tmp, "match.dem", 1024 * 1024)
+        dest = os.path.join(tmp, "match.download")
+        with open(dest + ".part0", 'wb') as f:
+            f.write(data[:300000])
+
+        async def run():
+            async with DemoServer(tmp) as server:
+                path = await DemoDownloader().download(f"{server.url}/match.dem", dest)
+                return path, server.requests
+
+        path, requests_log = asyncio.run(run())
+        assert path == dest and open(dest, 'rb').read() == data
+        assert requests_log == ['bytes=0-0', f'bytes=300000-{len(data) - 1}']
+        assert not os.path.exists(dest + ".part0")
+        print("✅ Завантажено лише відсутню частину файлу")
+
+
+def test_resume_after_dropped_connection():
+    """Після обриву з'єднання завантаження продовжується з місця обриву"""
+    print("\n🧪 Тестування обриву з'єднання...")
+    with tempfile.TemporaryDirectory() as tmp:
+        data = write_file(tmp, "match.dem", 1024 * 1024)
+        dest = os.path.join(tmp, "match.download")
+
+        async def run():
+            async with DemoServer(tmp, drop_first_after=400000) as server:
+                path = await DemoDownloader(retry_delay=0.01).download(f"{server.url}/match.dem", dest)
+                return path, server.requests
+
+        path, requests_log = asyncio.run(run())
+        assert path == dest and open(dest, 'rb').read() == data
+        assert requests_log[:2] == ['bytes=0-0', f'bytes=0-{len(data) - 1}']
+        resumed_from = int(requests_log[2].split('=')[1].split('-')[0])
+        assert 0 < resumed_from <= 400000
+        print(f"✅ Докачано з байта {resumed_from}")
+
+
+def test_parallel_ranges():
+    """Великий файл завантажується кількома діапазонами одночасно"""
+    print("\n🧪 Тестування паралельних діапазонів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        data = write_file(tmp, "match.dem", 4 * 1024 * 1024 + 123)
+        dest = os.path.join(tmp, "match.download")
+        downloader = DemoDownloader(parallel_ranges=4, parallel_threshold=1024 * 1024)
+
+        async def run():
+            async with DemoServer(tmp, delay=0.1) as server:
+                path = await downloader.download(f"{server.url}/match.dem", dest)
+                return path, server.requests, server.peak_active
+
+        path, requests_log, peak_active = asyncio.run(run())
+        assert path == dest and open(dest, 'rb').read() == data
+        assert len(requests_log) == 5 and peak_active == 4
+        assert not [name for name in os.listdir(tmp) if ".part" in name]
+        print(f"✅ Файл зібрано з {len(requests_log) - 1} діапазонів")
+
+
+def test_server_without_ranges():
+    """Сервер без підтримки Range віддає файл одним запитом"""
+    print("\n🧪 Тестування сервера без Range...")
+    with tempfile.TemporaryDirectory() as tmp:
+        data = write_file(tmp, "match.dem", 2 * 1024 * 1024)
+        dest = os.path.join(tmp, "match.download")
+        downloader = DemoDownloader(parallel_threshold=1024 * 1024)
+
+        async def run():
+            async with DemoServer(tmp, ranges=False) as server:
+                return await downloader.download(f"{server.url}/match.dem", dest, expected_size=len(data))
+
+        assert asyncio.run(run()) == dest and open(dest, 'rb').read() == data
+        print("✅ Файл завантажено без діапазонів")
+
+
+def test_concurrency_limit():
+    """Одночасно виконується не більше max_concurrent_downloads завантажень"""
+    print("\n🧪 Тестування обмеження паралельності...")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in range(4):
+            write_file(tmp, f"match{n}.dem", 1024)
+        downloader = DemoDownloader(max_concurrent_downloads=2)
+
+        async def run():
+            async with DemoServer(tmp, delay=0.1) as server:
+                paths = await asyncio.gather(*(downloader.download(f"{server.url}/match{n}.dem",
+                                                                   os.path.join(tmp, f"out{n}"))
+                                               for n in range(4)))
+                return paths, server.peak_active
+
+        paths, peak_active = asyncio.run(run())
+        assert all(paths) and peak_active == 2
+        print(f"✅ Макс. одночасних запитів: {peak_active}")
+
+
+def test_analyzer_downloads_demo():
+    """DemoAnalyzer завантажує демо за шаблоном адреси і зберігає його стисненим"""
+    print("\n🧪 Тестування завантаження демо аналізатором...")
+    with tempfile.TemporaryDirectory() as tmp:
+        served = os.path.join(tmp, "served")
+        os.makedirs(served)
+        with open(os.path.join(served, "m1.dem"), 'wb') as f:
+            f.write(sample_demo())
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+
+            async def run():
+                async with DemoServer(served) as server:
+                    analyzer.demo_url_template = server.url + "/{match_id}.dem"
+                    path = await analyzer.download_demo(TARGET, "m1")
+                    missing = await analyzer.download_demo(TARGET, "m2")
+                    return path, missing
+
+            path, missing = asyncio.run(run())
+            parsed = parse_demo_file(path)
+            stored = sorted(os.listdir("demos"))
+        finally:
+            os.chdir(cwd)
+
+        assert path == os.path.join("demos", "m1.dem") and missing is None
+        assert stored == ["m1.dem"]
+        assert parsed['players'][TARGET]['kills'] == 2
+        print("✅ Демо завантажено та розібрано")
+
+
+def test_job_demo_url():
+    """Без адреси демо не вигадується; адреса із завдання черги доходить до завантаження"""
+    print("\n🧪 Тестування адреси демо із завдання...")
+    with tempfile.TemporaryDirectory() as tmp:
+        served = os.path.join(tmp, "served")
+        os.makedirs(served)
+        with open(os.path.join(served, "remote.dem"), 'wb') as f:
+            f.write(sample_demo())
+        cwd = os.getcwd()
+        home = os.environ.get('HOME')
+        os.chdir(tmp)
+        os.environ['HOME'] = tmp
+        try:
+            db_path = os.path.join(tmp, "bot.db")
+            user_db = UserDatabase(db_path)
+            user_db.create_user(User(1, steam_id=TARGET))
+            queue = DemoJobQueue(db_path)
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+            analyzer.demo_url_template = None
+            workers = DemoAnalysisWorkerPool(queue, analyzer, user_db, MessageOutbox(db_path))
+
+            async def run():
+                missing = await analyzer.download_demo(TARGET, "nowhere")
+                async with DemoServer(served) as server:
+                    queue.enqueue("m1", TARGET, [1], PRIORITY_MANUAL, demo_url=server.url + "/remote.dem")
+                    # Повторний запит без адреси не затирає відому адресу
+                    queue.enqueue("m1", TARGET, [1], PRIORITY_MANUAL)
+                    job = queue.claim("worker")
+                    notified = await workers.process_job(job)
+                    return missing, job, notified, server.requests
+
+            missing, job, notified, requests = asyncio.run(run())
+            analyzer.shutdown()
+            stored = os.listdir("demos")
+        finally:
+            os.chdir(cwd)
+            os.environ['HOME'] = home
+
+        assert missing is None and stored == []
+        assert job['demo_url'].endswith("/remote.dem") and notified == [1] and requests
+        assert user_db.get_match_analysis(TARGET, "m1").analysis_data['player_stats']['kills'] == 2
+        print("✅ Демо завантажено за адресою із завдання, без адреси - помилка замість заглушки")
+
+
+def main():
+    """Головна функція тестування"""
+    test_download_and_verify()
+    test_resume_partial_download()
+    test_resume_after_dropped_connection()
+    test_parallel_ranges()
+    test_server_without_ranges()
+    test_concurrency_limit()
+    test_analyzer_downloads_demo()
+    test_job_demo_url()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки стовпцевої таблиці подій та векторних агрегатів
+"""
+import json
+import time
+
+import numpy as np
+
+from src.services.demo_events import (
+    EventTable, group_sum, summarize_analyses, EVENT_HURT, EVENT_DEATH, EVENT_MVP
+)
+from src.services.demo_parser import MatchStatsCollector, TEAM_T, TEAM_CT
+
+
+def test_event_table_aggregates():
+    """Лічильники гравців, зброї та раундів з таблиці подій"""
+    print("🧪 Тестування агрегатів таблиці подій...")
+    table = EventTable()
+    ak, awp, he = table.weapon_id("AK47"), table.weapon_id("AWP"), table.weapon_id("HEGRENADE")
+    # Гравець 0 стріляє, влучає і вбиває гравця 1; гравець 2 асистує засліпленням
+    table.count_shot(0, ak)
+    table.count_shot(0, ak)
+    table.add(EVENT_HURT, 11, 0, attacker=0, victim=1, weapon=ak, damage=27)
+    table.add(EVENT_HURT, 12, 0, attacker=2, victim=1, weapon=he, damage=40, flag=True)
+    table.add(EVENT_HURT, 13, 0, attacker=-1, victim=1, weapon=he, damage=5, flag=True)
+    table.add(EVENT_DEATH, 14, 0, attacker=0, victim=1, assister=2, weapon=awp, headshot=True, flag=True)
+    table.add(EVENT_DEATH, 15, 0, attacker=0, victim=2, weapon=ak)
+    table.add(EVENT_DEATH, 16, 0, attacker=0, victim=3, weapon=awp)
+    table.add(EVENT_MVP, 17, 0, attacker=0)
+    table.add_round_result(0, 0, 1, True)
+    table.add_round_result(1, 0, 1, False)
+    # Наступний раунд: лише смерть гравця 0 від світу
+    table.add(EVENT_DEATH, 30, 1, attacker=-1, victim=0, weapon=table.weapon_id("WORLD"))
+    table.add_round_result(0, 1, 2, False)
+    assert len(table) == 8
+
+    totals = table.aggregate(4, 2)
+    assert totals['kills'].tolist() == [3, 0, 0, 0]
+    assert totals['headshots'].tolist() == [1, 0, 0, 0]
+    assert totals['deaths'].tolist() == [1, 1, 1, 1]
+    assert totals['assists'].tolist() == [0, 0, 1, 0] and totals['flash_assists'].tolist() == [0, 0, 1, 0]
+    assert totals['damage_dealt'].tolist() == [27, 0, 40, 0]
+    assert totals['damage_taken'].tolist() == [0, 72, 0, 0]
+    assert totals['utility_damage'].tolist() == [0, 0, 40, 0]
+    assert totals['mvps'].tolist() == [1, 0, 0, 0]
+    assert totals['weapon_kills'][0, [ak, awp]].tolist() == [1, 2]
+    assert totals['weapon_shots'][0, ak] == 2 and totals['weapon_hits'][0, ak] == 1
+    assert totals['weapon_hits'][2].sum() == 0
+
+    first, second = totals['rounds'][0]
+    assert first == {'round': 1, 'kills': 3, 'deaths': 0, 'assists': 0, 'mvp': True, 'damage_dealt': 27,
+                     'weapon_used': "AWP", 'result': 'win'}
+    assert second['deaths'] == 1 and second['weapon_used'] is None and second['result'] == 'loss'
+    assert totals['rounds'][1][0]['deaths'] == 1 and totals['rounds'][2] == []
+    print("✅ Вбивства, шкода, асисти, зброя та раунди пораховано групуванням")
+
+
+def test_round_weapon_tie_breaks_by_first_kill():
+    """При рівній кількості вбивств основна зброя раунду - та, з якої вбито першим"""
+    print("\n🧪 Тестування вибору основної зброї раунду...")
+    table = EventTable()
+    m4, usp = table.weapon_id("M4A1"), table.weapon_id("USP")
+    for tick, weapon in enumerate((usp, m4, m4, usp)):
+        table.add(EVENT_DEATH, tick, 0, attacker=0, victim=1, weapon=weapon)
+    table.add(EVENT_DEATH, 10, 1, attacker=0, victim=1, weapon=m4)
+    table.add_round_result(0, 0, 1, True)
+    table.add_round_result(0, 1, 2, True)
+    rounds = table.aggregate(2, 2)['rounds'][0]
+    assert [r['weapon_used'] for r in rounds] == ["USP", "M4A1"]
+    print("✅ Основну зброю обрано коректно")
+
+
+def test_collector_output_is_plain_python():
+    """Результат збору статистики серіалізується в JSON (без типів NumPy)"""
+    print("\n🧪 Тестування формату результату...")
+    collector = MatchStatsCollector(64)
+    for userid, team in ((1, TEAM_T), (2, TEAM_CT)):
+        collector.handle('player_info', {'userid': userid, 'steamid': 76561198000000000 + userid,
+                                         'name': f"p{userid}"}, 0)
+        collector.handle('player_team', {'userid': userid, 'team': team}, 0)
+    collector.handle('round_start', {}, 1)
+    collector.handle('weapon_fire', {'userid': 1, 'weapon': "weapon_ak47"}, 2)
+    collector.handle('player_hurt', {'userid': 2, 'attacker': 1, 'weapon': "ak47", 'dmg_health': 100}, 3)
+    collector.handle('player_death', {'userid': 2, 'attacker': 1, 'weapon': "ak47", 'headshot': True}, 3)
+    collector.handle('round_end', {'winner': TEAM_T}, 4)
+    players = collector.finish()
+    encoded = json.loads(json.dumps(players))
+    assert encoded == players
+    shooter = players['76561198000000001']
+    assert shooter['weapons'] == {'AK47': {'kills': 1, 'shots': 1, 'hits': 1}}
+    assert shooter['rounds'][0]['weapon_used'] == "AK47" and type(shooter['kills']) is int
+    print("✅ Результат містить лише типи Python")
+
+
+def test_large_match_aggregation():
+    """Агрегати великої кількості подій рахуються векторно"""
+    print("\n🧪 Тестування продуктивності...")
+    rng = np.random.default_rng(7)
+    table = EventTable()
+    weapons = [table.weapon_id(name) for name in ("AK47", "M4A1", "AWP", "DEAGLE", "HEGRENADE")]
+    events = 200000
+    kinds = rng.integers(EVENT_HURT, EVENT_MVP, events)
+    players = rng.integers(0, 10, (events, 2))
+    segments = np.sort(rng.integers(0, 30, events))
+    chosen = rng.integers(0, len(weapons), events)
+    for kind, (attacker, victim), segment, weapon in zip(kinds.tolist(), players.tolist(), segments.tolist(),
+                                                         chosen.tolist()):
+        table.add(kind, 0, segment, attacker=attacker, victim=victim, weapon=weapon, damage=25)
+        table.count_shot(attacker, weapon)
+    for segment in range(30):
+        for player in range(10):
+            table.add_round_result(player, segment, segment + 1, player < 5)
+
+    started = time.perf_counter()
+    totals = table.aggregate(10, 30)
+    elapsed = time.perf_counter() - started
+    assert totals['kills'].sum() == (kinds == EVENT_DEATH).sum()
+    assert totals['weapon_shots'].sum() == events
+    assert totals['damage_dealt'].sum() == (kinds == EVENT_HURT).sum() * 25
+    assert sum(r['kills'] for rows in totals['rounds'] for r in rows) == totals['kills'].sum()
+    assert elapsed < 1.0
+    print(f"✅ {events} подій агреговано за {elapsed * 1000:.1f} мс")
+
+
+def test_summarize_analyses():
+    """Статистика /demo_stats: суми та групування за картами і зброєю"""
+    print("\n🧪 Тестування загальної статистики аналізів...")
+    analyses = [
+        {'player_stats': {'kills': 20, 'deaths': 10, 'mvps': 2, 'headshots': 8, 'damage_dealt': 2000},
+         'match_info': {'map': "de_mirage", 'rounds_played': 24, 'rounds_won': 13},
+         'weapon_stats': {'AK47': {'kills': 12, 'accuracy': 20.5}, 'AWP': {'kills': 3, 'accuracy': 40.0}}},
+        {'player_stats': {'kills': 10, 'deaths': 15, 'mvps': 0, 'headshots': 5, 'damage_dealt': 1500},
+         'match_info': {'map': "de_nuke", 'rounds_played': 20, 'rounds_won': 6},
+         'weapon_stats': {'AK47': {'kills': 6, 'accuracy': 15.5}}},
+        {'player_stats': {'kills': 5}, 'match_info': {'rounds_played': 16}},
+        {'match_info': {'map': "de_mirage", 'rounds_played': 30, 'rounds_won': 16}},
+    ]
+    summary = summarize_analyses(analyses)
+    assert (summary['matches'], summary['kills'], summary['deaths'], summary['mvps']) == (4, 35, 25, 2)
+    assert (summary['headshots'], summary['damage'], summary['rounds'], summary['wins']) == (13, 3500, 90, 35)
+    assert list(summary['maps']) == ["de_mirage", "de_nuke", "Невідомо"]
+    assert summary['maps']["de_mirage"] == {'rounds': 54, 'wins': 29, 'count': 2}
+    assert summary['weapons']["AK47"] == {'kills': 18, 'accuracy': 36.0, 'count': 2}
+    assert type(summary['weapons']["AWP"]['kills']) is int
+    assert summarize_analyses([])['maps'] == {} and group_sum([], {}) == {}
+    print("✅ Загальна статистика збігається з покроковим підрахунком")
+
+
+def main():
+    """Головна функція тестування"""
+    test_event_table_aggregates()
+    test_round_weapon_tie_breaks_by_first_kill()
+    test_collector_output_is_plain_python()
+    test_large_match_aggregation()
+    test_summarize_analyses()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки черги аналізу демо
+"""
+import asyncio
+import os
+import tempfile
+import time
+
+from src.models.user import UserDatabase, User
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.demo_job_queue import DemoJobQueue, DemoAnalysisWorkerPool, PRIORITY_MANUAL, PRIORITY_MONITOR
+from src.services.outbox import MessageOutbox
+from test_demo_parser import write_sample_demo, TARGET, TEAMMATE, ENEMY
+
+
+def test_enqueue_deduplicates_by_match_id():
+    """Повторна постановка матчу доповнює чати та підвищує пріоритет"""
+    print("🧪 Тестування дедуплікації завдань...")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = DemoJobQueue(os.path.join(tmp, "jobs.db"))
+
+        first = queue.enqueue("match_1", "76561198000000001", [1, 2], PRIORITY_MONITOR)
+        second = queue.enqueue("match_1", "76561198000000001", [3], PRIORITY_MANUAL)
+
+        assert first == second
+        assert queue.get_stats() == {'pending': 1}
+        job = queue.claim("worker")
+        assert job['chat_ids'] == [1, 2, 3]
+        assert job['priority'] == PRIORITY_MANUAL
+        print("✅ Дедуплікація працює")
+
+
+def test_priority_order_and_visibility_timeout():
+    """Ручні аналізи йдуть першими, завислі завдання повертаються в чергу"""
+    print("\n🧪 Тестування пріоритетів та visibility timeout...")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = DemoJobQueue(os.path.join(tmp, "jobs.db"), visibility_timeout=0.05)
+
+        queue.enqueue("monitor_match", "76561198000000001", [1], PRIORITY_MONITOR)
+        queue.enqueue("manual_match", "76561198000000002", [2], PRIORITY_MANUAL)
+
+        job = queue.claim("worker-a")
+        assert job['match_id'] == "manual_match"
+        assert queue.claim("worker-b")['match_id'] == "monitor_match"
+        assert queue.claim("worker-c") is None
+
+        # worker-a "зник" - після таймауту завдання бере інший воркер
+        time.sleep(0.1)
+        reclaimed = queue.claim("worker-c")
+        assert reclaimed['match_id'] == "manual_match"
+        assert reclaimed['attempts'] == 2
+        assert queue.complete(job['id'], "worker-a") is False
+        print("✅ Пріоритети та повторне взяття працюють")
+
+
+def test_retries_with_backoff_then_fail():
+    """Невдалі спроби повторюються з затримкою, потім завдання позначається невдалим"""
+    print("\n🧪 Тестування повторів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = DemoJobQueue(os.path.join(tmp, "jobs.db"), max_attempts=2, base_backoff=60)
+        queue.enqueue("match_1", "76561198000000001", [1])
+
+        job = queue.claim("worker")
+        assert queue.fail(job['id'], "worker", "timeout") == 'pending'
+        # Завдання відкладене на base_backoff секунд
+        assert queue.claim("worker") is None
+
+        queue.base_backoff = 0
+        queue.enqueue("match_2", "76561198000000002", [2])
+        job = queue.claim("worker")
+        assert job['match_id'] == "match_2"
+        assert queue.fail(job['id'], "worker", "boom") == 'pending'
+        job = queue.claim("worker")
+        assert queue.fail(job['id'], "worker", "boom") == 'failed'
+        print("✅ Повтори з затримкою працюють")
+
+
+def test_complete_requeues_late_subscribers():
+    """Чати, що додалися під час аналізу, отримають звіт наступним проходом"""
+    print("\n🧪 Тестування завершення завдання...")
+    with tempfile.TemporaryDirectory() as tmp:
+        queue = DemoJobQueue(os.path.join(tmp, "jobs.db"))
+        queue.enqueue("match_1", "76561198000000001", [1])
+
+        job = queue.claim("worker")
+        queue.enqueue("match_1", "76561198000000001", [2])
+        queue.complete(job['id'], "worker", notified_chat_ids=[1])
+
+        job = queue.claim("worker")
+        assert job['chat_ids'] == [2]
+        queue.complete(job['id'], "worker", notified_chat_ids=[2])
+        assert queue.get_stats() == {'done': 1}
+        print("✅ Завершення завдань працює")
+
+
+def test_worker_survives_queue_errors():
+    """Збій продовження чи позначки виконання не повертає розісланий аналіз у чергу"""
+    print("\n🧪 Тестування збоїв бази під час виконання завдання...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bot.db")
+        queue = DemoJobQueue(db_path, visibility_timeout=3)
+        workers = DemoAnalysisWorkerPool(queue, None, UserDatabase(db_path), MessageOutbox(db_path), poll_interval=0.01)
+        calls = {'extend': 0, 'complete': 0, 'process': 0}
+        extend, complete = queue.extend, queue.complete
+
+        def flaky_extend(*args):
+            calls['extend'] += 1
+            if calls['extend'] == 1:
+                raise RuntimeError("database is locked")
+            return extend(*args)
+
+        def flaky_complete(*args):
+            calls['complete'] += 1
+            if calls['complete'] == 1:
+                raise RuntimeError("database is locked")
+            return complete(*args)
+
+        async def process_job(job):
+            calls['process'] += 1
+            await asyncio.sleep(2.2)
+            return job['chat_ids']
+
+        queue.extend, queue.complete, workers.process_job = flaky_extend, flaky_complete, process_job
+        queue.enqueue("match_1", TARGET, [1])
+        job = queue.claim("worker")
+        asyncio.run(workers._run_job(job, "worker"))
+
+        assert calls == {'extend': 2, 'complete': 2, 'process': 1}
+        assert queue.get_stats() == {'done': 1}
+        print("✅ Завдання виконано один раз попри збої бази")
+
+
+def test_match_analysis_shared_by_participants():
+    """Демо матчу аналізується один раз, аналіз зберігається кожному зареєстрованому учаснику"""
+    print("\n🧪 Тестування спільного аналізу матчу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            db_path = os.path.join(tmp, "bot.db")
+            user_db = UserDatabase(db_path)
+            user_db.create_user(User(1, steam_id=TARGET))
+            user_db.create_user(User(2, steam_id=TEAMMATE))
+            user_db.create_user(User(3, steam_id="76561198000000099"))
+            outbox = MessageOutbox(db_path)
+            queue = DemoJobQueue(db_path)
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+            workers = DemoAnalysisWorkerPool(queue, analyzer, user_db, outbox)
+
+            # Демо вже завантажене для матчу (спільне для всіх гравців)
+            write_sample_demo(os.path.join("demos", "match_1.dem"))
+            queue.enqueue("match_1", TARGET, [1, 2, 3], PRIORITY_MANUAL)
+            job = queue.claim("worker")
+            notified = asyncio.run(workers.process_job(job))
+            analyzer.shutdown()
+
+            assert notified == [1, 2, 3]
+            assert analyzer.analysis_cache.get_stats()['entries'] == 1
+            assert not os.path.exists(os.path.join("demos", "match_1.dem"))
+        finally:
+            os.chdir(cwd)
+
+        target = user_db.get_recent_matches(TARGET)[0].analysis_data
+        mate = user_db.get_recent_matches(TEAMMATE)[0].analysis_data
+        assert target['player_stats']['kills'] == 2 and mate['player_stats']['kills'] == 1
+        assert mate['detailed_stats']['trade_kills'] == 1
+        assert user_db.get_recent_matches(ENEMY) == []
+        # /demo_analysis бере готовий аналіз поточної версії з бази замість повторного аналізу
+        stored = user_db.get_match_analysis(TEAMMATE, "match_1")
+        assert stored.analyzed and stored.analysis_data['analyzer_version'] == DemoAnalyzer.ANALYZER_VERSION
+
+        messages = {}
+        while True:
+            message = outbox.claim()
+            if not message:
+                break
+            messages[message['chat_id']] = message['text']
+        assert "(2/1)" in messages[1] and "(1/2)" in messages[2]
+        # Користувач не з матчу отримує аналіз гравця, що запросив
+        assert messages[3] == messages[1]
+        print("✅ Один розбір демо - аналізи для всіх учасників")
+
+
+def main():
+    """Головна функція тестування"""
+    test_enqueue_deduplicates_by_match_id()
+    test_priority_order_and_visibility_timeout()
+    test_retries_with_backoff_then_fail()
+    test_complete_requeues_late_subscribers()
+    test_worker_survives_queue_errors()
+    test_match_analysis_shared_by_participants()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
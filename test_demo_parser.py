@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки власного парсера демо-файлів
+"""
+import asyncio
+import bz2
+import gzip
+import os
+import struct
+import tempfile
+import time
+import tracemalloc
+
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.demo_parser import (
+    parse_demo_file, iter_demo_events, is_demo_file, detect_demo_format, DemoFile, DemoParseError, DEMO_MAGIC, HEADER_FORMAT, HEADER_SIZE, FRAME_HEADER, CMDINFO_SIZE,
+    DEM_SIGNON, DEM_PACKET, DEM_STOP, DEM_STRINGTABLES,
+    SVC_CREATE_STRING_TABLE, SVC_GAME_EVENT, SVC_GAME_EVENT_LIST, PLAYER_INFO_FORMAT
+)
+
+# Типи ключів подій: 1 - рядок, 4 - short, 5 - byte, 6 - bool
+EVENTS = {
+    'player_connect': [('name', 1), ('index', 5), ('userid', 4), ('networkid', 1)],
+    'player_team': [('userid', 4), ('team', 5), ('oldteam', 5), ('disconnect', 6)],
+    'begin_new_match': [],
+    'round_start': [('timelimit', 4)],
+    'round_end': [('winner', 5), ('reason', 5)],
+    'round_mvp': [('userid', 4), ('reason', 4)],
+    'weapon_fire': [('userid', 4), ('weapon', 1)],
+    'player_hurt': [('userid', 4), ('attacker', 4), ('weapon', 1), ('dmg_health', 4), ('hitgroup', 5)],
+    'player_death': [('userid', 4), ('attacker', 4), ('assister', 4), ('assistedflash', 6), ('weapon', 1),
+                     ('headshot', 6)],
+    'bomb_planted': [('userid', 4), ('site', 4)],
+}
+VALUE_FIELDS = {1: 2, 4: 5, 5: 6, 6: 7}
+
+
+def varint(value: int) -> bytes:
+    if value < 0:
+        value += 1 << 64
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def pb_int(field: int, value: int) -> bytes:
+    return varint(field << 3) + varint(value)
+
+
+def pb_bytes(field: int, value) -> bytes:
+    if isinstance(value, str):
+        value = value.encode()
+    return varint((field << 3) | 2) + varint(len(value)) + value
+
+
+class BitWriter:
+    def __init__(self):
+        self.value = 0
+        self.bits = 0
+
+    def write(self, value: int, count: int):
+        self.value |= (value & ((1 << count) - 1)) << self.bits
+        self.bits += count
+
+    def write_bytes(self, data: bytes):
+        for byte in data:
+            self.write(byte, 8)
+
+    def write_string(self, text: str):
+        self.write_bytes(text.encode() + b'\x00')
+
+    def getvalue(self) -> bytes:
+        return self.value.to_bytes((self.bits + 7) // 8, 'little')
+
+
+class DemoWriter:
+    """Збирає синтетичне демо HL2DEMO з ігровими подіями"""
+
+    def __init__(self, map_name: str = "de_mirage", tickrate: int = 64):
+        self.map_name = map_name
+        self.tickrate = tickrate
+        self.frames = bytearray()
+        self.tick = 0
+        self.event_ids = {name: n for n, name in enumerate(EVENTS)}
+        self._frame(DEM_SIGNON, self._event_list())
+
+    def _frame(self, command: int, payload: bytes):
+        self.frames += struct.pack('<BiB', command, self.tick, 0)
+        if command in (DEM_SIGNON, DEM_PACKET):
+            self.frames += b'\x00' * (CMDINFO_SIZE + 8)
+        self.frames += struct.pack('<i', len(payload)) + payload
+
+    @staticmethod
+    def _message(command: int, body: bytes) -> bytes:
+        return varint(command) + varint(len(body)) + body
+
+    def _event_list(self) -> bytes:
+        body = b''
+        for name, keys in EVENTS.items():
+            descriptor = pb_int(1, self.event_ids[name]) + pb_bytes(2, name)
+            for key_name, key_type in keys:
+                descriptor += pb_bytes(3, pb_int(1, key_type) + pb_bytes(2, key_name))
+            body += pb_bytes(1, descriptor)
+        return self._message(SVC_GAME_EVENT_LIST, body)
+
+    @staticmethod
+    def player_info(userid: int, steam_id: int, name: str, fake: bool = False) -> bytes:
+        data = struct.pack(PLAYER_INFO_FORMAT, 0, steam_id, name.encode(), userid,
+                           b"BOT" if fake else b"STEAM_1:0:1", 0, b'', fake, False)
+        return data + b'\x00' * 22
+
+    def userinfo_table(self, players):
+        """Таблиця userinfo через svc_CreateStringTable; players - (userid, steam_id, нік, бот)"""
+        writer = BitWriter()
+        writer.write(0, 1)
+        for slot, (userid, steam_id, name, fake) in enumerate(players):
+            writer.write(1, 1)  # наступний індекс
+            writer.write(1, 1)
+            writer.write(0, 1)
+            writer.write_string(str(slot))
+            data = self.player_info(userid, steam_id, name, fake)
+            writer.write(1, 1)
+            writer.write(len(data), 14)
+            writer.write_bytes(data)
+        body = (pb_bytes(1, "userinfo") + pb_int(2, 256) + pb_int(3, len(players)) +
+                pb_int(4, 0) + pb_int(7, 0) + pb_bytes(8, writer.getvalue()))
+        self._frame(DEM_SIGNON, self._message(SVC_CREATE_STRING_TABLE, body))
+
+    def stringtables_frame(self, players):
+        """Знімок таблиць рядків у кадрі dem_stringtables"""
+        writer = BitWriter()
+        writer.write(1, 8)
+        writer.write_string("userinfo")
+        writer.write(len(players), 16)
+        for slot, (userid, steam_id, name, fake) in enumerate(players):
+            writer.write_string(str(slot))
+            data = self.player_info(userid, steam_id, name, fake)
+            writer.write(1, 1)
+            writer.write(len(data), 16)
+            writer.write_bytes(data)
+        writer.write(0, 1)
+        self._frame(DEM_STRINGTABLES, writer.getvalue())
+
+    def event(self, name: str, ticks: int = 16, **values):
+        """Додати подію в окремому кадрі packet"""
+        self.tick += ticks
+        body = pb_int(2, self.event_ids[name])
+        for key_name, key_type in EVENTS[name]:
+            value = values.get(key_name, 0 if key_type != 1 else "")
+            field = VALUE_FIELDS[key_type]
+            key = pb_int(1, key_type)
+            key += pb_bytes(field, value) if key_type == 1 else pb_int(field, int(value))
+            body += pb_bytes(3, key)
+        self._frame(DEM_PACKET, self._message(SVC_GAME_EVENT, body))
+
+    def build(self) -> bytes:
+        header = struct.pack(HEADER_FORMAT, DEMO_MAGIC, 4, 13880, b"Valve CS:GO", b"GOTV", self.map_name.encode(),
+                             b"csgo", self.tick / self.tickrate, self.tick, 0, 0)
+        return header + bytes(self.frames) + struct.pack('<BiB', DEM_STOP, self.tick, 0)
+
+
+TARGET = "76561198000000001"
+TEAMMATE = "76561198000000002"
+ENEMY = "76561198000000003"
+
+
+def sample_demo(use_stringtables_frame: bool = False) -> bytes:
+    """Два раунди 2x2: ціль (userid 2) та тіммейт проти гравця та бота"""
+    demo = DemoWriter()
+    players = [(2, int(TARGET), "Target", False), (3, int(TEAMMATE), "Mate", False),
+               (4, int(ENEMY), "Enemy", False), (5, 0, "Bot", True)]
+    if use_stringtables_frame:
+        demo.stringtables_frame(players)
+    else:
+        demo.userinfo_table(players)
+    for userid, team in ((2, 2), (3, 2), (4, 3), (5, 3)):
+        demo.event('player_team', userid=userid, team=team)
+
+    # Розминка не враховується
+    demo.event('player_death', userid=4, attacker=2, weapon="ak47")
+    demo.event('begin_new_match')
+
+    # Раунд 1: entry та клач 1x1 цілі
+    demo.event('round_start')
+    for _ in range(3):
+        demo.event('weapon_fire', userid=2, weapon="weapon_ak47")
+    demo.event('player_hurt', userid=4, attacker=2, weapon="ak47", dmg_health=100, hitgroup=1)
+    demo.event('player_death', userid=4, attacker=2, weapon="ak47", headshot=True)
+    demo.event('player_death', userid=3, attacker=5, weapon="glock")
+    demo.event('player_death', userid=5, attacker=2, weapon="ak47", assister=-1)
+    demo.event('round_end', winner=2)
+    demo.event('round_mvp', userid=2)
+
+    # Раунд 2: розмін тіммейта, граната цілі, програш
+    demo.event('round_start')
+    demo.event('player_hurt', userid=4, attacker=2, weapon="hegrenade", dmg_health=30)
+    demo.event('bomb_planted', userid=3)
+    demo.event('player_death', userid=2, attacker=4, weapon="m4a1", assister=5, assistedflash=True)
+    demo.event('player_death', userid=4, attacker=3, weapon="ak47", ticks=64)
+    demo.event('player_death', userid=3, attacker=5, weapon="famas")
+    demo.event('round_end', winner=3)
+    return demo.build()
+
+
+def write_sample_demo(path: str, **kwargs) -> str:
+    with open(path, 'wb') as f:
+        f.write(sample_demo(**kwargs))
+    return path
+
+
+def test_parse_demo():
+    """Статистика гравців з подій демо"""
+    print("🧪 Тестування розбору демо...")
+    with tempfile.TemporaryDirectory() as tmp:
+        for use_stringtables_frame in (False, True):
+            parsed = parse_demo_file(write_sample_demo(os.path.join(tmp, "match.dem"),
+                                                       use_stringtables_frame=use_stringtables_frame))
+            assert parsed['header']['map_name'] == "de_mirage"
+            assert parsed['header']['tickrate'] == 64
+            assert parsed['rounds_played'] == 2
+            assert parsed['score'] == {'t': 1, 'ct': 1}
+            assert set(parsed['players']) == {TARGET, TEAMMATE, ENEMY, "BOT Bot"}
+
+            target = parsed['players'][TARGET]
+            assert (target['kills'], target['deaths'], target['headshots'], target['mvps']) == (2, 1, 1, 1)
+            assert target['entry_kills'] == 1
+            assert (target['clutch_situations'], target['clutch_wins']) == (1, 1)
+            assert target['damage_dealt'] == 130 and target['utility_damage'] == 30
+            assert target['weapons']['AK47'] == {'kills': 2, 'shots': 3, 'hits': 1}
+            assert target['rounds_won'] == 1
+            assert [r['result'] for r in target['rounds']] == ['win', 'loss']
+
+            mate = parsed['players'][TEAMMATE]
+            assert mate['trade_kills'] == 1 and mate['bomb_plants'] == 1
+            assert (mate['clutch_situations'], mate['clutch_wins']) == (1, 0)
+            bot = parsed['players']["BOT Bot"]
+            assert bot['steam_id'] is None and bot['assists'] == 1 and bot['flash_assists'] == 1
+    print("✅ Вбивства, шкода, клачі, розміни та раунди пораховано коректно")
+
+
+def test_invalid_demo():
+    """Не демо та обрізане демо дають DemoParseError"""
+    print("\n🧪 Тестування пошкоджених файлів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "fake.dem")
+        with open(path, 'w') as f:
+            f.write("Demo file for test")
+        data = sample_demo()
+        truncated = os.path.join(tmp, "truncated.dem")
+        with open(truncated, 'wb') as f:
+            f.write(data[:len(data) - 200])
+        for bad in (path, truncated):
+            try:
+                parse_demo_file(bad)
+                assert False, bad
+            except DemoParseError:
+                pass
+    print("✅ Пошкоджені файли відхиляються")
+
+
+def test_streaming_memory():
+    """Події читаються генератором з mmap, пам'ять не залежить від розміру демо"""
+    print("\n🧪 Тестування потокового читання...")
+    with tempfile.TemporaryDirectory() as tmp:
+        demo = DemoWriter()
+        demo.userinfo_table([(2, int(TARGET), "Target", False)])
+        head = len(demo.frames)
+        demo.event('weapon_fire', userid=2, weapon="weapon_ak47")
+        shot = bytes(demo.frames[head:])
+        data = demo.build()
+        header, stop = data[:HEADER_SIZE], data[-FRAME_HEADER.size:]
+
+        sizes = {}
+        for shots in (10000, 100000):
+            path = os.path.join(tmp, f"long{shots}.dem")
+            with open(path, 'wb') as f:
+                f.write(header)
+                f.write(bytes(demo.frames[:head]))
+                f.write(shot * shots)
+                f.write(stop)
+
+            tracemalloc.start()
+            counted = sum(1 for name, _, _ in iter_demo_events(path) if name == 'weapon_fire')
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            assert counted == shots
+            sizes[shots] = (os.path.getsize(path), peak)
+
+        small, large = sizes[10000], sizes[100000]
+        assert large[0] > 15 * 1024 * 1024
+        assert large[1] < 512 * 1024 and large[1] < small[1] * 2
+        print(f"✅ Демо {large[0] // (1024 * 1024)} МБ прочитано з піком {large[1] // 1024} КБ пам'яті")
+
+        # Кадри - зрізи без копіювання; файл можна закрити, навіть якщо зріз ще живий
+        with DemoFile(path) as parser:
+            command, _, payload = next(parser.frames())
+            assert command == DEM_SIGNON and isinstance(payload, memoryview)
+        assert payload.tobytes()[0] == SVC_GAME_EVENT_LIST
+
+
+def test_compressed_demos():
+    """Стиснені демо розпаковуються потоково і дають той самий результат"""
+    print("\n🧪 Тестування стиснених демо...")
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+    with tempfile.TemporaryDirectory() as tmp:
+        data = sample_demo()
+        expected = parse_demo_file(write_sample_demo(os.path.join(tmp, "match.dem")))
+        compressors = {'.dem.bz2': bz2.compress, '.dem.gz': gzip.compress}
+        if zstandard:
+            compressors['.dem.zst'] = zstandard.ZstdCompressor().compress
+        for extension, compress in compressors.items():
+            path = os.path.join(tmp, f"match{extension}")
+            with open(path, 'wb') as f:
+                f.write(compress(data))
+            assert is_demo_file(path)
+            assert parse_demo_file(path) == expected, extension
+
+            truncated = os.path.join(tmp, f"truncated{extension}")
+            with open(truncated, 'wb') as f:
+                f.write(compress(data)[:-40])
+            try:
+                parse_demo_file(truncated)
+                assert False, truncated
+            except DemoParseError:
+                pass
+
+        not_demo = os.path.join(tmp, "fake.dem.gz")
+        with open(not_demo, 'wb') as f:
+            f.write(gzip.compress(b"Demo file for test"))
+        assert not is_demo_file(not_demo)
+
+        # Велике стиснене демо читається потоково, без розпакованої копії в пам'яті
+        demo = DemoWriter()
+        demo.userinfo_table([(2, int(TARGET), "Target", False)])
+        head = len(demo.frames)
+        demo.event('weapon_fire', userid=2, weapon="weapon_ak47")
+        shot = bytes(demo.frames[head:])
+        full = demo.build()
+        path = os.path.join(tmp, "long.dem.gz")
+        with gzip.open(path, 'wb', compresslevel=1) as f:
+            f.write(full[:HEADER_SIZE] + bytes(demo.frames[:head]))
+            for _ in range(10):
+                f.write(shot * 10000)
+            f.write(full[-FRAME_HEADER.size:])
+
+        tracemalloc.start()
+        counted = sum(1 for name, _, _ in iter_demo_events(path) if name == 'weapon_fire')
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert counted == 100000
+        assert peak < 512 * 1024
+    print(f"✅ Формати {', '.join(compressors)} розібрано, пік пам'яті {peak // 1024} КБ")
+
+
+def test_download_demo_compressed():
+    """Демо з папки Steam зберігається як є; нестиснене стискається, лише якщо лишилось у папці"""
+    print("\n🧪 Тестування збереження демо...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        home = os.environ.get('HOME')
+        os.chdir(tmp)
+        os.environ['HOME'] = tmp
+        try:
+            replays = os.path.join(tmp, ".steam/steam/steamapps/common/Counter-Strike Global Offensive/csgo/replays")
+            os.makedirs(replays)
+            write_sample_demo(os.path.join(replays, "plain.dem"))
+            with open(os.path.join(replays, f"{TARGET}_packed.dem.bz2"), 'wb') as f:
+                f.write(bz2.compress(sample_demo()))
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+
+            async def run():
+                plain = await analyzer.download_demo(TARGET, "plain")
+                packed = await analyzer.download_demo(TARGET, "packed")
+                again = await analyzer.download_demo(TEAMMATE, "plain")
+                result = await analyzer.analyze_demo(plain, TARGET, "plain")
+                stored = sorted(os.listdir("demos"))
+                # Демо залишилось у папці: перевірка сховища стискає його, коли воно не використовується
+                assert await analyzer.storage.enforce_async() == []
+                fresh = sorted(os.listdir("demos"))
+                past = time.time() - 3600
+                os.utime(plain, (past, past))
+                await analyzer.storage.enforce_async()
+                kept = await analyzer.download_demo(TARGET, "plain")
+                return plain, packed, again, result, stored, fresh, kept
+
+            plain, packed, again, result, stored, fresh, kept = asyncio.run(run())
+            analyzer.shutdown()
+            compressed = sorted(os.listdir("demos"))
+            kept_size = os.path.getsize(kept)
+            kept_stats = parse_demo_file(kept)
+        finally:
+            os.chdir(cwd)
+            os.environ['HOME'] = home
+
+        assert plain == again == os.path.join("demos", "plain.dem")
+        assert packed == os.path.join("demos", "packed.dem.bz2")
+        assert stored == fresh == ["packed.dem.bz2", "plain.dem"]
+        assert result['analysis_method'] == 'native_parser' and result['player_stats']['kills'] == 2
+        assert kept == os.path.join("demos", "plain.dem.gz") and compressed == ["packed.dem.bz2", "plain.dem.gz"]
+        assert kept_size < len(sample_demo()) and kept_stats['players'][TARGET]['kills'] == 2
+    print("✅ Демо розібрано без копії, стиснено лише те, що залишилось у папці")
+
+
+def test_analyzer_process_pool():
+    """DemoAnalyzer розбирає кілька демо паралельно у пулі процесів"""
+    print("\n🧪 Тестування аналізу в пулі процесів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            analyzer = DemoAnalyzer("test", parse_workers=2)
+            paths = [write_sample_demo(os.path.join(tmp, f"match{n}.dem")) for n in range(4)]
+
+            async def run():
+                return await asyncio.gather(*(analyzer.analyze_demo(path, TARGET, f"m{n}")
+                                              for n, path in enumerate(paths)))
+
+            results = asyncio.run(run())
+            start_method = analyzer._parse_executor._mp_context.get_start_method()
+            analyzer.shutdown()
+        finally:
+            os.chdir(cwd)
+
+        # Воркери не успадковують процес бота через fork; без явного налаштування - не більше 2
+        assert start_method in ('forkserver', 'spawn')
+        assert 1 <= DemoAnalyzer.default_parse_workers() <= 2
+        for result in results:
+            assert result['analysis_method'] == 'native_parser'
+            assert result['match_info']['map'] == "de_mirage"
+            assert result['match_info']['rounds_won'] == 1 and result['match_info']['rounds_lost'] == 1
+            assert result['player_stats']['kd_ratio'] == 2.0
+            assert result['player_stats']['headshot_percent'] == 50.0
+            assert result['weapon_stats']['AK47']['accuracy'] == 33.3
+            assert result['detailed_stats']['entry_kills'] == 1
+            assert result['performance_analysis']['clutch_performance'] == 100.0
+        summary = asyncio.run(analyzer.get_analysis_summary(results[0]))
+        assert "de_mirage" in summary and "AK47" in summary
+        print("✅ Результат має формат player_stats/weapon_stats/match_info")
+
+
+def test_match_analyzed_once():
+    """Одночасні запити різних гравців того ж матчу використовують один розбір"""
+    print("\n🧪 Тестування спільного аналізу матчу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+            runs = []
+            analyze_match = analyzer._analyze_match
+
+            async def counting_analyze_match(demo_path, match_id):
+                runs.append(match_id)
+                return await analyze_match(demo_path, match_id)
+
+            analyzer._analyze_match = counting_analyze_match
+            demo_path = write_sample_demo(os.path.join("demos", "shared.dem"))
+
+            async def run():
+                first = await asyncio.gather(analyzer.analyze_demo(demo_path, TARGET, "shared"),
+                                             analyzer.analyze_demo(demo_path, TEAMMATE, "shared"))
+                # Повторний запит читає збережений аналіз матчу
+                again = await analyzer.analyze_demo(demo_path, ENEMY, "shared")
+                return first, again
+
+            (target, mate), enemy = asyncio.run(run())
+            analyzer.shutdown()
+            cache_stats = analyzer.analysis_cache.get_stats()
+        finally:
+            os.chdir(cwd)
+
+        assert runs == ["shared", "shared"]
+        assert (cache_stats['entries'], cache_stats['misses'], cache_stats['hits']) == (1, 1, 1)
+        assert (target['player_stats']['kills'], mate['player_stats']['kills'], enemy['player_stats']['kills']) == (2, 1, 1)
+        assert target['match_info'] == mate['match_info'] | {'rounds_won': 1, 'rounds_lost': 1, 'win_rate': 50.0}
+        print("✅ Демо розібрано один раз для всіх гравців матчу")
+
+
+def test_source2_demo_is_not_simulated():
+    """Демо CS2 без зовнішнього аналізатора не отримує вигаданого аналізу"""
+    print("\n🧪 Тестування демо CS2 (PBDEMS2)...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            demo_path = os.path.join(tmp, "cs2.dem")
+            with open(demo_path, 'wb') as f:
+                f.write(b"PBDEMS2\x00" + os.urandom(4096))
+            with gzip.open(demo_path + ".gz", 'wb') as f:
+                f.write(b"PBDEMS2\x00" + os.urandom(64))
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+            analyzer.csgo_demo_manager_path = os.path.join(tmp, "missing-demo-manager")
+            result = asyncio.run(analyzer.analyze_demo(demo_path, TARGET, "cs2"))
+            analyzer.shutdown()
+        finally:
+            os.chdir(cwd)
+        assert detect_demo_format(demo_path) == detect_demo_format(demo_path + ".gz") == 'source2'
+        assert not is_demo_file(demo_path)
+        assert result is None
+        print("✅ Демо CS2 без аналізатора не проаналізовано, вигаданих даних немає")
+
+
+def test_demo_manager_summary():
+    """Звіт будується з результату CSGO Demo Manager (демо CS2)"""
+    print("\n🧪 Тестування звіту з результату CSGO Demo Manager...")
+    raw = {
+        'match': {'map': "de_inferno", 'rounds_played': 20, 'rounds_won': 13, 'rounds_lost': 7, 'duration': "35 minutes"},
+        'players': [{'steam_id': TARGET, 'stats': {
+            'kills': 22, 'deaths': 11, 'assists': 4, 'mvps': 3, 'headshots': 11, 'damage_dealt': 2400,
+            'clutch_situations': 4, 'clutch_wins': 1, 'entry_kills': 5, 'flash_assists': 2,
+            'weapons': {'AK47': {'kills': 15, 'shots': 200, 'hits': 50}, 'AWP': {'kills': 7, 'shots': 10, 'hits': 7}}
+        }}]
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+            result = analyzer._process_csgo_demo_manager_data(raw, TARGET, "cs2")
+            summary = asyncio.run(analyzer.get_analysis_summary(result))
+        finally:
+            os.chdir(cwd)
+    assert result['detailed_stats']['entry_kills'] == 5 and result['detailed_stats']['bomb_plants'] == 0
+    assert result['performance_analysis']['clutch_performance'] == 25.0
+    assert result['performance_analysis']['entry_performance'] == 5
+    assert "Помилка" not in summary and "de_inferno" in summary and "Entry фраги: **5**" in summary
+    del result['detailed_stats']
+    assert "Entry фраги: **0**" in asyncio.run(analyzer.get_analysis_summary(result))
+    print("✅ Звіт з результату CSGO Demo Manager створено")
+
+
+def main():
+    """Головна функція тестування"""
+    test_parse_demo()
+    test_invalid_demo()
+    test_streaming_memory()
+    test_compressed_demos()
+    test_download_demo_compressed()
+    test_analyzer_process_pool()
+    test_match_analyzed_once()
+    test_source2_demo_is_not_simulated()
+    test_demo_manager_summary()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
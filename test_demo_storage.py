@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки квот на папки демо та аналізів
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+from contextlib import ExitStack
+
+from src.services.demo_analyzer import DemoAnalyzer
+from src.services.demo_storage import DemoStorage
+from test_demo_parser import write_sample_demo, TARGET
+
+
+def write(path: str, size: int, age: float = 3600) -> str:
+    with open(path, 'wb') as f:
+        f.write(b"\0" * size)
+    # Файл змінено давно - він не вважається зайнятим
+    past = time.time() - age
+    os.utime(path, (past, past))
+    return path
+
+
+def test_lru_eviction():
+    """Понад квоту видаляються найдавніше використані файли"""
+    print("🧪 Тестування витіснення LRU...")
+    with tempfile.TemporaryDirectory() as tmp:
+        demos = os.path.join(tmp, "demos")
+        storage = DemoStorage(os.path.join(tmp, "storage.db"), {demos: 3000})
+        paths = [write(os.path.join(demos, f"m{n}.dem"), 1000, age=3600 - n) for n in range(4)]
+        write(os.path.join(demos, "cache.db"), 5000)
+        for path in paths:
+            storage.touch(path)
+            time.sleep(0.01)
+        # m0 використано останнім - замість нього витісняється m1
+        storage.touch(paths[0])
+        # Файл поза обліком (наприклад, після збою) враховується з часом зміни
+        write(os.path.join(demos, "m4.dem"), 1000, age=1800)
+
+        evicted = storage.enforce()
+        assert [os.path.basename(path) for path in evicted] == ["m4.dem", "m1.dem"]
+        assert sorted(os.listdir(demos)) == ["cache.db", "m0.dem", "m2.dem", "m3.dem"]
+        usage = storage.get_usage()
+        assert usage['folders'][demos] == {'files': 3, 'bytes': 3000, 'quota': 3000}
+        assert (usage['evicted_files'], usage['evicted_bytes']) == (2, 2000)
+        assert storage.enforce() == []
+        print(f"✅ Витіснено {len(evicted)} файли, зайнято {usage['folders'][demos]['bytes']} з 3000 байт")
+
+
+def test_pinned_busy_and_stale():
+    """Закріплені та щойно змінені файли не витісняються, застарілі видаляються без перевищення квоти"""
+    print("\n🧪 Тестування закріплених та застарілих файлів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        demos = os.path.join(tmp, "demos")
+        analysis = os.path.join(tmp, "analysis")
+        storage = DemoStorage(os.path.join(tmp, "storage.db"), {demos: 1000, analysis: 10 ** 6},
+                              max_ages={analysis: 1800})
+        pinned = write(os.path.join(demos, "pinned.dem"), 1000, age=7200)
+        busy = write(os.path.join(demos, "busy.dem.gz"), 1000, age=0)
+        old = write(os.path.join(analysis, "old.json"), 10, age=7200)
+        fresh = write(os.path.join(analysis, "fresh.json"), 10, age=600)
+
+        # Закріплення в одному процесі бачить сховище іншого процесу (спільна база)
+        other = DemoStorage(os.path.join(tmp, "storage.db"), {demos: 1000, analysis: 10 ** 6},
+                            max_ages={analysis: 1800})
+        with storage.pin(pinned):
+            assert other.enforce() == [old]
+        assert os.path.exists(pinned) and os.path.exists(busy) and os.path.exists(fresh)
+        # Закріплення процесу, що зник, спливає
+        with storage.pin(pinned, ttl=0.01):
+            time.sleep(0.05)
+            assert other.enforce() == [pinned]
+        assert storage.get_usage()['folders'][demos]['bytes'] == 1000
+        print("✅ Закріплені та зайняті файли збережено, застарілий аналіз видалено")
+
+
+def test_background_eviction():
+    """Перевірка квот запускається у фоні і не блокує event loop"""
+    print("\n🧪 Тестування фонового очищення...")
+    with tempfile.TemporaryDirectory() as tmp:
+        demos = os.path.join(tmp, "demos")
+        storage = DemoStorage(os.path.join(tmp, "storage.db"), {demos: 1000}, eviction_interval=0.05)
+        for n in range(3):
+            write(os.path.join(demos, f"m{n}.dem"), 1000, age=3600 - n)
+
+        async def run():
+            storage.start()
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if len(os.listdir(demos)) == 1:
+                    break
+            await storage.stop()
+
+        asyncio.run(run())
+        assert os.listdir(demos) == ["m2.dem"]
+        print("✅ Фонова перевірка звільнила місце")
+
+
+def test_compaction():
+    """Ущільнюються лише файли, що не використовуються; час доступу зберігається"""
+    print("\n🧪 Тестування ущільнення файлів...")
+    with tempfile.TemporaryDirectory() as tmp, ExitStack() as pins:
+        demos = os.path.join(tmp, "demos")
+        compacted = []
+
+        def compact(path):
+            if not path.endswith(".dem"):
+                return None
+            compacted.append(os.path.basename(path))
+            shutil.copyfile(path, path + ".gz.part")
+            if path.endswith("raced.dem"):
+                # Інший процес закріплює файл, поки він ущільнюється
+                pins.enter_context(other.pin(path))
+            return path + ".gz.part", path + ".gz"
+
+        storage = DemoStorage(os.path.join(tmp, "storage.db"), {demos: 10 ** 6}, compactors={demos: compact})
+        other = DemoStorage(os.path.join(tmp, "storage.db"), {demos: 10 ** 6})
+        idle = write(os.path.join(demos, "idle.dem"), 100, age=7200)
+        pinned = write(os.path.join(demos, "pinned.dem"), 100, age=7200)
+        write(os.path.join(demos, "raced.dem"), 100, age=7200)
+        write(os.path.join(demos, "busy.dem"), 100, age=0)
+        write(os.path.join(demos, "packed.dem.bz2"), 100, age=7200)
+        storage.touch(idle)
+        conn = storage._connect()
+        conn.execute('UPDATE storage_files SET last_access = 1000 WHERE path = ?', (os.path.normpath(idle),))
+        conn.close()
+
+        with storage.pin(pinned):
+            assert storage.enforce() == []
+        conn = storage._connect()
+        row = conn.execute('SELECT last_access FROM storage_files WHERE path = ?',
+                           (os.path.normpath(idle + ".gz"),)).fetchone()
+        conn.close()
+        assert sorted(compacted) == ["idle.dem", "raced.dem"] and row['last_access'] == 1000
+        assert sorted(os.listdir(demos)) == ["busy.dem", "idle.dem.gz", "packed.dem.bz2", "pinned.dem", "raced.dem"]
+        assert storage.get_usage()['compacted_files'] == 1
+        print("✅ Ущільнено лише файл, що не використовується")
+
+
+def test_analyzer_tracks_demos():
+    """DemoAnalyzer бере демо на облік, стискає ті, що залишились, і витісняє старі понад квоту"""
+    print("\n🧪 Тестування квот аналізатора...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            analyzer = DemoAnalyzer("test", parse_workers=1)
+            demo_size = os.path.getsize(write_sample_demo(os.path.join("demos", "m0.dem")))
+            compressed_size = os.path.getsize(analyzer.compress_demo(write_sample_demo("probe.dem"))[0])
+            analyzer.storage.quotas[os.path.normpath("demos")] = demo_size + compressed_size
+            for n in range(1, 4):
+                past = time.time() - 3600 + n
+                os.utime(write_sample_demo(os.path.join("demos", f"m{n}.dem")), (past, past))
+
+            async def run():
+                # m0 щойно проаналізовано - він найсвіжіший за доступом
+                result = await analyzer.analyze_demo(os.path.join("demos", "m0.dem"), TARGET, "m0")
+                return result, await analyzer.storage.enforce_async()
+
+            result, evicted = asyncio.run(run())
+            analyzer.shutdown()
+            remaining = sorted(os.listdir("demos"))
+            usage = analyzer.storage.get_usage()
+        finally:
+            os.chdir(cwd)
+
+        # Старі демо спершу стиснуто, найдавніші з них витіснено; щойно аналізоване не чіпається
+        assert result['analysis_method'] == 'native_parser'
+        assert sorted(evicted) == [os.path.join("demos", "m1.dem.gz"), os.path.join("demos", "m2.dem.gz")]
+        assert remaining == ["m0.dem", "m3.dem.gz"]
+        assert usage['folders']['demos']['bytes'] == demo_size + compressed_size
+        assert usage['compacted_files'] == 3
+        print("✅ Аналізоване демо збережено, старі стиснено та витіснено")
+
+
+def main():
+    """Головна функція тестування"""
+    test_lru_eviction()
+    test_pinned_busy_and_stale()
+    test_background_eviction()
+    test_compaction()
+    test_analyzer_tracks_demos()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
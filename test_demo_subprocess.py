@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки неблокуючого запуску аналізатора демо
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from src.services.demo_analyzer import DemoAnalyzer
+
+
+def make_analyzer(tmp, max_concurrent_analyses=2):
+    cwd = os.getcwd()
+    os.chdir(tmp)
+    try:
+        analyzer = DemoAnalyzer("test", max_concurrent_analyses=max_concurrent_analyses)
+    finally:
+        os.chdir(cwd)
+    analyzer.KILL_GRACE_PERIOD = 1
+    return analyzer
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Завершений осиротілий процес може лишатися зомбі, доки його не прибере init
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+def test_output_capture():
+    """stdout та stderr читаються потоково і повертаються разом з кодом завершення"""
+    print("🧪 Тестування захоплення виводу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = make_analyzer(tmp)
+        script = "import sys\nfor i in range(500): print(i)\nsys.stderr.write('boom\\n')\nsys.exit(3)"
+        returncode, stdout, stderr = asyncio.run(analyzer.run_process([sys.executable, "-c", script], 10))
+        assert returncode == 3
+        lines = stdout.split("\n")
+        assert len(lines) == analyzer.OUTPUT_TAIL_LINES and lines[-1] == "499"
+        assert stderr == "boom"
+        print("✅ Вивід збережено (останні рядки), код завершення коректний")
+
+
+def test_event_loop_not_blocked():
+    """Під час аналізу event loop продовжує працювати, одночасно не більше N процесів"""
+    print("\n🧪 Тестування неблокуючого запуску та обмеження паралельності...")
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = make_analyzer(tmp, max_concurrent_analyses=2)
+        cmd = [sys.executable, "-c", "import time; time.sleep(0.5)"]
+
+        async def run():
+            running = 0
+            peak = 0
+            ticks = 0
+
+            async def analyze():
+                nonlocal running, peak
+                async with analyzer._analysis_semaphore:
+                    running += 1
+                    peak = max(peak, running)
+                    await analyzer.run_process(cmd, 10)
+                    running -= 1
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.05)
+
+            ticker_task = asyncio.create_task(ticker())
+            started = time.monotonic()
+            await asyncio.gather(*(analyze() for _ in range(4)))
+            elapsed = time.monotonic() - started
+            ticker_task.cancel()
+            return peak, ticks, elapsed
+
+        peak, ticks, elapsed = asyncio.run(run())
+        assert peak == 2
+        assert elapsed >= 0.9
+        assert ticks >= 10
+        print(f"✅ Макс. паралельно: {peak}, тіків event loop: {ticks}, час: {elapsed:.2f} с")
+
+
+def test_timeout_kills_process_group():
+    """Таймаут завершує процес разом з дочірніми"""
+    print("\n🧪 Тестування таймауту...")
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = make_analyzer(tmp)
+        pid_file = os.path.join(tmp, "child.pid")
+        script = (
+            "import subprocess, sys, time\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+            f"open({pid_file!r}, 'w').write(str(child.pid))\n"
+            "time.sleep(60)"
+        )
+
+        async def run():
+            try:
+                await analyzer.run_process([sys.executable, "-c", script], 1)
+            except asyncio.TimeoutError:
+                return True
+            return False
+
+        started = time.monotonic()
+        assert asyncio.run(run())
+        assert time.monotonic() - started < 10
+        if os.name == 'posix':
+            child_pid = int(open(pid_file).read())
+            time.sleep(0.2)
+            assert not pid_alive(child_pid)
+        print("✅ Процес аналізатора та його дочірні процеси завершено")
+
+
+def test_cancellation_kills_process():
+    """Скасування задачі завершує процес аналізатора"""
+    print("\n🧪 Тестування скасування...")
+    with tempfile.TemporaryDirectory() as tmp:
+        analyzer = make_analyzer(tmp)
+        pid_file = os.path.join(tmp, "analyzer.pid")
+        script = f"import os, time\nopen({pid_file!r}, 'w').write(str(os.getpid()))\ntime.sleep(60)"
+
+        async def run():
+            task = asyncio.create_task(analyzer.run_process([sys.executable, "-c", script], 60))
+            while not os.path.exists(pid_file) or not open(pid_file).read():
+                await asyncio.sleep(0.05)
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                return int(open(pid_file).read())
+
+        pid = asyncio.run(run())
+        assert pid and not pid_alive(pid)
+        print("✅ Процес завершено після скасування")
+
+
+def main():
+    """Головна функція тестування"""
+    test_output_capture()
+    test_event_loop_not_blocked()
+    test_timeout_kills_process_group()
+    test_cancellation_kills_process()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
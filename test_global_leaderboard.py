@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки глобального рейтингу
+"""
+import asyncio
+import os
+import tempfile
+
+from src.models.user import UserDatabase, User
+from src.services.steam_api import SteamAPI
+from src.services.leaderboards import LeaderboardStore
+from src.services.global_leaderboard import GlobalLeaderboard
+from src.handlers.bot_handlers import BotHandlers
+
+
+def seed(tmp, players=25):
+    user_db = UserDatabase(os.path.join(tmp, "global.db"))
+    store = LeaderboardStore(user_db.db_path)
+    for n in range(1, players + 1):
+        user_db.create_user(User(n, steam_id=f"s{n:02d}"))
+        store.record_player(f"s{n:02d}", {'kd_ratio': 1.0, 'win_rate': 50.0}, float(n), f"Гравець {n}")
+    # Гравець з однаковим Impact Score та друг, що не є користувачем бота
+    user_db.create_user(User(100, steam_id="s00"))
+    store.record_player("s00", {'kd_ratio': 1.0, 'win_rate': 50.0}, 25.0, "Двійник")
+    store.record_player("outsider", {'kd_ratio': 3.0, 'win_rate': 90.0}, 99.0, "Не користувач")
+    return user_db, store
+
+
+def test_top_k_pages_and_bands():
+    """Топ-k з позиціями, сторінки та перцентилі для решти"""
+    print("🧪 Тестування глобального рейтингу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        user_db, store = seed(tmp)
+        leaderboard = GlobalLeaderboard(user_db, store, top_k=10, page_size=4)
+        assert leaderboard.refresh() == 26
+        assert leaderboard.get_meta()['total_players'] == 26
+
+        entries, pages = leaderboard.get_page(1)
+        assert pages == 3
+        assert [entry['steam_id'] for entry in entries] == ["s00", "s25", "s24", "s23"]
+        entries, _ = leaderboard.get_page(99)
+        assert [entry['position'] for entry in entries] == [9, 10]
+
+        assert leaderboard.get_standing("s24") == {'position': 3}
+        assert leaderboard.get_standing("s14") == {'top_percent': 50}
+        assert leaderboard.get_standing("s01") == {'top_percent': 100}
+        assert leaderboard.get_standing("unknown") is None
+        print("✅ Рейтинг, сторінки та перцентилі коректні")
+
+
+def test_leaderboard_page_rendering():
+    """Сторінка /leaderboard з позицією користувача та кнопками"""
+    print("\n🧪 Тестування сторінки /leaderboard...")
+    with tempfile.TemporaryDirectory() as tmp:
+        user_db, store = seed(tmp)
+        handlers = BotHandlers(user_db, SteamAPI("test"),
+                               global_leaderboard=GlobalLeaderboard(user_db, store, top_k=10, page_size=4))
+
+        # Рейтинг ще не рахувався - перша сторінка рахує його з кешу
+        text, markup = asyncio.run(handlers._render_leaderboard_page(2, telegram_id=5))
+        assert "Сторінка 2/3" in text
+        assert "Ти у кращих" in text
+        assert [button.callback_data for button in markup.inline_keyboard[0]] == ["leaderboard:1", "leaderboard:3"]
+
+        text, markup = asyncio.run(handlers._render_leaderboard_page(1, telegram_id=25))
+        assert "Гравець 25** 👤" in text and "Твоя позиція: #2" in text
+        assert [button.callback_data for button in markup.inline_keyboard[0]] == ["leaderboard:2"]
+        print("✅ Сторінки рейтингу формуються з попередньо обчисленої таблиці")
+
+
+def main():
+    """Головна функція тестування"""
+    test_top_k_pages_and_bands()
+    test_leaderboard_page_rendering()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
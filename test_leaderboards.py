@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки матеріалізованих рейтингів друзів
+"""
+import asyncio
+import os
+import tempfile
+from datetime import timedelta
+
+from src.models.user import UserDatabase
+from src.services.daily_reports import DailyReportsService
+from src.services.leaderboards import LeaderboardStore
+from test_stats_snapshot import CountingSteamAPI, make_user
+
+
+def test_leaderboard_is_local_read_after_refresh():
+    """Повторне читання рейтингу не звертається до Steam, оновлення гравця перераховує групи"""
+    print("🧪 Тестування матеріалізованого рейтингу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LeaderboardStore(os.path.join(tmp, "leaderboards.db"))
+        api = CountingSteamAPI()
+
+        asyncio.run(store.refresh(api, ["s1", "s2", "s3", "missing"]))
+        assert sorted(api.stats_calls) == ["missing", "s1", "s2", "s3"]
+
+        api.stats_calls.clear()
+        asyncio.run(store.refresh(api, ["s1", "s2", "s3"]))
+        assert api.stats_calls == []
+
+        board = store.get_leaderboard(["s1", "s2", "s3", "missing"])
+        assert [entry['steam_id'] for entry in board] == ["s3", "s2", "s1"]
+        assert board[0]['name'] == "Гравець s3"
+
+        # Оновлення одного гравця змінює всі групи, до яких він входить
+        store.get_leaderboard(["s1", "s2"])
+        stats = store.get_players(["s1"])["s1"]['stats']
+        store.record_player("s1", stats, 99.0, "Гравець s1")
+        assert store.get_leaderboard(["s3", "s1", "s2", "missing"])[0]['steam_id'] == "s1"
+        assert [entry['steam_id'] for entry in store.get_leaderboard(["s2", "s1"])] == ["s1", "s2"]
+
+        # Статистика без імені (наприклад, з /stats без профілю) не затирає збережене ім'я
+        store.record_player("s2", stats, 98.0)
+        assert store.get_players(["s2"])["s2"]['name'] == "Гравець s2"
+        assert store.get_leaderboard(["s2", "s1"])[1]['name'] == "Гравець s2"
+        store.record_player("new", stats, 10.0)
+        assert store.get_leaderboard(["new"])[0]['name'] == "Невідомо"
+
+        # Застаріла статистика завантажується повторно
+        assert store.get_stale(["s1", "s2"], max_age=timedelta(0)) == ["s1", "s2"]
+        print("✅ Рейтинг читається з бази та оновлюється інкрементально")
+
+
+def test_daily_friends_report_reads_shared_leaderboard():
+    """Звіт по друзях читає той самий рейтинг, що й /friends_stats"""
+    print("\n🧪 Тестування звіту по друзях з матеріалізованого рейтингу...")
+    with tempfile.TemporaryDirectory() as tmp:
+        user_db = UserDatabase(os.path.join(tmp, "leaderboards.db"))
+        user = make_user(1, "s1", friends=["s2", "s3"])
+        service = DailyReportsService(user_db, CountingSteamAPI(), bot=None)
+
+        snapshot = asyncio.run(service.build_snapshot([user]))
+        report = asyncio.run(service.generate_friends_daily_report(user, snapshot))
+        assert report.index("Гравець s3") < report.index("Гравець s2") < report.index("Гравець s1")
+
+        # Без знімка звіт не робить запитів, якщо статистика актуальна
+        service.steam_api.stats_calls.clear()
+        asyncio.run(service.generate_friends_daily_report(user))
+        assert service.steam_api.stats_calls == []
+        assert service.leaderboards.get_leaderboard(["s3", "s2", "s1"])[0]['steam_id'] == "s3"
+        print("✅ Звіт по друзях використовує спільний рейтинг")
+
+
+def main():
+    """Головна функція тестування"""
+    test_leaderboard_is_local_read_after_refresh()
+    test_daily_friends_report_reads_shared_leaderboard()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
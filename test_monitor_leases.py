@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки оренди шардів воркерами моніторингу
+"""
+import os
+import sqlite3
+import tempfile
+
+from src.services.monitor_leases import MonitorLeaseManager
+
+
+class LockedConnection:
+    """База, заблокована іншим процесом довше за timeout"""
+    in_transaction = False
+
+    def execute(self, *args):
+        raise sqlite3.OperationalError("database is locked")
+
+    def close(self):
+        pass
+
+
+def _owned(managers):
+    return [m.owned_shards for m in managers]
+
+
+def test_workers_split_shards_disjointly():
+    """Кілька воркерів на одній базі ділять шарди без перетинів"""
+    print("🧪 Тестування розподілу шардів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "leases.db")
+        workers = [MonitorLeaseManager(db_path, f"worker-{i}", num_shards=16, lease_ttl=30) for i in range(3)]
+
+        # Кілька раундів heartbeat, поки оренди не збалансуються
+        now = 1000.0
+        for _ in range(3):
+            for worker in workers:
+                worker.heartbeat(now)
+            now += 5
+
+        owned = _owned(workers)
+        all_shards = set().union(*owned)
+        assert all_shards == set(range(16)), all_shards
+        assert sum(len(shards) for shards in owned) == 16
+        assert sorted(len(shards) for shards in owned) == [5, 5, 6]
+        print(f"✅ Шарди розподілено: {[sorted(s) for s in owned]}")
+
+
+def test_dead_worker_shards_are_rebalanced():
+    """Шарди воркера, що впав, переходять до живих після спливання оренди"""
+    print("\n🧪 Тестування перебалансування після падіння воркера...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "leases.db")
+        workers = [MonitorLeaseManager(db_path, f"worker-{i}", num_shards=12, lease_ttl=30) for i in range(3)]
+
+        now = 1000.0
+        for _ in range(3):
+            for worker in workers:
+                worker.heartbeat(now)
+            now += 5
+
+        # worker-2 перестає надсилати heartbeat
+        alive = workers[:2]
+        now += 31
+        for _ in range(2):
+            for worker in alive:
+                worker.heartbeat(now)
+            now += 5
+
+        owned = _owned(alive)
+        assert owned[0].isdisjoint(owned[1])
+        assert owned[0] | owned[1] == set(range(12))
+        assert alive[0].get_live_workers() == []  # реальний час далеко після симульованого
+        print(f"✅ Після падіння: {[sorted(s) for s in owned]}")
+
+
+def test_release_all_frees_shards():
+    """Штатна зупинка одразу звільняє шарди"""
+    print("\n🧪 Тестування звільнення оренд...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "leases.db")
+        first = MonitorLeaseManager(db_path, "worker-a", num_shards=8, lease_ttl=30)
+        second = MonitorLeaseManager(db_path, "worker-b", num_shards=8, lease_ttl=30)
+
+        first.heartbeat(1000.0)
+        second.heartbeat(1000.0)
+        first.release_all()
+        second.heartbeat(1001.0)
+
+        assert second.owned_shards == set(range(8))
+        assert second.owns("76561198000000000", now=1001.0) is True
+
+        # База заблокована при зупинці: помилка лише друкується, зупинка не падає
+        second._connect = LockedConnection
+        second.release_all()
+        assert second.owned_shards == set()
+        print("✅ Оренди звільнено та перехоплено")
+
+
+def test_failed_heartbeat_drops_expired_leases():
+    """Воркер без успішного heartbeat перестає обробляти шарди після спливання оренд"""
+    print("\n🧪 Тестування невдалого heartbeat...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "leases.db")
+        stuck = MonitorLeaseManager(db_path, "worker-a", num_shards=4, lease_ttl=30)
+        other = MonitorLeaseManager(db_path, "worker-b", num_shards=4, lease_ttl=30)
+        stuck.heartbeat(1000.0)
+        assert stuck.owned_shards == set(range(4))
+
+        stuck._connect = LockedConnection
+        for now in (1010.0, 1020.0):
+            try:
+                stuck.heartbeat(now)
+            except sqlite3.OperationalError:
+                pass
+            # Поки оренда діє, шарди залишаються за воркером
+            assert stuck.owns("76561198000000000", now=now) is True
+        try:
+            stuck.heartbeat(1030.0)
+        except sqlite3.OperationalError:
+            pass
+        assert stuck.owned_shards == set() and stuck.owns("76561198000000000", now=1030.0) is False
+
+        # Після спливання оренди шарди забирає інший воркер - без дублювання
+        other.heartbeat(1031.0)
+        assert other.owned_shards == set(range(4))
+        print("✅ Прострочені шарди відпущено, їх перехопив інший воркер")
+
+
+def main():
+    """Головна функція тестування"""
+    test_workers_split_shards_disjointly()
+    test_dead_worker_shards_are_rebalanced()
+    test_release_all_frees_shards()
+    test_failed_heartbeat_drops_expired_leases()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
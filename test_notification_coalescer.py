@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки об'єднання сповіщень у дайджест
+"""
+import os
+import tempfile
+import time
+
+from src.services.outbox import MessageOutbox
+from src.services.notification_coalescer import NotificationCoalescer
+from src.services.match_monitor import MatchMonitor
+
+
+def match_payload(match_id, kills, deaths, map_name="de_dust2"):
+    monitor = MatchMonitor.__new__(MatchMonitor)
+    return {
+        'text': f"🎮 Матч {match_id}",
+        'summary': monitor.create_match_summary(
+            {'kills': kills, 'deaths': deaths, 'damage': 1000},
+            {'player_name': "s1mple", 'last_match_map': map_name, 'last_match_result': 'Перемога'}
+        )
+    }
+
+
+def test_zero_window_sends_immediately():
+    """Без вікна повідомлення одразу йде в outbox"""
+    print("🧪 Тестування надсилання без вікна...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "coalescer.db")
+        outbox = MessageOutbox(db_path)
+        coalescer = NotificationCoalescer(db_path, outbox)
+
+        coalescer.add(1, "765", 'match', "m1", match_payload("m1", 20, 10), window=0)
+        message = outbox.claim()
+        assert message['text'] == "🎮 Матч m1"
+        print("✅ Повідомлення надіслано одразу")
+
+
+def test_matches_in_window_become_digest():
+    """Матчі одного гравця в межах вікна надсилаються одним дайджестом"""
+    print("\n🧪 Тестування дайджесту...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "coalescer.db")
+        outbox = MessageOutbox(db_path)
+        coalescer = NotificationCoalescer(db_path, outbox)
+
+        coalescer.add(1, "765", 'match', "m1", match_payload("m1", 20, 10), window=600)
+        coalescer.add(1, "765", 'match', "m2", match_payload("m2", 10, 10, "de_mirage"), window=600)
+        coalescer.add(1, "765", 'demo_analysis', "m1",
+                      {'text': "📊 Аналіз m1", 'summary': {'map': 'de_dust2', 'kd_ratio': 2.0, 'overall_rating': 7.5}},
+                      window=600)
+        coalescer.add(2, "765", 'match', "m1", match_payload("m1", 20, 10), window=600)
+
+        # Вікно ще відкрите
+        assert coalescer.flush_due() == 0
+        assert outbox.get_stats() == {}
+
+        assert coalescer.flush_due(now=time.time() + 601) == 2
+        first = outbox.claim()
+        second = outbox.claim()
+        digest = first if first['chat_id'] == 1 else second
+        single = second if digest is first else first
+
+        assert digest['text'].startswith("🎮 **Дайджест матчів s1mple**")
+        assert "Зіграно матчів: 2" in digest['text']
+        assert "de_mirage" in digest['text'] and "`m2`" in digest['text']
+        assert "K/D **30/20**" in digest['text']
+        assert "рейтинг 7.5/10" in digest['text']
+        assert single['text'] == "🎮 Матч m1"
+
+        # Буфер очищено
+        assert coalescer.flush_due(now=time.time() + 601) == 0
+        print("✅ Дайджест сформовано")
+
+
+def test_window_starts_from_first_notification():
+    """Нове сповіщення не продовжує вже відкрите вікно"""
+    print("\n🧪 Тестування фіксованого вікна...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "coalescer.db")
+        outbox = MessageOutbox(db_path)
+        coalescer = NotificationCoalescer(db_path, outbox)
+
+        coalescer.add(1, "765", 'match', "m1", match_payload("m1", 20, 10), window=60)
+        coalescer.add(1, "765", 'match', "m2", match_payload("m2", 20, 10), window=3600)
+
+        assert coalescer.flush_due(now=time.time() + 61) == 1
+        print("✅ Вікно рахується від першого матчу")
+
+
+def main():
+    """Головна функція тестування"""
+    test_zero_window_sends_immediately()
+    test_matches_in_window_become_digest()
+    test_window_starts_from_first_notification()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки outbox та відправника повідомлень
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from src.services.outbox import MessageOutbox, OutboxSender
+from src.services.rate_limiter import TelegramRateLimiter
+
+
+class FakeBot:
+    """Бот, що записує надіслані повідомлення та може падати заданими помилками"""
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = errors or {}
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        if self.errors.get(chat_id):
+            raise self.errors[chat_id].pop(0)
+        self.sent.append((chat_id, text, parse_mode))
+
+
+def test_enqueue_deduplicates_identical_messages():
+    """Однакові повідомлення в той самий чат відкидаються, поки попереднє не надіслано"""
+    print("🧪 Тестування дедуплікації outbox...")
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = MessageOutbox(os.path.join(tmp, "outbox.db"))
+
+        first = outbox.enqueue(1, "Привіт")
+        assert first is not None
+        assert outbox.enqueue(1, "Привіт") is None
+        assert outbox.enqueue(2, "Привіт") is not None
+        assert outbox.get_stats() == {'pending': 2}
+
+        # Той самий звіт, запитаний повторно після доставки, надсилається знову
+        outbox.mark_sent(outbox.claim()['id'])
+        assert outbox.enqueue(1, "Привіт") not in (None, first)
+
+        # Явний ключ ідемпотентності діє й після доставки
+        keyed = outbox.enqueue(3, "Звіт", dedupe_key="report:3")
+        outbox.mark_sent(keyed)
+        assert outbox.enqueue(3, "Звіт (повтор)", dedupe_key="report:3") is None
+        print("✅ Дедуплікація працює")
+
+
+def test_claim_keeps_per_chat_order():
+    """Повідомлення одного чату не надсилаються паралельно"""
+    print("\n🧪 Тестування порядку повідомлень...")
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = MessageOutbox(os.path.join(tmp, "outbox.db"))
+        outbox.enqueue(1, "перше")
+        outbox.enqueue(1, "друге")
+        outbox.enqueue(2, "інший чат")
+
+        first = outbox.claim()
+        other = outbox.claim()
+        assert first['text'] == "перше"
+        assert other['text'] == "інший чат"
+        assert outbox.claim() is None
+
+        outbox.mark_sent(first['id'])
+        assert outbox.claim()['text'] == "друге"
+        print("✅ Порядок у межах чату збережено")
+
+
+def test_sender_handles_telegram_errors():
+    """RetryAfter, Forbidden та помилки розмітки обробляються без втрати повідомлень"""
+    print("\n🧪 Тестування обробки помилок Telegram...")
+
+    async def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            outbox = MessageOutbox(os.path.join(tmp, "outbox.db"))
+            bot = FakeBot(errors={
+                1: [RetryAfter(0), BadRequest("Can't parse entities")],
+                2: [Forbidden("blocked")]
+            })
+            sender = OutboxSender(outbox, bot, TelegramRateLimiter(global_rate=1000, per_chat_interval=0))
+
+            outbox.enqueue(1, "*звіт*")
+            outbox.enqueue(2, "заблокований")
+
+            for _ in range(4):
+                message = outbox.claim()
+                if message:
+                    await sender.deliver(message)
+
+            assert bot.sent == [(1, "*звіт*", None)]
+            assert outbox.get_stats() == {'sent': 1, 'failed': 1}
+
+    asyncio.run(run())
+    print("✅ Помилки Telegram обробляються")
+
+
+def test_rate_limiter_spaces_messages_per_chat():
+    """Лімітер витримує інтервал між повідомленнями в один чат"""
+    print("\n🧪 Тестування лімітера...")
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = MessageOutbox(os.path.join(tmp, "outbox.db"))
+        limiter = TelegramRateLimiter(global_rate=1000, per_chat_interval=0.05)
+        for n in range(3):
+            outbox.enqueue(1, f"повідомлення {n}")
+
+        start = time.monotonic()
+        sent = 0
+        while sent < 3:
+            message, wait = outbox.claim_limited(limiter)
+            if message:
+                outbox.mark_sent(message['id'])
+                sent += 1
+            else:
+                time.sleep(wait or 0.005)
+        elapsed = time.monotonic() - start
+        assert elapsed >= 0.1, elapsed
+        print(f"✅ 3 повідомлення в один чат за {elapsed:.2f} с")
+
+
+def test_rate_limit_shared_between_processes():
+    """Глобальний ліміт та пауза flood control спільні для відправників різних процесів"""
+    print("\n🧪 Тестування спільного ліміту...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "outbox.db")
+        # Два відправники з окремими об'єктами, як у боті та воркері моніторингу
+        senders = [(MessageOutbox(db_path), TelegramRateLimiter(global_rate=20, per_chat_interval=0)) for _ in range(2)]
+        for chat_id in range(1, 9):
+            senders[0][0].enqueue(chat_id, "звіт")
+
+        start = time.monotonic()
+        sent_at = []
+        while len(sent_at) < 8:
+            for outbox, limiter in senders:
+                message, wait = outbox.claim_limited(limiter)
+                if message:
+                    sent_at.append(time.monotonic() - start)
+                    outbox.mark_sent(message['id'])
+            time.sleep(0.005)
+        # 8 повідомлень при 20/с разом на обидва процеси - не швидше ніж за 7 інтервалів
+        assert sent_at[-1] >= 7 * 0.05 * 0.9, sent_at
+
+        senders[0][0].enqueue(100, "після паузи")
+        senders[1][0].pause(0.3)
+        message, wait = senders[0][0].claim_limited(senders[0][1])
+        assert message is None and 0.2 < wait <= 0.3
+        print(f"✅ 8 повідомлень з двох процесів за {sent_at[-1]:.2f} с, пауза спільна")
+
+
+def test_expired_lease_is_not_overwritten():
+    """Відправник з простроченою орендою не змінює повідомлення, яке забрав інший"""
+    print("\n🧪 Тестування оренди повідомлення...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "outbox.db")
+        slow, other = MessageOutbox(db_path, send_lease=0.05), MessageOutbox(db_path)
+        slow.enqueue(1, "звіт")
+        first = slow.claim()
+        time.sleep(0.06)
+        second = other.claim()
+        assert second['id'] == first['id'] and second['attempts'] == 2
+
+        assert slow.mark_sent(first['id'], lease=first['locked_until']) is False
+        assert slow.retry(first['id'], 0, "timeout", lease=first['locked_until']) is False
+        assert other.get_stats() == {'sending': 1}
+        assert other.mark_sent(second['id'], lease=second['locked_until']) is True
+        assert other.get_stats() == {'sent': 1}
+        print("✅ Повідомлення змінює лише власник оренди")
+
+
+def test_sender_does_not_block_event_loop():
+    """Зайнята база (інший процес тримає блокування) не зупиняє event loop відправника"""
+    print("\n🧪 Тестування відправника при заблокованій базі...")
+
+    async def run(db_path):
+        outbox = MessageOutbox(db_path)
+        outbox.enqueue(1, "звіт")
+        bot = FakeBot()
+        sender = OutboxSender(outbox, bot, TelegramRateLimiter(global_rate=1000, per_chat_interval=0),
+                              poll_interval=0.01)
+        lock = sqlite3.connect(db_path, isolation_level=None)
+        lock.execute('BEGIN IMMEDIATE')
+        sender.start()
+        longest = 0.0
+        last = time.monotonic()
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+            now = time.monotonic()
+            longest, last = max(longest, now - last), now
+        lock.execute('COMMIT')
+        lock.close()
+        for _ in range(200):
+            if bot.sent:
+                break
+            await asyncio.sleep(0.01)
+        await sender.stop()
+        return longest, bot.sent
+
+    with tempfile.TemporaryDirectory() as tmp:
+        longest, sent = asyncio.run(run(os.path.join(tmp, "outbox.db")))
+    assert longest < 0.1, longest
+    assert sent == [(1, "звіт", 'Markdown')]
+    print(f"✅ Найдовша пауза event loop: {longest * 1000:.0f} мс")
+
+
+def main():
+    """Головна функція тестування"""
+    test_enqueue_deduplicates_identical_messages()
+    test_claim_keeps_per_chat_order()
+    test_sender_handles_telegram_errors()
+    test_rate_limiter_spaces_messages_per_chat()
+    test_rate_limit_shared_between_processes()
+    test_expired_lease_is_not_overwritten()
+    test_sender_does_not_block_event_loop()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
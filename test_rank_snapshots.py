@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки знімків рейтингу друзів
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.models.user import UserDatabase
+from src.services.daily_reports import DailyReportsService
+from src.services.rank_snapshots import RankSnapshotStore
+from test_stats_snapshot import CountingSteamAPI, make_user
+
+
+def test_rank_changes_single_pass():
+    """Зміни позицій та нові гравці"""
+    print("🧪 Тестування змін позицій...")
+    changes = RankSnapshotStore.rank_changes(["a", "b", "c", "d"], ["c", "a", "e", "b"])
+    assert changes == {"c": 2, "a": -1, "e": None, "b": -2}
+    assert RankSnapshotStore.format_change(2) == "↑2"
+    assert RankSnapshotStore.format_change(-1) == "↓1"
+    assert RankSnapshotStore.format_change(None) == "🆕"
+    assert RankSnapshotStore.format_change(0) == ""
+    assert RankSnapshotStore.group_key(["s1", "s2"]) == RankSnapshotStore.group_key(["s2", "s1", "s2"])
+    print("✅ Зміни позицій обчислюються коректно")
+
+
+def count_snapshots(db_path: str) -> int:
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM rank_snapshots").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_friends_report_shows_changes_and_shares_snapshots():
+    """Звіт по друзях показує зміну з учора, однакові групи мають один знімок"""
+    print("\n🧪 Тестування рейтингу друзів зі змінами...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "ranks.db")
+        user_db = UserDatabase(db_path)
+        # Двоє друзів додали один одного - склад групи однаковий
+        first = make_user(1, "s1", friends=["s2", "s3"])
+        second = make_user(2, "s2", friends=["s1", "s3"])
+        service = DailyReportsService(user_db, CountingSteamAPI(), bot=None)
+
+        group_key = RankSnapshotStore.group_key(["s1", "s2", "s3"])
+        today = date.today()
+        service.rank_snapshots.save(group_key, ["s3", "s2", "s1"], today - timedelta(days=1))
+
+        snapshot = asyncio.run(service.build_snapshot([first, second]))
+        report = asyncio.run(service.generate_friends_daily_report(first, snapshot, today))
+        # Impact Score залежить від останньої цифри: s3 > s2 > s1, тобто порядок не змінився
+        assert "↑" not in report and "↓" not in report
+        assert "Зміни позицій з" in report
+
+        service.rank_snapshots.save(group_key, ["s1", "s3", "s2"], today - timedelta(days=1))
+        changes = asyncio.run(service.get_leaderboard_changes(second, snapshot))
+        assert changes['ranking'] == ["s3", "s2", "s1"]
+        assert changes['changes'] == {"s3": 1, "s2": 1, "s1": -2}
+        report = asyncio.run(service.generate_friends_daily_report(second, snapshot, today))
+        assert "Гравець s2** 👤 ↑1" in report
+
+        assert count_snapshots(db_path) == 2  # вчорашній та спільний сьогоднішній знімок
+        print("✅ Рейтинг друзів показує зміни позицій")
+
+
+def test_adhoc_reports_do_not_save_snapshots():
+    """Ручні звіти лише читають знімки; розсилка зберігає їх за локальним днем користувача"""
+    print("\n🧪 Тестування збереження знімків лише з розсилки...")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "ranks.db")
+        user_db = UserDatabase(db_path)
+        user = make_user(1, "s1", friends=["s2", "s3"])
+        user.timezone = "Pacific/Kiritimati"  # UTC+14: локальний день часто вже завтрашній
+        user_db.create_user(user)
+        service = DailyReportsService(user_db, CountingSteamAPI(), bot=None)
+        group_key = RankSnapshotStore.group_key(["s1", "s2", "s3"])
+        local_day = datetime.now(ZoneInfo("Pacific/Kiritimati")).date()
+        service.rank_snapshots.save(group_key, ["s1", "s2", "s3"], local_day - timedelta(days=1))
+
+        # /daily_report та тестовий звіт не перезаписують сьогоднішній знімок
+        snapshot = asyncio.run(service.build_snapshot([user]))
+        report = asyncio.run(service.generate_friends_daily_report(user, snapshot))
+        changes = asyncio.run(service.get_leaderboard_changes(user, snapshot))
+        assert "Зміни позицій з" in report and changes['previous_day'] == local_day - timedelta(days=1)
+        assert count_snapshots(db_path) == 1
+
+        sent, errors = asyncio.run(service.send_daily_reports_to_all_users(wait_delivery=False))
+        assert (sent, errors) == (1, 0)
+        saved = service.rank_snapshots.get_previous(group_key, local_day + timedelta(days=1))
+        assert saved == (local_day, ["s3", "s2", "s1"])
+        # Після розсилки ручний звіт порівнює з учорашнім знімком, а не з сьогоднішнім
+        changes = asyncio.run(service.get_leaderboard_changes(user, snapshot))
+        assert changes['previous_day'] == local_day - timedelta(days=1) and count_snapshots(db_path) == 2
+        print("✅ Знімок збережено лише розсилкою за локальний день")
+
+
+def main():
+    """Головна функція тестування"""
+    test_rank_changes_single_pass()
+    test_friends_report_shows_changes_and_shares_snapshots()
+    test_adhoc_reports_do_not_save_snapshots()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
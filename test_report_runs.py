@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки відновлення та розкладу щоденних розсилок
+"""
+import asyncio
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from src.models.user import UserDatabase, User
+from src.services.daily_reports import DailyReportsService
+from src.services.scheduler import TaskScheduler
+from src.services.report_schedule import ReportSchedule
+from test_stats_snapshot import CountingSteamAPI
+
+
+def make_service(tmp, users_count=5):
+    user_db = UserDatabase(os.path.join(tmp, "runs.db"))
+    for telegram_id in range(1, users_count + 1):
+        user_db.create_user(User(telegram_id, steam_id=f"s{telegram_id}"))
+    return DailyReportsService(user_db, CountingSteamAPI(), bot=None)
+
+
+def test_restarted_run_skips_delivered_users():
+    """Перезапущена розсилка надсилає звіти лише тим, хто їх ще не отримав"""
+    print("🧪 Тестування продовження розсилки...")
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp)
+        run_id = "daily-2024-12-15"
+
+        # Процес впав після того, як перші двоє отримали звіт
+        service.report_runs.start_run(run_id, 'daily', [1, 2, 3, 4, 5])
+        conn = service.report_runs.connect()
+        service.report_runs.mark_in_transaction(conn, run_id, [1, 2], 'enqueued')
+        conn.close()
+
+        sent, errors = asyncio.run(service.send_daily_reports_to_all_users(run_id, wait_delivery=False))
+        assert (sent, errors) == (3, 0)
+        assert sorted(service.steam_api.stats_calls) == ["s3", "s4", "s5"]
+        assert service.report_runs.get_run(run_id)['attempts'] == 2
+        assert service.report_runs.is_completed(run_id)
+
+        # Повторний ручний запуск нічого не дублює
+        sent, errors = asyncio.run(service.send_daily_reports_to_all_users(run_id, wait_delivery=False))
+        assert (sent, errors) == (0, 0)
+        assert service.outbox.get_stats() == {'pending': 3}
+        print("✅ Розсилка продовжилась без дублікатів")
+
+
+def test_failed_users_retried_on_rerun():
+    """Користувачі без звіту (помилка Steam) отримують його при повторному запуску"""
+    print("\n🧪 Тестування повтору невдалих користувачів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp, users_count=2)
+        service.user_db.create_user(User(3, steam_id="missing"))
+
+        sent, errors = asyncio.run(service.send_daily_reports_to_all_users("daily-x", wait_delivery=False))
+        assert (sent, errors) == (2, 1)
+        assert service.report_runs.get_delivery_stats("daily-x") == {'enqueued': 2, 'error': 1}
+
+        service.steam_api.stats_calls.clear()
+        asyncio.run(service.send_daily_reports_to_all_users("daily-x", wait_delivery=False))
+        assert service.steam_api.stats_calls == ["missing"]
+        print("✅ Невдалі користувачі повторюються")
+
+
+def test_buckets_follow_user_time_zones():
+    """Кожен пакет обробляє користувачів, чий локальний час звіту настав"""
+    print("\n🧪 Тестування пакетів з часовими поясами...")
+    with tempfile.TemporaryDirectory() as tmp:
+        service = make_service(tmp, users_count=1)
+        service.user_db.create_user(User(2, steam_id="s2", report_time="09:00", timezone="Europe/London"))
+        service.user_db.create_user(User(3, steam_id="s3", report_time="23:50", timezone="America/New_York"))
+        service.schedule = ReportSchedule("10:00", "Europe/Kyiv", stagger_minutes=30)
+        scheduler = TaskScheduler(service)
+
+        def bucket(hour, minute):
+            service.steam_api.stats_calls.clear()
+            asyncio.run(scheduler.run_report_bucket(datetime(2024, 12, 15, hour, minute, tzinfo=timezone.utc)))
+            return sorted(service.steam_api.stats_calls)
+
+        # Перший пакет після старту надолужує пропущене: 23:50 у Нью-Йорку = 04:50 UTC
+        assert bucket(7, 0) == ["s3"]
+        assert service.report_runs.get_delivery_stats("daily-2024-12-14") == {'enqueued': 1}
+        # 10:00 за Києвом = 08:00 UTC (+ зсув до 30 хв)
+        assert bucket(8, 31) == ["s1"]
+        # 09:00 за Лондоном = 09:00 UTC
+        assert bucket(9, 31) == ["s2"]
+
+        # Після перезапуску вже надіслані звіти не повторюються
+        scheduler._last_bucket_end = None
+        assert bucket(9, 35) == []
+        print("✅ Пакети враховують час і часовий пояс користувачів")
+
+
+def test_stagger_spreads_same_report_time():
+    """Користувачі з однаковим часом розподіляються по вікну"""
+    print("\n🧪 Тестування розподілу звітів...")
+    schedule = ReportSchedule("10:00", "UTC", stagger_minutes=30)
+    offsets = [schedule.stagger_offset(telegram_id) for telegram_id in range(1000)]
+    assert all(timedelta(0) <= offset < timedelta(minutes=30) for offset in offsets)
+    # У кожен 5-хвилинний пакет потрапляє приблизно шоста частина користувачів
+    buckets = [sum(1 for offset in offsets if n * 300 <= offset.total_seconds() < (n + 1) * 300) for n in range(6)]
+    assert min(buckets) > 100, buckets
+    assert schedule.stagger_offset(42) == schedule.stagger_offset(42)
+    print(f"✅ Розподіл по пакетах: {buckets}")
+
+
+def main():
+    """Головна функція тестування"""
+    test_restarted_run_skips_delivered_users()
+    test_failed_users_retried_on_rerun()
+    test_buckets_follow_user_time_zones()
+    test_stagger_spreads_same_report_time()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки пакетного розрахунку Impact Score
+"""
+import random
+
+import numpy as np
+
+from src.services.steam_api import SteamAPI
+from src.services.stats_batch import PlayerStatsBatch, COUNTER_FIELDS, round_half_even
+from bench_impact_score import random_raw_stats
+
+
+def test_batch_matches_scalar_path():
+    """Пакетний розрахунок збігається з parse_cs2_stats та calculate_impact_score"""
+    print("🧪 Тестування відповідності скалярному розрахунку...")
+    api = SteamAPI("test")
+    rng = random.Random(7)
+    raw = {f"s{n}": random_raw_stats(rng) for n in range(5000)}
+    raw["empty"] = {}
+
+    batch = PlayerStatsBatch.from_raw_stats(raw)
+    metrics = batch.metrics()
+    scores = batch.impact_score_map()
+
+    for row, steam_id in enumerate(batch.steam_ids):
+        parsed = api.parse_cs2_stats(raw[steam_id])
+        assert scores[steam_id] == api.calculate_impact_score(parsed), steam_id
+        if not parsed:
+            continue
+        for name, values in metrics.items():
+            assert values[row] == parsed[name], (steam_id, name, values[row], parsed[name])
+
+    from_parsed = PlayerStatsBatch.from_parsed({steam_id: api.parse_cs2_stats(stats) for steam_id, stats in raw.items()})
+    assert from_parsed.impact_score_map() == scores
+    print(f"✅ {len(raw)} гравців збігаються зі скалярним розрахунком")
+
+
+def test_rounding_matches_builtin_round():
+    """Округлення збігається з round() на значеннях біля половини"""
+    print("\n🧪 Тестування округлення...")
+    values = np.array([0.125, 0.375, 2.675, 1.005, 0.5, 1.5, 2.5, 33.35, 66.65, 12.345])
+    for ndigits in (0, 1, 2):
+        rounded = round_half_even(values, ndigits)
+        assert rounded.tolist() == [round(float(value), ndigits) for value in values]
+    assert len(COUNTER_FIELDS) == PlayerStatsBatch.from_raw_stats({}).counters.shape[1]
+    print("✅ Округлення збігається з round()")
+
+
+def test_ranked_is_stable():
+    """Рейтинг від найвищого Impact Score, однакові значення - у вихідному порядку"""
+    print("\n🧪 Тестування сортування...")
+    raw = {
+        "a": {'stats': [{'name': 'total_kills', 'value': 10}, {'name': 'total_deaths', 'value': 10}]},
+        "b": {'stats': [{'name': 'total_kills', 'value': 30}, {'name': 'total_deaths', 'value': 10}]},
+        "c": {'stats': [{'name': 'total_kills', 'value': 10}, {'name': 'total_deaths', 'value': 10}]},
+    }
+    assert PlayerStatsBatch.from_raw_stats(raw).ranked() == ["b", "a", "c"]
+    print("✅ Сортування стабільне")
+
+
+def main():
+    """Головна функція тестування"""
+    test_batch_matches_scalar_path()
+    test_rounding_matches_builtin_round()
+    test_ranked_is_stable()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки знімка статистики та щоденних звітів
+"""
+import asyncio
+import os
+import tempfile
+
+from src.models.user import UserDatabase, User
+from src.services.steam_api import SteamAPI
+from src.services.daily_reports import DailyReportsService
+from src.services.stats_snapshot import PlayerStatsSnapshot
+from src.services.outbox import OutboxSender
+from src.services.rate_limiter import TelegramRateLimiter
+
+
+class CountingSteamAPI(SteamAPI):
+    """Steam API без мережі, що рахує запити"""
+
+    def __init__(self):
+        super().__init__("test")
+        self.stats_calls = []
+        self.summary_calls = []
+
+    async def get_player_stats(self, steam_id, time_period="all"):
+        self.stats_calls.append(steam_id)
+        if steam_id == "missing":
+            return None
+        n = int(steam_id[-1])
+        return {'stats': [
+            {'name': 'total_kills', 'value': 100 + n * 10},
+            {'name': 'total_deaths', 'value': 100},
+            {'name': 'total_kills_headshot', 'value': 40},
+            {'name': 'total_wins', 'value': 10 + n},
+            {'name': 'total_matches_played', 'value': 20},
+            {'name': 'total_mvps', 'value': 5},
+        ]}
+
+    async def get_player_summaries(self, steam_ids):
+        self.summary_calls.append(list(steam_ids))
+        return [{'steamid': steam_id, 'personaname': f"Гравець {steam_id}"} for steam_id in steam_ids]
+
+
+class RecordingBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append(chat_id)
+
+
+def make_user(telegram_id, steam_id=None, friends=None):
+    user = User(telegram_id, steam_id=steam_id)
+    user.friends = friends or []
+    return user
+
+
+def test_snapshot_fetches_each_player_once():
+    """Спільні друзі завантажуються один раз, імена - пакетами"""
+    print("🧪 Тестування знімка статистики...")
+    api = CountingSteamAPI()
+    users = [
+        make_user(1, "s1", ["s2", "s3"]),
+        make_user(2, "s2", ["s1", "s3", "missing"]),
+        make_user(3, "s4", ["s3"]),
+    ]
+    steam_ids = PlayerStatsSnapshot.collect_steam_ids(users)
+    assert steam_ids == ["s1", "s2", "s3", "missing", "s4"]
+
+    snapshot = asyncio.run(PlayerStatsSnapshot.build(api, steam_ids, concurrency=2))
+    assert sorted(api.stats_calls) == sorted(steam_ids)
+    assert len(api.summary_calls) == 1
+    assert snapshot.failed == ["missing"]
+    assert snapshot.get_name("s3") == "Гравець s3"
+    assert snapshot.get_impact_score("s4") > snapshot.get_impact_score("s1")
+    print(f"✅ {snapshot.total_requests} запитів для {len(steam_ids)} гравців")
+
+
+def test_daily_reports_render_from_snapshot():
+    """Щоденна розсилка робить по одному запиту на гравця"""
+    print("\n🧪 Тестування щоденних звітів зі знімка...")
+    with tempfile.TemporaryDirectory() as tmp:
+        user_db = UserDatabase(os.path.join(tmp, "reports.db"))
+        user_db.create_user(make_user(1, "s1", ["s2", "s3"]))
+        user_db.create_user(make_user(2, "s2", ["s1", "s3"]))
+        user_db.create_user(User(3))
+
+        api = CountingSteamAPI()
+        service = DailyReportsService(user_db, api, bot=None)
+        sent, errors = asyncio.run(service.send_daily_reports_to_all_users(wait_delivery=False))
+
+        assert (sent, errors) == (2, 0)
+        assert sorted(api.stats_calls) == ["s1", "s2", "s3"]
+        assert len(api.summary_calls) == 1
+        # Персональний звіт та рейтинг друзів для кожного з двох користувачів
+        assert service.outbox.get_stats() == {'pending': 4}
+
+        message = service.outbox.claim()
+        assert "Гравець s1" in message['text']
+        print("✅ Звіти сформовано без повторних запитів")
+
+
+def test_daily_reports_wait_for_delivery():
+    """Розсилка чекає, поки відправник outbox доставить усі звіти"""
+    print("\n🧪 Тестування доставки щоденних звітів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        user_db = UserDatabase(os.path.join(tmp, "reports.db"))
+        for telegram_id in range(1, 21):
+            user_db.create_user(make_user(telegram_id, f"s{telegram_id % 10}", ["s1", "s2"]))
+
+        bot = RecordingBot()
+        service = DailyReportsService(user_db, CountingSteamAPI(), bot)
+        service.delivery_poll_interval = 0.05
+
+        async def run():
+            sender = OutboxSender(service.outbox, bot, TelegramRateLimiter(global_rate=1000, per_chat_interval=0.01),
+                                  poll_interval=0.01)
+            sender.start()
+            try:
+                return await service.send_daily_reports_to_all_users(delivery_timeout=30)
+            finally:
+                await sender.stop()
+
+        sent, errors = asyncio.run(run())
+        assert (sent, errors) == (20, 0)
+        assert len(bot.sent) == 40
+        assert service.outbox.get_stats() == {'sent': 40}
+        print("✅ Усі 40 повідомлень доставлено")
+
+
+def main():
+    """Головна функція тестування"""
+    test_snapshot_fetches_each_player_once()
+    test_daily_reports_render_from_snapshot()
+    test_daily_reports_wait_for_delivery()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Тестовий скрипт для перевірки тижневих агрегатів та тижневого підсумку
+"""
+import asyncio
+import os
+import tempfile
+from datetime import date
+
+from src.models.user import UserDatabase
+from src.services.daily_reports import DailyReportsService
+from src.services.weekly_stats import WeeklyStatsStore
+from test_stats_snapshot import CountingSteamAPI, make_user
+
+
+def player_stats(matches, kills, deaths, wins, last_match=None):
+    stats = {
+        'kills': kills, 'deaths': deaths, 'headshot_kills': kills // 2, 'wins': wins,
+        'matches_played': matches, 'mvps': 0,
+        'kd_ratio': round(kills / deaths, 2), 'win_rate': round(wins / matches * 100, 1),
+        'headshot_percent': 50.0,
+    }
+    if last_match:
+        stats['last_match'] = last_match
+    return stats
+
+
+def test_week_tracks_start_last_and_best_match():
+    """Тиждень починається з останнього значення попереднього, найкращий матч - лише новий"""
+    print("🧪 Тестування тижневих агрегатів...")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = WeeklyStatsStore(os.path.join(tmp, "weekly.db"))
+        old_match = {'kills': 40, 'deaths': 5, 'damage': 4000, 'mvps': 9, 'rounds': 24}
+
+        # Неділя попереднього тижня
+        store.record({"s1": (player_stats(10, 100, 100, 5, old_match), 50.0, "A")}, date(2024, 12, 8))
+        # Понеділок: матч з попереднього тижня не стає найкращим цього тижня
+        store.record({"s1": (player_stats(10, 100, 100, 5, old_match), 50.0, "A")}, date(2024, 12, 9))
+        store.record({"s1": (player_stats(11, 120, 110, 6, {'kills': 20, 'deaths': 10, 'damage': 2000, 'rounds': 20}),
+                             55.0, "A")}, date(2024, 12, 10))
+        store.record({"s1": (player_stats(12, 130, 125, 6, {'kills': 10, 'deaths': 15, 'damage': 1500, 'rounds': 20}),
+                             53.0, "A")}, date(2024, 12, 12))
+
+        week = store.get_week(["s1", "unknown"], date(2024, 12, 9))
+        assert list(week) == ["s1"]
+        assert week["s1"]['start']['matches_played'] == 10
+        assert week["s1"]['last']['matches_played'] == 12
+        assert week["s1"]['last']['impact_score'] == 53.0
+        assert week["s1"]['best_match']['kills'] == 20
+        print("✅ Агрегати тижня оновлюються інкрементально")
+
+
+def test_weekly_summary_uses_aggregates_only():
+    """Тижневий підсумок не звертається до Steam та показує зміну місця серед друзів"""
+    print("\n🧪 Тестування тижневого підсумку...")
+    with tempfile.TemporaryDirectory() as tmp:
+        user_db = UserDatabase(os.path.join(tmp, "weekly.db"))
+        user_db.create_user(make_user(1, "s1", friends=["s2"]))
+        user_db.create_user(make_user(2, "s2"))
+        service = DailyReportsService(user_db, CountingSteamAPI(), bot=None)
+        monday = date(2024, 12, 9)
+
+        service.weekly_stats.record({
+            "s1": (player_stats(10, 100, 100, 5), 50.0, "Перший"),
+            "s2": (player_stats(10, 100, 100, 5), 60.0, "Другий"),
+        }, monday)
+        service.weekly_stats.record({
+            "s1": (player_stats(12, 130, 110, 7, {'kills': 18, 'deaths': 6, 'damage': 2100, 'mvps': 4,
+                                                   'rounds': 22, 'result': 'Перемога'}), 65.0, "Перший"),
+            "s2": (player_stats(10, 100, 100, 5), 60.0, "Другий"),
+        }, date(2024, 12, 14))
+
+        sent, errors = asyncio.run(service.send_weekly_summary(monday))
+        assert (sent, errors) == (2, 0)
+        assert service.steam_api.stats_calls == []
+        assert service.report_runs.get_delivery_stats("weekly-2024-W50") == {'enqueued': 2}
+
+        summary = service.generate_weekly_summary(
+            user_db.get_user(1), service.weekly_stats.get_week(["s1", "s2"], monday), monday)
+        assert "#2 → **#1**" in summary
+        assert "2 матчів" in summary
+        assert "18/6" in summary and "Перемога" in summary
+        assert "K/D тижня: **3.0**" in summary
+
+        # Повторний запуск того ж тижня нічого не дублює
+        assert asyncio.run(service.send_weekly_summary(monday)) == (0, 0)
+        assert service.outbox.get_stats() == {'pending': 2}
+        print("✅ Тижневий підсумок сформовано з агрегатів")
+
+
+def main():
+    """Головна функція тестування"""
+    test_week_tracks_start_last_and_best_match()
+    test_weekly_summary_uses_aggregates_only()
+    print("\n🎉 Всі тести пройшли успішно!")
+
+
+if __name__ == "__main__":
+    main()